@@ -41,6 +41,8 @@ from plastid.genomics.roitools import (GenomicSegment,
                                        SegmentChain,
                                        Transcript)
 
+from plastid.genomics.chain_table import ChainTable
+
 from plastid.genomics.genome_array import (BAMGenomeArray,
                                            BigWigGenomeArray,
                                            GenomeArray,
@@ -59,14 +61,17 @@ from plastid.genomics.map_factories import (StratifiedVariableFivePrimeMapFactor
                                             FivePrimeMapFactory,
                                             CenterMapFactory,
                                             ThreePrimeMapFactory,
-                                            SizeFilterFactory)
+                                            SizeFilterFactory,
+                                            ReadFilter)
 
 from plastid.readers.bed import BED_Reader
 from plastid.readers.bigbed import BigBedReader
 from plastid.readers.gff import (GTF2_Reader,
                                  GFF3_Reader,
                                  GTF2_TranscriptAssembler,
-                                 GFF3_TranscriptAssembler)
+                                 GFF3_TranscriptAssembler,
+                                 GTF2_IndexedTranscriptAssembler,
+                                 GFF3_IndexedTranscriptAssembler)
 
 from plastid.readers.psl import PSL_Reader
 from plastid.readers.bigwig import BigWigReader
@@ -49,6 +49,7 @@ from plastid.util.io.openers import argsopener, get_short_name
 from plastid.util.scriptlib.argparsers import (AnnotationParser, AlignmentParser,
                                                MaskParser, BaseParser)
 from plastid.util.scriptlib.help_formatters import format_module_docstring
+from plastid.util.scriptlib.pipeline import Pipeline, Stage
 
 warnings.simplefilter("once")
 printer = NameDateWriter(get_short_name(inspect.stack()[-1][1]))
@@ -99,31 +100,40 @@ def main(argv=sys.argv[1:]):
     ga_sum = ga.sum()
     normconst = 1000.0*1e6 / ga_sum
     
+    def add_masks(ivc):
+        masks = crossmap.get_overlapping_features(ivc)
+        ivc.add_masks(*itertools.chain.from_iterable((X for X in masks)))
+        return ivc
+
+    def count(ivc):
+        counts = numpy.nansum(ivc.get_masked_counts(ga))
+        length = ivc.masked_length
+        rpnt = numpy.nan if length == 0 else float(counts)/length
+        rpkm = numpy.nan if length == 0 else rpnt * normconst 
+        ltmp = [ivc.get_name(),
+                str(ivc),
+                "%.8e" % counts,
+                "%.8e" % rpnt,
+                "%.8e" % rpkm,
+                "%d" % length]
+        return "%s\n" % "\t".join(ltmp)
+
+    # parse, mask, count, and write in separate threads
+    pipeline = Pipeline([Stage("mask",add_masks),
+                         Stage("count",count)])
     with argsopener(args.outfile,args,"w") as fout:
         fout.write("## total_dataset_counts: %s\n" % ga_sum)
         fout.write("region_name\tregion\tcounts\tcounts_per_nucleotide\trpkm\tlength\n")
-        for n,ivc in enumerate(transcripts):
-            name = ivc.get_name()
-            masks = crossmap.get_overlapping_features(ivc)
-            ivc.add_masks(*itertools.chain.from_iterable((X for X in masks)))
+        n = 0
+        for n, line in enumerate(pipeline.imap(transcripts,name="parse")):
             if n % 1000 == 0:
                 printer.write("Processed %s regions..." % n)
-                
-            counts = numpy.nansum(ivc.get_masked_counts(ga))
-            length = ivc.masked_length
-            rpnt = numpy.nan if length == 0 else float(counts)/length
-            rpkm = numpy.nan if length == 0 else rpnt * normconst 
-            ltmp = [name,
-                    str(ivc),
-                    "%.8e" % counts,
-                    "%.8e" % rpnt,
-                    "%.8e" % rpkm,
-                    "%d" % length]
-            fout.write("%s\n" % "\t".join(ltmp))
+            fout.write(line)
     
         fout.close()
         
     printer.write("Processed %s regions total." % n)
+    pipeline.report(printer)
 
     printer.write("Done.")
 
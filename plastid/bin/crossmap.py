@@ -82,6 +82,7 @@ import functools
 from plastid.util.io.filters import NameDateWriter, AbstractReader
 from plastid.util.io.openers import get_short_name, argsopener
 from plastid.genomics.roitools import SegmentChain, positionlist_to_segments, GenomicSegment
+from plastid.genomics.writers import write_bed
 from plastid.util.scriptlib.help_formatters import format_module_docstring
 from plastid.util.services.mini2to3 import xrange
 from plastid.util.services.exceptions import MalformedFileError
@@ -291,11 +292,8 @@ def chrom_worker(chrom_seq,args=None):
             if os.path.exists(toomany_file):
                 printer.write("Assembling multimappers from chromosome '%s' into crossmap..."% name)
                 with argsopener(bed_file,args,"w") as bed_out:
-                    for plus_chain, minus_chain in fa_to_bed(open(toomany_file),
-                                                         args.read_length,
-                                                         offset=args.offset):
-                        bed_out.write(plus_chain.as_bed())
-                        bed_out.write(minus_chain.as_bed())
+                    chain_pairs = fa_to_bed(open(toomany_file),args.read_length,offset=args.offset)
+                    write_bed((X for pair in chain_pairs for X in pair),bed_out)
                 
                     bed_out.close()
             
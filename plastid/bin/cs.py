@@ -108,8 +108,9 @@ from plastid.util.scriptlib.argparsers import AnnotationParser,\
                                               BaseParser
 
 from plastid.util.scriptlib.help_formatters import format_module_docstring
+from plastid.util.scriptlib.pipeline import Pipeline, Stage
 
-from plastid.genomics.roitools import positions_to_segments, SegmentChain
+from plastid.genomics.roitools import GenomicSegment, SegmentChain
 from plastid.genomics.genome_hash import GenomeHash
 from plastid.util.io.openers import opener, get_short_name, argsopener, read_pl_table
 from plastid.util.io.filters import NameDateWriter
@@ -190,9 +191,139 @@ def write_output_files(table,title,args):
                           "transcript_ids"])
     pos_out.close()
 
+def _merge_intervals(intervals):
+    """Merge overlapping or adjacent half-open intervals
+
+    Parameters
+    ----------
+    intervals : list
+        List of `(start, end)` tuples, in any order
+
+    Returns
+    -------
+    list
+        Sorted list of non-overlapping, non-adjacent `(start, end)` tuples
+        covering the same positions as `intervals`
+    """
+    ltmp = []
+    for start, end in sorted(intervals):
+        if start >= end:
+            continue
+        if len(ltmp) > 0 and start <= ltmp[-1][1]:
+            if end > ltmp[-1][1]:
+                ltmp[-1] = (ltmp[-1][0],end)
+        else:
+            ltmp.append((start,end))
+
+    return ltmp
+
+def _intersect_intervals(a,b):
+    """Find positions covered by both of two lists of intervals
+
+    Parameters
+    ----------
+    a, b : list
+        Sorted lists of non-overlapping `(start, end)` tuples,
+        as returned by :func:`_merge_intervals`
+
+    Returns
+    -------
+    list
+        Sorted list of non-overlapping `(start, end)` tuples
+    """
+    ltmp = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0],b[j][0])
+        end   = min(a[i][1],b[j][1])
+        if start < end:
+            ltmp.append((start,end))
+
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+
+    return _merge_intervals(ltmp)
+
+def _subtract_intervals(a,b):
+    """Find positions covered by one list of intervals but not another
+
+    Parameters
+    ----------
+    a, b : list
+        Sorted lists of non-overlapping `(start, end)` tuples,
+        as returned by :func:`_merge_intervals`
+
+    Returns
+    -------
+    list
+        Sorted list of non-overlapping `(start, end)` tuples covering
+        positions in `a` that are not in `b`
+    """
+    ltmp = []
+    j = 0
+    for start, end in a:
+        while j < len(b) and b[j][1] <= start:
+            j += 1
+
+        k = j
+        while k < len(b) and b[k][0] < end:
+            if b[k][0] > start:
+                ltmp.append((start,b[k][0]))
+            start = max(start,b[k][1])
+            k += 1
+
+        if start < end:
+            ltmp.append((start,end))
+
+    return ltmp
+
+def _get_intervals(*chains):
+    """Return merged intervals covering all segments of one or more |SegmentChains|
+
+    Parameters
+    ----------
+    chains : |SegmentChain|
+        One or more |SegmentChains|. Masks are ignored.
+
+    Returns
+    -------
+    list
+        Sorted list of non-overlapping `(start, end)` tuples
+    """
+    return _merge_intervals([(X.start,X.end) for chain in chains for X in chain])
+
+def _intervals_to_chain(chrom,strand,intervals,**attr):
+    """Build a |SegmentChain| from a list of intervals
+
+    Parameters
+    ----------
+    chrom : str
+        Chromosome name
+
+    strand : str
+        Chromosome strand
+
+    intervals : list
+        Sorted list of non-overlapping `(start, end)` tuples
+
+    attr
+        Attributes for the new |SegmentChain|
+
+    Returns
+    -------
+    |SegmentChain|
+    """
+    return SegmentChain(*[GenomicSegment(chrom,start,end,strand) for start, end in intervals],**attr)
+
 def merge_genes(tx_ivcs):
     """Merge genes whose transcripts share exons into a combined, "merged" gene
 
+    Exons are sorted by position, so that genes sharing identical exons
+    become neighbors, and the resulting groups of genes are joined by
+    :func:`~plastid.util.services.sets.merge_sets`.
+
     Parameters
     ----------
     tx_ivcs : dict
@@ -204,49 +335,36 @@ def merge_genes(tx_ivcs):
     dict
         Dictionary mapping raw gene names to the names of the merged genes
     """
-    dout = {}
-    exondicts = {
-        "+" : {},
-        "-" : {}
-    }
-
     # backmap exons to genes as tuples
     printer.write("Mapping exons to genes ...")
-    for txid in tx_ivcs.keys():
-        my_segmentchain  = tx_ivcs[txid]
+    exons = []
+    for my_segmentchain in tx_ivcs.values():
         my_gene = my_segmentchain.get_gene()
         chrom  = my_segmentchain.spanning_segment.chrom
         strand = my_segmentchain.spanning_segment.strand
         for my_iv in my_segmentchain:
-            start = my_iv.start
-            end = my_iv.end
-            # separate exons by chromosome and strand to reduce 
-            # downstream comparisons in merging
-            if chrom not in exondicts[strand]:
-                exondicts[strand][chrom] = {}
-            try:
-                exondicts[strand][chrom][(start,end)].append(my_gene)
-            except KeyError:
-                exondicts[strand][chrom][(start,end)] = [my_gene]
-
-    for strand in exondicts:
-        for chrom in exondicts[strand]:
-            exondicts[strand][chrom] = { K : set(V) for K,V in exondicts[strand][chrom].items() }
-            printer.write("Flattening genes on %s(%s) ..." % (chrom,strand))
-            gene_groups = merge_sets(exondicts[strand][chrom].values(),
-                                     printer=printer)
- 
-            for group in gene_groups:
-                merged_name = ",".join(sorted(group))
-                for gene in group:
-                    dout[gene] = merged_name
+            exons.append((chrom,strand,my_iv.start,my_iv.end,my_gene))
+
+    exons.sort()
+    gene_groups = [[X[4] for X in group] for _, group in itertools.groupby(exons,key=lambda x: x[:4])]
+    del exons
+
+    printer.write("Flattening genes ...")
+    dout = {}
+    for group in merge_sets(gene_groups,printer=printer):
+        merged_name = ",".join(sorted(group))
+        for gene in group:
+            dout[gene] = merged_name
         
-    printer.write("Flattened to %s groups." % len(dout))
+    printer.write("Flattened to %s groups." % len(set(dout.values())))
     return dout
 
 def process_partial_group(transcripts,mask_hash,printer):
     """Correct boundaries of merged genes, as described in :func:`do_generate`
 
+    Positions are represented throughout as sorted lists of non-overlapping
+    intervals, rather than as sets of individual positions.
+
     Parameters
     ----------
     transcripts : dict
@@ -310,13 +428,9 @@ def process_partial_group(transcripts,mask_hash,printer):
     # remap transcripts to merged genes
     # and vice-versa
     merged_gene_tx = {}
-    tx_merged_gene = {}
     printer.write("Mapping transcripts to merged genes...")
     for txid in transcripts:
-        my_tx = transcripts[txid]
-        my_gene = my_tx.get_gene()
-        my_merged = merged_genes[my_gene]
-        tx_merged_gene[txid] = my_merged
+        my_merged = merged_genes[transcripts[txid].get_gene()]
         try:
             merged_gene_tx[my_merged].append(txid)
         except KeyError:
@@ -324,18 +438,17 @@ def process_partial_group(transcripts,mask_hash,printer):
 
     # flatten merged genes
     printer.write("Flattening merged genes, masking positions, and labeling subfeatures ...")
+    gene_intervals = []
     for n, (gene_id, my_txids) in enumerate(merged_gene_tx.items()):
         if n % 1000 == 0 and n > 0:
             printer.write("    %s genes ..." % n)
 
-        my_gene_positions = []
         chroms  = []
         strands = []
         for my_txid in my_txids:
             my_segmentchain = transcripts[my_txid]
             chroms.append(my_segmentchain.chrom)
             strands.append(my_segmentchain.strand)
-            my_gene_positions.extend(my_segmentchain.get_position_list())
 
             try:
                 assert len(set(chroms)) == 1
@@ -347,8 +460,9 @@ def process_partial_group(transcripts,mask_hash,printer):
             except AssertionError:
                 printer.write("Skipping gene %s which contains multiple strands: %s" % (gene_id,",".join(strands)))
 
-        my_gene_positions = set(my_gene_positions)
-        gene_ivc_raw = SegmentChain(*positions_to_segments(chroms[0],strands[0],my_gene_positions))
+        my_intervals = _get_intervals(*[transcripts[X] for X in my_txids])
+        gene_ivc_raw = _intervals_to_chain(chroms[0],strands[0],my_intervals)
+        gene_intervals.append(my_intervals)
         gene_table["region"].append(gene_id)
         gene_table["transcript_ids"].append(",".join(sorted(my_txids)))
         gene_table["exon_unmasked"].append(gene_ivc_raw)
@@ -359,87 +473,67 @@ def process_partial_group(transcripts,mask_hash,printer):
     printer.write("Masking positions and labeling subfeature positions ...")
     gene_hash = GenomeHash(gene_table["exon_unmasked"],do_copy=False)
 
-    for n,(gene_id,gene_ivc_raw) in enumerate(zip(gene_table["region"],gene_table["exon_unmasked"])):
+    for n,(gene_id,gene_ivc_raw,gene_positions_raw) in enumerate(zip(gene_table["region"],
+                                                                      gene_table["exon_unmasked"],
+                                                                      gene_intervals)):
         if n % 2000 == 0:
             printer.write("    %s genes ..." % n)
 
         my_chrom  = gene_ivc_raw.spanning_segment.chrom
         my_strand = gene_ivc_raw.spanning_segment.strand
 
-        masked_positions = []
-        nearby_genes = gene_hash[gene_ivc_raw]
-
         # don't mask out positions from identical gene
-        gene_ivc_raw_positions = gene_ivc_raw.get_position_set()
-        nearby_genes = [X for X in nearby_genes if X.get_position_set() != gene_ivc_raw_positions]
-        for gene in nearby_genes:
-            masked_positions.extend(gene.get_position_list())
-
+        nearby_genes = [X for X in gene_hash[gene_ivc_raw] if _get_intervals(X) != gene_positions_raw]
         nearby_masks = mask_hash[gene_ivc_raw]
-        for mask in nearby_masks:
-            masked_positions.extend(mask.get_position_list())
-
-        masked_positions = set(masked_positions)
+        masked_positions = _get_intervals(*(nearby_genes + nearby_masks))
 
-        gene_positions_raw = gene_ivc_raw.get_position_set()
-        mask_ivc_positions = gene_positions_raw & masked_positions
-        total_mask_ivc = SegmentChain(*positions_to_segments(my_chrom,my_strand,mask_ivc_positions),
-                                      ID=gene_id)
+        mask_ivc_positions = _intersect_intervals(gene_positions_raw,masked_positions)
+        total_mask_ivc = _intervals_to_chain(my_chrom,my_strand,mask_ivc_positions,ID=gene_id)
         gene_table["masked"].append(total_mask_ivc)
         gene_table["masked_bed"].append(total_mask_ivc.as_bed())
         
-        gene_post_mask = gene_positions_raw - masked_positions
-        gene_post_mask_ivc = SegmentChain(*positions_to_segments(my_chrom,my_strand,gene_post_mask),
-                                          ID=gene_id)
+        gene_post_mask = _subtract_intervals(gene_positions_raw,mask_ivc_positions)
+        gene_post_mask_ivc = _intervals_to_chain(my_chrom,my_strand,gene_post_mask,ID=gene_id)
         gene_table["exon"].append(gene_post_mask_ivc)
         gene_table["exon_bed"].append(gene_post_mask_ivc.as_bed())
     
-        masked_positions = total_mask_ivc.get_position_set()
-        tmp_positions = { "utr5"  : set(),
-                          "cds"   : set(),
-                          "utr3"  : set(),
-                         }
+        masked_positions = mask_ivc_positions
         txids  = sorted(merged_gene_tx[gene_id])
         chrom  = gene_post_mask_ivc.chrom
         strand = gene_post_mask_ivc.strand
 
         # pool transcript positions
+        tx_positions = {}
         for txid in txids:
             transcript = transcripts[txid]
-            
-            utr5pos = transcript.get_utr5().get_position_set()
-            cdspos  = transcript.get_cds().get_position_set()
-            utr3pos = transcript.get_utr3().get_position_set()
-            
-            tmp_positions["utr5"]  |= utr5pos
-            tmp_positions["cds"]   |= cdspos
-            tmp_positions["utr3"]  |= utr3pos 
-        
+            tx_positions[txid] = { "utr5" : _get_intervals(transcript.get_utr5()),
+                                   "cds"  : _get_intervals(transcript.get_cds()),
+                                   "utr3" : _get_intervals(transcript.get_utr3()),
+                                  }
+
+        tmp_positions = { K : _merge_intervals([X for txid in txids for X in tx_positions[txid][K]]) \
+                          for K in ("utr5","cds","utr3") }
+
         # eliminate positions in which CDS & UTRs overlap from each transcript
         for txid in txids:
             transcript = transcripts[txid]
-            transcript_positions = {
-                          "utr5"  : transcript.get_utr5().get_position_set(),
-                          "cds"   : transcript.get_cds().get_position_set(),
-                          "utr3"  : transcript.get_utr3().get_position_set(),
-                         }
-
+            transcript_positions = tx_positions[txid]
             for key1, key2 in keycombos:
-                transcript_positions[key1] -= tmp_positions[key2]
-                transcript_positions[key1] -= masked_positions
+                transcript_positions[key1] = _subtract_intervals(transcript_positions[key1],tmp_positions[key2])
+                transcript_positions[key1] = _subtract_intervals(transcript_positions[key1],masked_positions)
         
             transcript_table["region"].append(txid)
             
             # all unmasked positions
-            my_chain = SegmentChain(*positions_to_segments(chrom,strand,transcript.get_position_set() - masked_positions),
-                                    ID=txid)
+            my_chain = _intervals_to_chain(chrom,strand,
+                                           _subtract_intervals(_get_intervals(transcript),masked_positions),
+                                           ID=txid)
             transcript_table["exon"].append(str(my_chain))
             transcript_table["exon_bed"].append(my_chain.as_bed())
 
             # all uniquely-labeled unmasked positions            
             for k,v in transcript_positions.items():
-                my_chain = SegmentChain(*positions_to_segments(chrom,strand,v),
-                                        ID=txid)
+                my_chain = _intervals_to_chain(chrom,strand,v,ID=txid)
                 transcript_table[k].append(str(my_chain))
                 transcript_table["%s_bed" % k].append(my_chain.as_bed())
             
@@ -449,16 +543,16 @@ def process_partial_group(transcripts,mask_hash,printer):
             transcript_table["exon_unmasked"].append(str(transcript))
             transcript_table["transcript_ids"].append(txid)
         
-        tmp_positions2 = copy.deepcopy(tmp_positions)
-        for k1,k2 in keycombos:
-            tmp_positions[k1] -= tmp_positions2[k2]
-            tmp_positions[k1] -= masked_positions
-
-        for k in (tmp_positions.keys()):
-            my_chain = SegmentChain(*positions_to_segments(chrom,strand,tmp_positions[k]),
-                                    ID=gene_id)
-            gene_table[k].append(str(my_chain))
-            gene_table["%s_bed" % k].append(my_chain.as_bed())
+        for k1 in tmp_positions:
+            my_positions = tmp_positions[k1]
+            for k2 in tmp_positions:
+                if k1 != k2:
+                    my_positions = _subtract_intervals(my_positions,tmp_positions[k2])
+
+            my_positions = _subtract_intervals(my_positions,masked_positions)
+            my_chain = _intervals_to_chain(chrom,strand,my_positions,ID=gene_id)
+            gene_table[k1].append(str(my_chain))
+            gene_table["%s_bed" % k1].append(my_chain.as_bed())
     
     printer.write("    %s genes total." % (n+1))
 
@@ -661,20 +755,28 @@ def do_count(args,alignment_parser):
             dtmp[label] = []
             column_order.append(label)
     
-    for i,name in enumerate(gene_positions["region"]):
-        dtmp["region"].append(name)
+    def parse(i):
+        return [SegmentChain.from_str(gene_positions[k][i]) for k in keys]
+
+    def count(ivcs):
+        return [(sum(X.get_counts(ga)),X.length) for X in ivcs]
+
+    # parse positions and count in separate threads
+    pipeline = Pipeline([Stage("parse",parse),
+                         Stage("count",count)])
+    for i, results in enumerate(pipeline.imap(range(len(gene_positions)),name="genes")):
+        dtmp["region"].append(gene_positions["region"][i])
         if i % 500 == 0:
             printer.write("Processed %s genes ..." % i)
         
-        for k in keys:
-            ivc = SegmentChain.from_str(gene_positions[k][i])
-            total  = sum(ivc.get_counts(ga))
-            length = ivc.length
+        for k, (total, length) in zip(keys,results):
             rpkm =( normconst * total / length ) if length > 0 else numpy.nan
             dtmp["%s_reads"  % k].append(total)
             dtmp["%s_length" % k].append(length)
             dtmp["%s_rpkm"   % k].append(rpkm)
 
+    pipeline.report(printer)
+
     fout = argsopener("%s.txt" % args.outbase,args,"w")
     dtmp = pd.DataFrame(dtmp)
     dtmp.to_csv(fout,sep="\t",header=True,index=False,columns=column_order,na_rep="nan",float_format="%.8f")
@@ -22,6 +22,7 @@ from plastid.util.scriptlib.argparsers import (AlignmentParser, AnnotationParser
 from plastid.util.io.openers import get_short_name
 from plastid.util.io.filters import NameDateWriter
 from plastid.util.scriptlib.help_formatters import format_module_docstring
+from plastid.util.scriptlib.pipeline import Pipeline, Stage
 
 warnings.simplefilter("once")
 printer = NameDateWriter(get_short_name(inspect.stack()[-1][1]))
@@ -74,20 +75,31 @@ def main(args=sys.argv[1:]):
     transcripts = an.get_segmentchains_from_args(args,printer=printer)
     mask_hash = mp.get_genome_hash_from_args(args,printer=printer)
     
-    # evaluate
-    for n,tx in enumerate(transcripts):
-        if n % 1000 == 0:
-            printer.write("Processed %s regions of interest" % n)
-        filename      = "%s%s.txt" % (args.out_prefix,tx.get_name())
-        full_filename = os.path.join(args.out_folder,filename)
-         
-        # mask out overlapping masked regions
+    # mask out overlapping masked regions
+    def add_masks(tx):
         overlapping = mask_hash.get_overlapping_features(tx)
         for feature in overlapping:
             tx.add_masks(*feature.segments)
-         
-        count_vec = tx.get_masked_counts(ga)
+        return tx
+
+    def count(tx):
+        return tx.get_name(), tx.get_masked_counts(ga)
+
+    def write(result):
+        name, count_vec = result
+        filename      = "%s%s.txt" % (args.out_prefix,name)
+        full_filename = os.path.join(args.out_folder,filename)
         numpy.savetxt(full_filename,count_vec,fmt=args.format)
 
+    # evaluate, parsing, masking, counting, and writing in separate threads
+    pipeline = Pipeline([Stage("mask",add_masks),
+                         Stage("count",count),
+                         Stage("write",write)])
+    for n, _ in enumerate(pipeline.imap(transcripts,name="parse")):
+        if n % 1000 == 0:
+            printer.write("Processed %s regions of interest" % n)
+
+    pipeline.report(printer)
+
 if __name__ == "__main__":
     main()
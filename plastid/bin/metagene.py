@@ -145,7 +145,6 @@ See command-line help for each subprogram for details on parameters for each
 """
 __author__ = "joshua"
 
-import gc
 import sys
 import warnings
 import argparse
@@ -154,7 +153,7 @@ import numpy
 import pandas as pd
 from plastid.genomics.roitools import SegmentChain, positions_to_segments
 from plastid.util.io.filters import NameDateWriter
-from plastid.util.io.openers import get_short_name, argsopener, NullWriter
+from plastid.util.io.openers import get_short_name, argsopener, NullWriter, opener, get_compression_kwargs
 from plastid.util.scriptlib.help_formatters import format_module_docstring
 from plastid.util.services.exceptions import (ArgumentWarning,
                                               DataWarning,
@@ -352,8 +351,9 @@ def maximal_spanning_window(regions,mask_hash,flank_upstream,flank_downstream,
     regions : list
         List of |SegmentChains| or |Transcripts|
     
-    mask_hash : |GenomeHash|
-        |GenomeHash| containing regions to exclude from analysis
+    mask_hash : |GenomeHash| or None
+        |GenomeHash| containing regions to exclude from analysis. If `None`,
+        no masks are added to the window
     
     flank_upstream : int
         Number of nucleotides upstream of landmark to include in maximal
@@ -425,15 +425,14 @@ def maximal_spanning_window(regions,mask_hash,flank_upstream,flank_downstream,
     
     # continue only if refpoints all match
     if len(set(refpoints)) == 1 and numpy.nan not in refpoints:
-        new_shared_positions = []
-        if len(set(refpoints)) == 1:
-            for i in range(0,position_matrix.shape[1]):
-                col = position_matrix[:,i]
-                if len(set(col)) == 1 and not numpy.isnan(col[0]):
-                    new_shared_positions.append(int(col[0]))
+        # shared positions are columns in which every row equals the first.
+        # NaN never compares equal, so columns missing from any region drop out
+        first_row = position_matrix[0]
+        is_shared = (position_matrix == first_row).all(axis=0)
+        new_shared_positions = first_row[is_shared].astype(int).tolist()
       
         # continue only if there exist positions shared between all regions 
-        if len(set(new_shared_positions)) > 0:
+        if len(new_shared_positions) > 0:
     
             # define new ROI covering all positions common to all transcripts
             new_roi = SegmentChain(*positions_to_segments(regions[0].chrom,
@@ -462,17 +461,187 @@ def maximal_spanning_window(regions,mask_hash,flank_upstream,flank_downstream,
                 zero_point_roi = new_roi.get_segmentchain_coordinate(*genomic_refpoint)
                 new_offset = flank_upstream - zero_point_roi
     
-            masks = mask_hash.get_overlapping_features(new_roi)
-            mask_segs = []
-            for mask in masks:
-                mask_segs.extend(mask.segments)
-            
-            new_roi.add_masks(*mask_segs)
+            if mask_hash is not None:
+                _add_masks(new_roi,mask_hash.get_overlapping_features(new_roi))
 
             return new_roi, new_offset
             
     return SegmentChain(), numpy.nan
 
+def _add_masks(roi,masks):
+    """Add segments of each feature in `masks` to the masks of `roi`
+
+    Parameters
+    ----------
+    roi : |SegmentChain|
+        Window to mask
+
+    masks : list
+        |SegmentChains| covering positions to exclude from `roi`
+    """
+    mask_segs = []
+    for mask in masks:
+        mask_segs.extend(mask.segments)
+
+    roi.add_masks(*mask_segs)
+
+def _group_regions(regions,group_by="gene_id"):
+    """Group regions by the value of an attribute
+
+    Parameters
+    ----------
+    regions : list
+        |SegmentChains| or |Transcripts|
+
+    group_by : str, optional
+        Attribute by which to group `regions`. If a region lacks the attribute,
+        it is placed in a group of its own, named for the region
+        (Default: `'gene_id'`)
+
+    Returns
+    -------
+    dict
+        Dictionary mapping attribute values to lists of regions
+    """
+    groups = {}
+    for tx_chain in regions:
+        # if attr is missing, use transcript name, which should be unique
+        attr = tx_chain.attr
+        if group_by == "gene_id":
+            if "gene_id" in attr:
+                group_attr = attr["gene_id"]
+            else:
+                group_attr = tx_chain.get_gene()
+                warnings.warn("Region '%s' has no gene_id. Inferring gene_id to be '%s'" % (tx_chain.get_name(), group_attr),
+                              DataWarning)
+        else:
+            if group_by in attr:
+                group_attr = attr[group_by]
+            else:
+                warnings.warn("Region '%s' has no attribute '%s', and will not be grouped. Using region name as default group." % (tx_chain.get_name(),group_by),
+                              DataWarning)
+                group_attr = tx_chain.get_name()
+
+        try:
+            groups[group_attr].append(tx_chain)
+        except KeyError:
+            groups[group_attr] = [tx_chain]
+
+    return groups
+
+def _get_window_tasks(source,flank_upstream,flank_downstream,window_func,is_sorted,group_by):
+    """Group regions from `source`, and split the groups into one task per chromosome
+    for :func:`_make_windows`. If `source` is sorted, only one chromosome of regions
+    is held in memory at once.
+
+    Parameters
+    ----------
+    source : iterable
+        |SegmentChains| or |Transcripts|
+
+    flank_upstream, flank_downstream, window_func, is_sorted, group_by
+        See :func:`group_regions_make_windows`
+
+    Yields
+    ------
+    tuple
+        `(list of (group name, list of regions), flank_upstream, flank_downstream, window_func)`
+    """
+    def get_batches():
+        regions = []
+        last_chrom = None
+        for region in source:
+            chrom = region.spanning_segment.chrom
+            if is_sorted and chrom != last_chrom and len(regions) > 0:
+                yield regions
+                regions = []
+
+            last_chrom = chrom
+            regions.append(region)
+
+        if len(regions) > 0:
+            yield regions
+
+    for regions in get_batches():
+        by_chrom = {}
+        for region_id, tx_list in _group_regions(regions,group_by).items():
+            chrom = tx_list[0].spanning_segment.chrom
+            try:
+                by_chrom[chrom].append((region_id,tx_list))
+            except KeyError:
+                by_chrom[chrom] = [(region_id,tx_list)]
+
+        del regions
+        for chrom in sorted(by_chrom):
+            yield (by_chrom[chrom],flank_upstream,flank_downstream,window_func)
+
+def _make_windows(task):
+    """Build unmasked maximal spanning windows for groups of regions.
+    Defined at module level so that it may be sent to worker processes.
+
+    Parameters
+    ----------
+    task : tuple
+        `(list of (group name, list of regions), flank_upstream, flank_downstream, window_func)`
+
+    Returns
+    -------
+    int
+        Number of groups processed
+
+    list
+        Tuples of `(group name, window, alignment offset)` for each group
+        for which a window could be made
+    """
+    groups, flank_upstream, flank_downstream, window_func = task
+    ltmp = []
+    for region_id, tx_list in groups:
+        window, offset = maximal_spanning_window(tx_list,
+                                                 None,
+                                                 flank_upstream,
+                                                 flank_downstream,
+                                                 window_func=window_func,
+                                                 name=region_id)
+        if len(window) > 0:
+            ltmp.append((region_id,window,offset))
+
+    return len(groups), ltmp
+
+def _make_windows_parallel(tasks,processes):
+    """Run :func:`_make_windows` on `tasks` in `processes` worker processes.
+    Results are yielded in order, and no more than `processes` tasks are
+    queued or held in memory at once.
+
+    Parameters
+    ----------
+    tasks : iterable
+        Tasks for :func:`_make_windows`
+
+    processes : int
+        Number of worker processes
+
+    Yields
+    ------
+    tuple
+        Results of :func:`_make_windows`
+    """
+    import multiprocessing
+    from collections import deque
+
+    pool = multiprocessing.Pool(processes=processes)
+    pending = deque()
+    try:
+        for task in tasks:
+            pending.append(pool.apply_async(_make_windows,(task,)))
+            if len(pending) >= processes:
+                yield pending.popleft().get()
+
+        while len(pending) > 0:
+            yield pending.popleft().get()
+    finally:
+        pool.terminate()
+        pool.join()
+
 
 #===============================================================================
 # Subprograms
@@ -480,7 +649,7 @@ def maximal_spanning_window(regions,mask_hash,flank_upstream,flank_downstream,
 
 def group_regions_make_windows(source,mask_hash,flank_upstream,flank_downstream,
                                window_func=window_cds_start,is_sorted=False,
-                               group_by="gene_id",
+                               group_by="gene_id",processes=1,
                                printer=NullWriter()):
     """Group regions of interest by a shared attribute, and generate
     maximal spanning windows for them. Results are given in a table
@@ -547,6 +716,12 @@ def group_regions_make_windows(source,mask_hash,flank_upstream,flank_downstream,
         :func:`group_regions_make_windows` will take advantage of this to save memory.
         (Default: `False`)
 
+    processes : int, optional
+        Number of processes in which to build windows. Each chromosome is
+        handled by a single process. If greater than 1, `window_func` must
+        be defined at module level, so that it can be sent to worker
+        processes. (Default: `1`)
+
     printer : file-like, optional
         filehandle to write logging info to (Default: :func:`NullWriter`)
     
@@ -598,7 +773,6 @@ def group_regions_make_windows(source,mask_hash,flank_upstream,flank_downstream,
     Not all genes will be included in the output if, for example, there isn't a
     position set common to all transcripts surrounding the landmark
     """
-    import itertools
     window_size = flank_upstream + flank_downstream
         
     dtmp = { "region_id"          : [],
@@ -612,96 +786,40 @@ def group_regions_make_windows(source,mask_hash,flank_upstream,flank_downstream,
              "threeprime_offset"  : [],
              }
     
-    transcripts = []
-    group_transcript = {}
-    last_chrom = None
-    do_loop    = True
-    source = iter(source)
-    c = -1
-
-    # to save memory, we process one chromosome at a time if input file is sorted
-    # knowing that at that moment all transcript parts are assembled    
-    while do_loop == True:
-        try:
-            tx = next(source)
-        except StopIteration:
-            do_loop = False
-
-        try:
-            # end of chromosome or end of file
-            if (is_sorted and tx.spanning_segment.chrom != last_chrom) or do_loop == False:
-                last_chrom = tx.spanning_segment.chrom
-                if do_loop == True:
-                    source = itertools.chain([tx],source)
-
-                for tx_chain in transcripts:
-                    # if attr is missing, use transcript name, which should be unique
-                    attr = tx_chain.attr
-                    if group_by == "gene_id":
-                        if "gene_id" in attr:
-                            group_attr = attr["gene_id"]
-                        else:
-                            group_attr = tx_chain.get_gene()
-                            warnings.warn("Region '%s' has no gene_id. Inferring gene_id to be '%s'" % (tx_chain.get_name(), group_attr),
-                                          DataWarning)
-                    else:
-                        if group_by in attr:
-                            group_attr = attr[group_by]
-                        else:
-                            warnings.warn("Region '%s' has no attribute '%s', and will not be grouped. Using region name as default group." % (tx_chain.get_name(),group_by),
-                                          DataWarning)
-                            group_attr = tx_chain.get_name()
-
-                    try:
-                        group_transcript[group_attr].append(tx_chain)
-                    except KeyError:
-                        group_transcript[group_attr] = [tx_chain]
-
-                # for each gene, find maximal window in which all points
-                # are represented in all transcripts. return window and offset
-                for region_id, tx_list in group_transcript.items():
-                    c += 1
-                    if c % 1000 == 1:
-                        printer.write("Processed %s genes, included %s ..." % (c,len(list(dtmp.values())[0])))
-
-                    name = region_id # name regions after gene id
-                    max_spanning_window, offset =  maximal_spanning_window(tx_list,
-                                                                           mask_hash,
-                                                                           flank_upstream,
-                                                                           flank_downstream,
-                                                                           window_func=window_func,
-                                                                           name=name,
-                                                                           printer=printer)
-
-                    if len(max_spanning_window) > 0:
-                        mask_chain = max_spanning_window.get_masks_as_segmentchain()
-                        dtmp["region_id"].append(region_id)
-                        dtmp["window_size"].append(window_size)
-                        dtmp["region"].append(str(max_spanning_window)) # need to cast to string to keep numpy from converting to array
-                        dtmp["masked"].append(str(mask_chain))
-                        dtmp["alignment_offset"].append(offset)
-                        dtmp["zero_point"].append(flank_upstream)
-                        dtmp["region_bed"].append(max_spanning_window.as_bed())
-                        dtmp["region_length"].append(max_spanning_window.length)
-                        dtmp["threeprime_offset"].append(window_size - offset - max_spanning_window.length)
-
-                # clean up
-                del transcripts
-                del group_transcript
-                gc.collect()
-                del gc.garbage[:]
-                transcripts = []
-                group_transcript = {}
-
-            else:
-                transcripts.append(tx)
-
-        except UnboundLocalError:
-            pass
+    c = 0
+    tasks = _get_window_tasks(source,flank_upstream,flank_downstream,window_func,is_sorted,group_by)
+    if processes <= 1:
+        results = (_make_windows(X) for X in tasks)
+    else:
+        results = _make_windows_parallel(tasks,processes)
+
+    for num_groups, windows in results:
+        if (c + num_groups) // 1000 > c // 1000:
+            printer.write("Processed %s genes, included %s ..." % (c + num_groups,len(dtmp["region_id"])))
+        c += num_groups
+
+        # windows from each task lie on one chromosome. Look up their masks
+        # together, in order of position
+        windows = sorted(windows,key=lambda x: x[1].spanning_segment.start)
+        if mask_hash is not None:
+            for (_, max_spanning_window, _), (_, masks) in zip(windows,mask_hash.sweep([X[1] for X in windows])):
+                _add_masks(max_spanning_window,masks)
+
+        for region_id, max_spanning_window, offset in windows:
+            mask_chain = max_spanning_window.get_masks_as_segmentchain()
+            dtmp["region_id"].append(region_id)
+            dtmp["window_size"].append(window_size)
+            dtmp["region"].append(str(max_spanning_window)) # need to cast to string to keep numpy from converting to array
+            dtmp["masked"].append(str(mask_chain))
+            dtmp["alignment_offset"].append(offset)
+            dtmp["zero_point"].append(flank_upstream)
+            dtmp["region_bed"].append(max_spanning_window.as_bed())
+            dtmp["region_length"].append(max_spanning_window.length)
+            dtmp["threeprime_offset"].append(window_size - offset - max_spanning_window.length)
 
     df = pd.DataFrame(dtmp)
     df.sort_values(["region_id"],inplace=True)
-    printer.write("Processed %s genes total. Included %s." % (c+1,len(df)))
+    printer.write("Processed %s genes total. Included %s." % (c,len(df)))
 
     # Warn in case of annotation problems
     if (df["alignment_offset"] == flank_upstream).all():
@@ -862,12 +980,16 @@ def do_count(args,alignment_parser,plot_parser,printer=NullWriter()):
     norm_counts.mask[numpy.isinf(norm_counts)] = True
 
     if args.keep == True:
+        compression = get_compression_kwargs(args)
         printer.write("Saving counts to %s ..." % count_fn)
-        numpy.savetxt(count_fn,counts,delimiter="\t",fmt='%.8f')
+        with opener(count_fn,"w",**compression) as fout:
+            numpy.savetxt(fout,counts,delimiter="\t",fmt='%.8f')
         printer.write("Saving normalized counts to %s ..." % normcount_fn)
-        numpy.savetxt(normcount_fn,norm_counts,delimiter="\t")
+        with opener(normcount_fn,"w",**compression) as fout:
+            numpy.savetxt(fout,norm_counts,delimiter="\t")
         printer.write("Saving masks used in profile building to %s ..." % mask_fn)
-        numpy.savetxt(mask_fn,norm_counts.mask,delimiter="\t")
+        with opener(mask_fn,"w",**compression) as fout:
+            numpy.savetxt(fout,norm_counts.mask,delimiter="\t")
      
     try:
         if args.use_mean == True:
@@ -881,6 +1003,9 @@ def do_count(args,alignment_parser,plot_parser,printer=NullWriter()):
     except ValueError:
         profile = numpy.zeros(norm_counts.shape[0])
 
+    if row_select.sum() == 0:
+        profile = numpy.zeros(norm_counts.shape[1])
+
     if profile.sum() == 0:
         printer.write("Metagene profile is zero at all positions. %s ROIs made the minimum count cutoff." % row_select.sum())
         printer.write("Consider lowering --min_counts (currently %s)." % min_counts)
@@ -905,8 +1030,10 @@ def do_count(args,alignment_parser,plot_parser,printer=NullWriter()):
 
     # plot
     printer.write("Plotting to %s ..." % fig_fn)
-    rs = norm_counts[row_select,:]
-    p95 = numpy.nanpercentile(rs[rs > 0],95)
+    # drop masked values, which numpy.nanpercentile() does not handle
+    rs = numpy.ma.compressed(norm_counts[row_select,:])
+    rs = rs[rs > 0]
+    p95 = numpy.nanpercentile(rs,95) if len(rs) > 0 else 1.0
     im_args = {
         "interpolation" : "none",
         "vmin"          : 0,
@@ -1069,6 +1196,10 @@ def main(argv=sys.argv[1:]):
                          help="Attribute (e.g. in GTF2/GFF3 column 9) by which to group regions "+ \
                               "before generating maximal spanning windows "+ \
                               "(Default: group transcripts by gene using 'gene_id' attribute from GTF2, or 'Parent' attribute in GFF3)")
+    gparser.add_argument("--window_processes",type=int,default=1,metavar="N",
+                         help="Number of processes in which to build windows. Each chromosome "+ \
+                              "is handled in one process. Separate from '--processes', which "+ \
+                              "applies only to assembling transcripts with '--index' (Default: 1)")
     gparser.add_argument("outbase",type=str,
                          help="Basename for output files")
     
@@ -1161,7 +1292,8 @@ def main(argv=sys.argv[1:]):
                                                window_func=map_function,
                                                printer=printer,
                                                is_sorted=is_sorted,
-                                               group_by=args.group_by)
+                                               group_by=args.group_by,
+                                               processes=args.window_processes)
         
         roi_file = "%s_rois.txt" % args.outbase
         bed_file = "%s_rois.bed" % args.outbase
@@ -28,28 +28,39 @@ where `OUTBASE` is supplied by the user.
     an :term:`annotation` file that includes only one transcript isoform per
     gene.
 
+Counting may be split between several processes with ``--count_processes``.
+Coding regions on each chromosome are then counted in a separate process.
 """
 import sys
 import argparse
 import inspect
 import warnings
 
+import pysam
 import pandas as pd
 import numpy
 import matplotlib
 matplotlib.use("Agg")
 from plastid.util.scriptlib.argparsers import (AlignmentParser, AnnotationParser,
                                                PlottingParser, BaseParser)
-from plastid.util.io.openers import get_short_name, argsopener, read_pl_table
+from plastid.util.io.openers import get_short_name, argsopener, read_pl_table, NullWriter
 from plastid.util.io.filters import NameDateWriter
 from plastid.util.scriptlib.help_formatters import format_module_docstring
 from plastid.util.services.exceptions import DataWarning, ArgumentWarning
 from plastid.plotting.plots import phase_plot
 from plastid.genomics.roitools import SegmentChain
+from plastid.genomics.genome_array import BAMGenomeArray
+from plastid.genomics.c_phasing import PhaseCounter
 
 warnings.simplefilter("once")
 printer = NameDateWriter(get_short_name(inspect.stack()[-1][1]))
 
+# number of coding regions counted per task in worker processes
+_TASK_SIZE = 2000
+
+# |BAMGenomeArray| used by worker processes. Set by :func:`_init_worker`
+_WORKER_GA = None
+
 
 def roi_row_to_cds(row):
     """Helper function to extract coding portions from maximal spanning windows
@@ -72,6 +83,195 @@ def roi_row_to_cds(row):
     subchain = chain.get_subchain(cds_start,chain.length)
     return subchain
 
+def _init_worker(filenames,mapping,filters,cache_size=0):
+    """Open a private |BAMGenomeArray| in a worker process, so that
+    file handles are not shared with the parent process
+
+    Parameters
+    ----------
+    filenames : list
+        Filenames of `BAM`_ files
+
+    mapping : func
+        :term:`Mapping rule`
+
+    filters : OrderedDict
+        Filters to add to the |BAMGenomeArray|, keyed by name
+
+    cache_size : int, optional
+        Size of read cache, in bytes (Default: 0)
+    """
+    global _WORKER_GA
+    _WORKER_GA = BAMGenomeArray([pysam.AlignmentFile(X,"rb") for X in filenames],
+                                mapping=mapping,cache_size=cache_size)
+    for name, func in filters.items():
+        _WORKER_GA.add_filter(name,func)
+
+def _count_task(task):
+    """Count phasing in a group of coding regions in a worker process
+
+    Parameters
+    ----------
+    task : tuple
+        Tuple of (list of coding regions as |SegmentChains|, tuple of
+        arguments to |PhaseCounter|)
+
+    Returns
+    -------
+    |PhaseCounter|
+    """
+    regions, counter_args = task
+    counter = PhaseCounter(*counter_args)
+    for cds in regions:
+        counter.add(cds,_WORKER_GA)
+
+    return counter
+
+def _get_tasks(regions,counter_args,task_size=_TASK_SIZE):
+    """Group coding regions by chromosome into tasks for :func:`_count_task`.
+    A task is emitted whenever `task_size` regions have accumulated for
+    a chromosome, so that regions need not be sorted.
+
+    Parameters
+    ----------
+    regions : iterable
+        Coding regions, as |SegmentChains|
+
+    counter_args : tuple
+        Arguments to |PhaseCounter|
+
+    task_size : int, optional
+        Maximum number of regions per task
+
+    Yields
+    ------
+    tuple
+        Tuple of (list of |SegmentChains|, `counter_args`)
+    """
+    by_chrom = {}
+    for cds in regions:
+        group = by_chrom.setdefault(cds.chrom,[])
+        group.append(cds)
+        if len(group) >= task_size:
+            yield (group,counter_args)
+            by_chrom[cds.chrom] = []
+
+    for chrom in sorted(by_chrom):
+        if len(by_chrom[chrom]) > 0:
+            yield (by_chrom[chrom],counter_args)
+
+def count_phases(regions,ga,min_length,max_length,codon_buffer=0,end_buffer=0,
+                 processes=1,printer=NullWriter()):
+    """Count :term:`read alignments` at each codon position in coding regions,
+    stratified by read length. Counts are accumulated directly into a
+    |PhaseCounter|, without keeping count vectors for individual regions.
+
+    Parameters
+    ----------
+    regions : iterable
+        Coding regions, as |SegmentChains|, each beginning at a start codon
+
+    ga : |BAMGenomeArray|
+        Read alignments
+
+    min_length : int
+        Minimum read length to count, inclusive
+
+    max_length : int
+        Maximum read length to count, inclusive
+
+    codon_buffer : int, optional
+        Number of codons to exclude from the 5' end of each region (Default: `0`)
+
+    end_buffer : int, optional
+        Number of codons to exclude from the 3' end of each region (Default: `0`)
+
+    processes : int, optional
+        Number of processes to use. If greater than 1, regions are grouped
+        by chromosome, and groups are counted in separate processes, each
+        with its own handles to the `BAM`_ files in `ga`. (Default: `1`)
+
+    printer : file-like, optional
+        Stream to which progress messages are written (Default: no output)
+
+    Returns
+    -------
+    |PhaseCounter|
+        Counts for all regions
+    """
+    counter_args = (min_length,max_length,codon_buffer,end_buffer)
+    counter = PhaseCounter(*counter_args)
+
+    context = None
+    if processes > 1:
+        import multiprocessing
+        try:
+            # workers need to inherit mapping rules and filters, which
+            # generally cannot be pickled
+            context = multiprocessing.get_context("fork")
+        except AttributeError:
+            context = multiprocessing
+        except ValueError:
+            warnings.warn("Cannot fork worker processes on this platform. Counting in one process.",
+                          ArgumentWarning)
+
+    if context is None:
+        for n, cds in enumerate(regions):
+            if n % 1000 == 1:
+                printer.write("Counted %s ROIs ..." % n)
+
+            counter.add(cds,ga)
+    else:
+        from collections import deque
+        pool = context.Pool(processes=processes,
+                            initializer=_init_worker,
+                            initargs=([X.filename for X in ga.bamfiles],ga.map_fn,ga._filters,ga._cache_size))
+        pending = deque()
+        try:
+            for task in _get_tasks(regions,counter_args):
+                pending.append(pool.apply_async(_count_task,(task,)))
+                if len(pending) >= 2*processes:
+                    counter.merge(pending.popleft().get())
+                    printer.write("Counted %s ROIs ..." % counter.num_regions)
+
+            while len(pending) > 0:
+                counter.merge(pending.popleft().get())
+        finally:
+            pool.terminate()
+            pool.join()
+
+    printer.write("Counted %s ROIs total." % counter.num_regions)
+    return counter
+
+def _get_cds(regions,transform_fn,warn_partial=False):
+    """Extract coding regions from transcripts or ROI table rows
+
+    Parameters
+    ----------
+    regions : iterable
+        Transcripts or rows from ROI file
+
+    transform_fn : func
+        Function extracting a coding region from an item in `regions`
+
+    warn_partial : bool, optional
+        If `True`, issue a warning for coding regions whose length
+        is not divisible by 3 (Default: `False`)
+
+    Yields
+    ------
+    |SegmentChain|
+        Coding regions with non-zero length
+    """
+    for roi in regions:
+        cds_part = transform_fn(roi)
+        if cds_part.length > 0:
+            if warn_partial == True and cds_part.length % 3 != 0:
+                message = "Length of '%s' coding region (%s nt) is not divisible by 3. Ignoring last partial codon." % (roi.get_name(),cds_part.length)
+                warnings.warn(message,DataWarning)
+
+            yield cds_part
+
 def main(argv=sys.argv[1:]):
     """Command-line program
     
@@ -113,6 +313,10 @@ def main(argv=sys.argv[1:]):
     parser.add_argument("outbase",type=str,help="Required. Basename for output files")
     parser.add_argument("--codon_buffer",type=int,default=5,
                         help="Codons before and after start codon to ignore (Default: 5)")
+    parser.add_argument("--count_processes",type=int,default=1,metavar="N",
+                        help="Number of processes in which to count phasing. Coding regions on "+\
+                             "each chromosome are counted in one process. Separate from '--processes', "+\
+                             "which applies only to assembling transcripts with '--index' (Default: 1)")
 
 
     args = parser.parse_args(argv)
@@ -128,77 +332,29 @@ def main(argv=sys.argv[1:]):
             }
 
     if args.roi_file is not None:
-        using_roi = True
         roi_table = read_pl_table(args.roi_file)
-        regions = roi_table.iterrows()
-        transform_fn = roi_row_to_cds
-        back_buffer = -1
+        regions = _get_cds(roi_table.iterrows(),roi_row_to_cds)
+        end_buffer = 1
         if len(args.annotation_files) > 0:
             warnings.warn("If an ROI file is given, annotation files are ignored. Pulling regions from '%s'. Ignoring '%s'" % (args.roi_file,
                                                                                                                                ", ".join(args.annotation_files)),
                           ArgumentWarning)
     else:
-        using_roi = False
         if len(args.annotation_files) == 0:
             printer.write("Either an ROI file or at least annotation file must be given.")
             sys.exit(1)
         else:
             warnings.warn("Using a transcript annotation file instead of an ROI file can lead to double-counting of codons if the annotation contains multiple transcripts per gene.",
                           ArgumentWarning)        
-            regions = an.get_transcripts_from_args(args,printer=printer)
-            back_buffer  = -codon_buffer
-            transform_fn = lambda x: x.get_cds()
-    
-    phase_sums = {}
-    for k in read_lengths:
-        phase_sums[k] = numpy.zeros(3)
-    
-    for n, roi in enumerate(regions):
-        if n % 1000 == 1:
-            printer.write("Counted %s ROIs ..." % n)
-        
-        # transformation needed to extract CDS from transcript or from ROI file window
-        cds_part = transform_fn(roi)
-        
-        # only calculate for coding genes
-        if len(cds_part) > 0:
-
-            read_dict     = {}
-            count_vectors = {}
-            for k in read_lengths:
-                read_dict[k]     = []
-                count_vectors[k] = []
-            
-            # for each seg, fetch reads, sort them, and create individual count vectors
-            for seg in cds_part:
-                reads = gnd.get_reads(seg)
-                for read in filter(lambda x: len(x.positions) in read_dict,reads):
-                    read_dict[len(read.positions)].append(read)
-    
-                # map and sort by length
-                for read_length in read_dict:
-                    count_vector = list(gnd.map_fn(read_dict[read_length],seg)[1])
-                    count_vectors[read_length].extend(count_vector)
-            
-            # add each count vector for each length to total
-            for k, vec in count_vectors.items():
-                counts = numpy.array(vec)
-                if cds_part.strand == "-":
-                    counts = counts[::-1]
-               
-                if len(counts) % 3 == 0:
-                    counts = counts.reshape((int(len(counts)/3), 3))
-                else:
-                    if using_roi == False:
-                        message = "Length of '%s' coding region (%s nt) is not divisible by 3. Ignoring last partial codon." % (roi.get_name(),len(counts))
-                        warnings.warn(message,DataWarning)
-                    newlen = int(len(counts) // 3)
-                    counts = counts[:3*newlen]
-                    counts = counts.reshape(newlen,3)
+            transcripts = an.get_transcripts_from_args(args,printer=printer)
+            regions = _get_cds(transcripts,lambda x: x.get_cds(),warn_partial=True)
+            end_buffer = codon_buffer
     
-                phase_sums[k] += counts[codon_buffer:back_buffer,:].sum(0)
+    counter = count_phases(regions,gnd,args.min_length,args.max_length,
+                           codon_buffer=codon_buffer,end_buffer=end_buffer,
+                           processes=args.count_processes,printer=printer)
+    phase_sums = { K : counter.counts[n] for n, K in enumerate(counter.read_lengths) }
 
-    printer.write("Counted %s ROIs total." % (n+1))
     for k in dtmp:
         dtmp[k] = numpy.array(dtmp[k])
     
@@ -72,7 +72,7 @@ from collections import OrderedDict
 from plastid.util.scriptlib.argparsers import (AlignmentParser, PlottingParser,
                                                BaseParser)
 from plastid.genomics.roitools import SegmentChain
-from plastid.util.io.openers import get_short_name, argsopener, NullWriter, opener
+from plastid.util.io.openers import get_short_name, argsopener, NullWriter, opener, get_compression_kwargs
 from plastid.util.io.filters import NameDateWriter
 from plastid.util.scriptlib.help_formatters import format_module_docstring
 from plastid.util.services.exceptions import ArgumentWarning
@@ -361,9 +361,11 @@ def main(argv=sys.argv[1:]):
             count_fn     = "%s_%s_rawcounts.txt.gz"  % (outbase,k)
             normcount_fn = "%s_%s_normcounts.txt.gz" % (outbase,k)
             mask_fn      = "%s_%s_mask.txt.gz" % (outbase,k)
-            numpy.savetxt(count_fn,count_dict[k],delimiter="\t")
-            numpy.savetxt(normcount_fn,norm_count_dict[k],delimiter="\t")
-            numpy.savetxt(mask_fn,norm_count_dict[k].mask,delimiter="\t")
+            for fn, data in [(count_fn,count_dict[k]),
+                             (normcount_fn,norm_count_dict[k]),
+                             (mask_fn,norm_count_dict[k].mask)]:
+                with opener(fn,"w",**get_compression_kwargs(args)) as fout:
+                    numpy.savetxt(fout,data,delimiter="\t")
     
     # plotting & offsets
     printer.write("Plotting and determining offsets ...")
@@ -30,6 +30,7 @@ import copy
 from plastid.util.scriptlib.argparsers import (AnnotationParser,BaseParser)
 from plastid.util.services.exceptions import ArgumentWarning, warn
 from plastid.util.io.openers import argsopener, get_short_name
+from plastid.genomics.writers import write_bed, write_gtf
 from plastid.util.io.filters import NameDateWriter
 from plastid.util.scriptlib.help_formatters import format_module_docstring
 
@@ -154,20 +155,22 @@ def main(argv=sys.argv[1:]):
             warn("`--extra_columns` is ignored for %s-formatted output." % (args.output_format),ArgumentWarning)
             
             
-    with argsopener(args.outfile,args,"w") as fout:
-        c = 0
-        transcripts = ap.get_transcripts_from_args(args,printer=printer)
-        
+    counter = [0]
+    def report(transcripts):
         for transcript in transcripts:
-            if args.output_format == "GTF2":
-                fout.write(transcript.as_gtf(escape=args.no_escape))
-            elif args.output_format == "BED":
-                fout.write(transcript.as_bed(extra_columns=extra_cols,empty_value=args.empty_value))
-            if c % 1000 == 1:
-                printer.write("Processed %s transcripts ..." % c)
-            c += 1
+            if counter[0] % 1000 == 1:
+                printer.write("Processed %s transcripts ..." % counter[0])
+            counter[0] += 1
+            yield transcript
+
+    with argsopener(args.outfile,args,"w") as fout:
+        transcripts = report(ap.get_transcripts_from_args(args,printer=printer))
+        if args.output_format == "GTF2":
+            write_gtf(transcripts,fout,escape=args.no_escape)
+        elif args.output_format == "BED":
+            write_bed(transcripts,fout,extra_columns=extra_cols,empty_value=args.empty_value)
     
-    printer.write("Processed %s transcripts total." % c)
+    printer.write("Processed %s transcripts total." % counter[0])
     printer.write("Done.")
     print(end_message)
             
@@ -7,6 +7,9 @@ Package overview
     =============================================  ==================================================================
     **Submodule**                                   **Description**
     ---------------------------------------------  ------------------------------------------------------------------
+    :py:mod:`~plastid.genomics.chain_table`          Columnar storage for large numbers of
+                                                     :term:`features <feature>`
+
     :py:mod:`~plastid.genomics.genome_array`         Array-like objects indexed by chromosome, position, and strand
                                                      
     :py:mod:`~plastid.genomics.genome_hash`          Dictionary-like objects associate features
@@ -23,5 +26,8 @@ Package overview
                                                      sequences
                                             
     :py:mod:`~plastid.genomics.splicing`             Functions for manipulating splice junctions
+
+    :py:mod:`~plastid.genomics.writers`              Bulk export of :term:`features <feature>` to
+                                                     `BED`_ and `GTF2`_ files
     =============================================  ==================================================================
 """
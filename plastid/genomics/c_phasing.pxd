@@ -0,0 +1,7 @@
+cimport numpy
+
+cdef class PhaseCounter:
+    cdef readonly int min_length, max_length, codon_buffer, end_buffer, num_codons
+    cdef readonly long num_regions
+    cdef readonly numpy.ndarray counts
+    cdef readonly object codon_counts
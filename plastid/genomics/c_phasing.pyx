@@ -0,0 +1,232 @@
+"""Compiled accumulation of :term:`read alignments` by read length and codon phase
+
+|PhaseCounter| fetches read alignments covering coding regions from a
+|BAMGenomeArray|, maps them under its :term:`mapping rule`, and adds the
+resulting counts directly into a table of counts at each of the three
+codon positions, stratified by read length. No count vectors are kept for
+individual regions, so any number of regions may be counted in fixed memory.
+
+This is used by the |phase_by_size| script to estimate
+:term:`sub-codon phasing`.
+
+Examples
+--------
+Count phasing of 25-35-mers in coding regions of transcripts, excluding
+five codons at either end of each coding region::
+
+    >>> counter = PhaseCounter(25,35,codon_buffer=5,end_buffer=5)
+    >>> for tx in transcripts:
+    >>>     counter.add(tx.get_cds(),alignments)
+
+    >>> counter.counts # rows are read lengths, columns are codon positions
+"""
+import numpy
+cimport numpy
+cimport cython
+
+from plastid.genomics.c_common cimport reverse_strand
+from plastid.genomics.roitools cimport GenomicSegment, SegmentChain
+
+
+cdef class PhaseCounter:
+    """PhaseCounter(min_length, max_length, codon_buffer=0, end_buffer=0, num_codons=0)
+
+    Accumulate counts of :term:`read alignments` in coding regions by read
+    length and codon position.
+
+    Parameters
+    ----------
+    min_length : int
+        Minimum read length to count, inclusive
+
+    max_length : int
+        Maximum read length to count, inclusive
+
+    codon_buffer : int, optional
+        Number of codons to exclude from the 5' end of each coding region
+        (Default: `0`)
+
+    end_buffer : int, optional
+        Number of complete codons to exclude from the 3' end of each coding
+        region. Partial codons at the 3' end are always excluded.
+        (Default: `0`)
+
+    num_codons : int, optional
+        If greater than zero, also keep a histogram of counts at each position
+        within the first `num_codons` codons of all coding regions, in
+        :attr:`codon_counts` (Default: `0`)
+
+
+    Attributes
+    ----------
+    counts : :class:`numpy.ndarray`
+        Array of shape `(max_length - min_length + 1, 3)`, holding the number
+        of counts mapped to each codon position, for each read length
+
+    codon_counts : :class:`numpy.ndarray` or None
+        If `num_codons` is greater than zero, array of shape
+        `(max_length - min_length + 1, num_codons, 3)`, holding counts at
+        each position of each codon from the start of coding regions,
+        for each read length. Otherwise, `None`
+
+    read_lengths : :class:`numpy.ndarray`
+        Read lengths corresponding to the rows of :attr:`counts`
+
+    num_regions : int
+        Number of coding regions counted
+    """
+
+    def __cinit__(self, int min_length, int max_length, int codon_buffer=0, int end_buffer=0, int num_codons=0):
+        if min_length < 1 or max_length < min_length:
+            raise ValueError("PhaseCounter: need 1 <= min_length <= max_length. Got %s and %s." % (min_length,max_length))
+
+        if codon_buffer < 0 or end_buffer < 0 or num_codons < 0:
+            raise ValueError("PhaseCounter: `codon_buffer`, `end_buffer`, and `num_codons` must be >= 0.")
+
+        self.min_length   = min_length
+        self.max_length   = max_length
+        self.codon_buffer = codon_buffer
+        self.end_buffer   = end_buffer
+        self.num_codons   = num_codons
+        self.num_regions  = 0
+        self.counts       = numpy.zeros((max_length - min_length + 1,3),dtype=numpy.double)
+        if num_codons > 0:
+            self.codon_counts = numpy.zeros((max_length - min_length + 1,num_codons,3),dtype=numpy.double)
+        else:
+            self.codon_counts = None
+
+    def __reduce__(self):
+        return (PhaseCounter,
+                (self.min_length,self.max_length,self.codon_buffer,self.end_buffer,self.num_codons),
+                (self.counts,self.codon_counts,self.num_regions))
+
+    def __setstate__(self, tuple state):
+        self.counts, self.codon_counts, self.num_regions = state
+
+    def __repr__(self):
+        return "<%s lengths=%s-%s regions=%s>" % (self.__class__.__name__,self.min_length,self.max_length,self.num_regions)
+
+    property read_lengths:
+        """Read lengths corresponding to the rows of :attr:`counts`"""
+        def __get__(self):
+            return numpy.arange(self.min_length,self.max_length + 1)
+
+    def merge(self, PhaseCounter other not None):
+        """Add counts from another |PhaseCounter| with the same parameters
+
+        Parameters
+        ----------
+        other : |PhaseCounter|
+            Counter to add
+
+        Raises
+        ------
+        ValueError
+            If `other` was created with different parameters
+        """
+        if (other.min_length, other.max_length, other.codon_buffer, other.end_buffer, other.num_codons) != \
+           (self.min_length, self.max_length, self.codon_buffer, self.end_buffer, self.num_codons):
+            raise ValueError("Cannot merge PhaseCounters created with different parameters.")
+
+        self.counts += other.counts
+        if self.codon_counts is not None:
+            self.codon_counts += other.codon_counts
+
+        self.num_regions += other.num_regions
+
+    @cython.boundscheck(False)
+    @cython.wraparound(False)
+    def add(self, SegmentChain cds not None, object ga not None):
+        """Count reads in a coding region
+
+        Reads covering each segment of `cds` are fetched from `ga`, grouped
+        by length, and mapped under the :term:`mapping rule` of `ga`. Mapped
+        counts are added to :attr:`counts` at the codon position of each
+        nucleotide in `cds`.
+
+        Parameters
+        ----------
+        cds : |SegmentChain|
+            Coding region, beginning at a start codon
+
+        ga : |BAMGenomeArray|
+            Source of read alignments
+
+        Raises
+        ------
+        ValueError
+            If the mapping rule of `ga` returns more than one count per position
+        """
+        cdef:
+            int    num_lengths  = self.max_length - self.min_length + 1
+            int    min_length   = self.min_length
+            long   cds_length   = cds.length
+            long   first_codon  = self.codon_buffer
+            long   full_codons  = cds_length // 3
+            long   last_codon   = full_codons - self.end_buffer
+            long   num_codons   = min(self.num_codons,full_codons)
+            bint   is_reverse   = cds.spanning_segment.c_strand == reverse_strand
+            long   seg_offset   = 0
+            long   seg_length, i, x, codon, read_length
+            int    phase, row
+            double c
+            list   groups
+            double [:,:]   count_view  = self.counts
+            double [:,:,:] codon_view
+            double [:]     vec_view
+            GenomicSegment seg
+            object reads, read, vec
+            object map_fn = ga.map_fn
+
+        if cds_length == 0:
+            return
+
+        self.num_regions += 1
+        if first_codon >= last_codon and num_codons == 0:
+            return
+
+        if num_codons > 0:
+            codon_view = self.codon_counts
+
+        for seg in cds:
+            seg_length = seg.end - seg.start
+            reads = ga.fetch_reads(seg)
+            if len(reads) > 0:
+                groups = [None] * num_lengths
+                for read in reads:
+                    read_length = len(read.positions)
+                    row = read_length - min_length
+                    if row >= 0 and row < num_lengths:
+                        if groups[row] is None:
+                            groups[row] = [read]
+                        else:
+                            groups[row].append(read)
+
+                for row in range(num_lengths):
+                    if groups[row] is None:
+                        continue
+
+                    vec = map_fn(groups[row],seg)[1]
+                    if vec.ndim != 1:
+                        raise ValueError("PhaseCounter: mapping rules that return more than one count per position are not supported.")
+
+                    vec_view = numpy.asarray(vec,dtype=numpy.double)
+                    for i in range(seg_length):
+                        c = vec_view[i]
+                        if c == 0:
+                            continue
+
+                        # position in coding region, from 5' end
+                        x = seg_offset + i
+                        if is_reverse:
+                            x = cds_length - 1 - x
+
+                        codon = x // 3
+                        phase = x % 3
+                        if codon >= first_codon and codon < last_codon:
+                            count_view[row,phase] += c
+
+                        if codon < num_codons:
+                            codon_view[row,codon,phase] += c
+
+            seg_offset += seg_length
@@ -0,0 +1,20 @@
+from cpython cimport array
+from plastid.genomics.c_common cimport Strand
+from plastid.genomics.roitools cimport SegmentChain
+
+cdef class ChainTable:
+    cdef:
+        readonly object return_type
+        readonly long num_chains
+        list _chrom_names
+        dict _chrom_index
+        array.array _chrom_codes, _strand_codes
+        array.array _seg_offsets, _seg_starts, _seg_ends
+        array.array _cds_genome_starts, _cds_genome_ends
+        dict _attr
+        dict _views
+
+    cdef long _append_row(self, str, Strand, array.array, array.array, long, long, dict) except -1
+    cdef array.array _column(self, str)
+    cdef object _get_view(self, str)
+    cdef SegmentChain _materialize(self, long)
@@ -0,0 +1,1183 @@
+"""Columnar storage for large collections of |SegmentChains| and |Transcripts|
+
+A |ChainTable| stores each feature as a row of a table, rather than as a
+Python object: chromosome and strand are stored as small integer codes,
+the coordinates of all segments are stored in two flat arrays indexed by
+per-feature offsets, coding regions are stored as genomic start and end
+coordinates, and attributes are stored as columns. This uses a small
+fraction of the memory required by the equivalent |SegmentChains|, and
+allows lengths, spans, overlaps, and coordinate conversions to be computed
+for all features at once with :mod:`numpy`.
+
+|SegmentChain| or |Transcript| objects are created only when individual rows
+are accessed.
+
+Examples
+--------
+Load a `BED`_ file into a table, without creating any |Transcripts|::
+
+    >>> table = BED_Reader("some_file.bed",return_type=Transcript).read_table()
+    >>> len(table)
+    2000000
+
+Compute the length of every transcript and coding region::
+
+    >>> table.lengths
+    array([2034,  817, 5110, ...])
+
+    >>> table.cds_ends - table.cds_starts
+    array([ 1203,  312,   -1, ...])
+
+Find transcripts overlapping a region, and create a |Transcript| for each::
+
+    >>> idx = table.get_overlapping(GenomicSegment("chrI",10000,20000,"+"))
+    >>> [table[X] for X in idx]
+    [<Transcript ...>, <Transcript ...>]
+
+Convert positions on many transcripts to genomic coordinates at once::
+
+    >>> table.get_genomic_coordinates(idx,[0]*len(idx))
+    array([10230, 12007])
+
+Send a batch of transcripts to another process as a single compact buffer,
+rather than pickling each one::
+
+    >>> buf = pack_chains(transcripts)
+    >>> transcripts = unpack_chains(buf)
+"""
+import array
+import itertools
+import numbers
+import pickle
+import struct
+import numpy
+cimport numpy
+
+from cpython cimport array
+from plastid.genomics.c_common cimport Strand, forward_strand, reverse_strand, \
+                                       undef_strand, str_to_strand, strand_to_str
+from plastid.genomics.roitools cimport GenomicSegment, SegmentChain, Transcript, \
+                                       get_attr_from_bed, get_bed_block_list
+
+# placeholder for attributes absent from a row
+cdef object _MISSING = object()
+
+cdef array.array _long_template = array.array("l",[])
+
+# strand strings, indexed by strand code
+_STRAND_STRS = numpy.array(["\x00","+","-","."],dtype=object)
+
+# typecodes of columns that are stored in arrays
+_ARRAY_TYPES = {
+    "chrom_codes"       : "i",
+    "strand_codes"      : "b",
+    "seg_offsets"       : "l",
+    "seg_starts"        : "l",
+    "seg_ends"          : "l",
+    "cds_genome_starts" : "l",
+    "cds_genome_ends"   : "l",
+}
+
+
+# binary serialization: header, followed by columns, followed by pickled
+# chromosome names and attributes. Segment and CDS coordinates are stored
+# relative to the start of each feature, in 4 bytes if they fit, or 8 if not
+_MAGIC = b"PLCT"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sIIqqq")
+
+
+def pack_chains(object chains, object return_type=None):
+    """Serialize |SegmentChains| or |Transcripts| into a compact binary format,
+    e.g. to send them between processes. See :meth:`ChainTable.to_bytes`
+
+    Parameters
+    ----------
+    chains : iterable
+        |SegmentChains| or subclasses
+
+    return_type : |SegmentChain| or subclass, optional
+        Type of object created by :func:`unpack_chains`. If `None`,
+        the type of the first item in `chains` is used.
+
+    Returns
+    -------
+    bytes
+    """
+    return ChainTable.from_chains(chains,return_type=return_type).to_bytes()
+
+def unpack_chains(object buf):
+    """Create |SegmentChains| or |Transcripts| from data made by :func:`pack_chains`
+
+    Parameters
+    ----------
+    buf : bytes or buffer
+        Serialized chains
+
+    Returns
+    -------
+    list
+        |SegmentChains| or subclasses
+    """
+    return list(ChainTable.from_bytes(buf))
+
+def _table_from_bytes(object buf):
+    """Unpickle a |ChainTable|"""
+    return ChainTable.from_bytes(buf)
+
+def _read_column(object view, str dtype, long count, long offset):
+    """Read `count` values of type `dtype` from `view`, starting at `offset`
+
+    Returns
+    -------
+    :class:`numpy.ndarray`
+        Values read
+
+    long
+        Offset following values read
+    """
+    arr = numpy.frombuffer(view,dtype=dtype,count=count,offset=offset)
+    return arr, offset + arr.nbytes
+
+def _to_array(str typecode, object values):
+    """Convert a :class:`numpy.ndarray` to an :class:`array.array`"""
+    return array.array(typecode,numpy.ascontiguousarray(values,dtype=typecode).tobytes())
+
+
+cdef class ChainTable:
+    """ChainTable(return_type=SegmentChain)
+
+    Columnar container for large numbers of |SegmentChains| or |Transcripts|.
+
+    Features are added via :meth:`append`, :meth:`extend`, or
+    :meth:`append_bed`, or by readers (e.g. :meth:`BED_Reader.read_table`).
+    Integer indexing creates a `return_type` object for the corresponding row;
+    slices, index arrays, and boolean masks return a new |ChainTable| holding
+    the selected rows.
+
+    Parameters
+    ----------
+    return_type : |SegmentChain| or subclass, optional
+        Type of object created when rows are accessed (Default: |SegmentChain|)
+
+
+    Attributes
+    ----------
+    num_chains : int
+        Number of features in table
+
+    chrom_names : list
+        Chromosome names, indexed by :attr:`chrom_codes`
+
+    chrom_codes : :class:`numpy.ndarray`
+        Index into :attr:`chrom_names` of each feature's chromosome
+        (`-1` for features with no segments)
+
+    strand_codes : :class:`numpy.ndarray`
+        Strand of each feature (`1` for `'+'`, `2` for `'-'`, `3` for `'.'`)
+
+    seg_offsets : :class:`numpy.ndarray`
+        Array of length `num_chains + 1`. Segments of feature `i` are
+        at indices `seg_offsets[i]:seg_offsets[i+1]` of :attr:`seg_starts`
+        and :attr:`seg_ends`
+
+    seg_starts, seg_ends : :class:`numpy.ndarray`
+        Genomic start and end coordinates of all segments, in order
+
+    cds_genome_starts, cds_genome_ends : :class:`numpy.ndarray`
+        Genomic start and end coordinates of coding regions (`-1` if
+        a feature has no coding region)
+
+    Notes
+    -----
+    Masks added to |SegmentChains| via :meth:`SegmentChain.add_masks`
+    are not stored.
+
+    Arrays returned by properties are read-only and are shared between
+    calls until the table is modified. Copy them before modifying them.
+    """
+
+    def __cinit__(self, object return_type=SegmentChain):
+        if not isinstance(return_type,type) or not issubclass(return_type,SegmentChain):
+            raise TypeError("ChainTable: `return_type` must be SegmentChain or a subclass. Got %s." % return_type)
+
+        self.return_type        = return_type
+        self.num_chains         = 0
+        self._chrom_names       = []
+        self._chrom_index       = {}
+        self._chrom_codes       = array.array("i",[])
+        self._strand_codes      = array.array("b",[])
+        self._seg_offsets       = array.array("l",[0])
+        self._seg_starts        = array.array("l",[])
+        self._seg_ends          = array.array("l",[])
+        self._cds_genome_starts = array.array("l",[])
+        self._cds_genome_ends   = array.array("l",[])
+        self._attr              = {}
+        self._views             = {}
+
+    def __reduce__(self):
+        return (_table_from_bytes,(self.to_bytes(),))
+
+    def __repr__(self):
+        return "<%s chains=%s segments=%s return_type=%s>" % (self.__class__.__name__,
+                                                              self.num_chains,
+                                                              len(self._seg_starts),
+                                                              self.return_type.__name__)
+
+    def __len__(self):
+        return self.num_chains
+
+    def __iter__(self):
+        cdef long i
+        for i in range(self.num_chains):
+            yield self._materialize(i)
+
+    def __getitem__(self, object key):
+        cdef long i
+        if isinstance(key,numbers.Integral):
+            i = key
+            if i < 0:
+                i += self.num_chains
+            if i < 0 or i >= self.num_chains:
+                raise IndexError("ChainTable index %s out of range for table of %s chains." % (key,self.num_chains))
+
+            return self._materialize(i)
+        elif isinstance(key,slice):
+            return self.take(numpy.arange(self.num_chains)[key])
+        else:
+            return self.take(key)
+
+
+    # building ----------------------------------------------------------------
+
+    @classmethod
+    def from_chains(cls, object chains, object return_type=None):
+        """Create a |ChainTable| from an iterable of |SegmentChains| or |Transcripts|
+
+        Parameters
+        ----------
+        chains : iterable
+            |SegmentChains| or subclasses
+
+        return_type : |SegmentChain| or subclass, optional
+            Type of object created when rows are accessed. If `None`,
+            the type of the first item in `chains` is used.
+
+        Returns
+        -------
+        |ChainTable|
+        """
+        chains = iter(chains)
+        if return_type is None:
+            first = next(chains,None)
+            if first is None:
+                return ChainTable()
+
+            return_type = type(first)
+            chains = itertools.chain([first],chains)
+
+        table = ChainTable(return_type=return_type)
+        table.extend(chains)
+        return table
+
+    def append(self, SegmentChain chain not None):
+        """Add a |SegmentChain| or |Transcript| to the table
+
+        Parameters
+        ----------
+        chain : |SegmentChain| or subclass
+            Feature to add
+
+        Returns
+        -------
+        int
+            Index of new row
+        """
+        cdef:
+            list           segments = chain._segments
+            long           num_segs = len(segments)
+            array.array    starts   = array.clone(_long_template,num_segs,False)
+            array.array    ends     = array.clone(_long_template,num_segs,False)
+            long           cds_genome_start = -1
+            long           cds_genome_end   = -1
+            long           i
+            str            chrom    = None
+            Strand         strand   = undef_strand
+            GenomicSegment seg
+            Transcript     tx
+
+        if num_segs > 0:
+            chrom  = chain.spanning_segment.chrom
+            strand = chain.spanning_segment.c_strand
+
+        for i in range(num_segs):
+            seg = segments[i]
+            starts.data.as_longs[i] = seg.start
+            ends.data.as_longs[i]   = seg.end
+
+        if isinstance(chain,Transcript):
+            tx = chain
+            if tx.cds_genome_start is not None and tx.cds_genome_end is not None:
+                cds_genome_start = tx.cds_genome_start
+                cds_genome_end   = tx.cds_genome_end
+
+        return self._append_row(chrom,strand,starts,ends,cds_genome_start,cds_genome_end,dict(chain.attr))
+
+    def extend(self, object chains):
+        """Add each |SegmentChain| or |Transcript| in `chains` to the table
+
+        Parameters
+        ----------
+        chains : iterable
+            |SegmentChains| or subclasses
+        """
+        for chain in chains:
+            self.append(chain)
+
+    def append_bed(self, str line, object extra_columns=0):
+        """Parse a line of a `BED`_ or :term:`extended BED` file directly into the table,
+        without creating a |SegmentChain| or |Transcript|.
+
+        Attributes and coding regions are stored as they would be by
+        ``return_type.from_bed(line,extra_columns=extra_columns)``.
+
+        Parameters
+        ----------
+        line : str
+            Line from a `BED`_ file
+
+        extra_columns : int or list, optional
+            Extra, non-BED columns in :term:`extended BED` files. See
+            :meth:`SegmentChain.from_bed` for details. (Default: `0`)
+
+        Returns
+        -------
+        int
+            Index of new row
+
+        Raises
+        ------
+        ValueError
+            If `line` cannot be parsed
+
+        KeyError
+            If `return_type` is a |Transcript| and the coding region lies outside
+            the exons in `line`
+        """
+        cdef:
+            dict        attr        = get_attr_from_bed(line,extra_columns=extra_columns)
+            int         num_blocks  = int(attr.pop("blocks"))
+            array.array sizes       = get_bed_block_list(attr.pop("blocksizes"),num_blocks)
+            array.array starts      = get_bed_block_list(attr.pop("blockstarts"),num_blocks)
+            array.array ends        = array.clone(_long_template,num_blocks,False)
+            long        chrom_start = attr.pop("chrom_start")
+            str         chrom       = attr.pop("chrom")
+            Strand      strand      = str_to_strand(attr.pop("strand"))
+            long        cds_genome_start = -1
+            long        cds_genome_end   = -1
+            long        thickstart, thickend
+            int         i
+
+        for i in range(num_blocks):
+            if sizes.data.as_longs[i] < 0:
+                raise ValueError("ChainTable.append_bed(): negative block size in BED line:\n\t    '%s'" % line)
+
+            starts.data.as_longs[i] += chrom_start
+            ends.data.as_longs[i] = starts.data.as_longs[i] + sizes.data.as_longs[i]
+
+        if issubclass(self.return_type,Transcript):
+            thickstart = attr.pop("thickstart")
+            thickend   = attr.pop("thickend")
+            if thickstart != thickend:
+                # same requirements as Transcript._update_cds()
+                if not _blocks_contain(starts,ends,thickstart) or \
+                   (not _blocks_contain(starts,ends,thickend - 1) and \
+                    (strand != forward_strand or not _blocks_contain(starts,ends,thickend))):
+                    raise KeyError("ChainTable.append_bed(): coding region %s-%s outside exons in BED line:\n\t    '%s'" % (thickstart,thickend,line))
+
+                cds_genome_start = thickstart
+                cds_genome_end   = thickend
+
+            attr["type"] = "mRNA"
+        else:
+            attr.setdefault("type","exon")
+
+        if num_blocks == 0:
+            chrom  = None
+            strand = undef_strand
+
+        return self._append_row(chrom,strand,starts,ends,cds_genome_start,cds_genome_end,attr)
+
+    cdef long _append_row(self, str chrom, Strand strand, array.array starts, array.array ends,
+                          long cds_genome_start, long cds_genome_end, dict attr) except -1:
+        """Add a row to the table, assuming segments are sorted and non-overlapping
+
+        Returns
+        -------
+        long
+            Index of new row
+        """
+        cdef:
+            long   row = self.num_chains
+            int    code
+            object key, val, found
+            list   col
+
+        if chrom is None:
+            code = -1
+        else:
+            found = self._chrom_index.get(chrom)
+            if found is None:
+                code = len(self._chrom_names)
+                self._chrom_names.append(chrom)
+                self._chrom_index[chrom] = code
+            else:
+                code = found
+
+        self._chrom_codes.append(code)
+        self._strand_codes.append(strand)
+        array.extend(self._seg_starts,starts)
+        array.extend(self._seg_ends,ends)
+        self._seg_offsets.append(len(self._seg_starts))
+        self._cds_genome_starts.append(cds_genome_start)
+        self._cds_genome_ends.append(cds_genome_end)
+
+        for key, val in attr.items():
+            col = self._attr.get(key)
+            if col is None:
+                col = [_MISSING] * row
+                self._attr[key] = col
+            col.append(val)
+
+        if len(self._attr) > len(attr):
+            for col in self._attr.values():
+                if len(col) == row:
+                    col.append(_MISSING)
+
+        self.num_chains += 1
+        if len(self._views) > 0:
+            self._views.clear()
+
+        return row
+
+
+    # serialization -----------------------------------------------------------
+
+    def to_bytes(self):
+        """Serialize the table into a compact binary format
+
+        Coordinates and codes are written as little-endian arrays of
+        fixed width, followed by chromosome names and attributes. Segment
+        and coding region coordinates are written relative to the start
+        of each feature, in 4 bytes where possible. Equal strings in
+        attribute columns are written only once. The output can
+        be sent between processes, written to disk, or placed in shared
+        memory, and read by :meth:`from_bytes` on any platform.
+
+        Returns
+        -------
+        bytes
+        """
+        cdef:
+            dict   interned = {}
+            dict   attr_state = {}
+            list   col, values
+            str    name
+            object val
+
+        for name, col in self._attr.items():
+            values = []
+            for val in col:
+                if val is _MISSING:
+                    val = None
+                elif type(val) is str:
+                    # pickle stores repeated references to a string object once
+                    val = interned.setdefault(val,val)
+                values.append(val)
+
+            attr_state[name] = (values,[N for N,X in enumerate(col) if X is _MISSING])
+
+        meta = pickle.dumps((self.return_type,self._chrom_names,attr_state),pickle.HIGHEST_PROTOCOL)
+
+        span_starts = numpy.clip(self.span_starts,0,None)
+        seg_starts  = self.seg_starts - span_starts[self._seg_chain_ids]
+        seg_lengths = self.seg_ends - self.seg_starts
+        has_cds     = self.cds_genome_starts >= 0
+        cds_starts  = numpy.where(has_cds,self.cds_genome_starts - span_starts,-1)
+        cds_ends    = numpy.where(has_cds,self.cds_genome_ends - span_starts,-1)
+        relative    = (seg_starts,seg_lengths,cds_starts,cds_ends)
+
+        width = 4
+        for column in relative:
+            if len(column) > 0 and (column.min() < -2**31 or column.max() >= 2**31):
+                width = 8
+
+        chunks = [_HEADER.pack(_MAGIC,_FORMAT_VERSION,width,self.num_chains,len(self._seg_starts),len(meta)),
+                  span_starts.astype("<i8").tobytes(),
+                  self.num_segments.astype("<i4").tobytes(),
+                  self.chrom_codes.astype("<i4").tobytes(),
+                  self.strand_codes.astype("i1").tobytes()]
+        chunks.extend([X.astype("<i%s" % width).tobytes() for X in relative])
+        chunks.append(meta)
+        return b"".join(chunks)
+
+    @classmethod
+    def from_bytes(cls, object buf):
+        """Create a |ChainTable| from data serialized by :meth:`to_bytes`
+
+        Parameters
+        ----------
+        buf : bytes or buffer
+            Serialized table, in any object supporting the buffer protocol,
+            e.g. :class:`bytes`, :class:`memoryview`, :class:`mmap.mmap`,
+            or the buffer of a shared memory block
+
+        Returns
+        -------
+        |ChainTable|
+
+        Raises
+        ------
+        ValueError
+            If `buf` does not contain a serialized |ChainTable|
+        """
+        cdef:
+            ChainTable table
+            long       num_chains, num_segs, meta_length
+            long       offset = _HEADER.size
+            int        width
+            dict       attr_state
+            str        name
+            list       values, missing
+
+        view = memoryview(buf)
+        if len(view) < _HEADER.size:
+            raise ValueError("ChainTable.from_bytes(): buffer too short to contain a ChainTable.")
+
+        magic, version, width, num_chains, num_segs, meta_length = _HEADER.unpack_from(view,0)
+        if magic != _MAGIC:
+            raise ValueError("ChainTable.from_bytes(): buffer does not contain a serialized ChainTable.")
+        if version != _FORMAT_VERSION:
+            raise ValueError("ChainTable.from_bytes(): unsupported format version %s." % version)
+
+        rel_type = "<i%s" % width
+        span_starts,  offset = _read_column(view,"<i8",num_chains,offset)
+        num_segments, offset = _read_column(view,"<i4",num_chains,offset)
+        chrom_codes,  offset = _read_column(view,"<i4",num_chains,offset)
+        strand_codes, offset = _read_column(view,"i1",num_chains,offset)
+        seg_starts,   offset = _read_column(view,rel_type,num_segs,offset)
+        seg_lengths,  offset = _read_column(view,rel_type,num_segs,offset)
+        cds_starts,   offset = _read_column(view,rel_type,num_chains,offset)
+        cds_ends,     offset = _read_column(view,rel_type,num_chains,offset)
+        return_type, chrom_names, attr_state = pickle.loads(bytes(view[offset:offset + meta_length]))
+
+        seg_offsets = numpy.zeros(num_chains + 1,dtype="l")
+        numpy.cumsum(num_segments,out=seg_offsets[1:])
+        seg_starts = seg_starts + numpy.repeat(span_starts,num_segments)
+        has_cds    = cds_starts >= 0
+
+        table = ChainTable(return_type=return_type)
+        table.num_chains         = num_chains
+        table._chrom_names       = chrom_names
+        table._chrom_index       = { K : N for N,K in enumerate(chrom_names) }
+        table._chrom_codes       = _to_array("i",chrom_codes)
+        table._strand_codes      = _to_array("b",strand_codes)
+        table._seg_offsets       = _to_array("l",seg_offsets)
+        table._seg_starts        = _to_array("l",seg_starts)
+        table._seg_ends          = _to_array("l",seg_starts + seg_lengths)
+        table._cds_genome_starts = _to_array("l",numpy.where(has_cds,cds_starts + span_starts,-1))
+        table._cds_genome_ends   = _to_array("l",numpy.where(has_cds,cds_ends + span_starts,-1))
+        for name, (values, missing) in attr_state.items():
+            for i in missing:
+                values[i] = _MISSING
+            table._attr[name] = values
+
+        return table
+
+
+    # access ------------------------------------------------------------------
+
+    cdef SegmentChain _materialize(self, long i):
+        """Create a `return_type` object from row `i`"""
+        cdef:
+            long         first = self._seg_offsets.data.as_longs[i]
+            long         last  = self._seg_offsets.data.as_longs[i+1]
+            long         k
+            list         segments = []
+            str          chrom, strand
+            SegmentChain chain = self.return_type()
+            Transcript   tx
+            object       name, col
+
+        if last > first:
+            chrom  = self._chrom_names[self._chrom_codes.data.as_ints[i]]
+            strand = strand_to_str(<Strand>self._strand_codes.data.as_schars[i])
+            for k in range(first,last):
+                segments.append(GenomicSegment(chrom,
+                                               self._seg_starts.data.as_longs[k],
+                                               self._seg_ends.data.as_longs[k],
+                                               strand))
+            chain._set_segments(segments)
+
+        chain.attr = { name : col[i] for name, col in self._attr.items() if col[i] is not _MISSING }
+        if isinstance(chain,Transcript) and self._cds_genome_starts.data.as_longs[i] >= 0:
+            tx = chain
+            tx.cds_genome_start = self._cds_genome_starts.data.as_longs[i]
+            tx.cds_genome_end   = self._cds_genome_ends.data.as_longs[i]
+            tx._update_cds()
+
+        return chain
+
+    def take(self, object indices):
+        """Return a new |ChainTable| containing the rows at `indices`
+
+        Parameters
+        ----------
+        indices : array-like
+            Integer indices of rows, or boolean mask of length `num_chains`
+
+        Returns
+        -------
+        |ChainTable|
+        """
+        cdef:
+            ChainTable new = ChainTable(return_type=self.return_type)
+            str        name
+            list       col, new_col
+            long       i
+
+        idx = self._check_indices(indices)
+        offsets  = self.seg_offsets
+        num_segs = self.num_segments[idx]
+        new_offsets = numpy.zeros(len(idx) + 1,dtype="l")
+        numpy.cumsum(num_segs,out=new_offsets[1:])
+        seg_idx = numpy.repeat(offsets[idx] - new_offsets[:-1],num_segs) + numpy.arange(new_offsets[-1])
+
+        new.num_chains         = len(idx)
+        new._chrom_names       = list(self._chrom_names)
+        new._chrom_index       = dict(self._chrom_index)
+        new._chrom_codes       = _to_array("i",self.chrom_codes[idx])
+        new._strand_codes      = _to_array("b",self.strand_codes[idx])
+        new._seg_offsets       = _to_array("l",new_offsets)
+        new._seg_starts        = _to_array("l",self.seg_starts[seg_idx])
+        new._seg_ends          = _to_array("l",self.seg_ends[seg_idx])
+        new._cds_genome_starts = _to_array("l",self.cds_genome_starts[idx])
+        new._cds_genome_ends   = _to_array("l",self.cds_genome_ends[idx])
+        for name, col in self._attr.items():
+            new_col = [col[i] for i in idx]
+            if any(X is not _MISSING for X in new_col):
+                new._attr[name] = new_col
+
+        return new
+
+    def get_attr(self, str name, object default=None):
+        """Return the values of an attribute for all rows
+
+        Parameters
+        ----------
+        name : str
+            Attribute name
+
+        default : object, optional
+            Value used for rows without attribute `name` (Default: `None`)
+
+        Returns
+        -------
+        list
+        """
+        cdef list col = self._attr.get(name)
+        if col is None:
+            return [default] * self.num_chains
+
+        return [default if X is _MISSING else X for X in col]
+
+    property attr_names:
+        """Names of all attributes present in any row"""
+        def __get__(self):
+            return sorted(self._attr.keys())
+
+    property chrom_names:
+        """Chromosome names, indexed by :attr:`chrom_codes`"""
+        def __get__(self):
+            return list(self._chrom_names)
+
+
+    # column views ------------------------------------------------------------
+
+    cdef array.array _column(self, str name):
+        """Return array column `name`"""
+        if name == "chrom_codes":
+            return self._chrom_codes
+        elif name == "strand_codes":
+            return self._strand_codes
+        elif name == "seg_offsets":
+            return self._seg_offsets
+        elif name == "seg_starts":
+            return self._seg_starts
+        elif name == "seg_ends":
+            return self._seg_ends
+        elif name == "cds_genome_starts":
+            return self._cds_genome_starts
+        elif name == "cds_genome_ends":
+            return self._cds_genome_ends
+
+        raise KeyError(name)
+
+    cdef object _get_view(self, str name):
+        """Return a cached, read-only :class:`numpy.ndarray` copy of array column `name`"""
+        cdef object view = self._views.get(name)
+        if view is None:
+            view = numpy.array(self._column(name),dtype=_ARRAY_TYPES[name])
+            view.flags.writeable = False
+            self._views[name] = view
+
+        return view
+
+    property chrom_codes:
+        def __get__(self):
+            return self._get_view("chrom_codes")
+
+    property strand_codes:
+        def __get__(self):
+            return self._get_view("strand_codes")
+
+    property seg_offsets:
+        def __get__(self):
+            return self._get_view("seg_offsets")
+
+    property seg_starts:
+        def __get__(self):
+            return self._get_view("seg_starts")
+
+    property seg_ends:
+        def __get__(self):
+            return self._get_view("seg_ends")
+
+    property cds_genome_starts:
+        def __get__(self):
+            return self._get_view("cds_genome_starts")
+
+    property cds_genome_ends:
+        def __get__(self):
+            return self._get_view("cds_genome_ends")
+
+    def _cached(self, str name, object func):
+        """Return cached value of derived column `name`, computing it with `func` if necessary"""
+        cdef object val = self._views.get(name)
+        if val is None:
+            val = func()
+            if isinstance(val,numpy.ndarray):
+                val.flags.writeable = False
+            self._views[name] = val
+
+        return val
+
+    property chroms:
+        """Chromosome name of each feature (`None` for features with no segments)"""
+        def __get__(self):
+            def func():
+                names = numpy.array(self._chrom_names + [None],dtype=object)
+                return names[self.chrom_codes]
+            return self._cached("chroms",func)
+
+    property strands:
+        """Strand of each feature, as a string"""
+        def __get__(self):
+            return self._cached("strands",lambda: _STRAND_STRS[self.strand_codes])
+
+    property num_segments:
+        """Number of segments in each feature"""
+        def __get__(self):
+            return self._cached("num_segments",lambda: numpy.diff(self.seg_offsets))
+
+    property _seg_chain_ids:
+        """Row index of each segment"""
+        def __get__(self):
+            return self._cached("_seg_chain_ids",
+                                lambda: numpy.repeat(numpy.arange(self.num_chains),self.num_segments))
+
+    property _cum_lengths:
+        """Cumulative length of all segments preceding each segment"""
+        def __get__(self):
+            def func():
+                cum = numpy.zeros(len(self._seg_starts) + 1,dtype="l")
+                numpy.cumsum(self.seg_ends - self.seg_starts,out=cum[1:])
+                return cum
+            return self._cached("_cum_lengths",func)
+
+    property lengths:
+        """Length of each feature in nucleotides"""
+        def __get__(self):
+            def func():
+                cum = self._cum_lengths
+                offsets = self.seg_offsets
+                return cum[offsets[1:]] - cum[offsets[:-1]]
+            return self._cached("lengths",func)
+
+    property span_starts:
+        """Genomic start coordinate of each feature's span (`-1` if no segments)"""
+        def __get__(self):
+            def func():
+                out = numpy.full(self.num_chains,-1,dtype="l")
+                has_segs = self.num_segments > 0
+                out[has_segs] = self.seg_starts[self.seg_offsets[:-1][has_segs]]
+                return out
+            return self._cached("span_starts",func)
+
+    property span_ends:
+        """Genomic end coordinate of each feature's span (`-1` if no segments)"""
+        def __get__(self):
+            def func():
+                out = numpy.full(self.num_chains,-1,dtype="l")
+                has_segs = self.num_segments > 0
+                out[has_segs] = self.seg_ends[self.seg_offsets[1:][has_segs] - 1]
+                return out
+            return self._cached("span_ends",func)
+
+    property cds_starts:
+        """Start of each coding region in transcript coordinates (`-1` if no coding region)"""
+        def __get__(self):
+            return self._cached("cds_starts",lambda: self._get_cds_bounds()[0])
+
+    property cds_ends:
+        """End of each coding region in transcript coordinates (`-1` if no coding region)"""
+        def __get__(self):
+            return self._cached("cds_ends",lambda: self._get_cds_bounds()[1])
+
+    def _get_cds_bounds(self):
+        """Convert genomic coordinates of coding regions to transcript coordinates,
+        as in :meth:`Transcript._update_cds`
+        """
+        cds_starts = numpy.full(self.num_chains,-1,dtype="l")
+        cds_ends   = numpy.full(self.num_chains,-1,dtype="l")
+        idx = numpy.flatnonzero(self.cds_genome_starts >= 0)
+        gstart  = self.cds_genome_starts[idx]
+        gend    = self.cds_genome_ends[idx]
+        reverse = self.strand_codes[idx] == reverse_strand
+
+        start_pos = self.get_segmentchain_coordinates(idx,numpy.where(reverse,gend - 1,gstart))
+        end_pos   = self.get_segmentchain_coordinates(idx,numpy.where(reverse,gstart,gend - 1))
+        end_pos   = numpy.where(end_pos >= 0,end_pos + 1,-1)
+
+        # plus-strand ends that coincide with an exon boundary
+        end_direct = self.get_segmentchain_coordinates(idx,gend)
+        use_direct = ~reverse & (end_direct >= 0)
+        end_pos[use_direct] = end_direct[use_direct]
+
+        cds_starts[idx] = start_pos
+        cds_ends[idx]   = end_pos
+        return cds_starts, cds_ends
+
+
+    # vectorized operations ---------------------------------------------------
+
+    def _check_indices(self, object indices):
+        """Convert `indices` to an array of non-negative row indices
+
+        Raises
+        ------
+        IndexError
+            If any index is out of range
+        """
+        idx = numpy.asarray(indices)
+        if idx.dtype == bool:
+            if idx.shape != (self.num_chains,):
+                raise IndexError("ChainTable: boolean index has shape %s, but table has %s rows." % (idx.shape,self.num_chains))
+            return numpy.flatnonzero(idx)
+
+        if idx.size == 0:
+            return idx.astype("l")
+
+        if not numpy.issubdtype(idx.dtype,numpy.integer):
+            raise IndexError("ChainTable: indices must be integers or booleans. Got %s." % idx.dtype)
+
+        idx = numpy.where(idx < 0,idx + self.num_chains,idx).astype("l")
+        if idx.min() < 0 or idx.max() >= self.num_chains:
+            raise IndexError("ChainTable: index out of range for table of %s chains." % self.num_chains)
+
+        return idx
+
+    def get_overlapping(self, object roi, bint stranded=True):
+        """Find features overlapping `roi`
+
+        Parameters
+        ----------
+        roi : |GenomicSegment| or |SegmentChain|
+            Query feature
+
+        stranded : bool, optional
+            If `True` (default), only features on the same strand as `roi`
+            are reported
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Sorted indices of overlapping rows
+        """
+        cdef:
+            list           segments
+            GenomicSegment seg
+            object         code
+
+        if isinstance(roi,SegmentChain):
+            segments = (<SegmentChain>roi)._segments
+        elif isinstance(roi,GenomicSegment):
+            segments = [roi]
+        else:
+            raise TypeError("ChainTable.get_overlapping(): `roi` must be a GenomicSegment or SegmentChain. Got %s." % type(roi))
+
+        chain_ids  = self._seg_chain_ids
+        seg_chroms = self._cached("_seg_chrom_codes",lambda: self.chrom_codes[chain_ids])
+        starts = self.seg_starts
+        ends   = self.seg_ends
+        mask   = numpy.zeros(len(starts),dtype=bool)
+        for seg in segments:
+            code = self._chrom_index.get(seg.chrom)
+            if code is None:
+                continue
+
+            seg_mask = (seg_chroms == code) & (starts < seg.end) & (ends > seg.start)
+            if stranded == True:
+                seg_strands = self._cached("_seg_strand_codes",lambda: self.strand_codes[chain_ids])
+                seg_mask &= seg_strands == seg.c_strand
+
+            mask |= seg_mask
+
+        return numpy.unique(chain_ids[mask])
+
+    def get_segmentchain_coordinates(self, object indices, object positions, bint stranded=True):
+        """Convert genomic coordinates to coordinates relative to the 5' end
+        of features, as in :meth:`SegmentChain.get_segmentchain_coordinate`,
+        for many features at once.
+
+        Parameters
+        ----------
+        indices : array-like
+            Row indices of features
+
+        positions : array-like
+            Genomic coordinates, broadcastable against `indices`
+
+        stranded : bool, optional
+            If `True` (default), coordinates on minus-strand features are
+            counted from the 3' end of the genome. If `False`, all coordinates
+            are counted from the leftmost position of each feature.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Coordinate of each position in its feature, or `-1` for positions
+            not covered by their feature
+        """
+        idx, pos = numpy.broadcast_arrays(self._check_indices(indices),numpy.asarray(positions,dtype="l"))
+        out = numpy.full(idx.shape,-1,dtype="l")
+        starts = self.seg_starts
+        if len(starts) == 0 or idx.size == 0:
+            return out
+
+        ends    = self.seg_ends
+        offsets = self.seg_offsets
+        cum     = self._cum_lengths
+        big     = self._cached("_coordinate_base",lambda: int(ends.max()) + 1)
+        if float(big) * (self.num_chains + 1) >= 2**62:
+            # keys would overflow. fall back to searching each feature individually
+            for n, (i, p) in enumerate(zip(idx.ravel(),pos.ravel())):
+                out.flat[n] = self.get_segmentchain_coordinates([i],[p],stranded=stranded)[0]
+            return out
+
+        # segments sorted by (row, start), so that segments containing
+        # each position can be found by one binary search
+        keys  = self._cached("_seg_keys",lambda: self._seg_chain_ids * big + starts)
+        valid = (pos >= 0) & (pos < big)
+        k = numpy.searchsorted(keys,idx * big + numpy.where(valid,pos,0),side="right") - 1
+        kc = numpy.clip(k,0,None)
+        first = offsets[idx]
+        valid &= (k >= first) & (pos < ends[kc])
+
+        x = cum[kc] - cum[first] + pos - starts[kc]
+        if stranded == True:
+            reverse = self.strand_codes[idx] == reverse_strand
+            x = numpy.where(reverse,self.lengths[idx] - 1 - x,x)
+
+        out[valid] = x[valid]
+        return out
+
+    def get_genomic_coordinates(self, object indices, object positions, bint stranded=True):
+        """Convert coordinates relative to the 5' end of features to genomic
+        coordinates, as in :meth:`SegmentChain.get_genomic_coordinate`,
+        for many features at once.
+
+        Parameters
+        ----------
+        indices : array-like
+            Row indices of features
+
+        positions : array-like
+            Coordinates in features, broadcastable against `indices`
+
+        stranded : bool, optional
+            If `True` (default), coordinates on minus-strand features are
+            counted from the 3' end of the genome. If `False`, all coordinates
+            are counted from the leftmost position of each feature.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Genomic coordinates
+
+        Raises
+        ------
+        IndexError
+            If any position is outside its feature
+        """
+        idx, pos = numpy.broadcast_arrays(self._check_indices(indices),numpy.asarray(positions,dtype="l"))
+        lengths = self.lengths[idx]
+        if ((pos < 0) | (pos >= lengths)).any():
+            raise IndexError("ChainTable.get_genomic_coordinates(): positions must be >= 0 and less than feature length.")
+
+        if idx.size == 0:
+            return numpy.zeros(idx.shape,dtype="l")
+
+        if stranded == True:
+            pos = numpy.where(self.strand_codes[idx] == reverse_strand,lengths - 1 - pos,pos)
+
+        cum = self._cum_lengths
+        g = cum[self.seg_offsets[idx]] + pos
+        k = numpy.searchsorted(cum,g,side="right") - 1
+        return self.seg_starts[k] + g - cum[k]
+
+    def get_subchain_segments(self, object starts, object ends, bint stranded=True):
+        """Find segments covering a sub-region of each feature, as
+        :meth:`SegmentChain.get_subchain` would, without creating any
+        |SegmentChains|
+
+        Parameters
+        ----------
+        starts : array-like
+            Start of sub-region in each feature, in feature coordinates.
+            Broadcastable against the number of rows.
+
+        ends : array-like
+            End of sub-region in each feature, in feature coordinates, half-open.
+            Rows for which `end` equals `start` contribute no segments.
+
+        stranded : bool, optional
+            If `True` (default), coordinates on minus-strand features are
+            counted from the 3' end of the genome. If `False`, all coordinates
+            are counted from the leftmost position of each feature.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Row index of each segment, in ascending order
+
+        :class:`numpy.ndarray`
+            Genomic start coordinate of each segment
+
+        :class:`numpy.ndarray`
+            Genomic end coordinate of each segment
+
+        Raises
+        ------
+        IndexError
+            If any sub-region is not contained within its feature
+        """
+        shape   = (self.num_chains,)
+        lengths = self.lengths
+        starts  = numpy.broadcast_to(numpy.asarray(starts,dtype="l"),shape)
+        ends    = numpy.broadcast_to(numpy.asarray(ends,dtype="l"),shape)
+        if ((starts < 0) | (ends < starts) | (ends > lengths)).any():
+            raise IndexError("ChainTable.get_subchain_segments(): sub-regions must satisfy 0 <= start <= end <= feature length.")
+
+        if stranded == True:
+            reverse = self.strand_codes == reverse_strand
+            starts, ends = numpy.where(reverse,lengths - ends,starts), numpy.where(reverse,lengths - starts,ends)
+
+        # position of each segment relative to the leftmost position of its feature
+        chain_ids  = self._seg_chain_ids
+        seg_starts = self.seg_starts
+        cum        = self._cum_lengths
+        seg_pos    = cum[:-1] - cum[self.seg_offsets[:-1]][chain_ids]
+        lo = numpy.maximum(seg_pos,starts[chain_ids])
+        hi = numpy.minimum(seg_pos + self.seg_ends - seg_starts,ends[chain_ids])
+
+        keep = hi > lo
+        return chain_ids[keep], (seg_starts + lo - seg_pos)[keep], (seg_starts + hi - seg_pos)[keep]
+
+    def _get_coding_bounds(self):
+        """Return a mask of features with coding regions, and coding region
+        bounds in feature coordinates that are `0` for features without them
+        """
+        cds_starts = self.cds_starts
+        cds_ends   = self.cds_ends
+        coding     = (cds_starts >= 0) & (cds_ends >= 0)
+        return coding, numpy.where(coding,cds_starts,0), numpy.where(coding,cds_ends,0)
+
+    def get_cds_segments(self):
+        """Find segments covering the coding region of each feature, including
+        the stop codon, as :meth:`Transcript.get_cds` would, without creating
+        any |Transcripts|
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Row index of each segment, in ascending order
+
+        :class:`numpy.ndarray`
+            Genomic start coordinate of each segment
+
+        :class:`numpy.ndarray`
+            Genomic end coordinate of each segment
+        """
+        _, cds_starts, cds_ends = self._get_coding_bounds()
+        return self.get_subchain_segments(cds_starts,cds_ends)
+
+    def get_utr5_segments(self):
+        """Find segments covering the 5' UTR of each feature, as
+        :meth:`Transcript.get_utr5` would, without creating any |SegmentChains|.
+        Features without coding regions contribute no segments.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Row index of each segment, in ascending order
+
+        :class:`numpy.ndarray`
+            Genomic start coordinate of each segment
+
+        :class:`numpy.ndarray`
+            Genomic end coordinate of each segment
+        """
+        _, cds_starts, _ = self._get_coding_bounds()
+        return self.get_subchain_segments(0,cds_starts)
+
+    def get_utr3_segments(self):
+        """Find segments covering the 3' UTR of each feature, excluding the
+        stop codon, as :meth:`Transcript.get_utr3` would, without creating any
+        |SegmentChains|. Features without coding regions contribute no segments.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Row index of each segment, in ascending order
+
+        :class:`numpy.ndarray`
+            Genomic start coordinate of each segment
+
+        :class:`numpy.ndarray`
+            Genomic end coordinate of each segment
+        """
+        coding, _, cds_ends = self._get_coding_bounds()
+        lengths = self.lengths
+        return self.get_subchain_segments(numpy.where(coding,cds_ends,lengths),lengths)
+
+
+
+cdef bint _blocks_contain(array.array starts, array.array ends, long pos):
+    """Test whether any block defined by `starts` and `ends` contains `pos`"""
+    cdef int i
+    for i in range(len(starts)):
+        if starts.data.as_longs[i] <= pos and pos < ends.data.as_longs[i]:
+            return True
+
+    return False
@@ -208,7 +208,7 @@ from plastid.readers.wiggle import WiggleReader
 from plastid.readers.bowtie import BowtieReader
 from plastid.readers.bigwig import BigWigReader
 from plastid.genomics.roitools import GenomicSegment, SegmentChain
-from plastid.util.services.mini2to3 import xrange, ifilter
+from plastid.util.services.mini2to3 import xrange
 from plastid.util.services.exceptions import DataWarning, warn
 from plastid.util.io.openers import NullWriter, multiopen
 
@@ -216,6 +216,9 @@ from plastid.genomics.map_factories import *
 
 MIN_CHR_SIZE = int(10*1e6) # 10 Mb minimum size for unspecified chromosomes 
 
+READ_CACHE_BLOCK_SIZE = 65536 # size, in nt, of chromosome blocks in BAMGenomeArray read cache
+_CACHED_READ_BYTES    = 400   # estimated memory footprint of a cached read alignment
+
 
 #===============================================================================
 # INDEX: Mapping functions for GenomeArray and SparseGenomeArray.
@@ -582,7 +585,7 @@ class MutableAbstractGenomeArray(AbstractGenomeArray):
 
 class BAMGenomeArray(AbstractGenomeArray):
     """
-    BAMGenomeArray(*bamfiles,mapping=CenterMapFactory())
+    BAMGenomeArray(*bamfiles,mapping=CenterMapFactory(),cache_size=0)
     
     A GenomeArray for :term:`read alignments` in `BAM`_ files.
     
@@ -607,6 +610,11 @@ class BAMGenomeArray(AbstractGenomeArray):
         somewhere in the middle. Factories to produce such functions are provided.
         See references below. (Default: :func:`CenterMapFactory`)
 
+    cache_size : int, optional
+        Approximate memory, in bytes, to devote to caching :term:`read alignments`
+        from recently-queried blocks of chromosomes. Set to 0 to disable.
+        (Default: 0)
+
     
     Attributes
     ----------
@@ -622,6 +630,14 @@ class BAMGenomeArray(AbstractGenomeArray):
     The alignment data in |BAMGenomeArray| objects is immutable. If you need
     to change the data in-place, the |BAMGenomeArray| can be converted to a
     |GenomeArray| or |SparseGenomeArray| via :meth:`~BAMGenomeArray.to_genome_array`
+
+    If `cache_size` is greater than zero, reads are fetched from the `BAM`_
+    files in blocks of :data:`READ_CACHE_BLOCK_SIZE` nucleotides, which are kept
+    in memory and evicted least-recently-used first when the cache exceeds
+    `cache_size`. Overlapping or nearby queries, e.g. for adjacent exons or
+    for multiple isoforms of a gene, then decode each read only once.
+    Hit and miss counts are given by :attr:`~BAMGenomeArray.cache_info`.
+    Cached reads are shared between queries, and so should not be modified.
     """
     
     def __init__(self,*bamfiles,**kwargs): #mapping=None):
@@ -641,6 +657,10 @@ class BAMGenomeArray(AbstractGenomeArray):
             somewhere in the middle. Factories to produce such functions are provided.
             See references below. (Default: :func:`CenterMapFactory`)
 
+        cache_size : int, optional
+            Approximate memory, in bytes, to devote to caching read alignments.
+            Set to 0 to disable. (Default: 0)
+
         See also
         --------
         plastid.genomics.map_factories.FivePrimeMapFactory
@@ -673,12 +693,124 @@ class BAMGenomeArray(AbstractGenomeArray):
         self._chroms = sorted(list(self._chr_lengths.keys()))
 
         self._filters     = OrderedDict()
+
+        self._cache_size  = kwargs.get("cache_size",0)
+        self._read_cache  = OrderedDict()
+        self._cache_bytes = 0
+        self._cache_stats = { "hits" : 0, "misses" : 0 }
         self._update()
 
     def __del__(self):
         for bamfile in self.bamfiles:
             bamfile.close()
 
+    @property
+    def cache_info(self):
+        """Dictionary of hit and miss counts, number of blocks held, and
+        estimated size in bytes, of the read cache"""
+        info = dict(self._cache_stats)
+        info["blocks"] = len(self._read_cache)
+        info["bytes"]  = self._cache_bytes
+        return info
+
+    def clear_cache(self):
+        """Empty the read cache, and reset its statistics"""
+        self._read_cache.clear()
+        self._cache_bytes = 0
+        for k in self._cache_stats:
+            self._cache_stats[k] = 0
+
+    def _get_cached_block(self,chrom,block):
+        """Fetch all reads overlapping a block of a chromosome, from the
+        read cache if possible
+
+        Parameters
+        ----------
+        chrom : str
+            Chromosome name
+
+        block : int
+            Index of block, in units of :data:`READ_CACHE_BLOCK_SIZE`
+
+        Returns
+        -------
+        list
+            Reads overlapping block, as :class:`pysam.AlignedSegment`
+
+        :class:`numpy.ndarray`
+            Leftmost genomic coordinate of each read
+
+        :class:`numpy.ndarray`
+            Rightmost genomic coordinate of each read, plus 1
+        """
+        key   = (chrom,block)
+        cache = self._read_cache
+        entry = cache.pop(key,None)
+        if entry is not None:
+            # re-insert as most recently used
+            cache[key] = entry
+            self._cache_stats["hits"] += 1
+            return entry
+
+        self._cache_stats["misses"] += 1
+        start = block*READ_CACHE_BLOCK_SIZE
+        end   = min(start + READ_CACHE_BLOCK_SIZE,self._chr_lengths[chrom])
+        reads = list(itertools.chain.from_iterable((X.fetch(reference=chrom,
+                                                            start=start,
+                                                            end=end) for X in self.bamfiles)))
+        starts = numpy.array([X.reference_start for X in reads],dtype=int)
+        # unaligned reads placed at a position have no `reference_end`.
+        # htslib treats them as covering one position
+        ends   = numpy.array([X.reference_end or X.reference_start + 1 for X in reads],dtype=int)
+        entry  = (reads,starts,ends)
+
+        cache[key] = entry
+        self._cache_bytes += len(reads)*_CACHED_READ_BYTES
+        while self._cache_bytes > self._cache_size and len(cache) > 1:
+            old_reads, _, _ = cache.popitem(last=False)[1]
+            self._cache_bytes -= len(old_reads)*_CACHED_READ_BYTES
+
+        return entry
+
+    def _fetch_cached(self,chrom,start,end):
+        """Fetch reads overlapping a region via the read cache. Each read
+        is returned once, even if it spans several blocks, and reads are
+        ordered as by :meth:`pysam.AlignmentFile.fetch` within each block.
+
+        Parameters
+        ----------
+        chrom : str
+            Chromosome name
+
+        start : int
+            Leftmost coordinate of region, 0-indexed
+
+        end : int
+            Rightmost coordinate of region, half-open
+
+        Returns
+        -------
+        list
+            Reads overlapping region, as :class:`pysam.AlignedSegment`
+        """
+        end  = min(end,self._chr_lengths[chrom])
+        ltmp = []
+        if end <= start:
+            return ltmp
+
+        for block in range(start // READ_CACHE_BLOCK_SIZE,(end - 1) // READ_CACHE_BLOCK_SIZE + 1):
+            reads, starts, ends = self._get_cached_block(chrom,block)
+            if len(reads) == 0:
+                continue
+
+            # take each read only from the block holding its first position
+            # within the region, so that reads spanning blocks aren't repeated
+            first = numpy.maximum(starts,start) // READ_CACHE_BLOCK_SIZE == block
+            idx   = numpy.flatnonzero((starts < end) & (ends > start) & first)
+            ltmp.extend([reads[X] for X in idx])
+
+        return ltmp
+
     def reset_sum(self):
         """Reset the sum to the total number of mapped reads in the |BAMGenomeArray|
         
@@ -714,9 +846,17 @@ class BAMGenomeArray(AbstractGenomeArray):
         In Python, `lambda` functions do NOT have their own scope! We strongly
         recomend defining filter functions using the ``def`` syntax to avoid
         namespace collisions.
+
+        Filters on read length, mapping quality, `SAM`_ flags, or tag values
+        are much faster when given as a |ReadFilter|, which is evaluated
+        without calling Python for each read. Other filters are applied after
+        all |ReadFilters|.
         
         See also
         --------
+        plastid.genomics.map_factories.ReadFilter
+            filter read alignments by length, mapping quality, flags, or tags
+
         plastid.genomics.map_factories.SizeFilterFactory
             generate filter functions that gate read alignments on size
         """
@@ -787,36 +927,14 @@ class BAMGenomeArray(AbstractGenomeArray):
         ValueError
             if bamfiles not sorted or not indexed
         """
-        # fetch reads
-        chrom  = roi.chrom
-        strand = roi.strand
-        start  = roi.start
-        end    = roi.end
-        
-        if chrom not in self.chroms():
+        if roi.chrom not in self.chroms():
             # FIXME: generalize to N-D
             shape = [1] + getattr(self.map_fn,"shape",[])
             return [], numpy.zeros(shape)
 
-        reads = itertools.chain.from_iterable((X.fetch(reference=chrom,
-                                               start=start,
-                                               end=end,
-                                               # until_eof=True, # this could speed things up. need to test/investigate
-                                               ) for X in self.bamfiles))
-            
-        # filter by strand
-        if strand == "+":
-            reads = ifilter(lambda x: x.is_reverse is False,reads)
-        elif strand == "-":
-            reads = ifilter(lambda x: x.is_reverse is True,reads)
-        
-        # Pass through additional filters (e.g. size filters, if they have
-        # been added)
-        for my_filter in self._filters.values():
-            reads = ifilter(my_filter,reads)
-        
         # retrieve selected parts of regions
-        reads,count_array = self.map_fn(list(reads),roi)
+        strand = roi.strand
+        reads,count_array = self.map_fn(self.fetch_reads(roi),roi)
         
         # normalize to reads per million if normalization flag is set
         if self._normalize is True:
@@ -827,6 +945,53 @@ class BAMGenomeArray(AbstractGenomeArray):
 
         return reads, count_array
 
+    def fetch_reads(self,roi):
+        """Return :term:`read alignments` overlapping a |GenomicSegment| that
+        match its strand and pass all filters, *before* the mapping rule
+        is applied. Reads are strand-matched to `roi` by default. To obtain
+        unstranded reads, set the value of `roi.strand` to `'.'`
+
+        Parameters
+        ----------
+        roi : |GenomicSegment|
+            Region of interest
+
+
+        Returns
+        -------
+        list
+            List of reads (as :class:`pysam.AlignedSegment`) overlapping
+            region of interest. Reads may map outside `roi` under the
+            mapping rule set by :meth:`~BAMGenomeArray.set_mapping`
+
+
+        Raises
+        ------
+        ValueError
+            if bamfiles not sorted or not indexed
+        """
+        # fetch reads
+        chrom  = roi.chrom
+        strand = roi.strand
+        start  = roi.start
+        end    = roi.end
+        
+        if chrom not in self._chr_lengths:
+            return []
+
+        if self._cache_size > 0:
+            reads = self._fetch_cached(chrom,start,end)
+        else:
+            reads = list(itertools.chain.from_iterable((X.fetch(reference=chrom,
+                                                        start=start,
+                                                        end=end,
+                                                        # until_eof=True, # this could speed things up. need to test/investigate
+                                                        ) for X in self.bamfiles)))
+
+        # filter by strand, and pass through additional filters (e.g. size
+        # filters, if they have been added). ReadFilters are evaluated in C
+        return filter_reads(reads,strand,list(self._filters.values()))
+
     def get_reads(self,roi):
         """Returns reads covering a |GenomicSegment|. Reads are strand-matched
         to `roi` by default, and are included or excluded depending upon the
@@ -1192,17 +1357,24 @@ class BigWigGenomeArray(AbstractGenomeArray):
             Fetch a spliced vector of data covering a |SegmentChain|
         """
         if isinstance(roi,SegmentChain):
-            return roi.get_counts(self)
-        
+            if len(roi) == 0:
+                return roi.get_counts(self)
+            segments = list(roi)
+            length   = roi.length
+        else:
+            segments = [roi]
+            length   = len(roi)
+
         strand = roi.strand
         sdict  = self._strand_dict
         
-        count_vec = numpy.zeros(len(roi))
+        # pool data from all files for the strand into one vector
+        count_vec = numpy.zeros(length)
         if strand in sdict:
             for bw in sdict[strand]:
-                count_vec += bw.get(roi,roi_order=False) # we flip later to save operations
+                bw.get_chain(segments,out=count_vec,roi_order=False,accumulate=True) # we flip later to save operations
         else:
-            warnings.warn("Strand '%s' not in BigWigGenomeArray (has %s)." % (strand,", ".join(sdict.keys())),DataWarning)
+            warn("Strand '%s' not in BigWigGenomeArray (has %s)." % (strand,", ".join(sdict.keys())),DataWarning)
 
         if self._normalize is True:
             count_vec = count_vec / float(self.sum()) * 1e6
@@ -1212,6 +1384,58 @@ class BigWigGenomeArray(AbstractGenomeArray):
             
         return count_vec
         
+    def summarize(self,roi,n_bins=1,stat="mean",roi_order=True):
+        """Summarize data in `n_bins` equal-sized bins covering `roi`, using
+        zoom levels stored in the `BigWig`_ files rather than fetching data
+        at every position. See :meth:`BigWigReader.summarize` for details.
+        
+        Parameters
+        ----------
+        roi : |GenomicSegment| or |SegmentChain|
+            Region of interest in genome
+
+        n_bins : int, optional
+            Number of bins, between 1 and the length of `roi` (Default: `1`)
+
+        stat : str, optional
+            Statistic to calculate in each bin. `'mean'` (default) or `'sum'`.
+            If only one `BigWig`_ file was added for the strand of `roi`,
+            `'max'`, `'min'`, and `'coverage'` are also allowed.
+
+        roi_order : bool, optional
+            If `True` (default), bins are ordered 5' to 3' relative to `roi`
+            rather than to the genome.
+
+        Returns
+        -------
+        numpy.ndarray
+            Value of `stat` in each bin, normalized if :meth:`set_normalize`
+            is `True`
+
+        Raises
+        ------
+        ValueError
+            If `stat` cannot be combined across the files for the strand of `roi`
+        """
+        strand = roi.strand
+        sdict  = self._strand_dict
+        readers = sdict.get(strand,[])
+        if len(readers) > 1 and stat not in ("mean","sum"):
+            raise ValueError("BigWigGenomeArray.summarize(): '%s' cannot be combined across the %s BigWig files for strand '%s'. Use 'mean' or 'sum'." % (stat,len(readers),strand))
+
+        if len(readers) == 0:
+            warn("Strand '%s' not in BigWigGenomeArray (has %s)." % (strand,", ".join(sdict.keys())),DataWarning)
+            return numpy.zeros(n_bins)
+
+        count_vec = numpy.zeros(n_bins)
+        for bw in readers:
+            count_vec += bw.summarize(roi,n_bins=n_bins,stat=stat,roi_order=roi_order)
+
+        if self._normalize is True and stat != "coverage":
+            count_vec = count_vec / float(self.sum()) * 1e6
+
+        return count_vec
+
     def strands(self):
         """Return a tuple of strands in the GenomeArray
         
@@ -1287,12 +1511,20 @@ class BigWigGenomeArray(AbstractGenomeArray):
             
         self._strands = sorted(self._strand_dict.keys())
 
-    def reset_sum(self):
-        """Reset sum to total of data in the |BigWigGenomeArray|"""
+    def reset_sum(self,exact=False):
+        """Reset sum to total of data in the |BigWigGenomeArray|
+        
+        Parameters
+        ----------
+        exact : bool, optional
+            If `False` (default), use the sums stored in the headers of
+            the `BigWig`_ files, which is fast. If `True`, decode and sum
+            all data in each file. See :meth:`BigWigReader.sum`
+        """
         my_sum = 0
         for ltmp in self._strand_dict.values():
             for bw in ltmp:
-                my_sum += bw.sum()
+                my_sum += bw.sum(exact=exact)
  
         self._sum = my_sum       
         return my_sum
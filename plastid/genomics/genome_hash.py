@@ -70,6 +70,9 @@ to a |GenomeHash| as a |GenomicSegment|, |SegmentChain|, or |Transcript|::
 # Memory-efficient ways to hash features across a genome
 #===============================================================================
 import copy
+import heapq
+import itertools
+from collections import OrderedDict
 from plastid.util.services.mini2to3 import cStringIO
 from plastid.util.io.openers import NullWriter, multiopen
 from plastid.readers.bed import BED_Reader
@@ -79,6 +82,7 @@ from plastid.genomics.roitools import GenomicSegment, SegmentChain
 from abc import abstractmethod
 
 DEFAULT_BIN_SIZE=20000
+DEFAULT_RECORD_CACHE_SIZE=10000
 
 
 class AbstractGenomeHash(object):
@@ -136,6 +140,31 @@ class AbstractGenomeHash(object):
         """
         pass
 
+    def sweep(self,rois,stranded=True):
+        """Find features overlapping each of a series of regions of interest
+
+        Parameters
+        ----------
+        rois : iterable of |GenomicSegment| or |SegmentChain|
+            Query features. Subclasses that stream their data, like
+            |TabixGenomeHash|, require these to be sorted by chromosome
+            and start position.
+
+        stranded : bool
+            if `True`, retrieve only features on same strand as query feature.
+            Otherwise, retrieve features on both strands (Default: `True`)
+
+        Yields
+        ------
+        |GenomicSegment| or |SegmentChain|
+            Query feature from `rois`
+
+        list
+            Features overlapping the query feature
+        """
+        for roi in rois:
+            yield roi, self.get_overlapping_features(roi,stranded=stranded)
+
 
 class GenomeHash(AbstractGenomeHash):
     """Index memory-resident features (e.g. |SegmentChains| or |Transcripts|) by genomic position for quick lookup later.
@@ -534,6 +563,45 @@ class BigBedGenomeHash(AbstractGenomeHash):
             
         return ltmp
 
+    def sweep(self,rois,stranded=True,batch_size=1000):
+        """Find features overlapping each of a series of regions of interest,
+        fetching them from each file in batches via :meth:`BigBedReader.get_batch`
+
+        Parameters
+        ----------
+        rois : iterable of |GenomicSegment| or |SegmentChain|
+            Query features. These need not be sorted, but batches of nearby
+            queries are fetched most quickly.
+
+        stranded : bool
+            if `True`, retrieve only features on same strand as query feature.
+            Otherwise, retrieve features on both strands (Default: `True`)
+
+        batch_size : int, optional
+            Number of queries to fetch at once (Default: 1000)
+
+        Yields
+        ------
+        |GenomicSegment| or |SegmentChain|
+            Query feature from `rois`
+
+        list
+            Features overlapping the query feature
+        """
+        rois = iter(rois)
+        while True:
+            batch = list(itertools.islice(rois,batch_size))
+            if len(batch) == 0:
+                break
+
+            results = [[] for _ in batch]
+            for reader in self.bigbedreaders:
+                for ltmp, found in zip(results,reader.get_batch(batch,stranded=stranded)):
+                    ltmp.extend(found)
+
+            for roi, ltmp in zip(batch,results):
+                yield roi, ltmp
+
     def __getitem__(self,roi,stranded=True):
         """Return list of features that overlap the region of interest (roi)
         
@@ -562,7 +630,7 @@ class BigBedGenomeHash(AbstractGenomeHash):
 
 class TabixGenomeHash(AbstractGenomeHash):
     """
-    TabixGenomeHash(*filenames,data_format='GTF2')
+    TabixGenomeHash(*filenames,data_format='GTF2',record_cache_size=10000)
     
     Find features overlapping query regions in `Tabix`_-indexed files.
         
@@ -574,6 +642,10 @@ class TabixGenomeHash(AbstractGenomeHash):
     data_format : str
         Format of tabix-compressed file(s). Choices are:
         `'GTF2'`,`'GFF3'`,`'BED'`,`'PSL'` (Default: `GTF2`)
+
+    record_cache_size : int, optional
+        Number of parsed features to keep in memory, so that nearby queries
+        need not re-parse the same lines. Set to 0 to disable. (Default: %s)
     
     
     Attributes
@@ -583,16 +655,36 @@ class TabixGenomeHash(AbstractGenomeHash):
         
     tabix_readers : list of :py:class:`pysam.Tabixfile`
        `Pysam`_ interfaces to underlying data files 
-    """
+
+
+    Notes
+    -----
+    Like features stored in a |GenomeHash|, the same objects may be returned
+    by successive queries, and should therefore be copied before they are
+    modified. To return a new object from each query, set `record_cache_size`
+    to 0.
+
+    To find features overlapping many regions of interest, sort the regions
+    by chromosome and position, and pass them to :meth:`sweep`, which
+    streams each chromosome from the files only once.
+    """ % DEFAULT_RECORD_CACHE_SIZE
     
     _READERS = { "GTF2" : GTF2_Reader,
                  "GFF3" : GFF3_Reader,
                  "BED"  : BED_Reader,
                  "PSL"  : PSL_Reader,
                 }
+
+    # column of chromosome name, columns of start & end coordinates,
+    # and offset converting start to 0-based coordinates, for each format
+    _COORDINATE_COLUMNS = { "GTF2" : (0,3,4,1),
+                            "GFF3" : (0,3,4,1),
+                            "BED"  : (0,1,2,0),
+                            "PSL"  : (13,15,16,0),
+                           }
     
     def __init__(self,*filenames,**kwargs): #data_format=None,printer=None):
-        """Create a |BigBedGenomeHash|
+        """Create a |TabixGenomeHash|
         
         Parameters
         ----------
@@ -602,7 +694,11 @@ class TabixGenomeHash(AbstractGenomeHash):
         data_format : str
             Format of tabix-compressed file(s). Choices are:
             `'GTF2'`,`'GFF3'`,`'BED'`,`'PSL'` (Default: `GTF2`)
-        """
+
+        record_cache_size : int, optional
+            Number of parsed features to keep in memory. Set to 0 to disable.
+            (Default: %s)
+        """ % DEFAULT_RECORD_CACHE_SIZE
         from pysam import Tabixfile
         if len(filenames) == 1 and isinstance(filenames[0],list):
             filenames = filenames[0]
@@ -617,7 +713,13 @@ class TabixGenomeHash(AbstractGenomeHash):
             self.printer.write(msg)
             raise ValueError(msg)
         
+        self._coordinate_columns = TabixGenomeHash._COORDINATE_COLUMNS[data_format]
+        self._record_cache       = OrderedDict()
+        self._record_cache_size  = kwargs.get("record_cache_size",DEFAULT_RECORD_CACHE_SIZE)
+        self._cache_stats        = { "hits" : 0, "misses" : 0 }
+        
         self.tabix_readers = [Tabixfile(X) for X in self.filenames]
+        self._contigs      = [set(R.contigs) for R in self.tabix_readers]
     
     def __del__(self):
         try:
@@ -628,7 +730,87 @@ class TabixGenomeHash(AbstractGenomeHash):
                     pass
         except:
             pass
-            
+
+    @property
+    def cache_info(self):
+        """Dictionary of hit and miss counts, and current size, of the parsed-record cache"""
+        info = dict(self._cache_stats)
+        info["records"] = len(self._record_cache)
+        return info
+
+    def clear_cache(self):
+        """Empty the parsed-record cache, and reset its statistics"""
+        self._record_cache.clear()
+        for k in self._cache_stats:
+            self._cache_stats[k] = 0
+
+    def _parse_lines(self,lines):
+        """Parse lines of text from a tabix file into features, fetching
+        previously-parsed features from the record cache where possible
+
+        Parameters
+        ----------
+        lines : list of str
+            Lines of text, without trailing newlines
+
+        Returns
+        -------
+        list
+            Features, in the same order as `lines`. Lines that could not
+            be parsed are skipped.
+        """
+        cache  = self._record_cache
+        stats  = self._cache_stats
+        parsed = {}
+        todo   = []
+        for line in lines:
+            feature = cache.pop(line,None)
+            if feature is None:
+                if line not in parsed:
+                    parsed[line] = None
+                    todo.append(line)
+            else:
+                parsed[line] = feature
+                stats["hits"] += 1
+
+        if len(todo) > 0:
+            stats["misses"] += len(todo)
+            features = list(self._reader_class(cStringIO.StringIO("\n".join(todo))))
+            if len(features) == len(todo):
+                parsed.update(zip(todo,features))
+            else:
+                # some lines were skipped or malformed; parse one by one
+                # so that features stay paired with their source lines
+                for line in todo:
+                    found = list(self._reader_class(cStringIO.StringIO(line)))
+                    if len(found) == 1:
+                        parsed[line] = found[0]
+
+        ltmp = []
+        for line in lines:
+            feature = parsed[line]
+            if feature is not None:
+                ltmp.append(feature)
+
+        if self._record_cache_size > 0:
+            for line, feature in parsed.items():
+                if feature is not None:
+                    cache[line] = feature
+
+            while len(cache) > self._record_cache_size:
+                cache.popitem(last=False)
+
+        return ltmp
+
+    @staticmethod
+    def _get_query(roi):
+        if isinstance(roi,GenomicSegment):
+            return roi, SegmentChain(roi)
+        elif isinstance(roi,SegmentChain):
+            return roi.spanning_segment, roi
+        else:
+            raise TypeError("Query feature must be a GenomicSegment or SegmentChain")
+
     def get_overlapping_features(self,roi,stranded=True):
         """Return list of features overlapping `roi`
         
@@ -676,26 +858,145 @@ class TabixGenomeHash(AbstractGenomeHash):
         TypeError
             if `roi` is not a |GenomicSegment| or |SegmentChain|
         """
-        if isinstance(roi,GenomicSegment):
-            #roi_chain = SegmentChain(roi)
-            roi_seg = roi
-            roi_chain = SegmentChain(roi)
-        elif isinstance(roi,SegmentChain):
-            roi_chain = roi
-            roi_seg = roi.spanning_segment
-        else:
-            raise TypeError("Query feature must be a GenomicSegment or SegmentChain")
-        
+        roi_seg, roi_chain = self._get_query(roi)
         chrom = roi_seg.chrom
-        feature_text = "\n".join(["\n".join(list(R.fetch(chrom,
-                                                         X.start,
-                                                         X.end))) \
-                                                         for R in self.tabix_readers \
-                                                         for X in roi_chain])
-            
-        features = (self._reader_class(cStringIO.StringIO(feature_text)))
+
+        # lines from features spanning more than one segment of `roi`
+        # are fetched once per segment; keep only the first copy
+        lines = []
+        for R, contigs in zip(self.tabix_readers,self._contigs):
+            if chrom not in contigs:
+                continue
+
+            seen = set()
+            for X in roi_chain:
+                for line in R.fetch(chrom,X.start,X.end):
+                    if line not in seen:
+                        seen.add(line)
+                        lines.append(line)
+
+        features = self._parse_lines(lines)
         if stranded == True:
             features = [X for X in features if roi_chain.overlaps(X)]
         else:
             features = [X for X in features if roi_chain.unstranded_overlaps(X)]
         return features
+
+    def sweep(self,rois,stranded=True):
+        """Find features overlapping each of a series of sorted regions of interest
+
+        Each chromosome is read from the tabix files once, in a single pass.
+        Records whose spans could overlap the current query are kept in a heap
+        ordered by their end coordinates, and are discarded as soon as the
+        queries move past them. Each record is parsed at most once per pass,
+        so the total cost is linear in the size of the files plus the number of
+        overlaps found, rather than proportional to the number of queries times
+        the density of records near each.
+
+        Parameters
+        ----------
+        rois : iterable of |GenomicSegment| or |SegmentChain|
+            Query features, sorted by chromosome and then by start position
+            (of their spanning segments). Features from the same chromosome
+            must be contiguous in `rois`.
+
+        stranded : bool
+            If `True`, retrieve only features on same strand as query feature.
+            Otherwise, retrieve features on both strands (Default: `True`)
+
+        Yields
+        ------
+        |GenomicSegment| or |SegmentChain|
+            Query feature from `rois`
+
+        list
+            Features overlapping the query feature, in the order they
+            appear in the tabix files
+
+        Raises
+        ------
+        TypeError
+            if an item in `rois` is not a |GenomicSegment| or |SegmentChain|
+
+        ValueError
+            if `rois` are not sorted by start position within a chromosome
+        """
+        chrom_col, start_col, end_col, offset = self._coordinate_columns
+        num_readers = len(self.tabix_readers)
+        last_chrom  = None
+        last_start  = None
+        for roi in rois:
+            roi_seg, roi_chain = self._get_query(roi)
+            chrom = roi_seg.chrom
+            if chrom != last_chrom:
+                # per-reader state: record stream, next unread record,
+                # and heap of records that may overlap upcoming queries
+                streams = []
+                for R, contigs in zip(self.tabix_readers,self._contigs):
+                    if chrom in contigs:
+                        streams.append([iter(R.fetch(chrom)),None,[]])
+                    else:
+                        streams.append([iter(()),None,[]])
+
+                seq        = 0
+                last_chrom = chrom
+                last_start = roi_seg.start
+            elif roi_seg.start < last_start:
+                raise ValueError("Regions of interest must be sorted by start position within each chromosome. Found %s after start %s."
+                                 % (roi_seg,last_start))
+
+            last_start = roi_seg.start
+            qstart = roi_seg.start
+            qend   = roi_seg.end
+            candidates = []
+            for reader_num in range(num_readers):
+                stream  = streams[reader_num]
+                records = stream[0]
+                heap    = stream[2]
+                pending = stream[1]
+
+                # advance stream past all records starting before end of query
+                while True:
+                    if pending is None:
+                        line = next(records,None)
+                        if line is None:
+                            break
+
+                        items   = line.split("\t")
+                        pending = [int(items[start_col]) - offset,int(items[end_col]),seq,line,None]
+                        seq += 1
+
+                    if pending[0] >= qend:
+                        break
+
+                    heapq.heappush(heap,(pending[1],pending[2],pending))
+                    pending = None
+
+                stream[1] = pending
+
+                # discard records ending before start of query. Because
+                # queries are sorted, these cannot overlap later queries
+                while len(heap) > 0 and heap[0][0] <= qstart:
+                    heapq.heappop(heap)
+
+                # keep file order within each reader
+                candidates.extend(sorted([X[2] for X in heap if X[2][0] < qend],key=lambda x: x[2]))
+
+            # parse candidates not parsed on a previous query
+            todo = [X for X in candidates if X[4] is None]
+            if len(todo) > 0:
+                features = self._parse_lines([X[3] for X in todo])
+                if len(features) == len(todo):
+                    for entry, feature in zip(todo,features):
+                        entry[4] = feature
+                else:
+                    for entry in todo:
+                        found = self._parse_lines([entry[3]])
+                        entry[4] = found[0] if len(found) == 1 else False
+
+            if stranded == True:
+                features = [X[4] for X in candidates if X[4] is not False and roi_chain.overlaps(X[4])]
+            else:
+                features = [X[4] for X in candidates if X[4] is not False and roi_chain.unstranded_overlaps(X[4])]
+
+            yield roi, features
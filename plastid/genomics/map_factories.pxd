@@ -1,3 +1,8 @@
+IF PYSAM10:
+    from pysam.libcalignedsegment cimport AlignedSegment
+ELSE:
+    from pysam.calignedsegment cimport AlignedSegment
+
 cdef class CenterMapFactory:
     cdef unsigned int nibble
 
@@ -15,5 +20,12 @@ cdef class StratifiedVariableFivePrimeMapFactory(VariableFivePrimeMapFactory):
     cdef int min_length, max_length, _numlengths
      
 
-cdef class SizeFilterFactory:
-    cdef int min_, max_
\ No newline at end of file
+cdef class ReadFilter:
+    cdef readonly int min_length, max_length, min_mapq, require_flags, exclude_flags
+    cdef readonly object tag, tag_values
+    cdef bytes _tag
+    cdef bint _check_length
+    cdef bint check(self, AlignedSegment read)
+
+cdef class SizeFilterFactory(ReadFilter):
+    pass
\ No newline at end of file
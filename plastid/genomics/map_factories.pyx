@@ -93,6 +93,15 @@ Mapping functions are rarely called directly. Instead, they are invoked via
 
 Other mapping functions are similarly invoked. See their docstrings for further details.
 
+Reads can be filtered before mapping by length, mapping quality, `SAM`_ flags,
+or tag values using a |ReadFilter|, which |BAMGenomeArray| evaluates without
+calling Python for each read:
+
+ .. code-block:: python
+
+    # keep uniquely-aligned reads with mapping quality >= 10
+    >>> ga.add_filter("unique",ReadFilter(min_mapq=10,tag="NH",tag_values={1}))
+
 
 Implementation
 --------------
@@ -131,10 +140,15 @@ import numpy as np
 cimport numpy as np
 cimport cython
 
+from libc.stdint cimport uint8_t, int8_t, uint16_t, int16_t, uint32_t, int32_t
+from libc.string cimport memcpy
+
 IF PYSAM10:
     from pysam.libcalignmentfile cimport AlignedSegment
+    from pysam.libchtslib cimport bam1_t, bam_get_cigar
 ELSE:
     from pysam.calignmentfile cimport AlignedSegment
+    from pysam.chtslib cimport bam1_t, bam_get_cigar
 
 from plastid.genomics.c_common cimport forward_strand, reverse_strand, unstranded
 from plastid.genomics.roitools cimport GenomicSegment
@@ -773,12 +787,226 @@ cdef class StratifiedVariableFivePrimeMapFactory(VariableFivePrimeMapFactory):
             return [self._numlengths]
 
 
-cdef class SizeFilterFactory:
+cdef inline int aligned_length(bam1_t * b):
+    """Return the number of positions in a read alignment that are aligned
+    to the reference (`M`, `=`, and `X` operations), which equals
+    ``len(read.positions)``, without building a list of positions
+    """
+    cdef:
+        uint32_t * cigar = bam_get_cigar(b)
+        uint32_t i, op
+        int length = 0
+
+    for i in range(b.core.n_cigar):
+        op = cigar[i] & 0xf
+        if op == 0 or op == 7 or op == 8:
+            length += cigar[i] >> 4
+
+    return length
+
+
+cdef uint8_t * find_tag(bam1_t * b, const char * tag):
+    """Return a pointer to the type code of a `SAM`_ tag in the auxiliary
+    data of a `BAM`_ record, or `NULL` if the tag is absent. Equivalent to
+    htslib's ``bam_aux_get()``, which plastid is not linked against
+    """
+    cdef:
+        uint8_t * s   = b.data + b.core.l_qname + 4*b.core.n_cigar + (b.core.l_qseq + 1)//2 + b.core.l_qseq
+        uint8_t * end = b.data + b.l_data
+        uint8_t type_code, subtype
+        int32_t count
+        int size
+
+    while s + 3 <= end:
+        if s[0] == tag[0] and s[1] == tag[1]:
+            return s + 2
+
+        type_code = s[2]
+        s += 3
+        if type_code in b"AcC":
+            s += 1
+        elif type_code in b"sS":
+            s += 2
+        elif type_code in b"iIf":
+            s += 4
+        elif type_code in b"ZH":
+            while s < end and s[0] != 0:
+                s += 1
+            s += 1
+        elif type_code == b"B":
+            if s + 5 > end:
+                return NULL
+            subtype = s[0]
+            memcpy(&count,s + 1,4)
+            size = 1 if subtype in b"cC" else 2 if subtype in b"sS" else 4
+            s += 5 + size*count
+        else:
+            return NULL
+
+    return NULL
+
+cdef bint tag_to_int(uint8_t * aux, long * value):
+    """Read the value of an integer-valued `SAM`_ tag into `value`, given a
+    pointer from :func:`find_tag`. Return `False` if the tag is not integer-valued
+    """
+    cdef:
+        uint8_t type_code = aux[0]
+        int16_t v16
+        uint16_t u16
+        int32_t v32
+        uint32_t u32
+
+    if type_code == b"c":
+        value[0] = <int8_t>aux[1]
+    elif type_code == b"C":
+        value[0] = aux[1]
+    elif type_code == b"s":
+        memcpy(&v16,aux + 1,2)
+        value[0] = v16
+    elif type_code == b"S":
+        memcpy(&u16,aux + 1,2)
+        value[0] = u16
+    elif type_code == b"i":
+        memcpy(&v32,aux + 1,4)
+        value[0] = v32
+    elif type_code == b"I":
+        memcpy(&u32,aux + 1,4)
+        value[0] = u32
+    else:
+        return False
+
+    return True
+
+
+cdef class ReadFilter:
+    """
+    ReadFilter(min_length=0, max_length=-1, min_mapq=0, require_flags=0, exclude_flags=0, tag=None, tag_values=None)
+
+    Filter for read alignments, declared in terms of common alignment
+    properties. Like any other filter, a |ReadFilter| can be applied to a
+    |BAMGenomeArray| using :meth:`BAMGenomeArray.add_filter`. Unlike arbitrary
+    Python functions, |ReadFilters| are evaluated by |BAMGenomeArray| directly
+    on the underlying `BAM`_ records, without any Python calls per read.
+
+    Parameters
+    ----------
+    min_length : int, optional
+        Minimum number of aligned positions in read, inclusive (Default: `0`,
+        no minimum)
+
+    max_length : int, optional
+        Maximum number of aligned positions in read, inclusive. If `-1`,
+        there is no maximum (Default: `-1`)
+
+    min_mapq : int, optional
+        Minimum mapping quality, inclusive (Default: `0`)
+
+    require_flags : int, optional
+        Bitmask of `SAM`_ flags that must all be set (Default: `0`)
+
+    exclude_flags : int, optional
+        Bitmask of `SAM`_ flags that must not be set. e.g. `0x100` excludes
+        secondary alignments (Default: `0`)
+
+    tag : str, optional
+        Two-letter name of a `SAM`_ tag that must be present, e.g. `'NH'`
+        (Default: `None`, no tag requirement)
+
+    tag_values : collection, optional
+        If not `None`, value(s) of `tag` that pass the filter, e.g. `{1}`
+        to include only uniquely-aligned reads with an `NH` tag
+        (Default: `None`, any value)
+
+    Examples
+    --------
+    Count only primary alignments of 26-30 nt reads with mapping quality
+    of at least 10::
+
+        >>> ga.add_filter("good_reads",ReadFilter(min_length=26,max_length=30,
+                                                  min_mapq=10,exclude_flags=0x900))
+    """
+
+    def __init__(self, int min_length = 0, int max_length = -1, int min_mapq = 0,
+                 int require_flags = 0, int exclude_flags = 0, object tag = None,
+                 object tag_values = None):
+        if min_length < 0:
+            raise ValueError("ReadFilter: `min_length` must be >= 0. Got %s" % min_length)
+
+        if max_length != -1 and max_length < min_length:
+            raise ValueError("ReadFilter: `max_length` must be >= `min_length`")
+
+        if tag is not None and len(tag) != 2:
+            raise ValueError("ReadFilter: `tag` must be a two-letter SAM tag name. Got '%s'" % tag)
+
+        if tag_values is not None and tag is None:
+            raise ValueError("ReadFilter: `tag_values` requires `tag`.")
+
+        self.min_length    = min_length
+        self.max_length    = max_length
+        self.min_mapq      = min_mapq
+        self.require_flags = require_flags
+        self.exclude_flags = exclude_flags
+        self.tag           = tag
+        self.tag_values    = None if tag_values is None else frozenset(tag_values)
+        self._tag          = None if tag is None else tag.encode("ascii")
+        self._check_length = min_length > 0 or max_length != -1
+
+    def __reduce__(self):
+        return (ReadFilter,(self.min_length,self.max_length,self.min_mapq,
+                            self.require_flags,self.exclude_flags,self.tag,self.tag_values))
+
+    def __repr__(self):
+        return "<%s min_length=%s max_length=%s min_mapq=%s require_flags=%s exclude_flags=%s tag=%s tag_values=%s>" % \
+               (self.__class__.__name__,self.min_length,self.max_length,self.min_mapq,
+                self.require_flags,self.exclude_flags,self.tag,self.tag_values)
+
+    cdef bint check(self, AlignedSegment read):
+        """Return `True` if `read` passes the filter"""
+        cdef:
+            bam1_t * b = read._delegate
+            uint16_t flag = b.core.flag
+            uint8_t * aux
+            long int_value
+            int length
+            object value
+
+        if b.core.qual < self.min_mapq:
+            return False
+
+        if flag & self.require_flags != self.require_flags or flag & self.exclude_flags:
+            return False
+
+        if self._check_length:
+            length = aligned_length(b)
+            if length < self.min_length or (self.max_length != -1 and length > self.max_length):
+                return False
+
+        if self._tag is not None:
+            aux = find_tag(b,<char *>self._tag)
+            if aux == NULL:
+                return False
+
+            if self.tag_values is not None:
+                if tag_to_int(aux,&int_value):
+                    value = int_value
+                else:
+                    value = read.get_tag(self.tag)
+
+                return value in self.tag_values
+
+        return True
+
+    def __call__(self, AlignedSegment read not None):
+        return self.check(read)
+
+
+cdef class SizeFilterFactory(ReadFilter):
     """
     SizeFilterFactory(min = 1, max = -1)
     
     Create a read-length filter can be applied at runtime to a |BAMGenomeArray|
-    using ::meth:`BAMGenomeArray.add_filter`
+    using ::meth:`BAMGenomeArray.add_filter`. This is a |ReadFilter|, and so
+    is evaluated without Python calls per read.
     
     Parameters
     ----------
@@ -790,7 +1018,7 @@ cdef class SizeFilterFactory:
         then there is no maximum length filter. (Default: -1, no filter)
     """
 
-    def __cinit__(self,int min = 1, int max = -1):
+    def __init__(self,int min = 1, int max = -1):
         """Create a read-length filter can be applied at runtime to a |BAMGenomeArray|
         using ::meth:`BAMGenomeArray.add_filter`
         
@@ -813,10 +1041,67 @@ cdef class SizeFilterFactory:
         if min < 1:
             raise ValueError("Alignment size filter: min read length must be >= 1. Got %s" % min)
 
-        self.min_ = min
-        self.max_ = max
-        
-    def __call__(self,AlignedSegment read not None):
-        cdef unsigned int my_length = len(read.positions)
-        return my_length >= self.min_ and (my_length <= self.max_ or self.max_ == -1)
+        ReadFilter.__init__(self,min_length=min,max_length=max)
+
+    def __reduce__(self):
+        return (SizeFilterFactory,(self.min_length,self.max_length))
+
+
+def filter_reads(list reads not None, str strand, list filters not None):
+    """Select read alignments on a given strand that pass all filters.
+    |ReadFilters| are evaluated directly on `BAM`_ records, before any other
+    filters, which are called as Python functions.
 
+    Parameters
+    ----------
+    reads : list
+        Read alignments, as :class:`pysam.AlignedSegment`
+
+    strand : str
+        Strand of reads to keep: `'+'`, `'-'`, or `'.'` for both
+
+    filters : list
+        Filter functions and/or |ReadFilters|. Each must take a
+        :class:`pysam.AlignedSegment` and return `True` if that read
+        should be kept
+
+    Returns
+    -------
+    list
+        Read alignments that pass all filters
+    """
+    cdef:
+        list reads_out = []
+        list compiled  = [X for X in filters if isinstance(X,ReadFilter)]
+        list other     = [X for X in filters if not isinstance(X,ReadFilter)]
+        int  want_reverse = -1
+        bint keep
+        AlignedSegment read
+        ReadFilter my_filter
+        object other_filter
+
+    if strand == "+":
+        want_reverse = 0
+    elif strand == "-":
+        want_reverse = 1
+
+    for read in reads:
+        if want_reverse != -1 and (read._delegate.core.flag & 0x10 != 0) != want_reverse:
+            continue
+
+        keep = True
+        for my_filter in compiled:
+            if not my_filter.check(read):
+                keep = False
+                break
+
+        if keep:
+            for other_filter in other:
+                if not other_filter(read):
+                    keep = False
+                    break
+
+        if keep:
+            reads_out.append(read)
+
+    return reads_out
@@ -36,6 +36,9 @@ cpdef list merge_segments(list)
 
 # Various internals used by SegmentChain/Transcript
 cdef void nonecheck(object,str, str)
+cdef tuple pack_segments(SegmentChain)
+cdef list coords_to_segments(str, str, list)
+cdef tuple get_segment_arrays(SegmentChain)
 cdef bint check_segments(SegmentChain, tuple) except False
 cdef ExBool chain_richcmp(SegmentChain, SegmentChain, int) except bool_exception
 cdef ExBool transcript_richcmp(Transcript, Transcript, int) except bool_exception
@@ -45,8 +48,11 @@ cdef ExBool transcript_richcmp(Transcript, Transcript, int) except bool_exceptio
 cdef dict get_attr_from_bed_column_tuples(list, int, int, list)
 cdef dict get_attr_from_bed_column_names(list, int, list)
 cdef dict get_attr_from_bed_column_number(list, int, int)
+cdef object get_bed_column(list, int, object, object)
+cdef str get_bed_color(str)
 cdef dict get_standard_bed_attr(list, int)
 cdef dict get_attr_from_bed(str line,object extra_columns=*)
+cdef array.array get_bed_block_list(str, int)
 cdef list get_segments_from_bed(dict attr)
 
 
@@ -119,7 +125,12 @@ cdef class SegmentChain(object):                       # >= 836 bytes
 cdef class Transcript(SegmentChain):
     cdef:
         object cds_genome_start, cds_genome_end, cds_start, cds_end
+        dict _derived
 
+    cdef bint _set_segments(self,list) except False
+    cdef bint _set_masks(self,list) except False
+    cdef void c_reset_masks(self)
+    cdef void _clear_derived(self)
     cdef bint _update_cds(self) except False
     cdef bint _update_from_cds_start(self) except False
     cdef bint _update_from_cds_end(self) except False
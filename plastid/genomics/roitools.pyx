@@ -152,6 +152,10 @@ from plastid.genomics.c_common cimport ExBool, true, false, bool_exception, \
 cdef hash_template = array.array('l',[]) # c signed long / python int
 cdef mask_template = array.array('i',[]) # TODO: change to c unsigned char / python int
 
+# cache of BED color strings to hex representations
+cdef dict _BED_COLOR_CACHE = {}
+cdef int _BED_COLOR_CACHE_SIZE = 1024
+
 
 # to/from str
 igvpat = re.compile(r"([^:]*):([0-9]+)-([0-9]+)")
@@ -510,16 +514,41 @@ cdef dict get_attr_from_bed_column_number(list items, int num_bed_columns, int n
     attr["_bedx_column_order"] = xorder
     return attr
 
+cdef object get_bed_column(list items, int i, object func, object default):
+    """Format column `i` of a `BED`_ line with `func`, falling back to `default`
+    if the column is absent or cannot be parsed"""
+    try:
+        return func(items[i])
+    except IndexError:
+        # fall back to default value if real value isn't present
+        return default
+    except ValueError:
+        # fall back to default value if real value cannot be parsed
+        warn("get_standard_bed_attr: Could not format column %s with '%s'. Falling back to default value '%s'." % (items[i],str(func.__name__),default),DataWarning)
+        return default
+
+cdef str get_bed_color(str color):
+    """Convert a `BED`_ RGB color string (e.g. '255,0,0') to a hex string.
+    BED files typically use few colors, so conversions are cached."""
+    cdef object val = _BED_COLOR_CACHE.get(color)
+    if val is None:
+        try:
+            val = get_str_from_rgb255(tuple([int(X) for X in color.split(",")]))
+        except ValueError:
+            val = "#000000"
+
+        if len(_BED_COLOR_CACHE) < _BED_COLOR_CACHE_SIZE:
+            _BED_COLOR_CACHE[color] = val
+
+    return val
+
 cdef dict get_standard_bed_attr(list items, int num_bed_columns):
     """Get SegmentChain attributes from standard BED columns in `BED`_ line"""
     cdef:
-        str     chrom, strand, default_id
-        long    chrom_start, thickstart, thickend
-        str     KEY
-        object  DEFAULT, _
-        tuple   tup
-        int     i
-        dict    attr, _default_bed_columns
+        str     chrom, strand
+        long    chrom_start, chrom_end
+        object  thickstart, thickend
+        dict    attr
 
     if num_bed_columns < 3:
         raise ValueError("BED format requires at least 3 columns. Found only %s.\n\t    %s" % (num_bed_columns,items))
@@ -528,50 +557,19 @@ cdef dict get_standard_bed_attr(list items, int num_bed_columns):
     strand        = "." if num_bed_columns < 6 else items[5]
     chrom_start   = long(items[1])
     chrom_end     = long(items[2])
-    
-    default_id  = "%s:%s-%s(%s)" % (chrom,chrom_start,chrom_end,strand)
-
-    _default_bed_columns = {
-        3 :  ("ID",         default_id,                  str),
-        4 :  ("score",      numpy.nan,                   float),
-        #5 :  ("strand",    ".", strand),
-        6 :  ("thickstart", -1,                          long),
-        7 :  ("thickend",   -1,                          long),
-        8 :  ("color",      "0,0,0",                     str),
-        9 :  ("blocks",     "1",                         int),
-        10 : ("blocksizes", str(chrom_end - chrom_start),str),
-        11 : ("blockstarts","0",                         str),
-    }
-
-    # dict mapping optional bed column to tuple of (Name,default value)
-    # these values are used if any optional columns 4-12 are ommited
-    # set attr defaults in case we're dealing with BED4-BED9 format
-    attr = { KEY : DEFAULT for KEY,DEFAULT,_ in _default_bed_columns.values() }
-
-    for i in (3,4,6,7,8,9,10,11):
-        # populate attr with real values from BED columns that are present
-        if i >= num_bed_columns:
-            break
-        
-        tup = _default_bed_columns[i]
-        key     = tup[0]
-        default = tup[1]
-        func    = tup[2]
-        try:
-            attr[key] = func(items[i])
-        except IndexError:
-            # fall back to default value if real value isn't present
-            attr[key] = default
-        except ValueError:
-            # fall back to default value if real value cannot be parsed
-            warn("get_standard_bed_attr: Could not format column %s with '%s'. Falling back to default value '%s'." % (items[i],str(func.__name__),default),DataWarning)
-            attr[key] = default
 
-    # convert color to hex string
-    try:
-        attr["color"] = get_str_from_rgb255(tuple([int(X) for X in attr["color"].split(",")]))
-    except ValueError:
-        attr["color"] = "#000000"
+    # populate attr with real values from BED columns that are present,
+    # and defaults for optional columns 4-12 that are omitted.
+    # key order matches the order of columns in the BED spec
+    attr = {}
+    attr["ID"]          = items[3] if num_bed_columns > 3 else "%s:%s-%s(%s)" % (chrom,chrom_start,chrom_end,strand)
+    attr["score"]       = get_bed_column(items,4,float,numpy.nan) if num_bed_columns > 4 else numpy.nan
+    attr["thickstart"]  = get_bed_column(items,6,long,-1) if num_bed_columns > 6 else -1
+    attr["thickend"]    = get_bed_column(items,7,long,-1) if num_bed_columns > 7 else -1
+    attr["color"]       = get_bed_color(items[8] if num_bed_columns > 8 else "0,0,0")
+    attr["blocks"]      = get_bed_column(items,9,int,"1") if num_bed_columns > 9 else "1"
+    attr["blocksizes"]  = items[10] if num_bed_columns > 10 else str(chrom_end - chrom_start)
+    attr["blockstarts"] = items[11] if num_bed_columns > 11 else "0"
 
     # sanity check on thickstart and thickend
     thickstart = attr["thickstart"]
@@ -663,6 +661,55 @@ cdef dict get_attr_from_bed(str line,object extra_columns=0):
     
     return attr
 
+cdef array.array get_bed_block_list(str inp, int num_blocks):
+    """Parse the first `num_blocks` integers from the comma-separated
+    `blockSizes` or `blockStarts` column of a `BED`_ line, without
+    creating intermediate Python objects.
+
+    Raises
+    ------
+    IndexError
+        If `inp` contains fewer than `num_blocks` values
+
+    ValueError
+        If values cannot be parsed as integers
+    """
+    cdef:
+        array.array out = array.clone(hash_template,num_blocks,False)
+        str         stripped = inp.strip(",")
+        list        ltmp
+        long        val = 0
+        int         i = 0
+        bint        have_digit = False
+        Py_UCS4     c
+
+    for c in stripped:
+        if c >= u"0" and c <= u"9":
+            val = val*10 + (<long>c - 48)
+            have_digit = True
+        elif c == u"," and have_digit == True:
+            if i < num_blocks:
+                out.data.as_longs[i] = val
+            i += 1
+            val = 0
+            have_digit = False
+        else: # signs, whitespace, empty values, et c
+            i = -1
+            break
+
+    if have_digit == True:
+        if i < num_blocks:
+            out.data.as_longs[i] = val
+        i += 1
+
+    if i < num_blocks:
+        # slow path, which also raises appropriate errors for malformed input
+        ltmp = stripped.split(",")
+        for i in range(num_blocks):
+            out.data.as_longs[i] = int(ltmp[i])
+
+    return out
+
 cdef list get_segments_from_bed(dict attr):
     """Construct a list of |GenomicSegments| given a dictionary of attributes,
     as made from :meth:`get_attr_from_bed` or other methods above. i.e.
@@ -674,15 +721,17 @@ cdef list get_segments_from_bed(dict attr):
         str  strand      = attr["strand"]
         list segments    = []
         long chrom_start = attr["chrom_start"]
+        int  num_frags   = int(attr["blocks"])
+        long seg_start
+        int  i
+        array.array seg_sizes, seg_offsets
         
     # convert blocks to GenomicSegments
-    num_frags   = int(attr["blocks"])
-    seg_sizes   = attr["blocksizes"].strip(",").split(",")
-    seg_offsets = attr["blockstarts"].strip(",").split(",")
-    for i in range(0,num_frags):
-        seg_start = chrom_start + int(seg_offsets[i])
-        seg_end   = seg_start   + int(seg_sizes[i])
-        segments.append(GenomicSegment(chrom,seg_start,seg_end,strand))
+    seg_sizes   = get_bed_block_list(attr["blocksizes"],num_frags)
+    seg_offsets = get_bed_block_list(attr["blockstarts"],num_frags)
+    for i in range(num_frags):
+        seg_start = chrom_start + seg_offsets.data.as_longs[i]
+        segments.append(GenomicSegment(chrom,seg_start,seg_start + seg_sizes.data.as_longs[i],strand))
 
     # clean up attr
     for key in ("blocks","blocksizes","blockstarts","chrom_start","strand","chrom"):
@@ -695,6 +744,51 @@ cdef list get_segments_from_bed(dict attr):
 # Helpers
 #==============================================================================
 
+cdef tuple pack_segments(SegmentChain chain):
+    """Pack segments and masks of `chain` for pickling
+
+    Returns
+    -------
+    tuple
+        `(chrom, strand, coords, mask_coords)`, where `coords` and `mask_coords`
+        are flat lists of start and end coordinates of each segment or mask,
+        and `chrom` and `strand` are `None` if `chain` has no segments
+    """
+    cdef:
+        GenomicSegment seg
+        list coords      = []
+        list mask_coords = []
+        str  chrom       = None
+        str  strand      = None
+
+    if len(chain._segments) > 0:
+        chrom  = chain.spanning_segment.chrom
+        strand = strand_to_str(chain.spanning_segment.c_strand)
+
+    for seg in chain._segments:
+        coords.append(seg.start)
+        coords.append(seg.end)
+
+    if chain._mask_segments is not None:
+        for seg in chain._mask_segments:
+            mask_coords.append(seg.start)
+            mask_coords.append(seg.end)
+
+    return (chrom, strand, coords, mask_coords)
+
+cdef list coords_to_segments(str chrom, str strand, list coords):
+    """Create |GenomicSegments| from a flat list of start and end coordinates,
+    as made by :func:`pack_segments`
+    """
+    cdef:
+        list segments = []
+        int  i
+
+    for i in range(0,len(coords),2):
+        segments.append(GenomicSegment(chrom,coords[i],coords[i+1],strand))
+
+    return segments
+
 cdef void nonecheck(object obj,str place, str valname):
     """Propagate errors if incoming objects are None"""
     if obj is None:
@@ -738,6 +832,26 @@ cdef bint check_segments(SegmentChain chain, tuple segments) except False:
 
     return True
 
+cdef tuple get_segment_arrays(SegmentChain chain):
+    """Return arrays of segment start coordinates, end coordinates, and
+    cumulative length of the segments preceding each segment in `chain`
+    """
+    cdef:
+        GenomicSegment seg
+        long num_segs = len(chain._segments)
+        long i = 0
+
+    starts = numpy.empty(num_segs,dtype="l")
+    ends   = numpy.empty(num_segs,dtype="l")
+    for seg in chain._segments:
+        starts[i] = seg.start
+        ends[i]   = seg.end
+        i += 1
+
+    cum = numpy.zeros(num_segs + 1,dtype="l")
+    numpy.cumsum(ends - starts,out=cum[1:])
+    return starts, ends, cum
+
 cdef ExBool chain_richcmp(SegmentChain chain1, SegmentChain chain2, int cmpval) except bool_exception:
     """Helper method for rich comparisons (==, !=, <, >, <=, >=) of |SegmentChains|
 
@@ -1471,22 +1585,24 @@ cdef class SegmentChain(object):
         return (self.__class__,tuple(),self.__getstate__())
 
     def __getstate__(self): # save state for pickling
-        cdef:
-            list segstrs  = [str(X) for X in self._segments]
-            list maskstrs = []
-            dict attr = self.attr
-
-        if self._mask_segments is not None:
-            maskstrs = [str(X) for X in self._mask_segments]
-
-
-        return (segstrs,maskstrs,attr)
+        # segment coordinates are saved as flat lists of ints, which pickle
+        # far more compactly than lists of GenomicSegments or their strings
+        return pack_segments(self) + (self.attr,)
 
     def __setstate__(self,state): # revive state from pickling
         cdef:
-            list segs  = [GenomicSegment.from_str(X) for X in state[0]]
-            list masks = [GenomicSegment.from_str(X) for X in state[1]]
-            dict attr = state[2]
+            list segs, masks
+            dict attr
+
+        if isinstance(state[0],list):
+            # state saved by earlier versions of plastid, as segment strings
+            segs  = [GenomicSegment.from_str(X) for X in state[0]]
+            masks = [GenomicSegment.from_str(X) for X in state[1]]
+            attr  = state[2]
+        else:
+            segs  = coords_to_segments(state[0],state[1],state[2])
+            masks = coords_to_segments(state[0],state[1],state[3])
+            attr  = state[4]
 
         self.attr = attr
         self._set_segments(segs)
@@ -2898,10 +3014,12 @@ cdef class SegmentChain(object):
             GenomicSegment seg
             str msg
 
-        msg = "SegmentChain.get_segmentchain_coordinate: genomic position '%s' is not in chain '%s'.\n" % (genomic_x,self)
+        # error message is only formatted if needed, because formatting `self`
+        # is costly relative to the search itself
+        msg = "SegmentChain.get_segmentchain_coordinate: genomic position '%s' is not in chain '%s'.\n"
 
         if genomic_x < span.start:
-            raise KeyError(msg)
+            raise KeyError(msg % (genomic_x,self))
 
         while i < num_segs:
             seg = self._segments[i]
@@ -2915,10 +3033,10 @@ cdef class SegmentChain(object):
                     return retval
                 # because segments are sorted, if < end but not >= start,
                 # key must be outside bounds of chain
-                raise KeyError(msg) 
+                raise KeyError(msg % (genomic_x,self)) 
             i += 1
 
-        raise KeyError(msg)
+        raise KeyError(msg % (genomic_x,self))
 
     def get_genomic_coordinate(self,x,stranded=True):
         """Finds genomic coordinate corresponding to position `x` in `self`
@@ -3024,6 +3142,123 @@ cdef class SegmentChain(object):
         
         raise IndexError(msg)
 
+    def get_genomic_coordinates(self, object positions, bint stranded=True):
+        """Finds genomic coordinates corresponding to many positions in `self`
+        at once, as in :meth:`SegmentChain.get_genomic_coordinate`
+        
+        Parameters
+        ----------
+        positions : array-like
+            Positions of interest, relative to |SegmentChain|
+            
+        stranded : bool, optional
+            If `True`, `positions` are assumed to be in stranded space (i.e. counted from
+            5' end of chain, as one might expect for a transcript). If `False`,
+            coordinates assumed to be counted the left end of the `self`,
+            regardless of the strand of `self`. (Default: `True`)
+
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Genomic coordinate corresponding to each position, with the same
+            shape as `positions`
+
+
+        Raises
+        ------
+        IndexError
+            if any position is outside the bounds of the |SegmentChain|
+
+
+        See also
+        --------
+        ChainTable.get_genomic_coordinates
+            Conversion of positions in many |SegmentChains| at once
+        """
+        cdef:
+            long length = self.length
+            object starts, ends, cum
+
+        x = numpy.asarray(positions,dtype="l")
+        if ((x < 0) | (x >= length)).any():
+            raise IndexError("Positions must be within bounds [0,%s) of SegmentChain '%s'" % (length,self.get_name()))
+
+        if x.size == 0:
+            return x.copy()
+
+        if self.c_strand == reverse_strand and stranded == True:
+            x = length - x - 1
+
+        starts, ends, cum = get_segment_arrays(self)
+        k = numpy.searchsorted(cum,x,side="right") - 1
+        return starts[k] + x - cum[k]
+
+    def get_segmentchain_coordinates(self, str chrom, object positions, str strand, bint stranded=True):
+        """Finds |SegmentChain| coordinates corresponding to many genomic positions
+        at once, as in :meth:`SegmentChain.get_segmentchain_coordinate`
+        
+        Parameters
+        ----------
+        chrom : str
+            Chromosome name
+            
+        positions : array-like
+            Coordinates, in genomic space
+            
+        strand : str
+            Chromosome strand (`'+'`, `'-'`, or `'.'`)
+            
+        stranded : bool, optional
+            If `True`, coordinates are given in stranded space
+            (i.e. from 5' end of chain, as one might expect for a transcript).
+            If `False`, coordinates are given from the left end of `self`,
+            regardless of strand. (Default: `True`)
+        
+        
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Position in |SegmentChain| of each genomic coordinate, or `-1`
+            for coordinates outside the |SegmentChain|. Has the same shape
+            as `positions`
+
+
+        Raises
+        ------
+        ValueError
+            if `chrom` or `strand` do not match those of `self`
+
+
+        See also
+        --------
+        ChainTable.get_segmentchain_coordinates
+            Conversion of coordinates in many |SegmentChains| at once
+        """
+        cdef:
+            object starts, ends, cum
+
+        if chrom != self.chrom:
+            raise ValueError("get_segmentchain_coordinates: query chromosome '%s' does not match chain '%s'" % (chrom,self))
+        if strand != self.strand:
+            raise ValueError("get_segmentchain_coordinates: query strand '%s' does not match chain '%s'" % (strand,self))
+
+        g   = numpy.asarray(positions,dtype="l")
+        out = numpy.full(g.shape,-1,dtype="l")
+        if len(self._segments) == 0 or g.size == 0:
+            return out
+
+        starts, ends, cum = get_segment_arrays(self)
+        k  = numpy.searchsorted(starts,g,side="right") - 1
+        kc = numpy.clip(k,0,None)
+        valid = (k >= 0) & (g < ends[kc])
+        x = cum[kc] + g - starts[kc]
+        if self.c_strand == reverse_strand and stranded == True:
+            x = self.length - x - 1
+
+        out[valid] = x[valid]
+        return out
+
     def get_subchain(self, long start, long end, bint stranded=True, **extra_attr):
         """Retrieves a sub-|SegmentChain| corresponding a range of positions
         specified in coordinates relative this |SegmentChain|. Attributes in
@@ -3502,6 +3737,10 @@ cdef class Transcript(SegmentChain):
         (note: for minus-strand features this will be lower in genomic coordinates
         than `cds_start`).
 
+    cache_derived : bool
+        If `True`, subchains returned by :meth:`get_cds`, :meth:`get_utr5`
+        and :meth:`get_utr3` are built once and reused. (Default: `False`)
+
     spanning_segment : |GenomicSegment|
         A GenomicSegment spanning the endpoints of the Transcript
 
@@ -3603,22 +3842,23 @@ cdef class Transcript(SegmentChain):
         return (Transcript,tuple(),self.__getstate__())
 
     def __getstate__(self): # pickle state
-        cdef:
-            list segstrs  = [str(X) for X in self._segments]
-            list maskstrs = []
-            dict attr = self.attr
-        if self._mask_segments is not None:
-            maskstrs = [str(X) for X in self._mask_segments]
-
-        return (segstrs, maskstrs, attr, self.cds_genome_start, self.cds_genome_end)
+        return pack_segments(self) + (self.attr, self.cds_genome_start, self.cds_genome_end)
 
     def __setstate__(self,state): # revive state from pickling
         cdef:
-            list segs  = [GenomicSegment.from_str(X) for X in state[0]]
-            list masks = [GenomicSegment.from_str(X) for X in state[1]]
-            dict attr = state[2]
-            object gstart = state[3]
-            object gend = state[4]
+            list segs, masks
+            dict attr
+            object gstart, gend
+
+        if isinstance(state[0],list):
+            # state saved by earlier versions of plastid, as segment strings
+            segs  = [GenomicSegment.from_str(X) for X in state[0]]
+            masks = [GenomicSegment.from_str(X) for X in state[1]]
+            attr, gstart, gend = state[2:]
+        else:
+            segs  = coords_to_segments(state[0],state[1],state[2])
+            masks = coords_to_segments(state[0],state[1],state[3])
+            attr, gstart, gend = state[4:]
 
         self.attr = attr
         self._set_segments(segs)
@@ -3655,6 +3895,45 @@ cdef class Transcript(SegmentChain):
         else:
             raise TypeError("SegmentChain eq/ineq/et c is only defined for other SegmentChains or GenomicSegments.")
 
+    cdef bint _set_segments(self, list segments) except False:
+        """Set `self._segments` as in :meth:`SegmentChain._set_segments`,
+        discarding any cached subchains
+        """
+        self._clear_derived()
+        return SegmentChain._set_segments(self,segments)
+
+    cdef bint _set_masks(self, list segments) except False:
+        """Set `self._mask_segments` as in :meth:`SegmentChain._set_masks`,
+        discarding any cached subchains
+        """
+        self._clear_derived()
+        return SegmentChain._set_masks(self,segments)
+
+    cdef void c_reset_masks(self):
+        """Reset masks as in :meth:`SegmentChain.c_reset_masks`,
+        discarding any cached subchains
+        """
+        self._clear_derived()
+        SegmentChain.c_reset_masks(self)
+
+    cdef void _clear_derived(self):
+        """Discard subchains cached by :meth:`get_cds`, :meth:`get_utr5` and :meth:`get_utr3`"""
+        if self._derived is not None:
+            self._derived.clear()
+
+    property cache_derived:
+        """If `True`, :meth:`get_cds`, :meth:`get_utr5` and :meth:`get_utr3`
+        build their subchains once and return the same objects on later calls,
+        until segments, masks, or coding region boundaries of `self` change.
+        Cached subchains are shared between callers and should not be modified.
+        They are not updated if `self.attr` changes, and are bypassed when extra
+        attributes are passed to these methods. (Default: `False`)
+        """
+        def __get__(self):
+            return self._derived is not None
+        def __set__(self, bint val):
+            self._derived = {} if val == True else None
+
     property cds_start:
         """Start of coding region relative to 5' end of transcript, in direction of transcript.
         Setting to None also sets `self.cds_end`, `self.cds_genome_start` and
@@ -3669,6 +3948,7 @@ cdef class Transcript(SegmentChain):
                     raise ValueError("Transcript '%s': cds_start (%s) must be <= cds_end (%s)" % (self,val,end))
                 if val < 0:
                     raise ValueError("Transcript '%s': cds_start (%s) must be >= 0" % (self,val))
+            self._clear_derived()
             self.cds_start = val
             if val is None:
                 self.cds_end = None
@@ -3691,6 +3971,7 @@ cdef class Transcript(SegmentChain):
                     raise ValueError("Transcript '%s': cds_end (%s) must be >= cds_start (%s)" % (self,val,start))
                 if val > self.length:
                     raise ValueError("Transcript '%s': cds_end (%s) must be <= self.length (%s)" % (self,val,self.length))
+            self._clear_derived()
             self.cds_end = val
             if val is None:
                 self.cds_start = None
@@ -3712,6 +3993,7 @@ cdef class Transcript(SegmentChain):
             if val is not None and end is not None:
                 if val > end:
                     raise ValueError("Transcript '%s': cds_genome_start (%s) must be <= cds_genome_end (%s)" % (self,val,end))
+            self._clear_derived()
             self.cds_genome_start = val
             if val is None:
                 self.cds_genome_end = None
@@ -3733,6 +4015,7 @@ cdef class Transcript(SegmentChain):
             if val is not None and start is not None:
                 if val < start:
                     raise ValueError("Transcript '%s': cds_genome_end (%s) must be >= cds_genome_start (%s)" % (self,val,start))
+            self._clear_derived()
             self.cds_genome_end = val
             if val is None:
                 self.cds_genome_start = None
@@ -3886,9 +4169,14 @@ cdef class Transcript(SegmentChain):
         """
         cdef:
             SegmentChain chain
-            Transcript   transcript = Transcript()
+            Transcript   transcript
             dict         attr       = {}
+            bint         use_cache  = self._derived is not None and len(extra_attr) == 0
 
+        if use_cache == True and "cds" in self._derived:
+            return self._derived["cds"]
+
+        transcript = Transcript()
         if self.cds_genome_start is not None and self.cds_genome_end is not None:
             chain = self.c_get_subchain(self.cds_start,
                                         self.cds_end,
@@ -3904,7 +4192,10 @@ cdef class Transcript(SegmentChain):
             transcript.cds_genome_start = self.cds_genome_start
             transcript.cds_genome_end   = self.cds_genome_end
             transcript._update_cds()
-            
+
+        if use_cache == True:
+            self._derived["cds"] = transcript
+
         return transcript
     
     def get_utr5(self,**extra_attr):
@@ -3933,6 +4224,10 @@ cdef class Transcript(SegmentChain):
         cdef:
             SegmentChain my_segmentchain
             dict attr = {}
+            bint use_cache = self._derived is not None and len(extra_attr) == 0
+
+        if use_cache == True and "utr5" in self._derived:
+            return self._derived["utr5"]
 
         if self.cds_genome_start is not None and self.cds_genome_end is not None:
 
@@ -3943,10 +4238,13 @@ cdef class Transcript(SegmentChain):
             attr["ID"] = "%s_5UTR" % self.get_name()
             my_segmentchain.attr = attr
             my_segmentchain.attr.update(extra_attr)
-
-            return my_segmentchain
         else:
-            return SegmentChain()
+            my_segmentchain = SegmentChain()
+
+        if use_cache == True:
+            self._derived["utr5"] = my_segmentchain
+
+        return my_segmentchain
     
     def get_utr3(self,**extra_attr):
         """Retrieve sub-|SegmentChain| covering 3'UTR of `self`, excluding
@@ -3974,6 +4272,10 @@ cdef class Transcript(SegmentChain):
         cdef:
             SegmentChain my_segmentchain
             dict attr = {}
+            bint use_cache = self._derived is not None and len(extra_attr) == 0
+
+        if use_cache == True and "utr3" in self._derived:
+            return self._derived["utr3"]
 
         if self.cds_genome_start is not None and self.cds_genome_end is not None:
 
@@ -3984,10 +4286,13 @@ cdef class Transcript(SegmentChain):
             attr["ID"] = "%s_3UTR" % self.get_name()
             my_segmentchain.attr.update(attr)
             my_segmentchain.attr.update(extra_attr)
-
-            return my_segmentchain  
         else:
-            return SegmentChain()
+            my_segmentchain = SegmentChain()
+
+        if use_cache == True:
+            self._derived["utr3"] = my_segmentchain
+
+        return my_segmentchain
 
     def as_gtf(self, str feature_type="exon", bint escape=True, list excludes=None):
         """Format `self` as a `GTF2`_ block. |GenomicSegments| are formatted
@@ -0,0 +1,576 @@
+"""Bulk export of |SegmentChains| and |Transcripts| to `BED`_ and `GTF2`_ files
+
+:meth:`SegmentChain.as_bed` and :meth:`SegmentChain.as_gtf` format one feature
+per call, and recompute values that are shared by many features, or by all of
+the lines exported for a single feature. The writers in this module produce
+identical output, but:
+
+  - format the attribute column of `GTF2`_ output once per feature, rather
+    than once per exon
+
+  - cache escaped attribute keys and values, and `BED`_ color strings, which
+    are typically shared by many features
+
+  - build lines for blocks of features, and write each block with a single
+    call to the output stream
+
+  - when given a |ChainTable|, format `BED`_ lines directly from its columns,
+    creating |SegmentChain| objects only for rows whose attributes require it
+
+Features of types other than |SegmentChain| and |Transcript| (e.g. user-defined
+subclasses) are exported using their own `as_bed()` and `as_gtf()` methods.
+
+Module contents
+---------------
+
+.. autosummary::
+
+   write_bed
+   write_gtf
+
+Examples
+--------
+Export transcripts from a `GTF2`_ file as `BED`_::
+
+    >>> transcripts = GTF2_TranscriptAssembler("some_file.gtf")
+    >>> with open("some_file.bed","w") as fout:
+    >>>     write_bed(transcripts,fout)
+
+Export a |ChainTable| as `BED`_, without creating a |Transcript| for each row::
+
+    >>> table = BED_Reader("some_file.bed",return_type=Transcript).read_table()
+    >>> with open("copy.bed","w") as fout:
+    >>>     write_bed(table,fout)
+
+See also
+--------
+:meth:`SegmentChain.as_bed`, :meth:`Transcript.as_bed`
+    Format a single feature as a `BED`_ line
+
+:meth:`SegmentChain.as_gtf`, :meth:`Transcript.as_gtf`
+    Format a single feature as a block of `GTF2`_ lines
+"""
+from plastid.plotting.colors import get_rgb255
+from plastid.readers.gff_tokens import escape_GTF2, make_GTF2_tokens
+
+from plastid.genomics.c_common cimport Strand, strand_to_str
+from plastid.genomics.roitools cimport GenomicSegment, SegmentChain, Transcript
+from plastid.genomics.chain_table cimport ChainTable
+
+
+# attributes never exported to column 9 of GTF2 output, as in SegmentChain.as_gtf
+_GTF2_ALWAYS_EXCLUDED = ("source",
+                         "Parent",
+                         "score",
+                         "phase",
+                         "cds_genome_start",
+                         "cds_genome_end",
+                         "thickstart",
+                         "thickend",
+                         "type",
+                         "color",
+                         "_bedx_column_order")
+
+# maximum number of escaped strings or colors remembered by each writer
+cdef int _CACHE_SIZE = 100000
+
+# placeholder for attributes absent from a ChainTable row
+cdef object _MISSING = object()
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+cdef str _format_bed_score(object score, bint as_int):
+    """Format a `BED`_ score as :meth:`SegmentChain.as_bed` does"""
+    try:
+        score = float(score)
+        if as_int == True:
+            score = int(round(score))
+    except ValueError:
+        score = 0
+    except TypeError:
+        score = 0
+
+    return str(score)
+
+cdef object _format_bed_color(object color, dict cache):
+    """Format a `BED`_ color as :meth:`SegmentChain.as_bed` does, or return
+    `None` if `color` is not a string, in which case the feature's own
+    `as_bed()` method should be used
+    """
+    cdef object val
+    if not isinstance(color,str):
+        return None
+
+    val = cache.get(color)
+    if val is None:
+        try:
+            val = "%s,%s,%s" % tuple(get_rgb255(color))
+        except ValueError:
+            val = color
+
+        if len(cache) < _CACHE_SIZE:
+            cache[color] = val
+
+    return val
+
+cdef str _format_bed_line(str chrom, long span_start, long span_end, object name, str score,
+                          str strand, object thickstart, object thickend, str color,
+                          list sizes, list starts, list extra):
+    """Join the columns of a `BED`_ line"""
+    cdef list ltmp = [chrom,
+                      str(span_start),
+                      str(span_end),
+                      str(name),
+                      score,
+                      strand,
+                      str(thickstart),
+                      str(thickend),
+                      color,
+                      str(len(sizes)),
+                      ",".join(sizes) + ",",
+                      ",".join(starts) + ","]
+    if len(extra) > 0:
+        ltmp.extend([str(X) for X in extra])
+
+    return "\t".join(ltmp) + "\n"
+
+cdef str _chain_as_bed(SegmentChain chain, bint as_int, object extra_columns, object empty_value, dict color_cache):
+    """Format `chain` as a `BED`_ line, as its `as_bed()` method would"""
+    cdef:
+        dict           attr = chain.attr
+        GenomicSegment span, seg
+        long           span_start
+        object         thickstart = None, thickend = None, color
+        list           sizes, starts
+
+    if len(chain._segments) == 0:
+        return ""
+
+    color = _format_bed_color(attr.get("color","#000000"),color_cache)
+    if color is None:
+        return chain.as_bed(as_int=as_int,extra_columns=extra_columns,empty_value=empty_value)
+
+    span = chain.spanning_segment
+    span_start = span.start
+    if isinstance(chain,Transcript):
+        thickstart = (<Transcript>chain).cds_genome_start
+        thickend   = (<Transcript>chain).cds_genome_end
+
+    thickstart = attr.get("thickstart",span_start) if thickstart is None else thickstart
+    thickend   = attr.get("thickend",span_start)   if thickend   is None else thickend
+
+    sizes  = []
+    starts = []
+    for seg in chain._segments:
+        sizes.append(str(seg.end - seg.start))
+        starts.append(str(seg.start - span_start))
+
+    if extra_columns is None:
+        extra_columns = attr.get("_bedx_column_order",[])
+
+    return _format_bed_line(span.chrom,
+                            span_start,
+                            span.end,
+                            chain.get_name(),
+                            _format_bed_score(attr.get("score",0),as_int),
+                            span.strand,
+                            thickstart,
+                            thickend,
+                            color,
+                            sizes,
+                            starts,
+                            [attr.get(X,empty_value) for X in extra_columns])
+
+cdef str _escape(object inp, dict cache):
+    """Escape `inp` for column 9 of `GTF2`_ output, remembering the result"""
+    cdef:
+        str    key = str(inp)
+        object val = cache.get(key)
+
+    if val is None:
+        val = escape_GTF2(key)
+        if len(cache) < _CACHE_SIZE:
+            cache[key] = val
+
+    return val
+
+cdef str _make_GTF2_tokens(object gene_id, object transcript_id, dict attr,
+                           object excludes, bint escape, dict cache):
+    """Format column 9 of `GTF2`_ output, as :func:`~plastid.readers.gff_tokens.make_GTF2_tokens`
+    would for `attr` with `gene_id` and `transcript_id` set to the values given
+
+    Parameters
+    ----------
+    excludes : set
+        Keys to exclude, including `gene_id` and `transcript_id`
+    """
+    cdef:
+        list ltmp = []
+        dict dtmp
+
+    if escape == False:
+        dtmp = dict(attr)
+        dtmp["gene_id"] = gene_id
+        dtmp["transcript_id"] = transcript_id
+        return make_GTF2_tokens(dtmp,excludes=list(excludes),escape=False)
+
+    for key, val in attr.items():
+        if key in excludes:
+            continue
+        if isinstance(val,list):
+            val = ",".join([_escape(X,cache) for X in val])
+        else:
+            val = _escape(val,cache)
+        ltmp.append('%s "%s"; ' % (_escape(key,cache),val))
+
+    return 'gene_id "%s"; transcript_id "%s"; ' % (gene_id,transcript_id) + "".join(ltmp).strip(" ")
+
+cdef object _get_gene(dict attr, object name):
+    """Return the gene name of a feature with attributes `attr` and name `name`,
+    as :meth:`SegmentChain.get_gene` would
+    """
+    gene = attr.get("gene_id",attr.get("Parent","gene_%s" % name))
+    if isinstance(gene,list):
+        gene = ",".join(sorted(gene))
+
+    return gene
+
+cdef int _append_gtf_lines(list out, list segments, dict attr, str feature_type, str tokens) except -1:
+    """Append a `GTF2`_ line for each segment in `segments`, as :meth:`SegmentChain.as_gtf`
+    would for a |SegmentChain| with attributes `attr`
+    """
+    cdef:
+        GenomicSegment seg
+        str    source = str(attr.get("source","."))
+        str    score  = str(attr.get("score","."))
+        str    phase  = "."
+        bint   is_cds = feature_type == "CDS"
+        bint   use_attr_phase = is_cds and len(segments) == 1 and ("phase" in attr or "frame" in attr)
+        long   cumlength = 0
+
+    if use_attr_phase == True:
+        phase = str(attr.get("phase",attr.get("frame")))
+
+    for seg in segments:
+        if is_cds == True and use_attr_phase == False:
+            phase = str((3 - (cumlength % 3)) % 3)
+
+        out.append("\t".join([seg.chrom,
+                              source,
+                              feature_type,
+                              str(seg.start + 1),
+                              str(seg.end),
+                              score,
+                              seg.strand,
+                              phase,
+                              tokens]) + "\n")
+        cumlength += seg.end - seg.start
+
+    return 0
+
+cdef int _append_chain_gtf(list out, SegmentChain chain, object excludes, bint escape, dict cache) except -1:
+    """Append `GTF2`_ lines for `chain`, as :meth:`SegmentChain.as_gtf` would"""
+    cdef:
+        dict attr = chain.attr
+        str  feature_type, tokens
+
+    if len(chain._segments) == 0:
+        return 0
+
+    feature_type = attr["type"]
+    tokens = _make_GTF2_tokens(attr.get("gene_id",chain.get_gene()),
+                               attr.get("transcript_id",chain.get_name()),
+                               attr,
+                               excludes,
+                               escape,
+                               cache)
+    _append_gtf_lines(out,chain._segments,attr,feature_type,tokens)
+    return 0
+
+cdef int _append_transcript_gtf(list out, Transcript tx, object excludes, object user_excludes,
+                                bint escape, dict cache) except -1:
+    """Append `GTF2`_ lines for `tx`, as :meth:`Transcript.as_gtf` would"""
+    cdef:
+        dict         attr = tx.attr
+        dict         child_attr, codon_attr
+        str          tokens
+        object       tx_name, cds_name, cds_gene, cds_tid
+        SegmentChain cds, cds_no_stop
+        long         cds_length
+
+    if len(tx._segments) == 0:
+        return 0
+
+    cds = tx.get_cds()
+    cds_length = cds.length
+    cds_name = attr.get("ID",attr.get("Name",attr.get("name")))
+    if cds_length > 0 and (cds_length < 3 or "type" not in attr or \
+                           (cds_name is None and ("transcript_id" not in attr or
+                            ("gene_id" not in attr and "Parent" not in attr)))):
+        # names of CDS features would be generated from their coordinates,
+        # or the CDS is too short for codons. defer to the Transcript
+        out.append(tx.as_gtf(escape=escape,excludes=list(user_excludes)))
+        return 0
+
+    # exons. as in Transcript.as_gtf(), `excludes` does not apply to these
+    tx_name = tx.get_name()
+    tokens = _make_GTF2_tokens(attr.get("gene_id",tx.get_gene()),
+                               attr.get("transcript_id",tx_name),
+                               attr,
+                               _GTF2_EXCLUDE_SET,
+                               escape,
+                               cache)
+    _append_gtf_lines(out,tx._segments,attr,"exon",tokens)
+    if cds_length == 0:
+        return 0
+
+    # CDS, excluding stop codon
+    child_attr = dict(attr)
+    child_attr.pop("type")
+    cds_tid  = child_attr.get("transcript_id",cds_name)
+    cds_gene = child_attr["gene_id"] if "gene_id" in child_attr else _get_gene(child_attr,cds_name)
+    cds_no_stop = cds.c_get_subchain(0,cds_length - 3,True)
+    child_attr["type"] = "CDS"
+    tokens = _make_GTF2_tokens(cds_gene,cds_tid,child_attr,excludes,escape,cache)
+    _append_gtf_lines(out,cds_no_stop._segments,child_attr,"CDS",tokens)
+
+    # start and stop codons carry attributes of the CDS subchain, updated by those of `tx`
+    child_attr.pop("type")
+    codon_attr = { "gene_id"       : tx.get_gene(),
+                   "transcript_id" : tx_name,
+                   "ID"            : "%s_subchain" % tx_name }
+    codon_attr.update(child_attr)
+    tokens = _make_GTF2_tokens(codon_attr["gene_id"],codon_attr["transcript_id"],codon_attr,excludes,escape,cache)
+    _append_gtf_lines(out,cds.c_get_subchain(0,3,True)._segments,codon_attr,"start_codon",tokens)
+    _append_gtf_lines(out,cds.c_get_subchain(cds_length - 3,cds_length,True)._segments,codon_attr,"stop_codon",tokens)
+    return 0
+
+
+_GTF2_EXCLUDE_SET = frozenset(_GTF2_ALWAYS_EXCLUDED + ("gene_id","transcript_id"))
+
+
+#===============================================================================
+# INDEX: writers
+#===============================================================================
+
+def write_bed(object chains, object fh, bint as_int=True, object extra_columns=None,
+              object empty_value="", int blocksize=10000):
+    """Write |SegmentChains| or |Transcripts| to `fh` in `BED`_ format.
+    Output is identical to that of calling each feature's `as_bed()` method.
+
+    Parameters
+    ----------
+    chains : iterable of |SegmentChain|, or |ChainTable|
+        Features to export. Rows of a |ChainTable| are formatted directly
+        from its columns where possible.
+
+    fh : file-like
+        Open text stream
+
+    as_int : bool, optional
+        Force `score` to integer (Default: `True`)
+
+    extra_columns : None or list-like, optional
+        Attributes to export as extra columns, as in :meth:`SegmentChain.as_bed`.
+        If `None`, extra columns are exported in the order in which they were
+        imported, if any. (Default: `None`)
+
+    empty_value : str, optional
+        Value to export for `extra_columns` that are not defined (Default: "")
+
+    blocksize : int, optional
+        Number of features to format before each write (Default: `10000`)
+
+    Returns
+    -------
+    int
+        Number of features written, excluding features with no segments
+    """
+    cdef:
+        list         buf = []
+        dict         color_cache = {}
+        long         count = 0
+        SegmentChain chain
+        str          line
+
+    if isinstance(chains,ChainTable):
+        return _write_bed_table(chains,fh,as_int,extra_columns,empty_value,blocksize)
+
+    for chain in chains:
+        if type(chain) is SegmentChain or type(chain) is Transcript:
+            line = _chain_as_bed(chain,as_int,extra_columns,empty_value,color_cache)
+        else:
+            line = chain.as_bed(as_int=as_int,extra_columns=extra_columns,empty_value=empty_value)
+
+        if len(line) > 0:
+            buf.append(line)
+            count += 1
+            if len(buf) >= blocksize:
+                fh.write("".join(buf))
+                buf = []
+
+    fh.write("".join(buf))
+    return count
+
+cdef long _write_bed_table(ChainTable table, object fh, bint as_int, object extra_columns,
+                           object empty_value, int blocksize) except -1:
+    """Write rows of `table` in `BED`_ format, formatting lines from columns
+    unless a row's attributes require the row to be materialized
+    """
+    cdef:
+        list   buf = [], sizes, starts, extra
+        list   chrom_names = table._chrom_names
+        dict   color_cache = {}, extra_col_cache = {}
+        long   i, j, seg_start, span_start, cds_start
+        long   seg_end = 0
+        long   count = 0
+        Strand strand
+        bint   is_transcript = table.return_type is Transcript
+        object name, score, color, thickstart, thickend, cols
+        str    line
+
+    if table.return_type is not SegmentChain and is_transcript == False:
+        return write_bed(iter(table),fh,as_int=as_int,extra_columns=extra_columns,
+                         empty_value=empty_value,blocksize=blocksize)
+
+    name_keys = (["transcript_id"] if is_transcript == True else []) + ["ID","Name","name"]
+    name_cols   = [table.get_attr(X,_MISSING) for X in name_keys]
+    score_col   = table.get_attr("score",_MISSING)
+    color_col   = table.get_attr("color",_MISSING)
+    tstart_col  = table.get_attr("thickstart",_MISSING)
+    tend_col    = table.get_attr("thickend",_MISSING)
+    if extra_columns is None:
+        order_col = table.get_attr("_bedx_column_order",[])
+        extra_cols = None
+    else:
+        extra_cols = [table.get_attr(X,empty_value) for X in extra_columns]
+
+    for i in range(table.num_chains):
+        j = table._seg_offsets.data.as_longs[i]
+        if j == table._seg_offsets.data.as_longs[i+1]:
+            continue
+
+        name = _MISSING
+        for cols in name_cols:
+            name = cols[i]
+            if name is not _MISSING:
+                break
+
+        color = color_col[i]
+        color = _format_bed_color("#000000" if color is _MISSING else color,color_cache)
+        if name is _MISSING or color is None:
+            line = _chain_as_bed(table[i],as_int,extra_columns,empty_value,color_cache)
+        else:
+            span_start = table._seg_starts.data.as_longs[j]
+            sizes  = []
+            starts = []
+            while j < table._seg_offsets.data.as_longs[i+1]:
+                seg_start = table._seg_starts.data.as_longs[j]
+                seg_end   = table._seg_ends.data.as_longs[j]
+                sizes.append(str(seg_end - seg_start))
+                starts.append(str(seg_start - span_start))
+                j += 1
+
+            thickstart = None
+            thickend   = None
+            cds_start  = table._cds_genome_starts.data.as_longs[i]
+            if is_transcript == True and cds_start >= 0:
+                thickstart = cds_start
+                thickend   = table._cds_genome_ends.data.as_longs[i]
+
+            if thickstart is None:
+                thickstart = tstart_col[i]
+                thickstart = span_start if thickstart is _MISSING else thickstart
+                thickend   = tend_col[i]
+                thickend   = span_start if thickend is _MISSING else thickend
+
+            score = score_col[i]
+            if extra_cols is None:
+                extra = []
+                for key in order_col[i]:
+                    if key not in extra_col_cache:
+                        extra_col_cache[key] = table.get_attr(key,empty_value)
+                    extra.append(extra_col_cache[key][i])
+            else:
+                extra = [X[i] for X in extra_cols]
+
+            strand = <Strand>table._strand_codes.data.as_schars[i]
+            line = _format_bed_line(chrom_names[table._chrom_codes.data.as_ints[i]],
+                                    span_start,
+                                    seg_end,
+                                    name,
+                                    _format_bed_score(0 if score is _MISSING else score,as_int),
+                                    strand_to_str(strand),
+                                    thickstart,
+                                    thickend,
+                                    color,
+                                    sizes,
+                                    starts,
+                                    extra)
+
+        buf.append(line)
+        count += 1
+        if len(buf) >= blocksize:
+            fh.write("".join(buf))
+            buf = []
+
+    fh.write("".join(buf))
+    return count
+
+def write_gtf(object chains, object fh, bint escape=True, list excludes=None, int blocksize=10000):
+    """Write |SegmentChains| or |Transcripts| to `fh` in `GTF2`_ format.
+    Output is identical to that of calling each feature's `as_gtf()` method.
+
+    Parameters
+    ----------
+    chains : iterable of |SegmentChain|
+        Features to export
+
+    fh : file-like
+        Open text stream
+
+    escape : bool, optional
+        Escape tokens in column 9 of `GTF2`_ output (Default: `True`)
+
+    excludes : list, optional
+        List of attribute key names to exclude from column 9, as in
+        :meth:`SegmentChain.as_gtf` (Default: `[]`)
+
+    blocksize : int, optional
+        Number of features to format before each write (Default: `10000`)
+
+    Returns
+    -------
+    int
+        Number of features written, excluding features with no segments
+    """
+    cdef:
+        list   buf = []
+        dict   cache = {}
+        long   count = 0
+        object exclude_set
+        SegmentChain chain
+
+    excludes = [] if excludes is None else excludes
+    exclude_set = _GTF2_EXCLUDE_SET.union(excludes)
+    for chain in chains:
+        if len(chain._segments) == 0:
+            continue
+
+        if type(chain) is Transcript:
+            _append_transcript_gtf(buf,chain,exclude_set,excludes,escape,cache)
+        elif type(chain) is SegmentChain:
+            _append_chain_gtf(buf,chain,exclude_set,escape,cache)
+        else:
+            buf.append(chain.as_gtf(escape=escape,excludes=list(excludes)))
+
+        count += 1
+        if len(buf) >= blocksize:
+            fh.write("".join(buf))
+            buf = []
+
+    fh.write("".join(buf))
+    return count
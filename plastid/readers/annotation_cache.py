@@ -0,0 +1,672 @@
+#!/usr/bin/env python
+"""A compact, memory-mapped binary store for assembled |SegmentChains| and |Transcripts|.
+
+.. contents::
+   :local:
+
+Summary
+-------
+
+Assembling transcripts from large `GTF2`_, `GFF3`_, or `BED`_ files can take
+minutes, and is repeated every time a script is run on the same annotation.
+An annotation cache stores the output of assembly once, in a binary format
+that is memory-mapped -- rather than parsed -- when it is reopened:
+
+    - segment coordinates, CDS boundaries, and chromosome and strand indices
+      are stored as packed :class:`numpy.ndarray` columns
+
+    - chromosome names are stored once, in a header table; feature names are
+      stored in a single packed string table, with a sorted index for lookup
+
+    - `attr` dictionaries are optionally stored as JSON strings in a side
+      table, and are only decoded when a feature is built
+
+Caches are identified by a key derived from the checksums of the source files
+and the options used to assemble them (see :func:`get_annotation_cache_key`),
+so that a stale cache is never reused. When given a cache directory, the
+command-line |AnnotationParser| builds and reuses caches automatically.
+
+
+Module contents
+---------------
+
+.. autosummary::
+
+   AnnotationCache
+   AnnotationCacheWriter
+   get_annotation_cache_key
+   get_annotation_cache_filename
+   cache_features
+
+
+Examples
+--------
+Write a cache of transcripts assembled from a `GTF2`_ file::
+
+    >>> key = get_annotation_cache_key(["some_file.gtf"],annotation_format="GTF2")
+    >>> writer = AnnotationCacheWriter("some_file.plcache",key=key)
+    >>> for transcript in GTF2_TranscriptAssembler("some_file.gtf"):
+    >>>     writer.add(transcript)
+    >>> writer.close()
+
+Reopen it, iterate over its features, or look them up by name or region::
+
+    >>> cache = AnnotationCache("some_file.plcache",return_type=Transcript)
+    >>> len(cache)
+    7126
+    >>> for transcript in cache:
+    >>>     pass # do something with each Transcript
+
+    >>> cache.get_features_by_name("YAL030W_mRNA")
+    [<Transcript segments=2 bounds=chrI:87261-87752(+) name=YAL030W_mRNA>]
+
+    >>> cache[GenomicSegment("chrI",87000,88000,"+")]
+    [<Transcript segments=2 bounds=chrI:87261-87752(+) name=YAL030W_mRNA>]
+"""
+import array
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import numpy
+from plastid.genomics.roitools import GenomicSegment, SegmentChain, Transcript
+from plastid.genomics.genome_hash import AbstractGenomeHash
+from plastid.util.services.exceptions import DataWarning, warn
+
+#===============================================================================
+# INDEX: constants
+#===============================================================================
+
+_CACHE_MAGIC = b"PLASTID_ANNOTATION_CACHE\n"
+_CACHE_VERSION = 2
+_CACHE_EXTENSION = ".plcache"
+
+_STRANDS = ("+","-",".")
+_STRAND_CODES = { K : N for N,K in enumerate(_STRANDS) }
+
+_CDS_ABSENT = -2
+"""Sentinel for features with no CDS key in their `attr` dict"""
+
+_CDS_NONE = -1
+"""Sentinel for features whose CDS coordinates are `None`"""
+
+_CDS_KEYS = ("cds_genome_start","cds_genome_end")
+
+_ALIGNMENT = 8
+"""Byte alignment of arrays in cache files"""
+
+try:
+    array.array("q")
+    _INT64 = "q"
+except ValueError: # Python 2 has no long long typecode
+    _INT64 = "l"
+
+try:
+    _JSON_STRINGS = (str,unicode)
+    _JSON_SCALARS = (str,unicode,int,long,float,bool,type(None))
+except NameError: # Python 3
+    _JSON_STRINGS = (str,)
+    _JSON_SCALARS = (str,int,float,bool,type(None))
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+def _encode_cds(attr,key):
+    """Encode a CDS coordinate from an `attr` dict as an integer"""
+    if key not in attr:
+        return _CDS_ABSENT
+    return _encode_cds_value(attr[key])
+
+def _encode_cds_value(val):
+    """Encode a CDS coordinate, which may be `None`, as an integer"""
+    return _CDS_NONE if val is None else val
+
+def _decode_cds(val):
+    """Decode an integer CDS coordinate from the cache"""
+    return None if val == _CDS_NONE else int(val)
+
+def _is_json_value(val):
+    """Return `True` if `val` is unchanged by a round trip through :py:mod:`json`,
+    i.e. if it is a string, number, boolean, `None`, or a list, or dict with
+    string keys, of these. Tuples and sets, for example, are not.
+    """
+    if isinstance(val,_JSON_SCALARS):
+        return True
+    elif type(val) == list:
+        return all(_is_json_value(X) for X in val)
+    elif type(val) == dict:
+        return all(isinstance(K,_JSON_STRINGS) and _is_json_value(V) for K,V in val.items())
+
+    return False
+
+def _file_checksum(filename,blocksize=2**20):
+    """Return the MD5 checksum of a file's contents
+
+    Parameters
+    ----------
+    filename : str
+        Name of file
+
+    blocksize : int, optional
+        Number of bytes to read at a time
+
+    Returns
+    -------
+    str
+        Hexadecimal digest
+    """
+    md5 = hashlib.md5()
+    with open(filename,"rb") as fh:
+        block = fh.read(blocksize)
+        while len(block) > 0:
+            md5.update(block)
+            block = fh.read(blocksize)
+
+    return md5.hexdigest()
+
+def get_annotation_cache_key(filenames,**options):
+    """Create a key identifying the features assembled from `filenames`
+    using `options`. Keys change if the content of any file changes, or
+    if any option changes.
+
+    Parameters
+    ----------
+    filenames : list of str
+        Annotation files from which features are assembled
+
+    **options
+        Keyword arguments describing how features were assembled (e.g.
+        file format, whether stop codons were added). Values must be
+        serializable by :py:mod:`json`.
+
+    Returns
+    -------
+    str
+        Hexadecimal key
+    """
+    description = { "version"   : _CACHE_VERSION,
+                    "checksums" : [_file_checksum(X) for X in filenames],
+                    "options"   : options,
+                  }
+    md5 = hashlib.md5(json.dumps(description,sort_keys=True).encode("utf-8"))
+    return md5.hexdigest()
+
+def get_annotation_cache_filename(cache_dir,key):
+    """Return the name of the cache file for `key` in `cache_dir`
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory holding annotation caches
+
+    key : str
+        Key from :func:`get_annotation_cache_key`
+
+    Returns
+    -------
+    str
+    """
+    return os.path.join(cache_dir,key + _CACHE_EXTENSION)
+
+
+#===============================================================================
+# INDEX: writing caches
+#===============================================================================
+
+class AnnotationCacheWriter(object):
+    """Accumulate |SegmentChains| or |Transcripts| and write them to an annotation cache
+
+    Features are packed into compact columns as they are added, and written
+    when :meth:`close` is called. Data are first written to a temporary file,
+    which is renamed on completion, so that partially-written caches are never read.
+
+    Parameters
+    ----------
+    filename : str
+        Name of cache file to write
+
+    key : str, optional
+        Key identifying the source of the features, from :func:`get_annotation_cache_key`
+
+    store_attr : bool, optional
+        If `True`, store `attr` dictionaries of features. If `False`, only
+        names are stored. (Default: `True`)
+
+    Raises
+    ------
+    ValueError
+        From :meth:`add`, if `store_attr` is `True` and a feature's `attr`
+        dict holds values that would not be restored unchanged from the cache
+    """
+    def __init__(self,filename,key="",store_attr=True):
+        self.filename   = filename
+        self.key        = key
+        self.store_attr = store_attr
+        self.closed     = False
+
+        self._chrom_ids   = {}
+        self._chrom_idx   = array.array("i")
+        self._strand      = array.array("b")
+        self._seg_offsets = array.array(_INT64,[0])
+        self._seg_starts  = array.array(_INT64)
+        self._seg_ends    = array.array(_INT64)
+        self._cds_start   = array.array(_INT64)
+        self._cds_end     = array.array(_INT64)
+        self._cds_in_attr = array.array("b")
+        self._names       = bytearray()
+        self._name_offsets = array.array(_INT64,[0])
+        self._attrs       = bytearray()
+        self._attr_offsets = array.array(_INT64,[0])
+
+    def __len__(self):
+        return len(self._chrom_idx)
+
+    def add(self,feature):
+        """Add a feature to the cache
+
+        Parameters
+        ----------
+        feature : |SegmentChain| or subclass
+            Feature to add
+
+        Raises
+        ------
+        ValueError
+            If `attr` is stored, and holds values other than strings, numbers,
+            booleans, `None`, or lists or dicts of these
+        """
+        attr = feature.attr
+        if self.store_attr == True:
+            stored = { K : V for K,V in attr.items() if K not in _CDS_KEYS }
+            if not _is_json_value(stored):
+                raise ValueError("Cannot cache attr of feature '%s': values must be strings, numbers, booleans, None, or lists or dicts of these." % feature.get_name())
+
+        if len(feature) > 0:
+            chrom = feature.chrom
+            chrom_id = self._chrom_ids.get(chrom)
+            if chrom_id is None:
+                chrom_id = self._chrom_ids[chrom] = len(self._chrom_ids)
+            self._chrom_idx.append(chrom_id)
+            self._strand.append(_STRAND_CODES[feature.strand])
+        else:
+            self._chrom_idx.append(-1)
+            self._strand.append(_STRAND_CODES["."])
+
+        for seg in feature:
+            self._seg_starts.append(seg.start)
+            self._seg_ends.append(seg.end)
+        self._seg_offsets.append(len(self._seg_starts))
+
+        # Transcripts may hold their CDS outside `attr` (e.g. if read from BED)
+        if isinstance(feature,Transcript):
+            self._cds_start.append(_encode_cds_value(feature.cds_genome_start))
+            self._cds_end.append(_encode_cds_value(feature.cds_genome_end))
+        else:
+            self._cds_start.append(_encode_cds(attr,"cds_genome_start"))
+            self._cds_end.append(_encode_cds(attr,"cds_genome_end"))
+        self._cds_in_attr.append(all(X in attr for X in _CDS_KEYS))
+
+        self._names.extend(feature.get_name().encode("utf-8"))
+        self._name_offsets.append(len(self._names))
+
+        if self.store_attr == True:
+            self._attrs.extend(json.dumps(stored).encode("utf-8"))
+        self._attr_offsets.append(len(self._attrs))
+
+    def _get_arrays(self):
+        """Convert accumulated columns to arrays, and build indices for lookup
+        by name and by region
+
+        Returns
+        -------
+        list
+            List of (name, :class:`numpy.ndarray`) tuples
+        """
+        chrom_idx   = numpy.array(self._chrom_idx,dtype=numpy.int32)
+        seg_offsets = numpy.array(self._seg_offsets,dtype=numpy.int64)
+        seg_starts  = numpy.array(self._seg_starts,dtype=numpy.int64)
+        seg_ends    = numpy.array(self._seg_ends,dtype=numpy.int64)
+        name_offsets = numpy.array(self._name_offsets,dtype=numpy.int64)
+
+        # spans of features
+        has_segs = seg_offsets[1:] > seg_offsets[:-1]
+        tx_start = numpy.zeros(len(self),dtype=numpy.int64)
+        tx_end   = numpy.zeros(len(self),dtype=numpy.int64)
+        tx_start[has_segs] = seg_starts[seg_offsets[:-1][has_segs]]
+        tx_end[has_segs]   = seg_ends[seg_offsets[1:][has_segs] - 1]
+
+        # region index: features sorted by chromosome, then start
+        region_order = numpy.lexsort((tx_start,chrom_idx)).astype(numpy.int64)
+        num_chroms   = len(self._chrom_ids)
+        chrom_bounds = numpy.searchsorted(chrom_idx[region_order],
+                                          numpy.arange(num_chroms+1)).astype(numpy.int64)
+        max_span = numpy.zeros(num_chroms,dtype=numpy.int64)
+        if len(self) > 0 and num_chroms > 0:
+            valid = chrom_idx >= 0
+            numpy.maximum.at(max_span,chrom_idx[valid],(tx_end - tx_start)[valid])
+
+        # name index
+        names = [bytes(self._names[name_offsets[X]:name_offsets[X+1]]) for X in range(len(self))]
+        name_order = numpy.array(sorted(range(len(self)),key=names.__getitem__),dtype=numpy.int64)
+
+        return [("chrom_idx"    , chrom_idx),
+                ("strand"       , numpy.array(self._strand,dtype=numpy.int8)),
+                ("seg_offsets"  , seg_offsets),
+                ("seg_starts"   , seg_starts),
+                ("seg_ends"     , seg_ends),
+                ("cds_start"    , numpy.array(self._cds_start,dtype=numpy.int64)),
+                ("cds_end"      , numpy.array(self._cds_end,dtype=numpy.int64)),
+                ("cds_in_attr"  , numpy.array(self._cds_in_attr,dtype=numpy.int8)),
+                ("tx_start"     , tx_start),
+                ("tx_end"       , tx_end),
+                ("region_order" , region_order),
+                ("region_starts", tx_start[region_order]),
+                ("chrom_bounds" , chrom_bounds),
+                ("max_span"     , max_span),
+                ("names"        , numpy.frombuffer(bytes(self._names),dtype=numpy.uint8)),
+                ("name_offsets" , name_offsets),
+                ("name_order"   , name_order),
+                ("attrs"        , numpy.frombuffer(bytes(self._attrs),dtype=numpy.uint8)),
+                ("attr_offsets" , numpy.array(self._attr_offsets,dtype=numpy.int64)),
+               ]
+
+    def close(self):
+        """Write the cache to disk"""
+        if self.closed == True:
+            return
+
+        arrays = self._get_arrays()
+        chroms = [None]*len(self._chrom_ids)
+        for k,v in self._chrom_ids.items():
+            chroms[v] = k
+
+        # compute array offsets relative to start of data section
+        layout = {}
+        offset = 0
+        for name, arr in arrays:
+            layout[name] = { "dtype"  : arr.dtype.str,
+                             "shape"  : list(arr.shape),
+                             "offset" : offset }
+            offset += arr.nbytes
+            offset += (-offset) % _ALIGNMENT
+
+        header = json.dumps({ "version"    : _CACHE_VERSION,
+                              "key"        : self.key,
+                              "length"     : len(self),
+                              "chroms"     : chroms,
+                              "store_attr" : self.store_attr,
+                              "arrays"     : layout,
+                            }).encode("utf-8")
+        data_start = len(_CACHE_MAGIC) + 8 + len(header)
+        padding = (-data_start) % _ALIGNMENT
+        header += b" "*padding
+        data_start += padding
+
+        # unique temporary name, so concurrent writers of the same cache
+        # cannot overwrite each other's data before renaming
+        fd, tmpname = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filename)),
+                                       prefix=os.path.basename(self.filename),
+                                       suffix=".tmp")
+        try:
+            with os.fdopen(fd,"wb") as fout:
+                fout.write(_CACHE_MAGIC)
+                fout.write(struct.pack("<Q",len(header)))
+                fout.write(header)
+                for name, arr in arrays:
+                    fout.seek(data_start + layout[name]["offset"])
+                    fout.write(arr.tobytes())
+
+            os.rename(tmpname,self.filename)
+        except:
+            if os.path.exists(tmpname):
+                os.remove(tmpname)
+            raise
+
+        self.closed = True
+
+def cache_features(features,filename,key="",store_attr=True):
+    """Pass through features from an iterator, caching them as they pass.
+    The cache is written once `features` is exhausted. If `store_attr` is
+    `True` and a feature's `attr` cannot be cached faithfully, a
+    :class:`~plastid.util.services.exceptions.DataWarning` is issued, and
+    features are passed through without writing the cache.
+
+    Parameters
+    ----------
+    features : iterable
+        |SegmentChains| or |Transcripts|
+
+    filename : str
+        Name of cache file to write
+
+    key : str, optional
+        Key identifying the source of the features, from :func:`get_annotation_cache_key`
+
+    store_attr : bool, optional
+        If `True`, store `attr` dictionaries of features (Default: `True`)
+
+    Yields
+    ------
+    |SegmentChain| or subclass
+        Features from `features`
+    """
+    writer = AnnotationCacheWriter(filename,key=key,store_attr=store_attr)
+    for feature in features:
+        if writer is not None:
+            try:
+                writer.add(feature)
+            except ValueError as e:
+                warn("%s Not writing annotation cache '%s'." % (e,filename),DataWarning)
+                writer = None
+
+        yield feature
+
+    if writer is not None:
+        writer.close()
+
+
+#===============================================================================
+# INDEX: reading caches
+#===============================================================================
+
+class AnnotationCache(AbstractGenomeHash):
+    """Memory-mapped, read-only access to features in an annotation cache
+
+    Features may be iterated over in the order in which they were written,
+    looked up by name via :meth:`get_features_by_name`, or found by region,
+    as in a |GenomeHash|.
+
+    Parameters
+    ----------
+    filename : str
+        Name of cache file, written by |AnnotationCacheWriter|
+
+    return_type : |SegmentChain| or subclass, optional
+        Type of feature to return (Default: |SegmentChain|)
+
+    key : str or None, optional
+        If not `None`, raise a :class:`ValueError` if the key of the cache
+        does not match `key`
+
+    Attributes
+    ----------
+    key : str
+        Key identifying the source of the features
+
+    chroms : list
+        Chromosome names, in order of first appearance
+    """
+    def __init__(self,filename,return_type=None,key=None):
+        self.filename = filename
+        self.return_type = SegmentChain if return_type is None else return_type
+
+        with open(filename,"rb") as fh:
+            magic = fh.read(len(_CACHE_MAGIC))
+            if magic != _CACHE_MAGIC:
+                raise ValueError("'%s' is not a plastid annotation cache." % filename)
+            header_length, = struct.unpack("<Q",fh.read(8))
+            header = json.loads(fh.read(header_length).decode("utf-8"))
+
+        if header["version"] != _CACHE_VERSION:
+            raise ValueError("Annotation cache '%s' has version %s. Expected %s." % (filename,header["version"],_CACHE_VERSION))
+
+        self.key = header["key"]
+        if key is not None and key != self.key:
+            raise ValueError("Annotation cache '%s' has key '%s'. Expected '%s'." % (filename,self.key,key))
+
+        self.chroms = header["chroms"]
+        self._chrom_ids = { K : N for N,K in enumerate(self.chroms) }
+        self._length = header["length"]
+        self.store_attr = header["store_attr"]
+
+        # map file once; arrays are views of the mapping
+        data_start = len(_CACHE_MAGIC) + 8 + header_length
+        self._mmap = numpy.memmap(filename,dtype=numpy.uint8,mode="r")
+        for name, info in header["arrays"].items():
+            dtype = numpy.dtype(info["dtype"])
+            shape = tuple(info["shape"])
+            start = data_start + info["offset"]
+            stop  = start + dtype.itemsize*int(numpy.prod(shape))
+            setattr(self,"_" + name,self._mmap[start:stop].view(dtype).reshape(shape))
+
+    def __repr__(self):
+        return "<%s file=%s features=%s>" % (self.__class__.__name__,self.filename,len(self))
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._get_feature(i)
+
+    def _get_name_bytes(self,i):
+        """Return the UTF-8 encoded name of feature `i`"""
+        return self._names[self._name_offsets[i]:self._name_offsets[i+1]].tobytes()
+
+    def _get_name(self,i):
+        """Return the name of feature `i`"""
+        return self._get_name_bytes(i).decode("utf-8")
+
+    def _get_feature(self,i):
+        """Build feature `i` from the cache
+
+        Parameters
+        ----------
+        i : int
+            Index of feature, in order of writing
+
+        Returns
+        -------
+        |SegmentChain| or subclass
+        """
+        if self.store_attr == True:
+            attr = json.loads(self._attrs[self._attr_offsets[i]:self._attr_offsets[i+1]].tobytes().decode("utf-8"))
+        else:
+            attr = { "ID" : self._get_name(i) }
+
+        for key, arr in zip(_CDS_KEYS,(self._cds_start,self._cds_end)):
+            val = arr[i]
+            if val != _CDS_ABSENT:
+                attr[key] = _decode_cds(val)
+
+        chrom_id = self._chrom_idx[i]
+        if chrom_id >= 0:
+            chrom  = self.chroms[chrom_id]
+            strand = _STRANDS[self._strand[i]]
+            lo, hi = self._seg_offsets[i], self._seg_offsets[i+1]
+            segs = [GenomicSegment(chrom,int(X),int(Y),strand) for X,Y in zip(self._seg_starts[lo:hi],self._seg_ends[lo:hi])]
+        else:
+            segs = []
+
+        feature = self.return_type(*segs,**attr)
+        if not self._cds_in_attr[i]:
+            for key in _CDS_KEYS:
+                feature.attr.pop(key,None)
+
+        return feature
+
+    def get_features_by_name(self,name):
+        """Return all features whose name, as given by their `get_name()` method
+        when cached, matches `name`
+
+        Parameters
+        ----------
+        name : str
+            Feature name
+
+        Returns
+        -------
+        list
+            Matching features, in order of writing
+        """
+        order = self._name_order
+        name  = name.encode("utf-8")
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._get_name_bytes(order[mid]) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        matches = []
+        while lo < len(self) and self._get_name_bytes(order[lo]) == name:
+            matches.append(int(order[lo]))
+            lo += 1
+
+        return [self._get_feature(X) for X in sorted(matches)]
+
+    def get_overlapping_features(self,roi,stranded=True):
+        """Return list of features overlapping `roi`.
+
+        Parameters
+        ----------
+        roi : |GenomicSegment| or |SegmentChain|
+            Query feature indicating region of interest
+
+        stranded : bool
+            if `True`, retrieve only features on same strand as query feature.
+            Otherwise, retrieve features on both strands
+
+        Returns
+        -------
+        list
+           Features overlapping `roi`
+        """
+        if isinstance(roi,GenomicSegment):
+            roi = SegmentChain(roi)
+
+        chrom_id = self._chrom_ids.get(roi.chrom)
+        if chrom_id is None or len(roi) == 0:
+            return []
+
+        span = roi.spanning_segment
+        lo, hi = self._chrom_bounds[chrom_id], self._chrom_bounds[chrom_id+1]
+        starts = self._region_starts[lo:hi]
+        i0 = numpy.searchsorted(starts,span.start - self._max_span[chrom_id],side="left")
+        i1 = numpy.searchsorted(starts,span.end,side="left")
+        candidates = self._region_order[lo+i0:lo+i1]
+        candidates = numpy.sort(candidates[self._tx_end[candidates] > span.start])
+
+        fn = roi.overlaps if stranded == True else roi.unstranded_overlaps
+        features = (self._get_feature(X) for X in candidates)
+        return [X for X in features if fn(X) == True]
+
+    def __getitem__(self,roi):
+        """Return list of features that overlap a region of interest (roi),
+        on same strand.
+
+        Parameters
+        ----------
+        roi : |GenomicSegment| or |SegmentChain|
+            Query feature indicating region of interest
+
+        Returns
+        -------
+        list
+           Features overlapping `roi`
+        """
+        return self.get_overlapping_features(roi,stranded=True)
@@ -22,11 +22,27 @@ cdef extern from "<common.h>" nogil:
     ctypedef unsigned long long bits64
 
     void freeMem(void *pt)
-#     
-#     cdef struct fileOffsetSize:
-#         fileOffsetSize * next
-#         bits64           offset
-#         bits64           size
+    void slFreeList(void *listPt)
+
+    cdef struct fileOffsetSize:
+        fileOffsetSize * next
+        bits64           offset
+        bits64           size
+
+
+cdef extern from "<udc.h>":
+    cdef struct udcFile
+
+    void udcSeek(udcFile *file, bits64 offset) nogil
+    void udcMustRead(udcFile *file, void *buf, bits64 size) nogil
+
+
+cdef extern from "<zlibFace.h>":
+    size_t zUncompress(void *compressed, size_t compressedSize, void *uncompBuf, size_t uncompBufSize) nogil
+
+
+cdef extern from "<cirTree.h>":
+    cdef struct cirTreeFile
     
 
 
@@ -73,7 +89,7 @@ cdef extern from "<bbiFile.h>":
     cdef struct bbiFile:
         bbiFile *next
         char *fileName
-        #struct udcFile *udc
+        udcFile *udc
         bits32 typeSig
         bint   isSwapped
         #struct bptFile *chromBpt
@@ -88,7 +104,7 @@ cdef extern from "<bbiFile.h>":
         bits64 totalSummaryOffset
         bits32 uncompressBufSize
         #bits64 extensionOffset
-        #struct cirTreeFile unzoomedCir
+        cirTreeFile *unzoomedCir
         bbiZoomLevel *levelList
         #bits16 extensionSize
         bits16 extraIndexCount
@@ -105,7 +121,7 @@ cdef extern from "<bbiFile.h>":
         bits32 size
 
     cdef struct bbiSummary:
-        bbiSummary * next_
+        bbiSummary * next_ "next"
         bits32 chromId
         bits32 start, end
         bits32 validCount
@@ -144,6 +160,27 @@ cdef extern from "<bbiFile.h>":
 
     bbiSummaryElement bbiTotalSummary(bbiFile *bbi)
 
+    # zoom level with reduction closest to, but not exceeding, desiredReduction
+    bbiZoomLevel *bbiBestZoom(bbiZoomLevel *levelList, int desiredReduction) nogil
+
+    # list of summaries overlapping a region at a given zoom level. Free with slFreeList()
+    bbiSummary *bbiSummariesInRegion(bbiZoomLevel *zoom,
+                                     bbiFile *bbi,
+                                     int chromId,
+                                     bits32 start,
+                                     bits32 end) nogil
+
+    # make sure index of unzoomed data is attached
+    void bbiAttachUnzoomedCir(bbiFile *bbi) nogil
+
+    # fetch list of file blocks that contain items overlapping chromosome range
+    fileOffsetSize *bbiOverlappingBlocks(bbiFile *bbi,
+                                         cirTreeFile *ctf,
+                                         char *chrom,
+                                         bits32 start,
+                                         bits32 end,
+                                         bits32 *retChromId) nogil
+
 
 # cdef extern from "<cirTree.h>":
 #     cdef struct cirTreeFile:
@@ -180,6 +217,12 @@ cdef lm * get_lm(lm * my_lm=*, int maxmem=*) except NULL
 #===============================================================================
 
 
+cdef class _BBI_ThreadHandle:
+    cdef:
+        bbiFile * bbifile
+        lm *      lm
+
+
 cdef class _BBI_Reader:
 
     cdef:
@@ -190,6 +233,8 @@ cdef class _BBI_Reader:
         dict      _summary
         lm *      _lm
         long      _maxmem
+        object    _owner_thread
+        object    _thread_local
 
 #         dict _zoomlevels
 #         dict offsets
@@ -198,4 +243,7 @@ cdef class _BBI_Reader:
     cdef dict _define_chroms(self)
     cdef dict c_chroms(self)
     cdef lm* _get_lm(self)
-#     cdef dict fetch_summary(self)
+    cdef bbiFile * _open_bbifile(self) except NULL
+    cdef _BBI_ThreadHandle _get_thread_handle(self)
+    cdef bbiFile * _get_bbifile(self) except NULL
+    cdef dict fetch_summary(self)
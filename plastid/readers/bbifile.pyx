@@ -13,6 +13,9 @@ See also
 """
 import os
 import warnings
+import threading
+import numpy
+from multiprocessing.pool import ThreadPool
 
 from plastid.readers.autosql import AutoSqlDeclaration
 from plastid.util.io.binary import BinaryParserFactory, find_null_bytes
@@ -85,11 +88,33 @@ cdef lm * get_lm(lm * my_lm=NULL, int maxmem=0) except NULL:
 #===============================================================================
 
 
+cdef class _BBI_ThreadHandle:
+    """File handle and local memory pool used by a single thread to query a
+    `BigBed`_ or `BigWig`_ file. Both are released when the thread exits, or
+    when the reader that created them is destroyed.
+    """
+    def __cinit__(self):
+        self.bbifile = NULL
+        self.lm      = NULL
+
+    def __dealloc__(self):
+        if self.lm != NULL:
+            lmCleanup(&self.lm)
+
+        if self.bbifile != NULL:
+            close_file(self.bbifile)
+
+
 cdef class _BBI_Reader:
     """Abstract base class for `BigWig`_ file readers
 
     Reads basic file properties.
 
+    Readers may be shared between threads. Threads other than the one that
+    created the reader open their own handle to the file and their own pool
+    of local memory, so queries in different threads don't interfere, and
+    file reads and decompression release the GIL.
+
     Parameters
     ----------
     filename : str
@@ -110,6 +135,8 @@ cdef class _BBI_Reader:
         self._summary      = None
         self._lm           = NULL
         self._maxmem       = int(round(maxmem * 1024 * 1024))
+        self._owner_thread = threading.current_thread()
+        self._thread_local = threading.local()
 
     def __dealloc__(self):
         """Close `BigBed`_/`BigWig`_ file"""
@@ -140,8 +167,78 @@ cdef class _BBI_Reader:
         MemoryError
             If memory cannot be allocated
         """
-        self._lm = get_lm(my_lm=self._lm,maxmem=self._maxmem)
-        return self._lm
+        cdef _BBI_ThreadHandle handle
+
+        if threading.current_thread() is self._owner_thread:
+            self._lm = get_lm(my_lm=self._lm,maxmem=self._maxmem)
+            return self._lm
+
+        handle = self._get_thread_handle()
+        handle.lm = get_lm(my_lm=handle.lm,maxmem=self._maxmem)
+        return handle.lm
+
+    cdef bbiFile * _open_bbifile(self) except NULL:
+        """Open a new handle to the `BigBed`_ or `BigWig`_ file. Implemented in subclasses."""
+        raise NotImplementedError()
+
+    cdef _BBI_ThreadHandle _get_thread_handle(self):
+        """Return the file handle and local memory pool for the current thread,
+        opening them if necessary
+
+        Returns
+        -------
+        _BBI_ThreadHandle
+        """
+        cdef _BBI_ThreadHandle handle = getattr(self._thread_local,"handle",None)
+        if handle is None:
+            handle = _BBI_ThreadHandle()
+            handle.bbifile = self._open_bbifile()
+            self._thread_local.handle = handle
+
+        return handle
+
+    cdef bbiFile * _get_bbifile(self) except NULL:
+        """Return a handle to the `BigBed`_ or `BigWig`_ file that may
+        be used by the current thread
+
+        Returns
+        -------
+        bbiFile *
+        """
+        if threading.current_thread() is self._owner_thread:
+            return self._bbifile
+
+        return self._get_thread_handle().bbifile
+
+    def _get_many(self, object func, object rois, int threads):
+        """Apply `func` to each item in `rois`, in a pool of `threads` threads
+
+        Parameters
+        ----------
+        func : callable
+            Function that takes a region of interest
+
+        rois : iterable
+            Regions of interest
+
+        threads : int
+            Number of threads. If 1 or fewer, `rois` are processed in the
+            calling thread.
+
+        Returns
+        -------
+        list
+            Results of `func`, in the same order as `rois`
+        """
+        if threads <= 1:
+            return [func(X) for X in rois]
+
+        pool = ThreadPool(threads)
+        try:
+            return pool.map(func,rois)
+        finally:
+            pool.close()
+            pool.join()
 
     property filename:
         """Name of BigWig or BigBed file"""
@@ -168,51 +265,61 @@ cdef class _BBI_Reader:
     property chromids:
         def __get__(self):
             return self._chromids
-# see note below.
-#     property summary_info:
-#         """Summary information over total BBI file"""
-#         def __get__(self):
-#             if self._summary is not None:
-#                 return self._summary
-#             else:
-#                 return self.fetch_summary()
+    property summary_info:
+        """Summary information over total BBI file, read from the file header.
+        See :meth:`fetch_summary` for details.
+        """
+        def __get__(self):
+            if self._summary is not None:
+                return self._summary
+            else:
+                return self.fetch_summary()
 
     property uncompress_buf_size:
         """Size of buffer needed to uncompress blocks. If 0, the data is uncompressed"""
         def __get__(self):
             return self._bbifile.uncompressBufSize
 
-# data for mean as read from table is very inaccurate. Decide what to do later    
-#     cdef dict fetch_summary(self):
-#         """Return summary info of BBI file, and set `self._summary`.
-#         Summary info includes:
-#         
-#           - min value
-#           - max value
-#           - sum of values
-#           - sum of squares of values
-#           - covered bases
-#           - mean value over covered bases
-#           
-#         Returns
-#         -------
-#         dict
-#             dictionary described above
-#         """
-#         cdef:
-#             bbiSummaryElement mydata = bbiTotalSummary(self._bbifile)
-#             dict dtmp
-#          
-#         dtmp = {
-#             "min" : mydata.minVal,
-#             "max" : mydata.maxVal,
-#             "mean" : mydata.sumData / mydata.validCount,
-#             "sum"  : mydata.sumData,
-#             "sum_squares" : mydata.sumSquares,
-#             "valid_bases" : mydata.validCount,
-#         }
-#         self._summary = dtmp
-#         return dtmp
+    cdef dict fetch_summary(self):
+        """Return summary info of BBI file, and set `self._summary`.
+        Summary info includes:
+        
+          - min value
+          - max value
+          - sum of values
+          - sum of squares of values
+          - covered bases
+          - mean value over covered bases
+          
+        These values are stored in the file header when the file is written,
+        so fetching them is fast. Files written without a header summary fall
+        back to the most coarse zoom level, which is approximate.
+
+        Note
+        ----
+        `mean` is calculated over `valid_bases` only, i.e. over bases that
+        have data in the file, rather than over all bases in the genome.
+        Divide `sum` by the genome size to obtain the latter.
+
+        Returns
+        -------
+        dict
+            dictionary described above
+        """
+        cdef:
+            bbiSummaryElement mydata = bbiTotalSummary(self._bbifile)
+            dict dtmp
+         
+        dtmp = {
+            "min"  : mydata.minVal,
+            "max"  : mydata.maxVal,
+            "mean" : mydata.sumData / mydata.validCount if mydata.validCount > 0 else numpy.nan,
+            "sum"  : mydata.sumData,
+            "sum_squares" : mydata.sumSquares,
+            "valid_bases" : mydata.validCount,
+        }
+        self._summary = dtmp
+        return dtmp
 
     cdef dict _define_chroms(self):
         """Return dictionary mapping chromosome names to their lengths
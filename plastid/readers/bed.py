@@ -28,6 +28,15 @@ If `return_type` is unspecified, `BED`_ lines are read as |SegmentChains|::
     >>> my_chains[:5]
         [list of segment chains as output...]
 
+Large files are read much faster all at once, via :meth:`BED_Reader.read_all`::
+
+    >>> my_transcripts = BED_Reader("some_file.bed",return_type=Transcript).read_all()
+
+Files with millions of features can be read into a compact |ChainTable|,
+which creates |Transcripts| only as they are accessed::
+
+    >>> table = BED_Reader("some_file.bed",return_type=Transcript).read_table()
+
 Open an :term:`extended BED` file, which contains additional columns for `gene_id`
 and `favorite_color`. Values for these attributes will be stored in the `attr`
 dict of each |Transcript|::
@@ -50,7 +59,10 @@ See Also
 __date__ =  "Aug 23, 2011"
 __author__ = "joshua"
 
+import gc
+import itertools
 import shlex
+from plastid.genomics.chain_table import ChainTable
 from plastid.readers.common import AssembledFeatureReader
 from plastid.util.services.exceptions import FileFormatWarning, warn
 
@@ -268,6 +280,7 @@ class BED_Reader(AssembledFeatureReader):
         """
         AssembledFeatureReader.__init__(self,*args,**kwargs)
         self.extra_columns = kwargs.get("extra_columns",0)
+        self.add_three_for_stop = kwargs.get("add_three_for_stop",False)
 
     def _parse_track_line(self,inp):
         """Parse track line from `BED`_ / extended BED file
@@ -315,22 +328,41 @@ class BED_Reader(AssembledFeatureReader):
 
         return my_columns
 
-    def _assemble(self,line):
-        """Read `BED`_ files line-by-line into types specified by `self.return_type`"""
+    def _parse_line(self,line,parse=None):
+        """Parse a single line of a `BED`_ file
+        
+        Parameters
+        ----------
+        line : str
+            Line from `BED`_ file
+
+        parse : callable, optional
+            Function called as ``parse(line,extra_columns=extra_columns)``
+            on each feature line. If `None`, ``self.return_type.from_bed``
+            is used.
+        
+        Returns
+        -------
+        object or None
+            Output of `parse`, or `None` if `line` is blank, a comment,
+            a browser or track line, or cannot be parsed
+        """
         self.counter += 1
         if line.strip() == "":
-            return self.__next__()
+            return None
         elif line.startswith("browser"):
-            return self.__next__()
+            return None
         elif line.startswith("track"):
             # reset metadata
             self._parse_track_line(line[5:])
-            return self.__next__()
+            return None
         elif line.startswith("#"):
-            return self.__next__()
+            return None
         else:
+            if parse is None:
+                parse = self.return_type.from_bed
             try:
-                return self.return_type.from_bed(line,extra_columns=self.extra_columns)
+                return parse(line,extra_columns=self.extra_columns)
             except:
                 self.rejected.append(line)
                 msg = "Cannot parse BED line number %s. " % self.counter
@@ -343,4 +375,96 @@ class BED_Reader(AssembledFeatureReader):
 
                 msg += ("\n    %s" % line)
                 warn(msg,FileFormatWarning)
-                return self.__next__()
+                return None
+
+    def _assemble(self,line):
+        """Read `BED`_ files line-by-line into types specified by `self.return_type`"""
+        feature = self._parse_line(line)
+        while feature is None:
+            feature = self._parse_line(next(self.stream))
+
+        return feature
+
+    def read_all(self,blocksize=65536):
+        """Read all remaining features in `self.stream` into a list.
+
+        This is equivalent to ``list(reader)``, but much faster for large files,
+        because lines are pulled from the input in large blocks and parsed in a
+        tight loop, bypassing the per-feature iterator machinery and
+        cyclic garbage collection.
+
+        Parameters
+        ----------
+        blocksize : int, optional
+            Number of lines to read from `self.stream` at once (Default: `65536`)
+
+        Returns
+        -------
+        list
+            Features of type `self.return_type`
+        """
+        features = []
+        append   = features.append
+        parse    = self._parse_line
+        finalize = self._finalize
+        stream   = self.stream
+
+        # features don't form reference cycles, but the cyclic garbage collector
+        # repeatedly traverses all of them as the list grows. This dominates
+        # loading time for large files, so collection is paused while reading.
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            while True:
+                lines = list(itertools.islice(stream,blocksize))
+                if len(lines) == 0:
+                    break
+
+                for line in lines:
+                    feature = parse(line)
+                    if feature is not None:
+                        append(finalize(feature))
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        return features
+
+    def read_table(self,blocksize=65536):
+        """Read all remaining features in `self.stream` into a |ChainTable|.
+
+        Feature lines are parsed directly into the columns of the table,
+        so no |SegmentChain| or |Transcript| is created for each feature.
+        This requires a fraction of the memory of :meth:`read_all`, and is
+        suitable for files with millions of features.
+
+        Parameters
+        ----------
+        blocksize : int, optional
+            Number of lines to read from `self.stream` at once (Default: `65536`)
+
+        Returns
+        -------
+        |ChainTable|
+            Table of features, which yields features of type `self.return_type`
+            when indexed
+        """
+        table = ChainTable(return_type=self.return_type)
+        if self.add_three_for_stop == True:
+            # stop codons are added to assembled objects, which are then stored
+            from_bed = self.return_type.from_bed
+            finalize = self._finalize
+            parse = lambda line, extra_columns=0: table.append(finalize(from_bed(line,extra_columns=extra_columns)))
+        else:
+            parse = table.append_bed
+
+        stream = self.stream
+        while True:
+            lines = list(itertools.islice(stream,blocksize))
+            if len(lines) == 0:
+                break
+
+            for line in lines:
+                self._parse_line(line,parse)
+
+        return table
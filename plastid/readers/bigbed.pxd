@@ -1,6 +1,7 @@
 from collections import OrderedDict
 
-from plastid.readers.bbifile cimport bbiFile, bits32, bits64, lm, lmInit, lmCleanup, freeMem
+from cpython cimport array
+from plastid.readers.bbifile cimport bbiFile, bits32, bits64, lm, lmInit, lmCleanup, freeMem, fileOffsetSize
 from plastid.readers.bbifile cimport _BBI_Reader
 from plastid.util.services.mini2to3 import safe_bytes, safe_str
 from plastid.genomics.roitools cimport GenomicSegment, SegmentChain
@@ -49,7 +50,7 @@ cdef extern from "<bigBed.h>":
 # /* Get data for interval.  Return list allocated out of lm.  Set maxItems to maximum
 #  * number of items to return, or to 0 for all items. */
     bigBedInterval * bigBedIntervalQuery(bbiFile *bbi, char *chrom, bits32 start,
-                                         bits32 end, int maxItems, lm *lm)
+                                         bits32 end, int maxItems, lm *lm) nogil
     
 # /* Convert bigBedInterval into an array of chars equivalent to what you'd get by
 #  * parsing the bed file. The startBuf and endBuf are used to hold the ascii representation of
@@ -78,6 +79,18 @@ cdef extern from "<bigBed.h>":
 #  * Return list is allocated out of lm. */
     bigBedInterval *bigBedMultiNameQuery(bbiFile *bbi, bptFile *index, int fieldIx, char **names, int nameCount, lm *lm);
  
+cdef class _BigBedBlock:
+    cdef:
+        bits64          offset
+        array.array     chrom_ids
+        array.array     starts
+        array.array     ends
+        array.array     strands
+        array.array     rest_offsets
+        bytes           data
+        list            text
+
+
 cdef class BigBedReader(_BBI_Reader):
     cdef:
         bint               add_three_for_stop
@@ -90,5 +103,17 @@ cdef class BigBedReader(_BBI_Reader):
         object    return_type
         #types.classTypes return_type
 
+        object             _block_cache      # maps file offset to _BigBedBlock
+        object             _record_cache     # maps (file offset, index) to feature
+        long               _block_cache_size
+        long               _record_cache_size
+        dict               _cache_stats
+
     cdef list _bigbedinterval_to_bedtext(self, bigBedInterval *iv, Strand strand=*)
-    cdef _GeneratorWrapper _c_get(self, SegmentChain roi, bint stranded=*, bint check_unique=*, lm *my_lm=*)
\ No newline at end of file
+    cdef _GeneratorWrapper _c_get(self, SegmentChain roi, bint stranded=*, bint check_unique=*, lm *my_lm=*)
+    cdef bbiFile * _open_bbifile(self) except NULL
+    cdef _BigBedBlock _read_block(self, bits64 offset, bits64 size)
+    cdef list _get_blocks(self, str chrom, long start, long end, bits32 *chrom_id)
+    cdef str _get_record_text(self, _BigBedBlock block, int i)
+    cdef void _find_records(self, list blocks, bits32 chrom_id, long start, long end, Strand strand, dict found)
+    cdef list _get_records(self, dict found)
\ No newline at end of file
@@ -46,6 +46,14 @@ region of interest::
     >>> list(overlapping_features)
     [ list of SegmentChains/Transcripts ]
     
+Fetch features overlapping many regions of interest at once. This is much
+faster than fetching them one by one::
+
+    >>> rois = [GenomicSegment("chrI",X,X+500,"+") for X in range(0,100000,1000)]
+    >>> overlapping_features = my_reader.get_batch(rois)
+    >>> len(overlapping_features) == len(rois)
+    True
+
 Find features that match keyword(s) in a certain field:: 
 
     >>> # which fields are indexed and searchable?
@@ -81,7 +89,9 @@ from plastid.util.services.decorators import skipdoc, deprecated
 from plastid.util.services.exceptions import MalformedFileError, FileFormatWarning
 from plastid.readers.autosql import AutoSqlDeclaration
 
-from plastid.readers.bbifile cimport bbiFile, bits32, bits64, lm, lmInit, lmCleanup, freeMem, _BBI_Reader, get_lm
+from plastid.readers.bbifile cimport bbiFile, bits32, bits64, lm, lmInit, lmCleanup, freeMem, _BBI_Reader, get_lm, \
+                                     fileOffsetSize, udcSeek, udcMustRead, zUncompress, \
+                                     bbiAttachUnzoomedCir, bbiOverlappingBlocks
 
 from plastid.genomics.roitools cimport GenomicSegment, SegmentChain
 from plastid.genomics.c_common cimport strand_to_str, str_to_strand, Strand, \
@@ -90,6 +100,14 @@ from plastid.genomics.c_common cimport strand_to_str, str_to_strand, Strand, \
                                        _GeneratorWrapper
 
 from cpython.mem cimport PyMem_Malloc, PyMem_Free
+from cpython cimport array
+from libc.string cimport memcpy, strlen
+import array
+
+cdef array.array _long_template = array.array("l",[])
+
+DEF _DEFAULT_BLOCK_CACHE_SIZE  = 128
+DEF _DEFAULT_RECORD_CACHE_SIZE = 0
 #===============================================================================
 # INDEX: BigBedReader
 #===============================================================================
@@ -118,6 +136,25 @@ class _FromBED_StrAdaptor(object):
         """
         return inp
 
+cdef inline bits32 _read_bits32(char *pt, bint is_swapped):
+    """Read a 32-bit unsigned integer from `pt`, byte-swapping if necessary"""
+    cdef bits32 val
+    memcpy(&val,pt,4)
+    if is_swapped == True:
+        val = ((val & 0xFF) << 24) | ((val & 0xFF00) << 8) | ((val >> 8) & 0xFF00) | (val >> 24)
+
+    return val
+
+
+cdef class _BigBedBlock:
+    """Decompressed and partially parsed data block from a `BigBed`_ file,
+    held in the block cache of a |BigBedReader|. Coordinates and strands
+    of records are stored in arrays, so that overlap tests run in C. `BED`_
+    text for each record is only assembled when the record overlaps a query.
+    """
+    pass
+
+
 cdef class BigBedReader(_BBI_Reader):
     """
     BigBedReader(filename, return_type = SegmentChain, add_three_for_stop = False, maxmem = 0)
@@ -167,6 +204,23 @@ cdef class BigBedReader(_BBI_Reader):
         May be temporarily exceeded if large queries are requested.
         Does not include memory footprint of Python objects.
         (Default: 0, no limit)
+
+    block_cache_size : int, optional
+        Number of decompressed data blocks to keep in memory, so that nearby
+        queries need not re-read and decompress the same blocks. Set to 0
+        to disable. (Default: 128)
+
+    record_cache_size : int, optional
+        Number of parsed features to keep in memory, so that repeated
+        queries need not re-parse them. (Default: 0, no caching)
+    
+    
+    Notes
+    -----
+    If `record_cache_size` is greater than 0, features fetched by region are
+    cached. Like features stored in a |GenomeHash|, the same objects may then
+    be returned by successive queries, and should be copied before they are
+    modified. By default, each query returns new objects.
     
     
     Attributes
@@ -220,7 +274,14 @@ cdef class BigBedReader(_BBI_Reader):
             May be temporarily exceeded if large queries are requested.
             Does not include memory footprint of Python objects.
             (Default: 0, no limit)
-            
+
+        block_cache_size : int, optional
+            Number of decompressed data blocks to keep in memory.
+            Set to 0 to disable. (Default: 128)
+
+        record_cache_size : int, optional
+            Number of parsed features to keep in memory. If greater than 0,
+            successive queries may return the same objects. (Default: 0)
         """
         cdef:
             str autosql
@@ -258,6 +319,16 @@ cdef class BigBedReader(_BBI_Reader):
 
         self.add_three_for_stop = add_three_for_stop
 
+        self._block_cache       = OrderedDict()
+        self._record_cache      = OrderedDict()
+        self._block_cache_size  = kwargs.get("block_cache_size",_DEFAULT_BLOCK_CACHE_SIZE)
+        self._record_cache_size = kwargs.get("record_cache_size",_DEFAULT_RECORD_CACHE_SIZE)
+        self._cache_stats       = { "block_hits"    : 0,
+                                    "block_misses"  : 0,
+                                    "record_hits"   : 0,
+                                    "record_misses" : 0,
+                                  }
+
     property custom_fields:
         """BigBedReader.custom_fields is DEPRECATED. Will be removed in plastid v0.5.0. Use BigBedReader.extension_fields in future"""
         def __get__(self):
@@ -272,7 +343,7 @@ cdef class BigBedReader(_BBI_Reader):
     property num_records:
         """Number of features in file"""
         def __get__(self):
-            return bigBedItemCount(self._bbifile)
+            return bigBedItemCount(self._get_bbifile())
 
     property bed_fields:
         """Number of standard `BED`_ format columns included in file"""
@@ -310,6 +381,21 @@ cdef class BigBedReader(_BBI_Reader):
 
             return names
 
+    property cache_info:
+        """Dictionary of hit and miss counts, and current sizes, of block and record caches"""
+        def __get__(self):
+            info = dict(self._cache_stats)
+            info["blocks"]  = len(self._block_cache)
+            info["records"] = len(self._record_cache)
+            return info
+
+    def clear_cache(self):
+        """Empty block and record caches, and reset their statistics"""
+        self._block_cache.clear()
+        self._record_cache.clear()
+        for k in self._cache_stats:
+            self._cache_stats[k] = 0
+
     def __str__(self):
         return "<%s records=%s chroms=%s>" % (self.__class__.__name__,self.num_records,self.num_chroms)
 
@@ -325,7 +411,7 @@ cdef class BigBedReader(_BBI_Reader):
             autoSql-formatted string, or "" if no autoSql definition present
         """
         cdef:
-            char *  c_asql = bigBedAutoSqlText(self._bbifile)
+            char *  c_asql = bigBedAutoSqlText(self._get_bbifile())
             str     p_asql
             
         try:
@@ -452,11 +538,11 @@ cdef class BigBedReader(_BBI_Reader):
         if field_name not in self.indexed_fields:
             raise KeyError("BigBed file '%s' has no index named '%s'" % (self.filename,field_name))
         else:
-            bpt = bigBedOpenExtraIndex(self._bbifile, safe_bytes(field_name), idx)
+            bpt = bigBedOpenExtraIndex(self._get_bbifile(), safe_bytes(field_name), idx)
 
         if len(values) == 1:
             val  = safe_bytes(values[0])
-            iv   = bigBedNameQuery(self._bbifile, bpt, fieldIdx, val, buf)
+            iv   = bigBedNameQuery(self._get_bbifile(), bpt, fieldIdx, val, buf)
         else:
             num_vals = len(values)
             vals     = <char**> PyMem_Malloc(num_vals*sizeof(char*))
@@ -467,7 +553,7 @@ cdef class BigBedReader(_BBI_Reader):
                 val = safe_bytes(stmp)
                 vals[n] = val
                 
-            iv  = bigBedMultiNameQuery(self._bbifile, bpt, fieldIdx, vals, num_vals, buf)
+            iv  = bigBedMultiNameQuery(self._get_bbifile(), bpt, fieldIdx, vals, num_vals, buf)
             PyMem_Free(vals)
         
         ltmp = self._bigbedinterval_to_bedtext(iv)
@@ -524,10 +610,439 @@ cdef class BigBedReader(_BBI_Reader):
             
         return self._c_get(chain,stranded,check_unique=check_unique)
                     
-    # TODO: direct C/Cython route to SegmentChain.from_bed
-    # NB- no cache layer, which we  had in pure Python implementation (below)
-    # will this be fast enough for repeated queries over the same region?
-    # need to test    
+    cdef bbiFile * _open_bbifile(self) except NULL:
+        """Open a new handle to the `BigBed`_ file"""
+        return bigBedFileOpen(safe_bytes(self.filename))
+
+    def get_many(self, object rois, int threads=4, bint stranded=True, bint check_unique=True):
+        """Fetch features overlapping many regions of interest, using a pool
+        of threads. The reader may also be shared directly by threads in a
+        caller's own pool: each thread uses its own file handle, and file
+        reads and decompression run without the GIL.
+
+        Parameters
+        ----------
+        rois : iterable
+            |GenomicSegment| or |SegmentChain| regions of interest
+
+        threads : int, optional
+            Number of threads to use (Default: `4`)
+
+        stranded : bool, optional
+            If `True`, retrieve only features on same strand as query feature.
+            Otherwise, retrieve features on both strands. (Default: `True`)
+
+        check_unique : bool, optional
+            If `True`, assure that all results for each region are unique.
+            (Default: `True`)
+
+        Returns
+        -------
+        list
+            List of features overlapping each region, in the same order as `rois`
+
+        See also
+        --------
+        BigBedReader.get_batch
+            Fetch features for many regions in one thread, sharing index
+            searches between nearby regions
+        """
+        return self._get_many(lambda roi: list(self.get(roi,stranded=stranded,check_unique=check_unique)),
+                              rois,threads)
+
+    def get_batch(self, rois, bint stranded=True, long window=100000):
+        """Fetch features overlapping each of many regions of interest.
+
+        Queries are sorted by position, and queries that fall within `window`
+        of each other on the same chromosome are grouped. The `BigBed`_ index
+        is searched once per group, rather than once per query, and data
+        blocks are decompressed once per group. This is much faster than
+        calling :meth:`get` repeatedly for large numbers of nearby queries.
+
+        Parameters
+        ----------
+        rois : iterable of |SegmentChain| or |GenomicSegment|
+            Query features representing regions of interest
+
+        stranded : bool, optional
+            If `True`, retrieve only features on same strand as query feature.
+            Otherwise, retrieve features on both strands. (Default: `True`)
+
+        window : int, optional
+            Maximum span, in nucleotides, of a group of queries that share
+            a single index search (Default: 100000)
+
+
+        Returns
+        -------
+        list
+            List of lists of features, of `self.return_type`, overlapping each
+            region of interest, in the same order as `rois`. Features in each
+            list are unique, and ordered as they would be by :meth:`get`
+
+
+        Raises
+        ------
+        TypeError
+            if any roi is not a |GenomicSegment| or |SegmentChain|
+        """
+        cdef:
+            list           chains = []
+            list           order, results, blocks
+            dict           found
+            SegmentChain   chain
+            GenomicSegment span, seg
+            str            chrom
+            long           group_start, group_end
+            Strand         strand
+            bits32         chrom_id = 0
+            Py_ssize_t     i, j, k, n
+
+        for roi in rois:
+            if isinstance(roi,SegmentChain):
+                chains.append(roi)
+            elif isinstance(roi,GenomicSegment):
+                chains.append(SegmentChain(roi))
+            else:
+                raise TypeError("BigBedReader.get_batch(): Query intervals must be GenomicSegments or SegmentChains")
+
+        n       = len(chains)
+        results = [None] * n
+        order   = sorted(range(n),key=lambda x: (chains[x].spanning_segment.chrom,
+                                                 chains[x].spanning_segment.start))
+        i = 0
+        while i < n:
+            span        = chains[order[i]].spanning_segment
+            chrom       = span.chrom
+            group_start = span.start
+            group_end   = span.end
+            j = i + 1
+            while j < n:
+                span = chains[order[j]].spanning_segment
+                if span.chrom != chrom or max(group_end,span.end) - group_start > window:
+                    break
+
+                group_end = max(group_end,span.end)
+                j += 1
+
+            blocks = self._get_blocks(chrom,group_start,group_end,&chrom_id)
+            for k in order[i:j]:
+                chain  = chains[k]
+                strand = chain.spanning_segment.c_strand if stranded == True else unstranded
+                found  = {}
+                for seg in chain:
+                    self._find_records(blocks,chrom_id,seg.start,seg.end,strand,found)
+
+                results[k] = self._get_records(found)
+
+            i = j
+
+        return results
+
+    cdef _BigBedBlock _read_block(self, bits64 offset, bits64 size):
+        """Read, decompress, and parse a data block from the `BigBed`_ file
+
+        Parameters
+        ----------
+        offset : bits64
+            Offset of block in file
+
+        size : bits64
+            Size of block in file, in bytes
+
+        Returns
+        -------
+        _BigBedBlock
+        """
+        cdef:
+            bbiFile *    bbi        = self._get_bbifile()
+            bits32       buf_size   = bbi.uncompressBufSize
+            bint         is_swapped = bbi.isSwapped
+            bint         has_strand = self.total_fields > 3 and self.bed_fields >= 6
+            char *       raw        = NULL
+            char *       buf        = NULL
+            char *       pt
+            char *       block_start
+            char *       block_end
+            char *       field
+            size_t       data_size, max_records
+            long         n          = 0
+            int          tabs
+            _BigBedBlock block      = _BigBedBlock()
+            bytes        data
+            array.array  chrom_ids, starts, ends, strands, rest_offsets
+
+        raw = <char *>PyMem_Malloc(size)
+        if raw == NULL:
+            raise MemoryError("BigBedReader: could not allocate memory to read data block")
+
+        try:
+            with nogil:
+                udcSeek(bbi.udc,offset)
+                udcMustRead(bbi.udc,raw,size)
+
+            if buf_size > 0:
+                buf = <char *>PyMem_Malloc(buf_size)
+                if buf == NULL:
+                    raise MemoryError("BigBedReader: could not allocate memory to decompress data block")
+
+                with nogil:
+                    data_size = zUncompress(raw,size,buf,buf_size)
+
+                data = buf[:data_size]
+            else:
+                data_size = size
+                data = raw[:data_size]
+        finally:
+            PyMem_Free(raw)
+            if buf != NULL:
+                PyMem_Free(buf)
+
+        # each record is at least 12 bytes of coordinates plus a null byte
+        block_start  = data
+        block_end    = block_start + data_size
+        pt           = block_start
+        max_records  = data_size // 13 + 1
+        chrom_ids    = array.clone(_long_template,max_records,False)
+        starts       = array.clone(_long_template,max_records,False)
+        ends         = array.clone(_long_template,max_records,False)
+        strands      = array.clone(_long_template,max_records,False)
+        rest_offsets = array.clone(_long_template,max_records,False)
+        while pt < block_end:
+            chrom_ids.data.as_longs[n] = _read_bits32(pt,is_swapped)
+            starts.data.as_longs[n]    = _read_bits32(pt+4,is_swapped)
+            ends.data.as_longs[n]      = _read_bits32(pt+8,is_swapped)
+            pt += 12
+            rest_offsets.data.as_longs[n] = pt - block_start
+
+            # strand is third column of remainder of BED line
+            strands.data.as_longs[n] = unstranded
+            if has_strand == True:
+                tabs  = 0
+                field = pt
+                while field[0] != 0 and tabs < 2:
+                    if field[0] == c"\t":
+                        tabs += 1
+                    field += 1
+
+                if field[0] == c"+" and (field[1] == c"\t" or field[1] == 0):
+                    strands.data.as_longs[n] = forward_strand
+                elif field[0] == c"-" and (field[1] == c"\t" or field[1] == 0):
+                    strands.data.as_longs[n] = reverse_strand
+                elif not (field[0] == c"." and (field[1] == c"\t" or field[1] == 0)):
+                    # let str_to_strand handle (or complain about) anything else
+                    strands.data.as_longs[n] = str_to_strand(safe_str(pt[:strlen(pt)]).split("\t")[2])
+
+            pt += strlen(pt) + 1
+            n  += 1
+
+        array.resize(chrom_ids,n)
+        array.resize(starts,n)
+        array.resize(ends,n)
+        array.resize(strands,n)
+        array.resize(rest_offsets,n)
+
+        block.offset       = offset
+        block.chrom_ids    = chrom_ids
+        block.starts       = starts
+        block.ends         = ends
+        block.strands      = strands
+        block.rest_offsets = rest_offsets
+        block.data         = data
+        block.text         = [None] * n
+        return block
+
+    cdef list _get_blocks(self, str chrom, long start, long end, bits32 *chrom_id):
+        """Search the `BigBed`_ index for data blocks containing records that
+        overlap a genomic region, fetching blocks from the cache if present
+
+        Parameters
+        ----------
+        chrom : str
+            Chromosome name
+
+        start : long
+            Start of region, 0-indexed
+
+        end : long
+            End of region, half-open
+
+        chrom_id : bits32 *
+            Pointer that will be set to the ID of `chrom` in the `BigBed`_ file
+
+        Returns
+        -------
+        list
+            List of `_BigBedBlock`, empty if `chrom` is not in the file
+        """
+        cdef:
+            fileOffsetSize * block_list
+            fileOffsetSize * node
+            list             blocks     = []
+            object           cache      = self._block_cache
+            long             cache_size = self._block_cache_size
+            dict             stats      = self._cache_stats
+            _BigBedBlock     block
+            bbiFile        * bbi        = self._get_bbifile()
+            bytes            bchrom     = safe_bytes(chrom)
+            char           * cchrom     = bchrom
+            bits32           qstart     = max(start,0)
+            bits32           qend       = max(end,0)
+
+        with nogil:
+            bbiAttachUnzoomedCir(bbi)
+            block_list = bbiOverlappingBlocks(bbi,
+                                              bbi.unzoomedCir,
+                                              cchrom,
+                                              qstart,
+                                              qend,
+                                              chrom_id)
+        node = block_list
+        try:
+            while node != NULL:
+                block = cache.pop(node.offset,None)
+                if block is None:
+                    stats["block_misses"] += 1
+                    block = self._read_block(node.offset,node.size)
+                    while len(cache) > 0 and len(cache) >= cache_size:
+                        cache.popitem(last=False)
+                else:
+                    stats["block_hits"] += 1
+
+                # (re)insert at end of cache, marking block as most recently used
+                if cache_size > 0:
+                    cache[node.offset] = block
+
+                blocks.append(block)
+                node = node.next
+        finally:
+            slFreeList(&block_list)
+
+        return blocks
+
+    cdef str _get_record_text(self, _BigBedBlock block, int i):
+        """Return `BED`_ text for record `i` in `block`, as would be
+        generated by :meth:`BigBedReader._bigbedinterval_to_bedtext`
+        """
+        cdef:
+            str    text = block.text[i]
+            str    chrom
+            char * rest
+
+        if text is None:
+            if self._chromids is None:
+                self._define_chroms()
+
+            chrom = self._chromids[block.chrom_ids.data.as_longs[i]]
+            if self.total_fields > 3:
+                rest = block.data
+                rest += block.rest_offsets.data.as_longs[i]
+                text = "%s\t%s\t%s\t%s" % (chrom,
+                                           block.starts.data.as_longs[i],
+                                           block.ends.data.as_longs[i],
+                                           safe_str(rest[:strlen(rest)]))
+            else:
+                text = "%s\t%s\t%s" % (chrom,
+                                      block.starts.data.as_longs[i],
+                                      block.ends.data.as_longs[i])
+            block.text[i] = text
+
+        return text
+
+    cdef void _find_records(self, list blocks, bits32 chrom_id, long start, long end, Strand strand, dict found):
+        """Find records in `blocks` that overlap a genomic region
+
+        Parameters
+        ----------
+        blocks : list
+            List of `_BigBedBlock` from :meth:`BigBedReader._get_blocks`
+
+        chrom_id : bits32
+            ID of chromosome of region in `BigBed`_ file
+
+        start : long
+            Start of region, 0-indexed
+
+        end : long
+            End of region, half-open
+
+        strand : Strand
+            Strand that must be overlapped for records to be returned
+
+        found : dict
+            Dictionary that will be populated, mapping `BED`_ text of
+            overlapping records to their `(block offset, index)` keys.
+            Because keys are BED text, records are made unique.
+        """
+        cdef:
+            _BigBedBlock block
+            long *       chrom_ids
+            long *       starts
+            long *       ends
+            long *       strands
+            str          text
+            int          i, n
+
+        for block in blocks:
+            chrom_ids = block.chrom_ids.data.as_longs
+            starts    = block.starts.data.as_longs
+            ends      = block.ends.data.as_longs
+            strands   = block.strands.data.as_longs
+            n         = len(block.text)
+            for i in range(n):
+                if chrom_ids[i] == chrom_id and starts[i] < end and ends[i] > start \
+                   and (strands[i] & strand) != 0:
+                    text = self._get_record_text(block,i)
+                    if text not in found:
+                        found[text] = (block.offset,i)
+
+    cdef list _get_records(self, dict found):
+        """Convert records found by :meth:`BigBedReader._find_records` to
+        features of `self.return_type`, sorted by their `BED`_ text,
+        fetching features from the cache if present
+
+        Parameters
+        ----------
+        found : dict
+            Dictionary mapping `BED`_ text to `(block offset, index)` keys
+
+        Returns
+        -------
+        list
+            Features of `self.return_type`
+        """
+        cdef:
+            list   features   = []
+            object outfunc    = self.return_type.from_bed
+            list   etypes     = list(self.extension_types.items())
+            object cache      = self._record_cache
+            long   cache_size = self._record_cache_size
+            dict   stats      = self._cache_stats
+            str    text
+            tuple  key
+            object feature
+
+        for text in sorted(found):
+            key     = found[text]
+            feature = cache.pop(key,None)
+            if feature is None:
+                stats["record_misses"] += 1
+                feature = outfunc(text,extra_columns=etypes)
+                if self.add_three_for_stop == True:
+                    feature = add_three_for_stop_codon(feature)
+
+                while len(cache) > 0 and len(cache) >= cache_size:
+                    cache.popitem(last=False)
+            else:
+                stats["record_hits"] += 1
+
+            if cache_size > 0:
+                cache[key] = feature
+
+            features.append(feature)
+
+        return features
+
     cdef _GeneratorWrapper _c_get(self, SegmentChain chain, bint stranded=True, bint check_unique=True, lm *my_lm = NULL):
         """c-layer implementation of :meth:`BigBedReader.get`
         
@@ -565,22 +1080,40 @@ cdef class BigBedReader(_BBI_Reader):
             Strand           ivstrand
             object           outfunc   = self.return_type.from_bed
             list             etypes    = list(self.extension_types.items())
+            dict             found
+            bits32           chrom_id  = 0
+            bbiFile        * bbi
+            bytes            bchrom
+            char           * cchrom
+            bits32           qstart, qend
        
+        if stranded is True:
+            strand = span.c_strand
+
+        # queries for unique features go through the block and record caches.
+        # Queries that don't check uniqueness (e.g. from BigBedIterator) scan
+        # large regions once, and would only evict useful data from the caches
+        if check_unique == True and my_lm == NULL:
+            found = {}
+            for roi in chain:
+                self._find_records(self._get_blocks(chrom,roi.start,roi.end,&chrom_id),
+                                   chrom_id,roi.start,roi.end,strand,found)
+
+            return _GeneratorWrapper(iter(self._get_records(found)),"BigBed entries")
+
         if my_lm != NULL:
             buf = my_lm
         else:
             buf = self._get_lm()
 
-        if stranded is True:
-            strand = span.c_strand
-
+        bbi    = self._get_bbifile()
+        bchrom = safe_bytes(span.chrom)
+        cchrom = bchrom
         for roi in chain:
-            iv = bigBedIntervalQuery(self._bbifile,
-                                     safe_bytes(span.chrom),
-                                     roi.start,
-                                     roi.end,
-                                     0,
-                                     buf)
+            qstart = roi.start
+            qend   = roi.end
+            with nogil:
+                iv = bigBedIntervalQuery(bbi,cchrom,qstart,qend,0,buf)
             ltmp.extend(self._bigbedinterval_to_bedtext(iv, strand=strand))
         
         # filter for uniqueness
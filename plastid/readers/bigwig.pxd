@@ -10,7 +10,7 @@ See also
 `Source repository for Kent utilities <https://github.com/ENCODE-DCC/kentUtils.git>`_
     The header files are particularly useful.
 """
-from plastid.readers.bbifile cimport lm, bbiFile, _BBI_Reader, bits32, Bits, bbiSummaryType, get_lm
+from plastid.readers.bbifile cimport lm, bbiFile, _BBI_Reader, bits32, Bits, bbiSummaryType, bbiZoomLevel, get_lm
 from plastid.genomics.roitools cimport GenomicSegment
 from plastid.genomics.c_common cimport _GeneratorWrapper
 
@@ -38,7 +38,7 @@ cdef extern from "<bigWig.h>":
                                       char *chrom,
                                       bits32 start,
                                       bits32 end,
-                                      lm *lm)
+                                      lm *lm) nogil
     
     bigWigValsOnChrom *bigWigValsOnChromNew()
     
@@ -60,8 +60,14 @@ cdef extern from "<bigWig.h>":
 cdef class BigWigReader(_BBI_Reader):
     cdef double fill
     cdef double _sum
+    cdef dict   _chrom_name_ids
     
     cdef double _summarize(self,GenomicSegment roi, bbiSummaryType type_)
+    cdef int _summarize_segment(self, GenomicSegment seg, long offset, bbiZoomLevel *zoom,
+                                long [:] bounds, double [:] valid, double [:] total,
+                                double [:] maxes, double [:] mins) except -1
     cdef double c_sum(self)
+    cdef bbiFile * _open_bbifile(self) except NULL
+    cdef int c_fill_chain(self, list segments, double [:] out, bint accumulate) except -1
     cdef bigWigValsOnChrom * c_get_chromosome_counts(self, str chrom)
 
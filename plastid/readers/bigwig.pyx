@@ -52,6 +52,13 @@ Efficiently fetch a :class:`numpy.ndarray` of counts covering a whole chromosome
     >>> chrI_counts
     [ numpy array of counts covering chromosome chrI ]
 
+Pool data from replicate files into one preallocated array::
+
+    >>> replicates = [BigWigReader("rep1.bw"), BigWigReader("rep2.bw")]
+    >>> pooled = numpy.zeros(my_transcript.length)
+    >>> for reader in replicates:
+    >>>     reader.get_chain(my_transcript,out=pooled,accumulate=True)
+
 Iterate over a `BigWig`_ file (this is unusual). Data are returned as tuples of
 (chromosome name, start coordinate, end coordinate, and the value over those 
 coordinates)::
@@ -59,6 +66,12 @@ coordinates)::
     >>> for chrom, my_start, my_end, value in count_data:
     >>>     pass # do something interesting with those values
 
+Quickly summarize data in 100 bins over a region, using the zoom levels
+stored in the file, rather than fetching every position::
+
+    >>> binned_means = count_data.summarize(GenomicSegment("chrI",0,200000,"+"),n_bins=100)
+    >>> binned_max   = count_data.summarize(my_transcript,n_bins=20,stat="max")
+
 
 See also
 --------
@@ -72,6 +85,7 @@ See also
     The header files are particularly useful.
 """
 import warnings
+cimport cython
 cimport numpy
 import numpy
 
@@ -79,7 +93,8 @@ from plastid.util.services.exceptions import DataWarning
 from plastid.genomics.roitools cimport GenomicSegment, SegmentChain
 from plastid.genomics.c_common cimport reverse_strand
 from plastid.readers.bbifile cimport _BBI_Reader, close_file,\
-                                     bbiSummary, bbiSummaryType,\
+                                     bbiSummary, bbiSummaryType, bbiZoomLevel,\
+                                     bbiBestZoom, bbiSummariesInRegion, slFreeList,\
                                      bbiSumMax,bbiSumMin,bbiSumMean,\
                                      bbiSumCoverage, bbiSumStandardDeviation,\
                                      lmInit, lmCleanup, lmAlloc, lm, \
@@ -89,6 +104,13 @@ from plastid.readers.bbifile cimport WARN_CHROM_NOT_FOUND
 from plastid.genomics.c_common import _GeneratorWrapper
 from plastid.util.services.mini2to3 import safe_bytes, safe_str
 
+
+SUMMARY_STATS = ("mean","sum","max","min","coverage")
+"""Statistics that may be calculated by :meth:`BigWigReader.summarize`"""
+
+cdef long CHAIN_QUERY_MAX_GAP = 16384
+"""Segments separated by fewer than this many bases are fetched together by :meth:`BigWigReader.get_chain`"""
+
 #===============================================================================
 # INDEX: BigWig reader
 #===============================================================================
@@ -163,6 +185,7 @@ cdef class BigWigReader(_BBI_Reader):
         self._bbifile = bigWigFileOpen(safe_bytes(filename))
         self.fill = 0.0 #fill
         self._sum = numpy.nan
+        self._chrom_name_ids = None
 
     def __iter__(self):
         return _GeneratorWrapper(BigWigIterator(self,maxmem=self._maxmem),"BigWig values")
@@ -197,40 +220,230 @@ cdef class BigWigReader(_BBI_Reader):
             Fetch a spliced vector of data covering a |SegmentChain|
         """
         cdef:
-            long start    = roi.start
-            long end      = roi.end
-            str  chrom    = roi.chrom
-            size_t length = end - start
+            long start, end
+            str  chrom
+            size_t length
             double usefill = self.fill if numpy.isnan(fill) else fill
             
-            numpy.ndarray counts = numpy.full(length,usefill,dtype=numpy.float)
-            double [:] view      = counts
+            numpy.ndarray counts
+            double [:] view
             
-            lm* buf = self._get_lm()
+            lm* buf
+            bbiFile* bbi
             bbiInterval* iv
+            bytes bchrom
+            char* cchrom
             long segstart, segend
         
         if isinstance(roi,SegmentChain):
-            return roi.get_counts(self)
+            if len(roi) == 0:
+                return roi.get_counts(self)
+            return self.get_chain(roi,roi_order=roi_order)
         
+        start  = roi.start
+        end    = roi.end
+        chrom  = roi.chrom
+        length = end - start
+        counts = numpy.full(length,usefill,dtype=numpy.float)
+        view   = counts
+
         # return empty vector if chromosome is not in BigWig file
         if chrom not in self.c_chroms():
             warnings.warn(WARN_CHROM_NOT_FOUND % (chrom,self.filename),DataWarning)
             return counts
         
         # populate vector
-        iv = bigWigIntervalQuery(self._bbifile,safe_bytes(chrom),start,end,buf)
-        while iv is not NULL:
-            segstart = iv.start - start
-            segend = iv.end - start
-            view[segstart:segend] = iv.val
-            iv = iv.next
+        buf    = self._get_lm()
+        bbi    = self._get_bbifile()
+        bchrom = safe_bytes(chrom)
+        cchrom = bchrom
+        with nogil:
+            iv = bigWigIntervalQuery(bbi,cchrom,start,end,buf)
+            while iv is not NULL:
+                segstart = iv.start - start
+                segend = iv.end - start
+                view[segstart:segend] = iv.val
+                iv = iv.next
         
         if roi.strand == "-" and roi_order == True:
             counts = counts[::-1]
 
         return counts
                      
+    cdef bbiFile * _open_bbifile(self) except NULL:
+        """Open a new handle to the `BigWig`_ file"""
+        return bigWigFileOpen(safe_bytes(self.filename))
+
+    def get_many(self, object rois, int threads=4, bint roi_order=True):
+        """Retrieve arrays of counts for many regions of interest, using a pool
+        of threads. The reader may also be shared directly by threads in a
+        caller's own pool: each thread uses its own file handle, and file
+        reads, decompression, and decoding run without the GIL.
+
+        Parameters
+        ----------
+        rois : iterable
+            |GenomicSegment| or |SegmentChain| regions of interest
+
+        threads : int, optional
+            Number of threads to use (Default: `4`)
+
+        roi_order : bool, optional
+            If `True` (default) return vectors of values 5' to 3' 
+            relative to each region rather than genome.
+
+        Returns
+        -------
+        list
+            :class:`numpy.ndarray` of values for each region, in the same
+            order as `rois`
+        """
+        return self._get_many(lambda roi: self.get(roi,roi_order=roi_order),rois,threads)
+
+    def get_chain(self, object segments, numpy.ndarray out=None, bint roi_order=True, bint accumulate=False):
+        """Fetch values covering all segments of a |SegmentChain| in a single
+        pass, writing them into one output array rather than allocating and
+        concatenating a vector for each segment.
+
+        Parameters
+        ----------
+        segments : |SegmentChain| or list of |GenomicSegment|
+            Region of interest. If a list, segments must be sorted from left to right,
+            and share a chromosome and strand.
+
+        out : :class:`numpy.ndarray`, optional
+            One-dimensional array of `float` to fill, with one position for each
+            position in `segments`. If `None` (default), a new array is allocated.
+
+        roi_order : bool, optional
+            If `True` (default), values are ordered 5' to 3' relative to
+            `segments`, rather than to the genome.
+
+        accumulate : bool, optional
+            If `True`, add values to those already in `out`, leaving
+            positions without data untouched. This allows data from several
+            files to be pooled into one array. If `False` (default), `out` is
+            overwritten, and positions without data are set to the fill value.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            `out`, filled with values covering `segments`
+
+        Raises
+        ------
+        ValueError
+            If `out` has the wrong length or type
+        """
+        cdef:
+            list seglist = list(segments)
+            long length = sum([len(X) for X in seglist])
+            numpy.ndarray view
+
+        if out is None:
+            out = numpy.empty(length,dtype=float)
+            accumulate = False
+        elif out.ndim != 1 or out.shape[0] != length or out.dtype != numpy.double:
+            raise ValueError("BigWigReader.get_chain(): `out` must be a 1-dimensional array of %s floats." % length)
+
+        if roi_order == True and len(seglist) > 0 and seglist[0].strand == "-":
+            view = out[::-1]
+        else:
+            view = out
+
+        self.c_fill_chain(seglist,view,accumulate)
+        return out
+
+    @cython.boundscheck(False) # valid because intervals are clipped to segments, whose total length is checked in get_chain()
+    @cython.wraparound(False)
+    cdef int c_fill_chain(self, list segments, double [:] out, bint accumulate) except -1:
+        """Write values covering `segments`, in genomic order, into `out`.
+        Segments separated by less than `CHAIN_QUERY_MAX_GAP` are fetched
+        with a single query, so that data blocks shared by neighboring
+        segments (e.g. short exons) are only read and decompressed once.
+        
+        Parameters
+        ----------
+        segments : list of |GenomicSegment|
+            Segments to fetch, sorted from left to right
+
+        out : double [:]
+            Output buffer, with length equal to the total length of `segments`
+
+        accumulate : bool
+            If `True`, add values to `out`. Otherwise, overwrite `out`,
+            setting positions without data to the fill value.
+        """
+        cdef:
+            GenomicSegment seg
+            dict     chroms = self.c_chroms()
+            long     num_segs = len(segments)
+            long     i = 0
+            long     j, p, q
+            long     k, kend, qstart, qend
+            double   val
+            lm     * buf
+            bbiFile* bbi = self._get_bbifile()
+            bbiInterval *iv
+            bytes    bchrom
+            char   * cchrom
+            numpy.ndarray offsets_arr = numpy.zeros(num_segs,dtype="l")
+            numpy.ndarray starts_arr  = numpy.array([X.start for X in segments],dtype="l")
+            numpy.ndarray ends_arr    = numpy.array([X.end for X in segments],dtype="l")
+            long [:] offsets = offsets_arr
+            long [:] starts  = starts_arr
+            long [:] ends    = ends_arr
+
+        if accumulate == False:
+            out[:] = self.fill
+
+        if num_segs > 1:
+            offsets_arr[1:] = numpy.cumsum(ends_arr - starts_arr)[:-1]
+
+        while i < num_segs:
+            seg = segments[i]
+
+            # group segments i..j-1 into a single query
+            j = i + 1
+            while j < num_segs and starts[j] - ends[j-1] < CHAIN_QUERY_MAX_GAP:
+                j += 1
+
+            if seg.chrom not in chroms:
+                warnings.warn(WARN_CHROM_NOT_FOUND % (seg.chrom,self.filename),DataWarning)
+            else:
+                buf    = self._get_lm()
+                bchrom = safe_bytes(seg.chrom)
+                cchrom = bchrom
+                with nogil:
+                    iv = bigWigIntervalQuery(bbi,cchrom,starts[i],ends[j-1],buf)
+                    p = i
+                    while iv is not NULL:
+                        while p < j and ends[p] <= iv.start:
+                            p += 1
+
+                        val = iv.val
+                        q = p
+                        while q < j and starts[q] < iv.end:
+                            qstart = max(<long>iv.start,starts[q])
+                            qend   = min(<long>iv.end,ends[q])
+                            k    = offsets[q] + qstart - starts[q]
+                            kend = offsets[q] + qend - starts[q]
+                            if accumulate == True:
+                                while k < kend:
+                                    out[k] += val
+                                    k += 1
+                            else:
+                                while k < kend:
+                                    out[k] = val
+                                    k += 1
+                            q += 1
+
+                        iv = iv.next
+
+            i = j
+
+        return 0
+
     def __getitem__(self, GenomicSegment roi):
         """Retrieve array of counts at each position in `roi`, in `roi`'s 5' to 3' direction
         
@@ -280,6 +493,7 @@ cdef class BigWigReader(_BBI_Reader):
                     vals    = self.c_get_chromosome_counts(chrom)
                     length  = vals.chromSize
                     vbuf = vals.valBuf
+                    i = 0
                     while i < length:
                         mysum += vbuf[i]
                         i += 1
@@ -292,14 +506,24 @@ cdef class BigWigReader(_BBI_Reader):
             
         return mysum
 
-    def sum(self):
+    def sum(self, bint exact=False):
         """Return sum of data in `BigWig`_ file, calculating if necessary
         
+        Parameters
+        ----------
+        exact : bool, optional
+            If `False` (default), return the sum stored in the file header
+            when the file was written, which is fast. If `True`, or if the
+            file has no header summary, decode and sum every position in the file.
+
         Returns
         -------
         double
             Sum of all values over all positions
         """
+        if exact == False and self._bbifile.totalSummaryOffset != 0:
+            return self.summary_info["sum"]
+
         return self.c_sum()
     
     cdef bigWigValsOnChrom* c_get_chromosome_counts(self, str chrom):
@@ -337,7 +561,7 @@ cdef class BigWigReader(_BBI_Reader):
             warnings.warn(WARN_CHROM_NOT_FOUND % (chrom,self.filename),DataWarning)
         
         vals    = bigWigValsOnChromNew()
-        success = bigWigValsOnChromFetchData(vals,safe_bytes(chrom),self._bbifile)
+        success = bigWigValsOnChromFetchData(vals,safe_bytes(chrom),self._get_bbifile())
             
         if success == False:
             warnings.warn("Could not retrieve data for chrom '%s' from file '%s'." % (chrom,self.filename),DataWarning)
@@ -399,32 +623,215 @@ cdef class BigWigReader(_BBI_Reader):
             
         return counts    
 
-# DISABLED - values for mean & stdev aren't even close to those expected from
-# known test files. However, pulling a numpy array with get() or __getitem__
-# and manually calculating mean & stdev *is* accurate
-#
-#     def summarize(self, GenomicSegment roi):
-#         """Summarize `BigWig`_ data over the region of interest.
-#         
-#         Note
-#         ----
-#         These are quickly calculated approximations. More accurate mean, stdev,
-#         et c can be calculated using ``bigwig_reader[roi].mean()`` et c
-#          
-#         Returns
-#         -------
-#         tuple of floats
-#             `(mean,max,min,fraction of bases covered,stdev)` of data in `BigWig`_ 
-#             file over the region defined by `roi` 
-#         """
-#         mean  = self._summarize(roi,bbiSumMean)
-#         max_  = self._summarize(roi,bbiSumMax)
-#         min_  = self._summarize(roi,bbiSumMin)
-#         cov   = self._summarize(roi,bbiSumCoverage)
-#         stdev = self._summarize(roi,bbiSumStandardDeviation)
-#          
-#         return (mean,max_,min_,cov,stdev)
+    def summarize(self, object roi, int n_bins=1, str stat="mean", bint roi_order=True):
+        """Summarize `BigWig`_ data in `n_bins` equal-sized bins covering `roi`,
+        using the lowest-resolution zoom level in the file that still
+        provides at least two summary records per bin (and per segment,
+        if `roi` is a |SegmentChain|). This is far faster
+        than fetching values at each position, e.g. for binned heatmaps
+        or downsampled browser tracks.
+
+        Positions without data are treated as zero, as in :meth:`get`.
+
+        Parameters
+        ----------
+        roi : |GenomicSegment| or |SegmentChain|
+            Region of interest in genome
+
+        n_bins : int, optional
+            Number of bins, between 1 and the length of `roi` (Default: `1`)
+
+        stat : str, optional
+            Statistic to calculate in each bin. One of `'mean'` (default),
+            `'sum'`, `'max'`, `'min'`, or `'coverage'` (fraction of positions
+            in bin that have data)
+
+        roi_order : bool, optional
+            If `True` (default), bins are ordered 5' to 3' relative to `roi`
+            rather than to the genome.
+
+        Returns
+        -------
+        :class:`numpy.ndarray`
+            Value of `stat` in each bin
+
+        Raises
+        ------
+        ValueError
+            If `stat` is not recognized, or `n_bins` is out of range
+
+        Notes
+        -----
+        Bins are laid out from the genomic 5' end of `roi`, so that bin
+        `i` covers positions ``length * i // n_bins`` to ``length * (i+1) // n_bins``
+        of `roi`, and are reversed for minus-strand features when `roi_order`
+        is `True`.
+
+        When a zoom level is used, statistics of summary records that
+        partially overlap a bin are apportioned to the bin by the fraction
+        of the record that overlaps it. `'sum'`, `'mean'` and `'coverage'` are
+        therefore approximations, and `'max'` and `'min'` may include values
+        from positions just outside the bin. Regions shorter than twice the
+        resolution of the finest zoom level are summarized from the
+        full-resolution data, and are exact.
+        """
+        cdef:
+            list segments
+            GenomicSegment seg
+            str chrom = roi.chrom
+            long length, offset = 0
+            int reduction
+            bbiZoomLevel *zoom = NULL
+            numpy.ndarray bounds, valid, total, maxes, mins, binlen, counts
+            double fill = self.fill
+
+        if stat not in SUMMARY_STATS:
+            raise ValueError("BigWigReader.summarize(): `stat` must be one of %s. Got '%s'." % (", ".join(SUMMARY_STATS),stat))
+
+        if isinstance(roi,SegmentChain):
+            segments = list(roi)
+        else:
+            segments = [roi]
+
+        length = sum([len(X) for X in segments])
+        if n_bins < 1 or n_bins > length:
+            raise ValueError("BigWigReader.summarize(): `n_bins` must be between 1 and the length of `roi` (%s). Got %s." % (length,n_bins))
+
+        # same bin boundaries used by the Kent utilities
+        bounds = numpy.arange(n_bins + 1,dtype="l") * length // n_bins
+        valid  = numpy.zeros(n_bins,dtype=float)
+        total  = numpy.zeros(n_bins,dtype=float)
+        maxes  = numpy.full(n_bins,-numpy.inf,dtype=float)
+        mins   = numpy.full(n_bins,numpy.inf,dtype=float)
+
+        if chrom not in self.c_chroms():
+            warnings.warn(WARN_CHROM_NOT_FOUND % (chrom,self.filename),DataWarning)
+        else:
+            # ask for two summary records per bin, as in the Kent utilities,
+            # and per segment, so that short exons aren't smeared by coarse zooms
+            reduction = min(length // n_bins,min([len(X) for X in segments])) // 2
+            zoom = bbiBestZoom(self._bbifile.levelList,reduction)
+            for seg in segments:
+                self._summarize_segment(seg,offset,zoom,bounds,valid,total,maxes,mins)
+                offset += len(seg)
+
+        binlen = numpy.diff(bounds).astype(float)
+        valid  = numpy.minimum(valid,binlen)
+        if stat == "sum":
+            counts = total + fill*(binlen - valid)
+        elif stat == "mean":
+            counts = (total + fill*(binlen - valid)) / binlen
+        elif stat == "coverage":
+            counts = valid / binlen
+        elif stat == "max":
+            counts = numpy.where(valid < binlen,numpy.maximum(maxes,fill),maxes)
+        else:
+            counts = numpy.where(valid < binlen,numpy.minimum(mins,fill),mins)
+
+        if roi.strand == "-" and roi_order == True:
+            counts = counts[::-1]
+
+        return counts
+
+    cdef int _summarize_segment(self, GenomicSegment seg, long offset, bbiZoomLevel *zoom,
+                                long [:] bounds, double [:] valid, double [:] total,
+                                double [:] maxes, double [:] mins) except -1:
+        """Add summary statistics of data in `seg` to bins in :meth:`summarize`
         
+        Parameters
+        ----------
+        seg : |GenomicSegment|
+            Segment to summarize
+
+        offset : long
+            Position of `seg` within the region being summarized
+
+        zoom : bbiZoomLevel*
+            Zoom level to use. If `NULL`, full-resolution data are used.
+
+        bounds : long [:]
+            Bin boundaries, in coordinates of region being summarized
+
+        valid, total, maxes, mins : double [:]
+            Number of positions with data, sum of values, maximum, and minimum
+            values in each bin. Updated in place.
+        """
+        cdef:
+            long segstart = seg.start
+            long segend   = seg.end
+            long n = bounds.shape[0] - 1
+            long j = 0
+            long k, cstart, cend, overlap
+            double frac, val
+            int chrom_id
+            bbiSummary *sumlist
+            bbiSummary *sumptr
+            bbiInterval *iv
+            bbiFile *bbi = self._get_bbifile()
+            lm *buf
+            bytes chrom = safe_bytes(seg.chrom)
+            char *cchrom = chrom
+
+        if self._chrom_name_ids is None:
+            self._chrom_name_ids = { V : K for K, V in self._chromids.items() }
+
+        if zoom != NULL:
+            chrom_id = self._chrom_name_ids[seg.chrom]
+            with nogil:
+                sumlist = bbiSummariesInRegion(zoom,bbi,chrom_id,segstart,segend)
+
+            sumptr = sumlist
+            try:
+                while sumptr != NULL:
+                    cstart = max(<long>sumptr.start,segstart) - segstart + offset
+                    cend   = min(<long>sumptr.end,segend) - segstart + offset
+                    while j < n and bounds[j+1] <= cstart:
+                        j += 1
+
+                    k = j
+                    while k < n and bounds[k] < cend:
+                        overlap = min(cend,bounds[k+1]) - max(cstart,bounds[k])
+                        if overlap > 0:
+                            frac = (<double>overlap) / (sumptr.end - sumptr.start)
+                            valid[k] += sumptr.validCount * frac
+                            total[k] += sumptr.sumData * frac
+                            if sumptr.maxVal > maxes[k]:
+                                maxes[k] = sumptr.maxVal
+                            if sumptr.minVal < mins[k]:
+                                mins[k] = sumptr.minVal
+                        k += 1
+
+                    sumptr = sumptr.next_
+            finally:
+                slFreeList(&sumlist)
+        else:
+            buf = self._get_lm()
+            with nogil:
+                iv = bigWigIntervalQuery(bbi,cchrom,segstart,segend,buf)
+
+            while iv != NULL:
+                cstart = iv.start - segstart + offset
+                cend   = iv.end - segstart + offset
+                val    = iv.val
+                while j < n and bounds[j+1] <= cstart:
+                    j += 1
+
+                k = j
+                while k < n and bounds[k] < cend:
+                    overlap = min(cend,bounds[k+1]) - max(cstart,bounds[k])
+                    if overlap > 0:
+                        valid[k] += overlap
+                        total[k] += val * overlap
+                        if val > maxes[k]:
+                            maxes[k] = val
+                        if val < mins[k]:
+                            mins[k] = val
+                    k += 1
+
+                iv = iv.next
+
+        return 0
+
     cdef double _summarize(self, GenomicSegment roi, bbiSummaryType type_):
         """Summarize `BigWig`_ data over ROI for a single statistic
          
@@ -530,7 +937,7 @@ def BigWigIterator(BigWigReader reader, maxmem=0):
             raise MemoryError("BigWigIterator: could not allocate memory.")
 
         chromlength = chromsizes[chrom]
-        iv = bigWigIntervalQuery(reader._bbifile,
+        iv = bigWigIntervalQuery(reader._get_bbifile(),
                                  safe_bytes(chrom),
                                  0,
                                  chromlength,
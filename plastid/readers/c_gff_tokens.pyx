@@ -0,0 +1,312 @@
+"""Compiled tokenizers for `GTF2`_ and `GFF3`_ lines and attribute strings.
+
+These functions return the same values as their pure-Python counterparts in
+:py:mod:`plastid.readers.gff_tokens`, but scan attribute strings in a single
+pass instead of using :py:func:`shlex.split` and per-token unescaping loops,
+which dominate the cost of reading large annotation files. In addition:
+
+  - attribute keys, and values of keys that are shared by many lines
+    (e.g. `gene_id` and `transcript_id`), are interned, so that the millions
+    of features in a large annotation share one copy of each string
+
+  - escape sequences are only decoded for tokens that contain a `'%'`
+
+  - callers may request only a subset of attributes. Other attributes
+    are skipped without being decoded.
+
+Lines that the fast scanners cannot handle unambiguously (e.g. `GTF2`_ values
+containing backslashes, or malformed attribute strings) are handed to the
+pure-Python implementations, so that results and errors are identical.
+
+Module Contents
+---------------
+
+.. autosummary::
+
+   parse_GFF_line
+   parse_GTF2_tokens
+   parse_GFF3_tokens
+
+See also
+--------
+:py:mod:`plastid.readers.gff_tokens`
+    Pure-Python tokenizers, and functions for formatting attributes
+"""
+import sys
+from plastid.readers.gff_tokens import unescape_GTF2, unescape_GFF3, _GFF3_DEFAULT_LISTS
+from plastid.readers.gff_tokens import parse_GTF2_tokens as _py_parse_GTF2_tokens
+from plastid.readers.gff_tokens import parse_GFF3_tokens as _py_parse_GFF3_tokens
+from plastid.util.services.exceptions import FileFormatWarning, warn
+
+try:
+    from sys import intern as _intern
+except ImportError: # Python 2
+    from __builtin__ import intern as _intern
+
+
+_INTERNED_VALUE_KEYS = frozenset(["gene_id",
+                                  "transcript_id",
+                                  "gene_name",
+                                  "gene_type",
+                                  "gene_biotype",
+                                  "transcript_type",
+                                  "transcript_biotype",
+                                  "Parent",
+                                  ])
+"""Attributes whose values are shared by many features, and which are therefore interned"""
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+cdef inline bint _is_space(Py_UCS4 c):
+    """Return `True` if `c` is whitespace, as defined by :py:mod:`shlex`"""
+    return c == u" " or c == u"\t" or c == u"\n" or c == u"\r"
+
+cdef inline str _unescape_GTF2(str inp):
+    """Unescape `inp` only if it contains escape sequences"""
+    if u"%" in inp:
+        return unescape_GTF2(inp)
+    return inp
+
+cdef inline str _unescape_GFF3(str inp):
+    """Unescape `inp` only if it contains escape sequences"""
+    if u"%" in inp:
+        return unescape_GFF3(inp)
+    return inp
+
+cdef dict _select_attributes(dict d, object attributes):
+    """Remove keys not named in `attributes` from `d`, unless `attributes` is `None`"""
+    if attributes is None:
+        return d
+    return { K : V for K,V in d.items() if K in attributes }
+
+cdef dict _fallback_GTF2_tokens(str inp, object attributes):
+    """Parse `inp` with the pure-Python tokenizer, keeping only `attributes`"""
+    return _select_attributes(_py_parse_GTF2_tokens(inp),attributes)
+
+cdef dict _fallback_GFF3_tokens(str inp, object list_types, object attributes):
+    """Parse `inp` with the pure-Python tokenizer, keeping only `attributes`"""
+    return _select_attributes(_py_parse_GFF3_tokens(inp,list_types=list_types),attributes)
+
+
+#===============================================================================
+# INDEX: line & attribute parsing
+#===============================================================================
+
+def parse_GFF_line(str line, bint adjust_to_0=True, bint end_included=True):
+    """Split a feature line from a `GTF2`_ or `GFF3`_ file into its nine columns,
+    converting coordinates to integers. Columns that repeat across many lines
+    (chromosome, source, feature type, score, strand and phase) are interned.
+
+    Parameters
+    ----------
+    line : str
+        Feature line from a `GTF2`_ or `GFF3`_ file
+
+    adjust_to_0 : bool, optional
+        If `True`, subtract 1 from coordinates, converting them to a
+        0-indexed system (Default: `True`)
+
+    end_included : bool, optional
+        If `True`, the end coordinate in `line` is included in the
+        feature, and 1 is added to it to produce a half-open
+        interval (Default: `True`)
+
+    Returns
+    -------
+    tuple
+        `(chrom, source, feature_type, start, end, score, strand, phase, attr_string)`
+    """
+    cdef:
+        list items = line.rstrip(u"\n").split(u"\t")
+        long start, end
+
+    start = int(items[3]) - adjust_to_0
+    end   = int(items[4]) - adjust_to_0 + end_included
+    return (_intern(items[0]),
+            _intern(items[1]),
+            _intern(items[2]),
+            start,
+            end,
+            _intern(items[5]),
+            _intern(items[6]),
+            _intern(items[7]),
+            items[8])
+
+def parse_GTF2_tokens(str inp, object attributes=None):
+    """Parse tokens in the final column of a `GTF2`_ file into a dictionary
+    of attributes. Values are identical to those of
+    :py:func:`plastid.readers.gff_tokens.parse_GTF2_tokens`.
+
+    Parameters
+    ----------
+    inp : str
+        Ninth column of `GTF2`_ entry
+
+    attributes : set or None, optional
+        If not `None`, only attributes named in `attributes` are parsed
+        and returned. (Default: `None`, parse all attributes)
+
+    Returns
+    -------
+    dict : key-value pairs
+    """
+    cdef:
+        dict d = {}
+        str key, val
+        Py_ssize_t i = 0
+        Py_ssize_t n, start, stop
+        Py_UCS4 c
+        bint ends_with_semicolon
+
+    inp = inp.strip(u"\n")
+    n = len(inp)
+    while True:
+        while i < n and _is_space(inp[i]):
+            i += 1
+
+        if i >= n:
+            break
+
+        # key
+        start = i
+        while i < n and not _is_space(inp[i]):
+            c = inp[i]
+            if c == u"\"" or c == u"'" or c == u"\\":
+                return _fallback_GTF2_tokens(inp,attributes)
+            i += 1
+
+        key = inp[start:i]
+        while i < n and _is_space(inp[i]):
+            i += 1
+
+        if i >= n: # key without value
+            return _fallback_GTF2_tokens(inp,attributes)
+
+        # value
+        if inp[i] == u"\"":
+            i += 1
+            start = i
+            while i < n and inp[i] != u"\"":
+                if inp[i] == u"\\":
+                    return _fallback_GTF2_tokens(inp,attributes)
+                i += 1
+
+            if i >= n: # unterminated quote
+                return _fallback_GTF2_tokens(inp,attributes)
+
+            stop = i
+            i += 1
+            if i < n and inp[i] == u";":
+                ends_with_semicolon = True
+                val = inp[start:stop]
+                i += 1
+            else:
+                val = inp[start:stop]
+                ends_with_semicolon = val.endswith(u";")
+                if ends_with_semicolon:
+                    val = val[:-1]
+
+            if i < n and not _is_space(inp[i]): # token continues after quotes
+                return _fallback_GTF2_tokens(inp,attributes)
+        else:
+            start = i
+            while i < n and not _is_space(inp[i]):
+                c = inp[i]
+                if c == u"\"" or c == u"'" or c == u"\\":
+                    return _fallback_GTF2_tokens(inp,attributes)
+                i += 1
+
+            val = inp[start:i]
+            ends_with_semicolon = val.endswith(u";")
+            if ends_with_semicolon:
+                val = val[:-1]
+
+        # all but the final value must be terminated by semicolons
+        if not ends_with_semicolon:
+            start = i
+            while start < n and _is_space(inp[start]):
+                start += 1
+            if start < n:
+                return _fallback_GTF2_tokens(inp,attributes)
+
+        key = _unescape_GTF2(key)
+        if attributes is not None and key not in attributes:
+            continue
+
+        key = _intern(key)
+        val = _unescape_GTF2(val)
+        if key in d:
+            warn("Found duplicate attribute key '%s' in GTF2 line. Catenating value with previous value for key in attr dict:\n    %s" % (key,inp),
+                 FileFormatWarning)
+            d[key] = "%s,%s" % (d[key],val)
+        else:
+            if key in _INTERNED_VALUE_KEYS:
+                val = _intern(val)
+            d[key] = val
+
+    return d
+
+def parse_GFF3_tokens(str inp, object list_types=None, object attributes=None):
+    """Parse tokens in the final column of a `GFF3`_ file into a dictionary
+    of attributes. Values are identical to those of
+    :py:func:`plastid.readers.gff_tokens.parse_GFF3_tokens`.
+
+    Parameters
+    ----------
+    inp : str
+        Ninth column of `GFF3`_ entry
+
+    list_types : list, optional
+        Names of attributes that should be returned as lists
+        (Default: `Parent`, `Alias`, `Note`, `Dbxref`, `Ontology_term`, `dbxref`)
+
+    attributes : set or None, optional
+        If not `None`, only attributes named in `attributes` are parsed
+        and returned. (Default: `None`, parse all attributes)
+
+    Returns
+    -------
+    dict : key-value pairs
+    """
+    cdef:
+        dict d = {}
+        str item, key
+        object val
+        Py_ssize_t eq
+
+    if list_types is None:
+        list_types = _GFF3_DEFAULT_LISTS
+
+    for item in inp.strip(u"\n").strip(u";").split(u";"):
+        if len(item) == 0:
+            continue
+
+        eq = item.find(u"=")
+        if eq < 0 or item.find(u"=",eq+1) >= 0: # malformed token
+            return _fallback_GFF3_tokens(inp,list_types,attributes)
+
+        key = _unescape_GFF3(item[:eq].strip(u" "))
+        if attributes is not None and key not in attributes:
+            continue
+
+        key = _intern(key)
+        if key in list_types:
+            if key in _INTERNED_VALUE_KEYS:
+                val = [_intern(_unescape_GFF3(X)) for X in item[eq+1:].strip(u" ").split(u",")]
+            else:
+                val = [_unescape_GFF3(X) for X in item[eq+1:].strip(u" ").split(u",")]
+        else:
+            val = _unescape_GFF3(item[eq+1:].strip(u" "))
+            if key in _INTERNED_VALUE_KEYS:
+                val = _intern(val)
+
+        if key in d:
+            warn("Found duplicate attribute key '%s' in GFF3 line. Catenating value with previous value for key in attr dict:\n    %s" % (key,inp),
+                 FileFormatWarning)
+            val = "%s,%s" % (d[key],val)
+        d[key] = val
+
+    return d
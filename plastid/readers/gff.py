@@ -21,6 +21,12 @@ feature having its own record on its own line -- two interfaces for reading
         Features are read from `GTF2`_/`GFF3`_ files, grouped by `transcript_id`,
         `Parent`, or `ID` attributes, depending on file type. Assembled |Transcripts|
         are yielded only when their component features have fully been collected.
+
+    Indexed assembly of large, unsorted files
+        |GTF2_IndexedTranscriptAssembler| and |GFF3_IndexedTranscriptAssembler|
+        build (once) an on-disk index of feature offsets by chromosome, and then
+        assemble transcripts one chromosome at a time, optionally in parallel.
+        Memory use is bounded by the largest chromosome rather than the file.
         
     Low-level parsing of simple features
         |GTF2_Reader| and |GFF3_Reader| read raw features (such as individual
@@ -34,8 +40,10 @@ Module contents
 
    GTF2_Reader
    GTF2_TranscriptAssembler
+   GTF2_IndexedTranscriptAssembler
    GFF3_Reader
    GFF3_TranscriptAssembler
+   GFF3_IndexedTranscriptAssembler
 
 
 Examples
@@ -97,6 +105,7 @@ __date__ ="$Dec 1, 2010 11:00:55 AM$"
 import itertools
 import gc
 import copy
+import os
 import sys
 from abc import abstractmethod
 from plastid.util.io.filters import AbstractReader, SkipBlankReader
@@ -105,7 +114,8 @@ from plastid.readers.common import get_identical_attributes, \
                                    AssembledFeatureReader
 from plastid.genomics.roitools import Transcript, SegmentChain, \
                                       GenomicSegment, add_three_for_stop_codon
-from plastid.readers.gff_tokens import parse_GFF3_tokens, parse_GTF2_tokens
+from plastid.genomics.chain_table import pack_chains, unpack_chains
+from plastid.readers.c_gff_tokens import parse_GFF_line, parse_GFF3_tokens, parse_GTF2_tokens
 from plastid.util.services.exceptions import DataWarning, warn
 
 #===============================================================================
@@ -369,6 +379,41 @@ encountered, indicating that all previously returned features may be assembled
 into full objects. Also emitted when a GFF is sorted by chromosome, and
 the chromosome name changes"""
 
+def _parse_GFF_metatokens(inp,metadata,chromosomes):
+    """Parse a line of metadata from a GFF file, minus its leading `'##'`,
+    storing `sequence-region` lines in `chromosomes` and all others in `metadata`.
+    Values of keys that appear more than once are joined by semicolons.
+
+    Parameters
+    ----------
+    inp : str
+        line of GFF metadata, without leading `'##'`
+
+    metadata : dict
+        Dictionary of metadata, updated in place
+
+    chromosomes : dict
+        Dictionary of `sequence-region` boundaries, updated in place
+
+    Raises
+    ------
+    StopIteration : when line is a `'##FASTA'` directive
+    """
+    items = inp.rstrip().split()
+    if len(items) > 0:
+        key = items[0]
+        if key == "FASTA":
+            raise StopIteration() #e.g. is end of features
+        elif key == "sequence-region":
+            try:
+                chromosomes[items[1]] = (items[2],items[3])
+            except IndexError:
+                chromosomes[items[1]] = tuple(items[1:])
+        elif key in metadata.keys():
+            metadata[key] += ";" + " ".join(items[1:])
+        else:
+            metadata[key] = " ".join(items[1:])
+
 class AbstractGFF_Reader(AbstractReader):
     """Abstract base class for GFF readers.
     
@@ -413,6 +458,12 @@ class AbstractGFF_Reader(AbstractReader):
         tabix : boolean, optional
             `streams` point to `tabix`_-compressed files or are open
             :class:`~pysam.ctabix.tabix_file_iterator` (Default: `False`)        
+
+        attributes : list or None, optional
+            If not `None`, only attributes in column 9 whose names are in
+            `attributes` are parsed; all others are skipped. This speeds
+            reading of attribute-rich files, such as those from GENCODE.
+            (Default: `None`, parse all attributes)
         """
         #adjust_to_0=True,end_included=True,return_stopfeatures=True,is_sorted=False,tabix=False
         stream = itertools.chain.from_iterable(multiopen(streams,fn=open))
@@ -427,6 +478,9 @@ class AbstractGFF_Reader(AbstractReader):
         self.end_included        = kwargs.get("end_included",True)
         self.return_stopfeatures = kwargs.get("return_stopfeatures",True)
         self.is_sorted           = kwargs.get("is_sorted",False)
+
+        attributes = kwargs.get("attributes",None)
+        self.attributes = None if attributes is None else frozenset(attributes)
         
         line = next(stream)
         while line[0:2] == "##":
@@ -452,20 +506,7 @@ class AbstractGFF_Reader(AbstractReader):
         ------
         StopIteration : when no features remain in file
         """
-        items = inp.rstrip().split()
-        if len(items) > 0:
-            key = items[0]
-            if key == "FASTA":
-                raise StopIteration() #e.g. is end of features
-            elif key == "sequence-region":
-                try:
-                    self.chromosomes[items[1]] = (items[2],items[3])
-                except IndexError:
-                    self.chromosomes[items[1]] = tuple(items[1:])
-            elif key in self.metadata.keys():
-                self.metadata[key] += ";" + " ".join(items[1:])
-            else:
-                self.metadata[key] = " ".join(items[1:])
+        _parse_GFF_metatokens(inp,self.metadata,self.chromosomes)
     
     @abstractmethod
     def _parse_tokens(self,attr_string):
@@ -497,16 +538,8 @@ class AbstractGFF_Reader(AbstractReader):
         -------
         |SegmentChain|
         """
-        items = line.rstrip("\n").split("\t")
-        chrom        = items[0]
-        source       = items[1]
-        feature_type = items[2]
-        start        = int(items[3]) - int(self.adjust_to_0)
-        end          = int(items[4]) - int(self.adjust_to_0) + int(self.end_included)
-        score        = items[5]
-        strand       = items[6]
-        phase        = items[7]
-        attr_string  = items[8]            
+        chrom, source, feature_type, start, end, score, strand, phase, attr_string = \
+            parse_GFF_line(line,self.adjust_to_0,self.end_included)
         info_dict = self._parse_tokens(attr_string)
         info_dict['source'] = source
         info_dict['score']  = score
@@ -556,7 +589,7 @@ class AbstractGFF_Reader(AbstractReader):
     
 class GFF3_Reader(AbstractGFF_Reader):
     """
-    GFF3_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False)
+    GFF3_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False, attributes=None)
     
     Read raw features in `GFF3`_ files as |SegmentChains|.
     
@@ -629,7 +662,7 @@ class GFF3_Reader(AbstractGFF_Reader):
     
     def __init__(self,*streams,**kwargs): #,end_included=True,return_stopfeatures=False,is_sorted=False,tabix=False):
         """
-        GFF3_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False)
+        GFF3_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False, attributes=None)
         
         Parameters
         ----------
@@ -656,6 +689,10 @@ class GFF3_Reader(AbstractGFF_Reader):
         tabix : boolean, optional
             `streams` point to `tabix`_-compressed files or are open
             :class:`~pysam.ctabix.tabix_file_iterator` (Default: `False`)
+
+        attributes : list or None, optional
+            If not `None`, only attributes in column 9 whose names are in
+            `attributes` are parsed. (Default: `None`, parse all attributes)
          """
         super(GFF3_Reader,self).__init__(*streams,adjust_to_0=True,**kwargs)
 #                                          adjust_to_0=True,
@@ -676,12 +713,12 @@ class GFF3_Reader(AbstractGFF_Reader):
         dict
             Dictionary of parsed tokens from ninth `GFF3`_ column
         """
-        return parse_GFF3_tokens(inp)
+        return parse_GFF3_tokens(inp,attributes=self.attributes)
     
             
 class GTF2_Reader(AbstractGFF_Reader): 
     """
-    GTF2_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False)
+    GTF2_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False, attributes=None)
     
     Read raw features in `GTF2`_ files as |SegmentChains|. To assemble transcripts
     from raw features, use |GTF2_TranscriptAssembler|.
@@ -749,7 +786,7 @@ class GTF2_Reader(AbstractGFF_Reader):
     """
     def __init__(self,*streams,**kwargs): #,end_included=True,return_stopfeatures=False,is_sorted=False,tabix=False):
         """
-        GTF2_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False)
+        GTF2_Reader(*streams, end_included=True, return_stopfeatures=False, is_sorted=False, tabix=False, attributes=None)
         
         Parameters
         ----------
@@ -776,6 +813,10 @@ class GTF2_Reader(AbstractGFF_Reader):
         tabix : boolean, optional
             `streams` point to `tabix`_-compressed files or are open
             :class:`~pysam.ctabix.tabix_file_iterator` (Default: `False`)
+
+        attributes : list or None, optional
+            If not `None`, only attributes in column 9 whose names are in
+            `attributes` are parsed. (Default: `None`, parse all attributes)
         """
         super(GTF2_Reader,self).__init__(*streams,adjust_to_0=True,**kwargs)
 #                                          adjust_to_0=True,
@@ -796,7 +837,7 @@ class GTF2_Reader(AbstractGFF_Reader):
         dict
             Dictionary of parsed tokens from ninth `GTF2`_ column
         """
-        return parse_GTF2_tokens(inp)
+        return parse_GTF2_tokens(inp,attributes=self.attributes)
 
 class AbstractGFF_Assembler(AssembledFeatureReader):
     """Abstract base class for readers that assemble composite features
@@ -1518,3 +1559,566 @@ class GFF3_TranscriptAssembler(AbstractGFF_Assembler):
             
 
 
+#===============================================================================
+# INDEX: Indexed assembly of unsorted GFF files
+#===============================================================================
+
+_GFF_INDEX_VERSION = 2
+_GFF_INDEX_HEADER  = "##plastid_gff_index"
+_GFF_INDEX_MULTICHROM = "#multichromosome"
+_GFF_INDEX_METADATA   = "#metadata"
+
+_GTF2_GROUP_ATTRIBUTES = frozenset(["transcript_id"])
+_GFF3_GROUP_ATTRIBUTES = frozenset(["Parent","ID"])
+
+def _get_GTF2_group_names(attr_string):
+    """Return the names of transcripts a `GTF2`_ feature may belong to
+    
+    Parameters
+    ----------
+    attr_string : str
+        Ninth column of `GTF2`_
+
+    Returns
+    -------
+    list
+    """
+    tname = parse_GTF2_tokens(attr_string,attributes=_GTF2_GROUP_ATTRIBUTES).get("transcript_id")
+    return [] if tname is None else [tname]
+
+def _get_GFF3_group_names(attr_string):
+    """Return the names of transcripts a `GFF3`_ feature may belong to
+    or define, i.e. its `Parent` and `ID` attributes
+
+    Parameters
+    ----------
+    attr_string : str
+        Ninth column of `GFF3`_
+
+    Returns
+    -------
+    list
+    """
+    attr = parse_GFF3_tokens(attr_string,attributes=_GFF3_GROUP_ATTRIBUTES)
+    names = list(attr.get("Parent",[]))
+    if "ID" in attr:
+        names.append(attr["ID"])
+    return names
+
+_GFF_GROUP_NAME_FUNCTIONS = { "GTF2" : _get_GTF2_group_names,
+                              "GFF3" : _get_GFF3_group_names }
+
+def get_GFF_index_filename(filename):
+    """Return the default name of the on-disk index for `filename`
+
+    Parameters
+    ----------
+    filename : str
+        Name of `GTF2`_ or `GFF3`_ file
+
+    Returns
+    -------
+    str
+    """
+    return "%s.plidx" % filename
+
+def _get_index_header(filename,file_format):
+    """Return the header line used to detect stale or mismatched indices
+
+    Parameters
+    ----------
+    filename : str
+        Name of indexed file
+
+    file_format : str
+        `'GTF2'` or `'GFF3'`
+
+    Returns
+    -------
+    list
+        Header fields: magic string, index version, file format, and size and
+        integer modification time of `filename`
+    """
+    st = os.stat(filename)
+    return [_GFF_INDEX_HEADER,str(_GFF_INDEX_VERSION),file_format,str(st.st_size),str(int(st.st_mtime))]
+
+def index_GFF(filename,file_format="GTF2",index_file=None,printer=None):
+    """Build an on-disk index of the feature lines in a `GTF2`_ or `GFF3`_ file.
+    
+    The index records, for each chromosome, the byte ranges of the file
+    that contain features on that chromosome. Runs of consecutive lines from
+    the same chromosome are stored as a single range, so indices of sorted
+    or mostly-sorted files are tiny. Comment and `'###'` lines are skipped,
+    and indexing stops at a `'##FASTA'` line. Metadata (`'##'`) lines are
+    copied into the index, so that they may be read without rescanning the file.
+
+    The index also records the names of transcripts (`transcript_id` for
+    `GTF2`_; `Parent` or `ID` for `GFF3`_) whose features lie on more than one
+    chromosome, so that these can be rejected, as they are by
+    |GTF2_TranscriptAssembler| and |GFF3_TranscriptAssembler|.
+
+    Parameters
+    ----------
+    filename : str
+        Name of uncompressed `GTF2`_ or `GFF3`_ file
+
+    file_format : str, optional
+        `'GTF2'` or `'GFF3'` (Default: `'GTF2'`)
+
+    index_file : str, optional
+        Name of index file to write (Default: `filename` + `'.plidx'`)
+
+    printer : file-like, optional
+        Logger implementing a ``write()`` method. Default: |NullWriter|
+
+    Returns
+    -------
+    str
+        Name of index file
+
+    Raises
+    ------
+    ValueError
+        If `filename` is compressed, because compressed files cannot be
+        randomly accessed by byte offset
+    """
+    if filename.endswith((".gz",".bz2",".zip")):
+        raise ValueError("Cannot index compressed file '%s'. Please decompress it first." % filename)
+
+    if index_file is None:
+        index_file = get_GFF_index_filename(filename)
+
+    if printer is None:
+        printer = NullWriter()
+
+    get_group_names = _GFF_GROUP_NAME_FUNCTIONS[file_format]
+
+    printer.write("Indexing features in '%s' ..." % filename)
+    runs = {}
+    name_chroms = {}
+    multichrom  = set()
+    metadata   = []
+    last_chrom = None
+    run_start  = 0
+    offset     = 0
+    with open(filename,"rb") as fh:
+        for line in fh:
+            if line[:1] == b"#" or line.strip() == b"":
+                if line[:7] == b"##FASTA":
+                    break
+                elif line[:2] == b"##" and line[:3] != b"###":
+                    metadata.append(line[2:].decode("utf-8").rstrip("\r\n"))
+
+                # close current run, so that comments are not re-read
+                if last_chrom is not None:
+                    runs[last_chrom].append((run_start,offset))
+                    last_chrom = None
+            else:
+                items = line.decode("utf-8").rstrip("\r\n").split("\t")
+                chrom = items[0]
+                if chrom != last_chrom:
+                    if last_chrom is not None:
+                        runs[last_chrom].append((run_start,offset))
+                    if chrom not in runs:
+                        runs[chrom] = []
+                    last_chrom = chrom
+                    run_start  = offset
+
+                for name in get_group_names(items[8]):
+                    if name_chroms.setdefault(name,chrom) != chrom:
+                        multichrom.add(name)
+
+            offset += len(line)
+
+    if last_chrom is not None:
+        runs[last_chrom].append((run_start,offset))
+
+    with open(index_file,"w") as fout:
+        fout.write("\t".join(_get_index_header(filename,file_format)) + "\n")
+        for chrom in sorted(runs):
+            for start, end in runs[chrom]:
+                fout.write("%s\t%s\t%s\n" % (chrom,start,end))
+        for name in sorted(multichrom):
+            fout.write("%s\t%s\n" % (_GFF_INDEX_MULTICHROM,name))
+        for line in metadata:
+            fout.write("%s\t%s\n" % (_GFF_INDEX_METADATA,line))
+
+    return index_file
+
+def read_GFF_index(filename,file_format="GTF2",index_file=None,printer=None):
+    """Read the on-disk index for a `GTF2`_ or `GFF3`_ file, creating or
+    rebuilding the index if it is missing, or if `filename` has changed
+    since it was built
+    
+    Parameters
+    ----------
+    filename : str
+        Name of uncompressed `GTF2`_ or `GFF3`_ file
+
+    file_format : str, optional
+        `'GTF2'` or `'GFF3'` (Default: `'GTF2'`)
+
+    index_file : str, optional
+        Name of index file (Default: `filename` + `'.plidx'`)
+
+    printer : file-like, optional
+        Logger implementing a ``write()`` method. Default: |NullWriter|
+
+    Returns
+    -------
+    dict
+        Dictionary mapping chromosome names to lists of `(start, end)`
+        byte ranges in `filename`
+
+    set
+        Names of transcripts whose features lie on multiple chromosomes
+
+    list
+        Metadata lines from `filename`, minus their leading `'##'`, in file order
+    """
+    if index_file is None:
+        index_file = get_GFF_index_filename(filename)
+
+    stale = True
+    if os.path.exists(index_file):
+        with open(index_file) as fh:
+            header = fh.readline().rstrip("\n").split("\t")
+        stale = header != _get_index_header(filename,file_format)
+
+    if stale == True:
+        index_GFF(filename,file_format=file_format,index_file=index_file,printer=printer)
+
+    runs = {}
+    multichrom = set()
+    metadata   = []
+    with open(index_file) as fh:
+        fh.readline()
+        for line in fh:
+            items = line.rstrip("\n").split("\t")
+            if items[0] == _GFF_INDEX_METADATA:
+                metadata.append(line.rstrip("\n")[len(_GFF_INDEX_METADATA)+1:])
+            elif items[0] == _GFF_INDEX_MULTICHROM:
+                multichrom.add(items[1])
+            else:
+                chrom, start, end = items
+                try:
+                    runs[chrom].append((int(start),int(end)))
+                except KeyError:
+                    runs[chrom] = [(int(start),int(end))]
+
+    return runs, multichrom, metadata
+
+def _assemble_indexed_chromosome(task):
+    """Assemble transcripts from all features on a single chromosome of an indexed file.
+    Defined at module level so that it may be sent to worker processes.
+
+    Parameters
+    ----------
+    task : tuple
+        `(filename, byte_ranges, assembler_class, kwargs)`
+
+    Returns
+    -------
+    tuple
+        List of assembled transcripts, and list of rejected transcript IDs
+    """
+    filename, byte_ranges, assembler_class, kwargs = task
+    lines = []
+    with open(filename,"rb") as fh:
+        for start, end in byte_ranges:
+            fh.seek(start)
+            lines.extend(fh.read(end - start).decode("utf-8").splitlines(True))
+
+    assembler = assembler_class(lines,**kwargs)
+    transcripts = list(assembler)
+    return transcripts, assembler.rejected
+
+def _assemble_indexed_chromosome_packed(task):
+    """Run :func:`_assemble_indexed_chromosome` in a worker process, returning
+    transcripts serialized by :func:`~plastid.genomics.chain_table.pack_chains`,
+    which are much faster to send back to the parent process than pickled
+    |Transcripts|.
+
+    Parameters
+    ----------
+    task : tuple
+        `(filename, byte_ranges, assembler_class, kwargs)`
+
+    Returns
+    -------
+    tuple
+        Serialized transcripts, and list of rejected transcript IDs
+    """
+    transcripts, rejected = _assemble_indexed_chromosome(task)
+    return pack_chains(transcripts), rejected
+
+
+class AbstractGFF_IndexedAssembler(object):
+    """Abstract base class for assemblers that reconstruct |Transcripts| from
+    `GTF2`_ or `GFF3`_ files one chromosome at a time, using an on-disk index
+    of feature offsets. Files need not be sorted, and only the features from
+    one chromosome (per process) are held in memory at any time.
+    
+    Attributes
+    ----------
+    filenames : list
+        Names of annotation files
+
+    metadata : dict
+        Metadata found in file headers, populated as each file's index is read
+        
+    chromosomes : dict
+        Boundaries of chromosomes given by `sequence-region` metadata, if any
+
+    printer : file-like, optional
+        Logger implementing a ``write()`` method.
+
+    rejected : list
+        A list of transcript IDs that failed to assemble properly
+    """
+
+    assembler_class = None
+    file_format = None
+
+    def __init__(self,*filenames,**kwargs):
+        """Create an |AbstractGFF_IndexedAssembler|
+
+        Parameters
+        ----------
+        *filenames : str
+            Names of one or more uncompressed annotation files
+
+        processes : int, optional
+            Number of processes in which to assemble chromosomes (Default: `1`)
+
+        index_files : list, optional
+            Names of index files, one per file in `filenames`. If an index
+            is missing or stale, it will be (re)built.
+            (Default: each filename + `'.plidx'`)
+
+        printer : file-like, optional
+            Logger implementing a ``write()`` method. Default: |NullWriter|
+
+        **kwargs
+            Other keyword arguments passed to the underlying assembler, e.g.
+            `add_three_for_stop`, `end_included`, or `return_type`
+        """
+        self.filenames   = list(filenames)
+        self.processes   = kwargs.pop("processes",1)
+        self.index_files = kwargs.pop("index_files",None)
+        self.printer     = kwargs.pop("printer",NullWriter())
+        
+        # options for per-chromosome assembly. `is_sorted` and `tabix` are
+        # meaningless here, because we read each chromosome's features directly
+        kwargs.pop("is_sorted",None)
+        kwargs.pop("tabix",None)
+        self._assembler_kwargs = kwargs
+
+        if self.index_files is None:
+            self.index_files = [None] * len(self.filenames)
+        elif len(self.index_files) != len(self.filenames):
+            raise ValueError("Number of index files (%s) must match number of annotation files (%s)." % (len(self.index_files),len(self.filenames)))
+
+        self.metadata = {}
+        self.chromosomes = {}
+        self.rejected = []
+        self._multichrom = set()
+        self._iterator = self._assemble_all()
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        return self.__next__()
+
+    def __next__(self):
+        return next(self._iterator)
+
+    def _get_tasks(self):
+        """Yield one assembly task per chromosome per file, in lexical order of chromosome.
+        Names of transcripts that span multiple chromosomes are added to `self._multichrom`,
+        and metadata from each file's header to `self.metadata`.
+
+        Yields
+        ------
+        tuple
+            `(filename, byte_ranges, assembler_class, kwargs)`
+        """
+        for filename, index_file in zip(self.filenames,self.index_files):
+            runs, multichrom, metadata = read_GFF_index(filename,
+                                                        file_format=self.file_format,
+                                                        index_file=index_file,
+                                                        printer=self.printer)
+            for line in metadata:
+                _parse_GFF_metatokens(line,self.metadata,self.chromosomes)
+
+            for name in sorted(multichrom - self._multichrom):
+                warn("Rejecting transcript '%s' because it contains exons on multiple chromosomes or strands." % name,DataWarning)
+                self.rejected.append(name)
+
+            self._multichrom |= multichrom
+            for chrom in sorted(runs):
+                yield (filename,runs[chrom],self.assembler_class,self._assembler_kwargs)
+
+    def _assemble_all(self):
+        """Assemble all transcripts, chromosome by chromosome
+
+        Yields
+        ------
+        |Transcript|
+        """
+        if self.processes <= 1:
+            results = (_assemble_indexed_chromosome(X) for X in self._get_tasks())
+        else:
+            results = self._assemble_parallel()
+
+        for transcripts, rejected in results:
+            self.printer.write("Assembling next batch of transcripts ...")
+            self.rejected.extend([X for X in rejected if X not in self._multichrom])
+            for tx in transcripts:
+                if tx.attr.get("transcript_id") not in self._multichrom:
+                    yield tx
+
+    def _assemble_parallel(self):
+        """Assemble chromosomes in `self.processes` worker processes. Results
+        are yielded in order, and no more than `self.processes` chromosomes
+        are queued or held in memory at once.
+
+        Yields
+        ------
+        tuple
+            List of assembled transcripts, and list of rejected transcript IDs
+        """
+        import multiprocessing
+        from collections import deque
+
+        pool = multiprocessing.Pool(processes=self.processes)
+        pending = deque()
+        try:
+            for task in self._get_tasks():
+                pending.append(pool.apply_async(_assemble_indexed_chromosome_packed,(task,)))
+                if len(pending) >= self.processes:
+                    packed, rejected = pending.popleft().get()
+                    yield unpack_chains(packed), rejected
+
+            while len(pending) > 0:
+                packed, rejected = pending.popleft().get()
+                yield unpack_chains(packed), rejected
+        finally:
+            pool.terminate()
+            pool.join()
+
+
+class GTF2_IndexedTranscriptAssembler(AbstractGFF_IndexedAssembler):
+    """
+    GTF2_IndexedTranscriptAssembler(*filenames, processes=1, index_files=None, return_type=SegmentChain, add_three_for_stop=False, printer=None)
+
+    Assemble |Transcripts| from unsorted `GTF2`_ files using bounded memory.
+
+    On first use, an index grouping the byte offsets of features by chromosome
+    is written alongside each file (see :func:`index_GFF`). Transcripts are
+    then assembled by |GTF2_TranscriptAssembler| one chromosome at a time,
+    optionally in several processes, and returned in lexical order. 
+
+    Parameters
+    ----------
+    *filenames : str
+        Names of one or more uncompressed `GTF2`_ files
+
+    processes : int, optional
+        Number of processes in which to assemble chromosomes (Default: `1`)
+
+    index_files : list, optional
+        Names of index files, one per file in `filenames` 
+        (Default: each filename + `'.plidx'`)
+
+    return_type : |SegmentChain| or subclass, optional
+        Type of feature to return from assembled subfeatures (Default: |SegmentChain|)
+
+    add_three_for_stop : bool, optional
+        Some annotation files exclude the stop codon from CDS annotations. If set to
+        `True`, three nucleotides will be added to the threeprime end of each
+        CDS annotation, UNLESS the annotated transcript contains explicit `stop_codon`
+        feature. (Default: `False`)
+    
+    printer : file-like, optional
+        Logger implementing a ``write()`` method. Default: |NullWriter|
+
+
+    Attributes
+    ----------
+    filenames : list
+        Names of annotation files
+
+    printer : file-like, optional
+        Logger implementing a ``write()`` method.
+
+    rejected : list
+        A list of transcript IDs from transcripts that failed to assemble properly
+
+    """
+    assembler_class = GTF2_TranscriptAssembler
+    file_format = "GTF2"
+
+
+class GFF3_IndexedTranscriptAssembler(AbstractGFF_IndexedAssembler):
+    """
+    GFF3_IndexedTranscriptAssembler(*filenames, processes=1, index_files=None, return_type=SegmentChain, add_three_for_stop=False, printer=None, transcript_types=None, exon_types=None, cds_types=None)
+
+    Assemble |Transcripts| from unsorted `GFF3`_ files using bounded memory.
+
+    On first use, an index grouping the byte offsets of features by chromosome
+    is written alongside each file (see :func:`index_GFF`). Transcripts are
+    then assembled by |GFF3_TranscriptAssembler| one chromosome at a time,
+    optionally in several processes, and returned in lexical order. 
+
+    Parameters
+    ----------
+    *filenames : str
+        Names of one or more uncompressed `GFF3`_ files
+
+    processes : int, optional
+        Number of processes in which to assemble chromosomes (Default: `1`)
+
+    index_files : list, optional
+        Names of index files, one per file in `filenames` 
+        (Default: each filename + `'.plidx'`)
+
+    return_type : |SegmentChain| or subclass, optional
+        Type of feature to return from assembled subfeatures (Default: |SegmentChain|)
+
+    add_three_for_stop : bool, optional
+        Some annotation files exclude the stop codon from CDS annotations. If set to
+        `True`, three nucleotides will be added to the threeprime end of each
+        CDS annotation. (Default: `False`)
+
+    transcript_types : list, optional
+        List of `GFF3`_ feature types that should be considered as transcripts
+        (Default: as specified in SO 2.5.3 )
+
+    exon_types : list, optional
+        List of `GFF3`_ feature types that should be considered as exons
+        (Default: as specified in SO 2.5.3 )
+    
+    cds_types : list, optional
+        List of `GFF3`_ feature types that should be considered as CDS
+        (Default: as specified in SO 2.5.3 )
+    
+    printer : file-like, optional
+        Logger implementing a ``write()`` method. Default: |NullWriter|
+
+
+    Attributes
+    ----------
+    filenames : list
+        Names of annotation files
+
+    printer : file-like, optional
+        Logger implementing a ``write()`` method.
+
+    rejected : list
+        A list of transcript IDs from transcripts that failed to assemble properly
+
+    """
+    assembler_class = GFF3_TranscriptAssembler
+    file_format = "GFF3"
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""Benchmarks of :data:`plastid`'s hot paths, on synthetic data.
+
+Unlike the unit and functional tests, benchmarks measure how long code
+takes to run, rather than whether it is correct. Results are saved as
+JSON, so that timings can be compared between versions.
+
+Package overview
+================
+
+    =================================================    =========================
+    **Package module**                                   **Contents**
+    -------------------------------------------------    -------------------------
+    :py:mod:`~plastid.test.benchmarks.data`               Generators of synthetic genomes, annotations, and BAM files
+    :py:mod:`~plastid.test.benchmarks.suite`              Benchmarks, grouped by subsystem
+    :py:mod:`~plastid.test.benchmarks.runner`             Command-line program to run benchmarks and compare results
+    =================================================    =========================
+
+To run the suite and compare with an earlier run::
+
+    $ python -m plastid.test.benchmarks.runner results_new.json --compare results_old.json
+"""
+
+#===============================================================================
+# INDEX: benchmark base classes
+#===============================================================================
+
+class SkipBenchmark(Exception):
+    """Raised by :meth:`Benchmark.setup` when a benchmark cannot run, e.g.
+    because an optional tool or file is unavailable
+    """
+    pass
+
+
+class Benchmark(object):
+    """Base class for groups of benchmarks that share data and setup
+
+    Subclasses define methods whose names begin with `time_`. If `params`
+    is a list, each such method is run once per parameter value, which is
+    passed to :meth:`setup`, the method, and :meth:`teardown`.
+
+    Parameters
+    ----------
+    dataset : :class:`~plastid.test.benchmarks.data.SyntheticDataset`
+        Data on which to run benchmarks
+    """
+    params = None
+
+    def __init__(self,dataset):
+        self.dataset = dataset
+
+    def setup(self,*params):
+        """Prepare inputs for a benchmark. Not timed"""
+        pass
+
+    def teardown(self,*params):
+        """Clean up after a benchmark. Not timed"""
+        pass
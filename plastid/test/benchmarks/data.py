@@ -0,0 +1,386 @@
+#!/usr/bin/env python
+"""Generators of synthetic genomes, annotations, and read alignments for benchmarks.
+
+All data are generated from a seeded random number generator, so that a
+given size and seed always produce the same files, and benchmark results
+from different versions of :data:`plastid` can be compared.
+
+Important classes & functions
+-----------------------------
+:class:`SyntheticDataset`
+    Writes a random genome, transcript and mask annotations in BED and GTF2
+    format, a sorted and indexed BAM file of ribosome-profiling-like read
+    alignments, and, if the UCSC tools `bedToBigBed` and `bedGraphToBigWig`
+    are installed, BigBed and BigWig versions of these.
+
+:func:`random_genome`, :func:`random_transcripts`, :func:`random_reads`
+    Generate the components of a dataset in memory
+"""
+import os
+import json
+import bisect
+import random
+import subprocess
+from distutils.spawn import find_executable
+from plastid.genomics.roitools import GenomicSegment, Transcript
+
+
+#===============================================================================
+# INDEX: dataset sizes
+#===============================================================================
+
+DATASET_SIZES = {
+    "small"  : { "num_chroms" : 2,  "chrom_length" : 200000,  "num_transcripts" : 300,   "num_reads" : 100000 },
+    "medium" : { "num_chroms" : 4,  "chrom_length" : 1000000, "num_transcripts" : 2000,  "num_reads" : 1000000 },
+    "large"  : { "num_chroms" : 10, "chrom_length" : 5000000, "num_transcripts" : 10000, "num_reads" : 5000000 },
+}
+"""Parameters for datasets of various sizes"""
+
+# offset from fiveprime end of reads to P-site, by read length
+P_OFFSETS = { 26 : 11, 27 : 11, 28 : 12, 29 : 12, 30 : 12, 31 : 13, 32 : 13 }
+
+
+#===============================================================================
+# INDEX: generators
+#===============================================================================
+
+def random_genome(rng,chrom_lengths):
+    """Generate random chromosome sequences
+
+    Parameters
+    ----------
+    rng : :class:`random.Random`
+        Random number generator
+
+    chrom_lengths : dict
+        Dictionary mapping chromosome names to lengths
+
+    Returns
+    -------
+    dict
+        Dictionary mapping chromosome names to sequences
+    """
+    return { K : "".join([rng.choice("ACGT") for _ in range(V)]) for K,V in chrom_lengths.items() }
+
+
+def random_transcripts(rng,chrom_lengths,num):
+    """Generate multi-exon |Transcripts| with coding regions, at random
+    positions on both strands. Pairs of consecutive transcripts are
+    isoforms of the same gene, sharing their first exon.
+
+    Parameters
+    ----------
+    rng : :class:`random.Random`
+        Random number generator
+
+    chrom_lengths : dict
+        Dictionary mapping chromosome names to lengths
+
+    num : int
+        Number of transcripts to generate
+
+    Returns
+    -------
+    list
+        List of |Transcripts|, sorted by chromosome and position
+    """
+    chroms = sorted(chrom_lengths)
+    transcripts = []
+    i = 0
+    while len(transcripts) < num:
+        chrom  = rng.choice(chroms)
+        strand = rng.choice("+-")
+        start  = rng.randint(0,chrom_lengths[chrom] - 10000)
+        first_exon = GenomicSegment(chrom,start,start + rng.randint(150,600),strand)
+        gene_id = "gene_%s" % i
+        for j in range(min(2,num - len(transcripts))):
+            segments = [first_exon]
+            pos = first_exon.end
+            for _ in range(rng.randint(0,4)):
+                pos += rng.randint(60,800)
+                length = rng.randint(80,700)
+                segments.append(GenomicSegment(chrom,pos,pos + length,strand))
+                pos += length
+
+            tx = Transcript(*segments,ID="%s_tx_%s" % (gene_id,j),
+                            transcript_id="%s_tx_%s" % (gene_id,j),gene_id=gene_id)
+
+            # coding region a multiple of 3, with UTRs at both ends
+            utr5 = rng.randint(20,min(120,tx.length // 4))
+            cds_length = 3*((tx.length - utr5 - rng.randint(20,120)) // 3)
+            cds_start = tx.get_genomic_coordinate(utr5)[1]
+            cds_end   = tx.get_genomic_coordinate(utr5 + cds_length - 1)[1]
+            tx = Transcript(*segments,ID=tx.attr["ID"],transcript_id=tx.attr["transcript_id"],
+                            gene_id=gene_id,cds_genome_start=min(cds_start,cds_end),
+                            cds_genome_end=max(cds_start,cds_end) + 1)
+            transcripts.append(tx)
+
+        i += 1
+
+    transcripts.sort(key=lambda x: (x.chrom,x.spanning_segment.start,x.spanning_segment.end))
+    return transcripts
+
+
+def random_reads(rng,transcripts,chrom_lengths,num,background=0.1):
+    """Generate ungapped read alignments, most with their P-sites in-frame
+    in coding regions, so that mapping rules, metagenes, and P-site
+    estimation all have signal to work with.
+
+    Parameters
+    ----------
+    rng : :class:`random.Random`
+        Random number generator
+
+    transcripts : list
+        |Transcripts| with coding regions, from which reads are drawn
+
+    chrom_lengths : dict
+        Dictionary mapping chromosome names to lengths
+
+    num : int
+        Number of reads to generate
+
+    background : float, optional
+        Fraction of reads placed uniformly at random (Default: 0.1)
+
+    Returns
+    -------
+    list
+        Sorted list of tuples of `(chrom, start, length, is_reverse)`
+    """
+    chroms  = sorted(chrom_lengths)
+    lengths = sorted(P_OFFSETS)
+    weights = [rng.paretovariate(1.5) for _ in transcripts]
+    total   = sum(weights)
+    cumulative = []
+    running = 0.0
+    for w in weights:
+        running += w / total
+        cumulative.append(running)
+
+    reads = []
+    for _ in range(num):
+        length = rng.choice(lengths)
+        if rng.random() < background:
+            chrom = rng.choice(chroms)
+            reads.append((chrom,rng.randint(0,chrom_lengths[chrom] - length),length,rng.random() < 0.5))
+            continue
+
+        tx = transcripts[min(bisect.bisect_left(cumulative,rng.random()),len(transcripts) - 1)]
+        codons = (tx.cds_end - tx.cds_start) // 3
+        psite  = tx.cds_start + 3*rng.randrange(codons)
+        fiveprime = psite - P_OFFSETS[length]
+        if fiveprime < 0:
+            continue
+
+        genomic_5p = tx.get_genomic_coordinate(fiveprime)[1]
+        if tx.strand == "+":
+            start = genomic_5p
+        else:
+            start = genomic_5p - length + 1
+
+        if 0 <= start < chrom_lengths[tx.chrom] - length:
+            reads.append((tx.chrom,start,length,tx.strand == "-"))
+
+    reads.sort(key=lambda x: (chroms.index(x[0]),x[1]))
+    return reads
+
+
+#===============================================================================
+# INDEX: writers
+#===============================================================================
+
+def write_bam(filename,reads,chrom_lengths):
+    """Write read alignments to a sorted, indexed BAM file
+
+    Parameters
+    ----------
+    filename : str
+        Name of BAM file
+
+    reads : list
+        Sorted list of tuples of `(chrom, start, length, is_reverse)`
+
+    chrom_lengths : dict
+        Dictionary mapping chromosome names to lengths
+    """
+    import pysam
+    chroms = sorted(chrom_lengths)
+    chrom_ids = { K : N for N,K in enumerate(chroms) }
+    header = { "HD" : { "VN" : "1.0", "SO" : "coordinate" },
+               "SQ" : [{ "SN" : X, "LN" : chrom_lengths[X] } for X in chroms] }
+    quals = { L : pysam.qualitystring_to_array("I"*L) for L in P_OFFSETS }
+    with pysam.AlignmentFile(filename,"wb",header=header) as fout:
+        for n, (chrom,start,length,is_reverse) in enumerate(reads):
+            read = pysam.AlignedSegment()
+            read.query_name      = "read_%s" % n
+            read.query_sequence  = "A"*length
+            read.flag            = 16 if is_reverse else 0
+            read.reference_id    = chrom_ids[chrom]
+            read.reference_start = start
+            read.mapping_quality = 50
+            read.cigartuples     = [(0,length)]
+            read.query_qualities = quals[length]
+            fout.write(read)
+
+    pysam.index(filename)
+
+
+def write_fasta(filename,genome):
+    """Write chromosome sequences to a FASTA file"""
+    with open(filename,"w") as fout:
+        for chrom in sorted(genome):
+            seq = genome[chrom]
+            fout.write(">%s\n" % chrom)
+            for i in range(0,len(seq),60):
+                fout.write("%s\n" % seq[i:i+60])
+
+
+#===============================================================================
+# INDEX: datasets
+#===============================================================================
+
+class SyntheticDataset(object):
+    """A set of synthetic files for benchmarks, written to `directory`
+
+    Files are only regenerated if they are missing, or were generated with
+    different parameters, so a directory can be reused between runs and
+    between versions of :data:`plastid`.
+
+    Parameters
+    ----------
+    directory : str
+        Folder in which to write files. Created if it does not exist
+
+    size : str, optional
+        Key in :data:`DATASET_SIZES` (Default: `'small'`)
+
+    seed : int, optional
+        Seed for random number generator (Default: 42)
+
+    Attributes
+    ----------
+    params : dict
+        Parameters used to generate the dataset
+
+    transcripts : list
+        |Transcripts| in the annotation
+
+    bigbed : str or None
+        Name of BigBed version of annotation, or `None` if `bedToBigBed` is
+        not installed
+
+    bigwig : str or None
+        Name of BigWig file of fiveprime-mapped read counts on the forward
+        strand, or `None` if `bedGraphToBigWig` is not installed
+    """
+
+    def __init__(self,directory,size="small",seed=42):
+        if size not in DATASET_SIZES:
+            raise ValueError("Dataset size must be one of %s. Got '%s'." % (", ".join(sorted(DATASET_SIZES)),size))
+
+        self.directory = os.path.abspath(directory)
+        self.params = dict(DATASET_SIZES[size])
+        self.params["size"] = size
+        self.params["seed"] = seed
+
+        chroms = ["chr%s" % (N+1) for N in range(self.params["num_chroms"])]
+        self.chrom_lengths = { K : self.params["chrom_length"] for K in chroms }
+
+        for name, filename in [("fasta"       , "genome.fa"),
+                               ("chrom_sizes" , "genome.sizes"),
+                               ("bed"         , "transcripts.bed"),
+                               ("gtf"         , "transcripts.gtf"),
+                               ("mask_bed"    , "masks.bed"),
+                               ("bam"         , "reads.bam"),
+                               ("offset_file" , "p_offsets.txt")]:
+            setattr(self,name,os.path.join(self.directory,filename))
+
+        self.bigbed = None
+        self.bigwig = None
+        self.transcripts = None
+        self.build()
+
+    def _manifest_matches(self,manifest_fn):
+        if not os.path.exists(manifest_fn):
+            return False
+
+        with open(manifest_fn) as fh:
+            return json.load(fh) == self.params
+
+    def build(self):
+        """Generate files, unless they already exist with the same parameters"""
+        from plastid.readers.bed import BED_Reader
+
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+        manifest_fn = os.path.join(self.directory,"manifest.json")
+        if self._manifest_matches(manifest_fn):
+            with open(self.bed) as fh:
+                self.transcripts = list(BED_Reader(fh,return_type=Transcript))
+        else:
+            self._generate()
+            with open(manifest_fn,"w") as fout:
+                json.dump(self.params,fout)
+
+        bigbed = os.path.join(self.directory,"transcripts.bb")
+        bigwig = os.path.join(self.directory,"reads_fw.bw")
+        self.bigbed = bigbed if os.path.exists(bigbed) else None
+        self.bigwig = bigwig if os.path.exists(bigwig) else None
+
+    def _generate(self):
+        rng = random.Random(self.params["seed"])
+        chrom_lengths = self.chrom_lengths
+
+        write_fasta(self.fasta,random_genome(rng,chrom_lengths))
+        with open(self.chrom_sizes,"w") as fout:
+            for chrom in sorted(chrom_lengths):
+                fout.write("%s\t%s\n" % (chrom,chrom_lengths[chrom]))
+
+        self.transcripts = random_transcripts(rng,chrom_lengths,self.params["num_transcripts"])
+        with open(self.bed,"w") as fout:
+            for tx in self.transcripts:
+                fout.write(tx.as_bed())
+        with open(self.gtf,"w") as fout:
+            for tx in self.transcripts:
+                fout.write(tx.as_gtf())
+
+        with open(self.mask_bed,"w") as fout:
+            for tx in self.transcripts[::5]:
+                span  = tx.spanning_segment
+                start = rng.randint(span.start,span.end - 50)
+                mask  = Transcript(GenomicSegment(tx.chrom,start,start + rng.randint(30,300),tx.strand),
+                                   ID="mask_%s" % tx.get_name())
+                fout.write(mask.as_bed())
+
+        with open(self.offset_file,"w") as fout:
+            fout.write("length\tp_offset\n")
+            for length in sorted(P_OFFSETS):
+                fout.write("%s\t%s\n" % (length,P_OFFSETS[length]))
+
+        reads = random_reads(rng,self.transcripts,chrom_lengths,self.params["num_reads"])
+        write_bam(self.bam,reads,chrom_lengths)
+        self._generate_bbi()
+
+    def _generate_bbi(self):
+        """Write BigBed and BigWig files, if UCSC tools are installed"""
+        bed_to_bigbed = find_executable("bedToBigBed")
+        if bed_to_bigbed is not None:
+            subprocess.check_call([bed_to_bigbed,"-type=bed12",self.bed,self.chrom_sizes,
+                                   os.path.join(self.directory,"transcripts.bb")])
+
+        bedgraph_to_bigwig = find_executable("bedGraphToBigWig")
+        if bedgraph_to_bigwig is not None:
+            from plastid.genomics.genome_array import BAMGenomeArray
+            from plastid.genomics.map_factories import FivePrimeMapFactory
+            bedgraph = os.path.join(self.directory,"reads_fw.bedGraph")
+            bam_array = BAMGenomeArray(self.bam,mapping=FivePrimeMapFactory())
+            with open(bedgraph,"w") as fout:
+                for chrom in sorted(self.chrom_lengths):
+                    counts = bam_array[GenomicSegment(chrom,0,self.chrom_lengths[chrom],"+")]
+                    for pos in counts.nonzero()[0]:
+                        fout.write("%s\t%s\t%s\t%s\n" % (chrom,pos,pos + 1,counts[pos]))
+
+            subprocess.check_call([bedgraph_to_bigwig,bedgraph,self.chrom_sizes,
+                                   os.path.join(self.directory,"reads_fw.bw")])
@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+"""Run the benchmark suite, save results as JSON, and compare results between versions.
+
+Benchmarks are methods whose names begin with `time_`, on subclasses of
+:class:`~plastid.test.benchmarks.Benchmark` in :mod:`plastid.test.benchmarks.suite`, in the style of
+`asv <https://asv.readthedocs.io>`_. Each is run once to warm up, and then
+timed `--repeat` times on a :class:`~plastid.test.benchmarks.data.SyntheticDataset`.
+
+Benchmarks faster than 0.2 seconds are called repeatedly in each timed run.
+
+Run the suite on a small dataset, and save results::
+
+    $ python -m plastid.test.benchmarks.runner results_new.json --size small
+
+Run only benchmarks whose names match a regular expression, and compare
+with earlier results, flagging those more than 10% slower::
+
+    $ python -m plastid.test.benchmarks.runner results_new.json --bench "GenomeHash|BED" \\
+          --compare results_old.json --threshold 0.1
+
+Results files contain the :data:`plastid` version, git commit (if known),
+Python version, platform, dataset parameters, and, for each benchmark, its
+status (`'ok'`, `'skipped'` or `'failed'`) and timings in seconds.
+"""
+import os
+import re
+import sys
+import json
+import math
+import time
+import platform
+import datetime
+import argparse
+import traceback
+import subprocess
+from plastid.test.benchmarks import Benchmark, SkipBenchmark
+
+RESULTS_FORMAT_VERSION = 1
+
+
+#===============================================================================
+# INDEX: running benchmarks
+#===============================================================================
+
+def discover(module):
+    """Find benchmarks in `module`
+
+    Parameters
+    ----------
+    module : module
+        Module containing subclasses of :class:`~plastid.test.benchmarks.Benchmark`
+
+    Returns
+    -------
+    list
+        List of tuples of `(name, class, method name, parameter)`, where
+        parameter is `None` for unparameterized benchmarks
+    """
+    found = []
+    classes = [X for X in vars(module).values() if isinstance(X,type) and issubclass(X,Benchmark) and X is not Benchmark]
+    for cls in sorted(classes,key=lambda x: x.__name__):
+        for method in sorted([X for X in dir(cls) if X.startswith("time_")]):
+            if cls.params is None:
+                found.append(("%s.%s" % (cls.__name__,method),cls,method,None))
+            else:
+                for param in cls.params:
+                    found.append(("%s.%s(%s)" % (cls.__name__,method,param),cls,method,param))
+
+    return found
+
+
+def run_benchmark(cls,method,param,dataset,repeat=5,min_time=0.2):
+    """Time a single benchmark
+
+    Benchmarks that take less than `min_time` seconds are called several
+    times per timed run, and times are reported per call, to reduce noise
+
+    Parameters
+    ----------
+    cls : class
+        Subclass of :class:`~plastid.test.benchmarks.Benchmark`
+
+    method : str
+        Name of method to time
+
+    param : object or None
+        Parameter to pass to `setup`, `method`, and `teardown`
+
+    dataset : :class:`~plastid.test.benchmarks.data.SyntheticDataset`
+        Data on which to run benchmark
+
+    repeat : int, optional
+        Number of timed runs, following one untimed warm-up run (Default: 5)
+
+    min_time : float, optional
+        Minimum duration of each timed run, in seconds (Default: 0.2)
+
+    Returns
+    -------
+    dict
+        Status, and, if the benchmark ran, its timings per call in seconds,
+        their summary statistics, and the number of calls per timed run
+    """
+    import numpy
+    args = () if param is None else (param,)
+    bench = cls(dataset)
+    try:
+        bench.setup(*args)
+    except SkipBenchmark as e:
+        return { "status" : "skipped", "reason" : str(e) }
+    except Exception:
+        return { "status" : "failed", "error" : traceback.format_exc() }
+
+    func = getattr(bench,method)
+    times = []
+    try:
+        start = time.time()
+        func(*args)
+        warmup = time.time() - start
+        number = max(1,int(math.ceil(min_time / warmup))) if warmup > 0 else 1
+        for _ in range(repeat):
+            start = time.time()
+            for _ in range(number):
+                func(*args)
+            times.append((time.time() - start) / number)
+    except Exception:
+        return { "status" : "failed", "error" : traceback.format_exc() }
+    finally:
+        bench.teardown(*args)
+
+    return { "status" : "ok",
+             "number" : number,
+             "times"  : times,
+             "min"    : min(times),
+             "median" : float(numpy.median(times)),
+             "mean"   : float(numpy.mean(times)),
+             "stdev"  : float(numpy.std(times)),
+           }
+
+
+def _get_commit():
+    """Return the git commit of the :data:`plastid` source tree, if it is a git checkout"""
+    import plastid
+    try:
+        with open(os.devnull,"w") as null:
+            out = subprocess.check_output(["git","rev-parse","HEAD"],
+                                          cwd=os.path.dirname(os.path.abspath(plastid.__file__)),
+                                          stderr=null)
+        return out.decode("ascii").strip()
+    except Exception:
+        return None
+
+
+def run_suite(dataset,repeat=5,pattern=None,module=None,printer=None):
+    """Run all benchmarks whose names match `pattern`
+
+    Parameters
+    ----------
+    dataset : :class:`~plastid.test.benchmarks.data.SyntheticDataset`
+        Data on which to run benchmarks
+
+    repeat : int, optional
+        Number of timed runs of each benchmark (Default: 5)
+
+    pattern : str or None, optional
+        Regular expression. If not `None`, only benchmarks whose names
+        contain a match are run
+
+    module : module, optional
+        Module containing benchmarks (Default: :mod:`plastid.test.benchmarks.suite`)
+
+    printer : file-like, optional
+        If given, progress is written to `printer`
+
+    Returns
+    -------
+    dict
+        Results, suitable for export as JSON
+    """
+    import plastid
+    if module is None:
+        from plastid.test.benchmarks import suite as module
+
+    results = { "format_version"  : RESULTS_FORMAT_VERSION,
+                "plastid_version" : plastid.__version__,
+                "commit"          : _get_commit(),
+                "date"            : str(datetime.datetime.now()),
+                "python"          : platform.python_version(),
+                "platform"        : platform.platform(),
+                "dataset"         : dataset.params,
+                "repeat"          : repeat,
+                "benchmarks"      : {},
+              }
+    for name, cls, method, param in discover(module):
+        if pattern is not None and re.search(pattern,name) is None:
+            continue
+
+        result = run_benchmark(cls,method,param,dataset,repeat=repeat)
+        results["benchmarks"][name] = result
+        if printer is not None:
+            if result["status"] == "ok":
+                printer.write("%-70s %10.4f s (median of %s)" % (name,result["median"],repeat))
+            elif result["status"] == "skipped":
+                printer.write("%-70s    skipped: %s" % (name,result["reason"]))
+            else:
+                printer.write("%-70s     failed:\n%s" % (name,result["error"]))
+
+    return results
+
+
+#===============================================================================
+# INDEX: comparing results
+#===============================================================================
+
+def compare_results(old,new,threshold=0.1):
+    """Compare median timings of benchmarks that ran successfully in both `old` and `new`
+
+    Parameters
+    ----------
+    old, new : dict
+        Results from :func:`run_suite`, or loaded from JSON
+
+    threshold : float, optional
+        Fractional change in median time above which a benchmark is flagged
+        as a regression (or, below the negative, an improvement; Default: 0.1)
+
+    Returns
+    -------
+    list
+        List of tuples of `(name, old median, new median, ratio, flag)`, where
+        `flag` is `'slower'`, `'faster'`, or `''`
+    """
+    rows = []
+    for name in sorted(set(old["benchmarks"]) & set(new["benchmarks"])):
+        a = old["benchmarks"][name]
+        b = new["benchmarks"][name]
+        if a["status"] != "ok" or b["status"] != "ok":
+            continue
+
+        ratio = b["median"] / a["median"] if a["median"] > 0 else float("inf")
+        if ratio > 1.0 + threshold:
+            flag = "slower"
+        elif ratio < 1.0 / (1.0 + threshold):
+            flag = "faster"
+        else:
+            flag = ""
+
+        rows.append((name,a["median"],b["median"],ratio,flag))
+
+    return rows
+
+
+def main(argv=sys.argv[1:]):
+    """Command-line program
+
+    Parameters
+    ----------
+    argv : list, optional
+        A list of command-line arguments, which will be processed
+        as if the script were called from the command line if
+        :py:func:`main` is called directly.
+
+        Default: sys.argv[1:] (actual command-line arguments)
+
+    Returns
+    -------
+    int
+        1 if `--compare` was given and any benchmark was flagged as slower,
+        otherwise 0
+    """
+    from plastid.util.io.filters import NameDateWriter
+    from plastid.test.benchmarks.data import SyntheticDataset, DATASET_SIZES
+    printer = NameDateWriter("benchmarks")
+
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("outfile",type=str,help="JSON file in which to save results")
+    parser.add_argument("--size",choices=sorted(DATASET_SIZES),default="small",
+                        help="Size of synthetic dataset (Default: small)")
+    parser.add_argument("--seed",type=int,default=42,help="Random seed for synthetic dataset (Default: 42)")
+    parser.add_argument("--data_dir",type=str,default=None,
+                        help="Folder in which to generate, or from which to reuse, synthetic data "+
+                             "(Default: 'plastid_benchmark_data_SIZE' in the current folder)")
+    parser.add_argument("--repeat",type=int,default=5,help="Number of timed runs of each benchmark (Default: 5)")
+    parser.add_argument("--bench",type=str,default=None,metavar="REGEX",
+                        help="Only run benchmarks whose names match REGEX")
+    parser.add_argument("--compare",type=str,default=None,metavar="JSON",
+                        help="Compare results with those in an earlier results file")
+    parser.add_argument("--threshold",type=float,default=0.1,
+                        help="Fractional change in median time reported as a regression or improvement (Default: 0.1)")
+    args = parser.parse_args(argv)
+
+    data_dir = args.data_dir if args.data_dir is not None else "plastid_benchmark_data_%s" % args.size
+    printer.write("Preparing %s dataset in %s ..." % (args.size,data_dir))
+    dataset = SyntheticDataset(data_dir,size=args.size,seed=args.seed)
+
+    results = run_suite(dataset,repeat=args.repeat,pattern=args.bench,printer=printer)
+    with open(args.outfile,"w") as fout:
+        json.dump(results,fout,indent=2,sort_keys=True)
+    printer.write("Saved results to %s." % args.outfile)
+
+    if args.compare is not None:
+        with open(args.compare) as fh:
+            old = json.load(fh)
+        if old["dataset"] != results["dataset"]:
+            printer.write("Warning: datasets differ between runs; timings may not be comparable.")
+
+        rows = compare_results(old,results,threshold=args.threshold)
+        printer.write("Comparison with %s (plastid %s, commit %s):" % (args.compare,old["plastid_version"],old["commit"]))
+        for name, a, b, ratio, flag in rows:
+            printer.write("    %-70s %10.4f -> %10.4f s  x%6.2f  %s" % (name,a,b,ratio,flag))
+
+        if any(X[-1] == "slower" for X in rows):
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
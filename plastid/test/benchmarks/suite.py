@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""Benchmarks of :data:`plastid`'s most heavily used code paths.
+
+Each class groups benchmarks that share setup. Inputs are taken from a
+:class:`~plastid.test.benchmarks.data.SyntheticDataset`, so timings depend
+only on the dataset size and seed, and on the code being benchmarked.
+See :mod:`plastid.test.benchmarks.runner` for how to run them.
+"""
+import os
+import sys
+import shutil
+import tempfile
+import itertools
+from plastid.test.benchmarks import Benchmark, SkipBenchmark
+
+# number of regions queried in each benchmark
+NUM_QUERIES = 300
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+class _Silenced(object):
+    """Context manager that sends output written to stdout and stderr,
+    including output from C libraries, to the null device
+    """
+
+    def __enter__(self):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self._null = os.open(os.devnull,os.O_WRONLY)
+        self._saved = [os.dup(1),os.dup(2)]
+        os.dup2(self._null,1)
+        os.dup2(self._null,2)
+        return self
+
+    def __exit__(self,type_,value,traceback):
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(self._saved[0],1)
+        os.dup2(self._saved[1],2)
+        for fd in self._saved + [self._null]:
+            os.close(fd)
+
+
+def _get_map_factory(name,dataset):
+    """Create a mapping rule for a |BAMGenomeArray|"""
+    from plastid.genomics.map_factories import (FivePrimeMapFactory, ThreePrimeMapFactory,
+                                                CenterMapFactory, VariableFivePrimeMapFactory,
+                                                StratifiedVariableFivePrimeMapFactory)
+    from plastid.test.benchmarks.data import P_OFFSETS
+    if name == "fiveprime":
+        return FivePrimeMapFactory(offset=12)
+    elif name == "threeprime":
+        return ThreePrimeMapFactory(offset=15)
+    elif name == "center":
+        return CenterMapFactory(nibble=12)
+    elif name == "fiveprime_variable":
+        return VariableFivePrimeMapFactory(dict(P_OFFSETS))
+    elif name == "stratified_variable":
+        return StratifiedVariableFivePrimeMapFactory(dict(P_OFFSETS),min(P_OFFSETS),max(P_OFFSETS))
+
+
+#===============================================================================
+# INDEX: count data
+#===============================================================================
+
+class TimeBAMGenomeArray(Benchmark):
+    """Fetch reads and counts from a |BAMGenomeArray| under each mapping rule"""
+    params = ["fiveprime","threeprime","center","fiveprime_variable","stratified_variable"]
+
+    def setup(self,mapping):
+        from plastid.genomics.genome_array import BAMGenomeArray
+        self.ga = BAMGenomeArray(self.dataset.bam,mapping=_get_map_factory(mapping,self.dataset))
+        self.segments = [X for X in itertools.chain.from_iterable(Y.segments for Y in self.dataset.transcripts[:NUM_QUERIES])]
+
+    def time_get_reads_and_counts(self,mapping):
+        for seg in self.segments:
+            self.ga.get_reads_and_counts(seg)
+
+
+class TimeSegmentChainCounts(Benchmark):
+    """Fetch count vectors for |Transcripts|, with and without masks, from
+    a |BAMGenomeArray| or an in-memory |GenomeArray|
+    """
+    params = ["BAMGenomeArray","GenomeArray"]
+
+    def setup(self,array_type):
+        from plastid.genomics.genome_array import BAMGenomeArray, GenomeArray
+        from plastid.genomics.genome_hash import GenomeHash
+        from plastid.genomics.roitools import GenomicSegment, SegmentChain
+        from plastid.readers.bed import BED_Reader
+
+        bam_array = BAMGenomeArray(self.dataset.bam,mapping=_get_map_factory("fiveprime",self.dataset))
+        if array_type == "GenomeArray":
+            self.ga = GenomeArray(self.dataset.chrom_lengths)
+            for chrom, length in self.dataset.chrom_lengths.items():
+                for strand in ("+","-"):
+                    roi = GenomicSegment(chrom,0,length,strand)
+                    self.ga[roi] = bam_array[roi]
+        else:
+            self.ga = bam_array
+
+        with open(self.dataset.mask_bed) as fh:
+            mask_hash = GenomeHash(BED_Reader(fh))
+
+        self.transcripts = self.dataset.transcripts[:NUM_QUERIES]
+        self.masked = []
+        for tx in self.transcripts:
+            masked = SegmentChain(*tx.segments,**tx.attr)
+            masked.add_masks(*itertools.chain.from_iterable(X.segments for X in mask_hash.get_overlapping_features(tx)))
+            self.masked.append(masked)
+
+    def time_get_counts(self,array_type):
+        for tx in self.transcripts:
+            tx.get_counts(self.ga)
+
+    def time_get_masked_counts(self,array_type):
+        for tx in self.masked:
+            tx.get_masked_counts(self.ga)
+
+
+#===============================================================================
+# INDEX: annotation
+#===============================================================================
+
+class TimeGenomeHash(Benchmark):
+    """Build a |GenomeHash| and query it for features overlapping regions"""
+
+    def setup(self):
+        from plastid.genomics.genome_hash import GenomeHash
+        self.transcripts = self.dataset.transcripts
+        self.hash = GenomeHash(self.transcripts)
+        self.queries = [X.get_cds() for X in self.transcripts[:NUM_QUERIES]]
+
+    def time_build(self):
+        from plastid.genomics.genome_hash import GenomeHash
+        GenomeHash(self.transcripts)
+
+    def time_get_overlapping_features(self):
+        for roi in self.queries:
+            self.hash.get_overlapping_features(roi)
+
+
+class TimeAnnotationReaders(Benchmark):
+    """Parse the annotation from BED and GTF2 files"""
+
+    def time_bed_reader(self):
+        from plastid.readers.bed import BED_Reader
+        from plastid.genomics.roitools import Transcript
+        with open(self.dataset.bed) as fh:
+            list(BED_Reader(fh,return_type=Transcript))
+
+    def time_gtf2_transcript_assembler(self):
+        from plastid.readers.gff import GTF2_TranscriptAssembler
+        with open(self.dataset.gtf) as fh:
+            list(GTF2_TranscriptAssembler(fh))
+
+
+class TimeBigBedReader(Benchmark):
+    """Fetch features overlapping regions from a BigBed file"""
+
+    def setup(self):
+        if self.dataset.bigbed is None:
+            raise SkipBenchmark("BigBed file not available. Install UCSC tool 'bedToBigBed' and regenerate the dataset.")
+
+        from plastid.readers.bigbed import BigBedReader
+        self.reader = BigBedReader(self.dataset.bigbed)
+        self.queries = [X.spanning_segment for X in self.dataset.transcripts[:NUM_QUERIES]]
+
+    def time_get(self):
+        for roi in self.queries:
+            self.reader.get(roi)
+
+
+class TimeBigWigReader(Benchmark):
+    """Fetch count vectors for regions from a BigWig file"""
+
+    def setup(self):
+        if self.dataset.bigwig is None:
+            raise SkipBenchmark("BigWig file not available. Install UCSC tool 'bedGraphToBigWig' and regenerate the dataset.")
+
+        from plastid.readers.bigwig import BigWigReader
+        self.reader = BigWigReader(self.dataset.bigwig)
+        self.queries = [X for X in itertools.chain.from_iterable(Y.segments for Y in self.dataset.transcripts[:NUM_QUERIES])
+                        if X.strand == "+"]
+
+    def time_get(self):
+        for roi in self.queries:
+            self.reader.get(roi)
+
+
+#===============================================================================
+# INDEX: command-line scripts, end-to-end
+#===============================================================================
+
+class TimeScripts(Benchmark):
+    """Run command-line scripts from start to finish on the dataset"""
+
+    def setup(self):
+        import matplotlib
+        matplotlib.use("Agg")
+        from plastid.bin import cs, metagene
+        self.tmpdir = tempfile.mkdtemp(prefix="plastid_benchmark_")
+        self.outbase = os.path.join(self.tmpdir,"bench")
+        with _Silenced():
+            cs.main(["generate",self.outbase,"-q","--annotation_files",self.dataset.gtf])
+            metagene.main(["generate",self.outbase,"-q","--landmark","cds_start",
+                           "--annotation_files",self.dataset.bed,"--annotation_format","BED"])
+
+    def teardown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def time_cs_generate(self):
+        from plastid.bin import cs
+        with _Silenced():
+            cs.main(["generate",self.outbase + "_gen","-q","--annotation_files",self.dataset.gtf])
+
+    def time_cs_count(self):
+        from plastid.bin import cs
+        with _Silenced():
+            cs.main(["count","%s_gene.positions" % self.outbase,self.outbase + "_count","-q",
+                     "--count_files",self.dataset.bam,"--fiveprime","--offset","12"])
+
+    def time_metagene_generate(self):
+        from plastid.bin import metagene
+        with _Silenced():
+            metagene.main(["generate",self.outbase + "_gen","-q","--landmark","cds_start",
+                           "--annotation_files",self.dataset.bed,"--annotation_format","BED"])
+
+    def time_metagene_count(self):
+        from plastid.bin import metagene
+        with _Silenced():
+            metagene.main(["count","%s_rois.txt" % self.outbase,self.outbase + "_count","-q",
+                           "--count_files",self.dataset.bam,"--fiveprime","--offset","12"])
+
+    def time_psite(self):
+        from plastid.bin import psite
+        with _Silenced():
+            psite.main(["%s_rois.txt" % self.outbase,self.outbase + "_psite","-q",
+                        "--count_files",self.dataset.bam,"--min_length","26","--max_length","32"])
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Unit tests for functions in :py:mod:`plastid.bin.cs`
+"""
+import random
+from nose.plugins.attrib import attr
+from nose.tools import assert_equal, assert_dict_equal
+from plastid.bin.cs import _merge_intervals, \
+                           _intersect_intervals, \
+                           _subtract_intervals, \
+                           merge_genes
+from plastid.genomics.roitools import GenomicSegment, Transcript
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+def _to_positions(intervals):
+    stmp = set()
+    for start, end in intervals:
+        stmp |= set(range(start,end))
+    return stmp
+
+def _random_intervals(num,max_pos=200,max_len=20):
+    return [(X,X + random.randint(0,max_len)) for X in (random.randint(0,max_pos) for _ in range(num))]
+
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+def test_merge_intervals():
+    assert_equal(_merge_intervals([]),[])
+    assert_equal(_merge_intervals([(5,10),(0,3),(3,4),(8,12),(20,20)]),[(0,4),(5,12)])
+
+@attr(test="unit")
+def test_interval_arithmetic_matches_position_sets():
+    random.seed(1)
+    for _ in range(200):
+        a = _merge_intervals(_random_intervals(random.randint(0,10)))
+        b = _merge_intervals(_random_intervals(random.randint(0,10)))
+        pos_a = _to_positions(a)
+        pos_b = _to_positions(b)
+
+        found = _intersect_intervals(a,b)
+        assert_equal(_to_positions(found),pos_a & pos_b)
+        assert_equal(found,_merge_intervals(found))
+
+        found = _subtract_intervals(a,b)
+        assert_equal(_to_positions(found),pos_a - pos_b)
+        assert_equal(found,_merge_intervals(found))
+
+@attr(test="unit")
+def test_merge_genes_shared_exons():
+    def tx(name,gene,*exons,**kwargs):
+        chrom  = kwargs.get("chrom","chrA")
+        strand = kwargs.get("strand","+")
+        return Transcript(*[GenomicSegment(chrom,X,Y,strand) for X, Y in exons],
+                          ID=name,transcript_id=name,gene_id=gene)
+
+    transcripts = [tx("t1","g1",(0,100),(200,300)),
+                   tx("t2","g2",(200,300),(400,500)),    # shares exon with g1
+                   tx("t3","g3",(400,500),(600,700)),    # shares exon with g2
+                   tx("t4","g4",(0,101)),                # overlaps, but doesn't share, exon
+                   tx("t5","g5",(0,100),strand="-"),     # other strand
+                   tx("t6","g6",(0,100),chrom="chrB"),   # other chromosome
+                   tx("t7","g6",(1000,1100),chrom="chrB"),
+                   ]
+    expected = { "g1" : "g1,g2,g3",
+                 "g2" : "g1,g2,g3",
+                 "g3" : "g1,g2,g3",
+                 "g4" : "g4",
+                 "g5" : "g5",
+                 "g6" : "g6",
+                }
+    assert_dict_equal(merge_genes({ X.get_name() : X for X in transcripts }),expected)
@@ -1,6 +1,10 @@
 #!/usr/bin/env python
 """
 """
+import os
+import random
+import shutil
+import tempfile
 import numpy
 
 from nose.plugins.attrib import attr
@@ -267,6 +271,48 @@ def test_group_regions_make_windows_finds_masks():
             result_group = _DO_GENERATE_MAX_WINDOW_RESULTS_MASKED["%s_%s_%s" % (test_name,flank_up,flank_down)]
             yield check_maximal_window, test_name, crossmap, test_group, [result_group], flank_up, flank_down
 
+@attr(test="unit")
+def test_group_regions_make_windows_parallel_same_as_serial():
+    crossmap = GenomeHash(_MASKS)
+    transcripts = sorted(_TRANSCRIPTS.values(),key=lambda x: (x.spanning_segment.chrom,x.spanning_segment.start))
+    for window_func in (window_cds_start,window_cds_stop):
+        expected = group_regions_make_windows(transcripts,crossmap,50,100,window_func)
+        for kwargs in ({ "is_sorted" : True },{ "processes" : 2 },{ "processes" : 2, "is_sorted" : True }):
+            found = group_regions_make_windows(transcripts,crossmap,50,100,window_func,**kwargs)
+            assert_true(expected.reset_index(drop=True).equals(found.reset_index(drop=True)[expected.columns]))
+
+@attr(test="unit")
+def test_do_count_plots_masked_rows():
+    # windows extending past 5' ends of transcripts have masked positions,
+    # which must be dropped before choosing the heatmap's color range,
+    # including when no rows pass the count cutoff
+    import matplotlib
+    matplotlib.use("Agg")
+    from plastid.bin import metagene
+    from plastid.test.benchmarks.data import random_transcripts, random_reads, write_bam
+    chrom_lengths = { "chrA" : 60000, "chrB" : 40000 }
+    rng = random.Random(5)
+    tmpdir = tempfile.mkdtemp()
+    try:
+        bed_file = os.path.join(tmpdir,"transcripts.bed")
+        bam_file = os.path.join(tmpdir,"reads.bam")
+        outbase  = os.path.join(tmpdir,"test")
+        transcripts = random_transcripts(rng,chrom_lengths,40)
+        with open(bed_file,"w") as fout:
+            for tx in transcripts:
+                fout.write(tx.as_bed())
+        write_bam(bam_file,random_reads(rng,transcripts,chrom_lengths,20000),chrom_lengths)
+
+        metagene.main(["generate",outbase,"-q","--landmark","cds_start",
+                       "--annotation_files",bed_file,"--annotation_format","BED"])
+        for min_counts in ("1","1000000000"):
+            countbase = "%s_%s" % (outbase,min_counts)
+            metagene.main(["count","%s_rois.txt" % outbase,countbase,"-q","--count_files",bam_file,
+                           "--fiveprime","--offset","12","--min_counts",min_counts])
+            assert_true(os.path.exists("%s_metagene_overview.png" % countbase))
+    finally:
+        shutil.rmtree(tmpdir)
+
 
 #===============================================================================
 # INDEX: test data
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+"""Tests for counting in :py:mod:`plastid.bin.phase_by_size`"""
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import numpy
+from nose.plugins.attrib import attr
+from plastid.genomics.genome_array import BAMGenomeArray
+from plastid.genomics.map_factories import FivePrimeMapFactory
+from plastid.bin.phase_by_size import count_phases, _get_tasks
+from plastid.test.benchmarks.data import random_transcripts, random_reads, write_bam
+
+_CHROM_LENGTHS = { "chrA" : 60000, "chrB" : 50000, "chrC" : 40000 }
+
+
+@attr(test="unit")
+class TestCountPhases(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        rng = random.Random(7)
+        cls.tmpdir  = tempfile.mkdtemp()
+        cls.bamfile = os.path.join(cls.tmpdir,"reads.bam")
+        cls.transcripts = random_transcripts(rng,_CHROM_LENGTHS,60)
+        write_bam(cls.bamfile,random_reads(rng,cls.transcripts,_CHROM_LENGTHS,20000),_CHROM_LENGTHS)
+        cls.regions = [X.get_cds() for X in cls.transcripts]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def get_counter(self,processes):
+        ga = BAMGenomeArray(self.bamfile,mapping=FivePrimeMapFactory(offset=12))
+        return count_phases(self.regions,ga,26,32,codon_buffer=2,end_buffer=2,processes=processes)
+
+    def test_same_with_one_or_several_processes(self):
+        expected = self.get_counter(1)
+        self.assertGreater(expected.counts.sum(),0)
+        for processes in (2,3):
+            found = self.get_counter(processes)
+            self.assertEqual(found.num_regions,expected.num_regions)
+            self.assertTrue(numpy.array_equal(found.read_lengths,expected.read_lengths))
+            self.assertTrue(numpy.array_equal(found.counts,expected.counts))
+
+    def test_get_tasks_groups_by_chromosome(self):
+        tasks = list(_get_tasks(self.regions,(26,32,0,0),task_size=7))
+        self.assertEqual(sum(len(X[0]) for X in tasks),len(self.regions))
+        for regions, counter_args in tasks:
+            self.assertEqual(counter_args,(26,32,0,0))
+            self.assertLessEqual(len(regions),7)
+            self.assertEqual(len(set(X.chrom for X in regions)),1)
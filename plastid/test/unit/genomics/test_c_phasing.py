@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+"""Test suite for :py:mod:`plastid.genomics.c_phasing`"""
+import pickle
+import random
+import unittest
+import numpy
+from nose.plugins.attrib import attr
+from plastid.genomics.roitools import GenomicSegment, SegmentChain
+from plastid.genomics.c_phasing import PhaseCounter
+
+
+#===============================================================================
+# INDEX: helper classes & functions
+#===============================================================================
+
+class _FakeRead(object):
+    """Read alignment mapping to its leftmost position"""
+    def __init__(self,chrom,start,length):
+        self.chrom     = chrom
+        self.positions = list(range(start,start+length))
+
+def _map_leftmost(reads,seg):
+    vec = numpy.zeros(seg.end - seg.start)
+    for read in reads:
+        if seg.start <= read.positions[0] < seg.end:
+            vec[read.positions[0] - seg.start] += 1
+
+    return reads, vec
+
+class _FakeGenomeArray(object):
+    """Minimal stand-in for a |BAMGenomeArray|, ignoring strand"""
+    def __init__(self,reads,map_fn=_map_leftmost):
+        self.reads  = reads
+        self.map_fn = map_fn
+
+    def fetch_reads(self,seg):
+        return [X for X in self.reads if X.chrom == seg.chrom and \
+                                         X.positions[-1] >= seg.start and \
+                                         X.positions[0] < seg.end]
+
+def _expected_counts(cds,reads,min_length,max_length,codon_buffer,end_buffer):
+    expected = numpy.zeros((max_length - min_length + 1,3))
+    positions = cds.get_position_list()
+    if cds.strand == "-":
+        positions = positions[::-1]
+
+    last_codon = len(positions) // 3 - end_buffer
+    for read in reads:
+        row = len(read.positions) - min_length
+        if 0 <= row < expected.shape[0] and read.positions[0] in positions:
+            x = positions.index(read.positions[0])
+            if codon_buffer <= x // 3 < last_codon:
+                expected[row,x % 3] += 1
+
+    return expected
+
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+class TestPhaseCounter(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        random.seed(5)
+        cls.reads = [_FakeRead("chrA",random.randint(0,600),random.randint(24,36)) for _ in range(3000)]
+        cls.ga = _FakeGenomeArray(cls.reads)
+        cls.chains = []
+        for strand in ("+","-"):
+            cls.chains.append(SegmentChain(GenomicSegment("chrA",50,350,strand)))
+            cls.chains.append(SegmentChain(GenomicSegment("chrA",50,150,strand),
+                                           GenomicSegment("chrA",200,301,strand),
+                                           GenomicSegment("chrA",400,430,strand)))
+
+    def test_counts_match_per_position(self):
+        for cds in self.chains:
+            for codon_buffer, end_buffer in ((0,0),(5,5),(3,1)):
+                counter = PhaseCounter(25,35,codon_buffer=codon_buffer,end_buffer=end_buffer)
+                counter.add(cds,self.ga)
+                expected = _expected_counts(cds,self.reads,25,35,codon_buffer,end_buffer)
+                self.assertTrue((counter.counts == expected).all())
+                self.assertEqual(counter.num_regions,1)
+
+    def test_codon_counts(self):
+        cds = self.chains[1]
+        counter = PhaseCounter(25,35,codon_buffer=5,num_codons=10)
+        counter.add(cds,self.ga)
+        self.assertEqual(counter.codon_counts.shape,(11,10,3))
+
+        unbuffered = PhaseCounter(25,35,end_buffer=cds.length // 3 - 10)
+        unbuffered.add(cds,self.ga)
+        self.assertTrue((counter.codon_counts.sum(1) == unbuffered.counts).all())
+        self.assertIsNone(PhaseCounter(25,35).codon_counts)
+
+    def test_read_lengths(self):
+        self.assertTrue((PhaseCounter(25,30).read_lengths == numpy.arange(25,31)).all())
+
+    def test_merge_equals_sequential_add(self):
+        together = PhaseCounter(25,35,codon_buffer=2,end_buffer=2,num_codons=5)
+        merged   = PhaseCounter(25,35,codon_buffer=2,end_buffer=2,num_codons=5)
+        for cds in self.chains:
+            together.add(cds,self.ga)
+            other = PhaseCounter(25,35,codon_buffer=2,end_buffer=2,num_codons=5)
+            other.add(cds,self.ga)
+            merged.merge(other)
+
+        self.assertTrue((together.counts == merged.counts).all())
+        self.assertTrue((together.codon_counts == merged.codon_counts).all())
+        self.assertEqual(merged.num_regions,len(self.chains))
+
+    def test_merge_different_parameters_raises_value_error(self):
+        self.assertRaises(ValueError,PhaseCounter(25,35).merge,PhaseCounter(25,34))
+        self.assertRaises(ValueError,PhaseCounter(25,35).merge,PhaseCounter(25,35,codon_buffer=1))
+
+    def test_bad_parameters_raise_value_error(self):
+        self.assertRaises(ValueError,PhaseCounter,0,30)
+        self.assertRaises(ValueError,PhaseCounter,30,25)
+        self.assertRaises(ValueError,PhaseCounter,25,30,codon_buffer=-1)
+
+    def test_pickle(self):
+        counter = PhaseCounter(25,35,codon_buffer=1,num_codons=3)
+        counter.add(self.chains[0],self.ga)
+        found = pickle.loads(pickle.dumps(counter))
+        self.assertEqual((found.min_length,found.max_length,found.codon_buffer,found.end_buffer,found.num_codons),
+                         (25,35,1,0,3))
+        self.assertEqual(found.num_regions,1)
+        self.assertTrue((found.counts == counter.counts).all())
+        self.assertTrue((found.codon_counts == counter.codon_counts).all())
+
+    def test_empty_region_not_counted(self):
+        counter = PhaseCounter(25,35)
+        counter.add(SegmentChain(),self.ga)
+        self.assertEqual(counter.num_regions,0)
+
+    def test_multidimensional_mapping_raises_value_error(self):
+        ga = _FakeGenomeArray(self.reads,map_fn=lambda reads, seg: (reads,numpy.zeros((2,seg.end - seg.start))))
+        self.assertRaises(ValueError,PhaseCounter(25,35).add,self.chains[0],ga)
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+"""Test suite for :py:mod:`plastid.genomics.chain_table`"""
+import pickle
+import random
+import unittest
+import numpy
+from nose.plugins.attrib import attr
+from plastid.genomics.roitools import GenomicSegment, SegmentChain, Transcript
+from plastid.genomics.chain_table import ChainTable, pack_chains, unpack_chains
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+def _random_transcripts(num,seed=7):
+    """Generate random multi-exon |Transcripts|, some with coding regions"""
+    rng = random.Random(seed)
+    transcripts = []
+    for i in range(num):
+        chrom  = rng.choice(["chrA","chrB"])
+        strand = rng.choice(["+","-"])
+        pos = rng.randint(0,20000)
+        segments = []
+        for _ in range(rng.randint(1,4)):
+            length = rng.randint(10,200)
+            segments.append(GenomicSegment(chrom,pos,pos + length,strand))
+            pos += length + rng.randint(1,300)
+
+        tx = Transcript(*segments,ID="tx%s" % i)
+        if rng.random() < 0.7:
+            x1 = tx.get_genomic_coordinate(rng.randint(0,tx.length // 2))[1]
+            x2 = tx.get_genomic_coordinate(rng.randint(tx.length // 2 + 1,tx.length - 1))[1]
+            tx = Transcript(*segments,ID="tx%s" % i,cds_genome_start=min(x1,x2),cds_genome_end=max(x1,x2) + 1)
+        if i % 3 == 0:
+            tx.attr["gene_id"] = "gene%s" % (i // 3)
+
+        transcripts.append(tx)
+
+    return transcripts
+
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+class TestChainTable(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.transcripts = _random_transcripts(500)
+        cls.table = ChainTable.from_chains(cls.transcripts)
+
+    def check_rows(self,table,expected):
+        self.assertEqual(len(table),len(expected))
+        for found, known in zip(table,expected):
+            self.assertEqual(found.segments,known.segments)
+            self.assertEqual(found.attr,known.attr)
+            self.assertEqual(type(found),type(known))
+            if isinstance(known,Transcript):
+                self.assertEqual((found.cds_start,found.cds_end),(known.cds_start,known.cds_end))
+
+    def test_materialize_rows(self):
+        self.assertIs(self.table.return_type,Transcript)
+        self.check_rows(self.table,self.transcripts)
+        self.assertEqual(self.table[-1],self.transcripts[-1])
+        self.assertRaises(IndexError,self.table.__getitem__,len(self.transcripts))
+
+    def test_segment_chains_and_empty_chains(self):
+        chains = [SegmentChain(*X.segments,**X.attr) for X in self.transcripts[:20]]
+        chains.append(SegmentChain(ID="empty"))
+        table = ChainTable.from_chains(chains)
+        self.check_rows(table,chains)
+        self.assertEqual(table.lengths[-1],0)
+        self.assertEqual(table.span_starts[-1],-1)
+
+    def test_columns(self):
+        table = self.table
+        self.assertEqual(table.lengths.tolist(),[X.length for X in self.transcripts])
+        self.assertEqual(table.span_starts.tolist(),[X.spanning_segment.start for X in self.transcripts])
+        self.assertEqual(table.span_ends.tolist(),[X.spanning_segment.end for X in self.transcripts])
+        self.assertEqual(table.num_segments.tolist(),[len(X) for X in self.transcripts])
+        self.assertEqual(table.chroms.tolist(),[X.chrom for X in self.transcripts])
+        self.assertEqual(table.strands.tolist(),[X.strand for X in self.transcripts])
+        self.assertEqual(table.cds_starts.tolist(),[-1 if X.cds_start is None else X.cds_start for X in self.transcripts])
+        self.assertEqual(table.cds_ends.tolist(),[-1 if X.cds_end is None else X.cds_end for X in self.transcripts])
+        self.assertEqual(table.get_attr("gene_id"),[X.attr.get("gene_id") for X in self.transcripts])
+        self.assertFalse(table.lengths.flags.writeable)
+
+    def test_append_invalidates_columns(self):
+        table = ChainTable.from_chains(self.transcripts[:10])
+        self.assertEqual(len(table.lengths),10)
+        table.append(self.transcripts[10])
+        self.assertEqual(table.lengths.tolist(),[X.length for X in self.transcripts[:11]])
+
+    def test_take(self):
+        idx = [5,3,3,400,-1]
+        self.check_rows(self.table.take(idx),[self.transcripts[X] for X in idx])
+        self.check_rows(self.table[10:50:4],self.transcripts[10:50:4])
+
+        mask = self.table.lengths > 300
+        self.check_rows(self.table[mask],[X for X in self.transcripts if X.length > 300])
+        self.assertRaises(IndexError,self.table.take,[len(self.transcripts)])
+
+    def test_get_overlapping(self):
+        rng = random.Random(3)
+        for _ in range(50):
+            start = rng.randint(0,20000)
+            roi = GenomicSegment(rng.choice(["chrA","chrB","chrC"]),start,start + rng.randint(1,1000),rng.choice(["+","-"]))
+            expected = [N for N,X in enumerate(self.transcripts) if X.overlaps(roi)]
+            self.assertEqual(self.table.get_overlapping(roi).tolist(),expected)
+
+            expected = [N for N,X in enumerate(self.transcripts) if X.unstranded_overlaps(SegmentChain(roi))]
+            self.assertEqual(self.table.get_overlapping(roi,stranded=False).tolist(),expected)
+
+    def test_coordinate_conversion(self):
+        rng = random.Random(5)
+        idx = numpy.array([rng.randrange(len(self.transcripts)) for _ in range(1000)])
+        for stranded in (True,False):
+            positions = [rng.randrange(self.transcripts[X].length) for X in idx]
+            expected  = [self.transcripts[X].get_genomic_coordinate(Y,stranded=stranded)[1] for X,Y in zip(idx,positions)]
+            genomic   = self.table.get_genomic_coordinates(idx,positions,stranded=stranded)
+            self.assertEqual(genomic.tolist(),expected)
+            self.assertEqual(self.table.get_segmentchain_coordinates(idx,genomic,stranded=stranded).tolist(),positions)
+
+        # positions in introns or outside features
+        for i, tx in enumerate(self.transcripts[:50]):
+            span = tx.spanning_segment
+            positions = numpy.arange(span.start - 2,span.end + 2)
+            expected = []
+            for pos in positions:
+                try:
+                    expected.append(tx.get_segmentchain_coordinate(tx.chrom,pos,tx.strand))
+                except KeyError:
+                    expected.append(-1)
+
+            self.assertEqual(self.table.get_segmentchain_coordinates(i,positions).tolist(),expected)
+
+        self.assertRaises(IndexError,self.table.get_genomic_coordinates,[0],[self.transcripts[0].length])
+
+    def test_cds_utr_segments(self):
+        for name in ("cds","utr5","utr3"):
+            rows, starts, ends = getattr(self.table,"get_%s_segments" % name)()
+            for i, tx in enumerate(self.transcripts):
+                found = list(zip(starts[rows == i],ends[rows == i]))
+                expected = [(X.start,X.end) for X in getattr(tx,"get_%s" % name)()]
+                self.assertEqual(found,expected)
+
+    def test_get_subchain_segments(self):
+        rows, starts, ends = self.table.get_subchain_segments(1,self.table.lengths - 1,stranded=False)
+        for i, tx in enumerate(self.transcripts[:50]):
+            found = list(zip(starts[rows == i],ends[rows == i]))
+            expected = [(X.start,X.end) for X in tx.get_subchain(1,tx.length - 1,stranded=False)]
+            self.assertEqual(found,expected)
+
+        self.assertRaises(IndexError,self.table.get_subchain_segments,0,self.table.lengths + 1)
+
+    def test_append_bed(self):
+        for return_type in (SegmentChain,Transcript):
+            table = ChainTable(return_type=return_type)
+            for tx in self.transcripts[:50]:
+                table.append_bed(tx.as_bed())
+
+            self.check_rows(table,[return_type.from_bed(X.as_bed()) for X in self.transcripts[:50]])
+
+    def test_append_bed_cds_outside_exons_raises_key_error(self):
+        line = "\t".join(["chrA","100","1000","ID","0","+","250","950","0,0,0","2","100,100,","0,800,"])
+        self.assertRaises(KeyError,ChainTable(return_type=Transcript).append_bed,line)
+
+    def test_pickle(self):
+        found = pickle.loads(pickle.dumps(self.table))
+        self.assertIs(found.return_type,Transcript)
+        self.check_rows(found,self.transcripts)
+
+    def test_to_bytes_round_trip(self):
+        buf = self.table.to_bytes()
+        self.check_rows(ChainTable.from_bytes(buf),self.transcripts)
+        self.check_rows(ChainTable.from_bytes(memoryview(bytearray(buf))),self.transcripts)
+
+        # coordinates too far from feature starts for 4 bytes, and empty chains
+        chains = [SegmentChain(GenomicSegment("chrA",5,10,"+"),GenomicSegment("chrA",3*10**9,3*10**9 + 20,"+"),ID="long"),
+                  SegmentChain(ID="empty")]
+        self.check_rows(ChainTable.from_bytes(ChainTable.from_chains(chains).to_bytes()),chains)
+
+        self.assertRaises(ValueError,ChainTable.from_bytes,b"not a table")
+        self.assertRaises(ValueError,ChainTable.from_bytes,b"XXXX" + buf[4:])
+
+    def test_pack_unpack_chains(self):
+        found = unpack_chains(pack_chains(self.transcripts))
+        self.check_rows(found,self.transcripts)
+        self.assertEqual(unpack_chains(pack_chains([])),[])
+
+    def test_bad_return_type_raises_type_error(self):
+        self.assertRaises(TypeError,ChainTable,GenomicSegment)
@@ -1194,6 +1194,21 @@ class TestBigWigGenomeArray(AbstractGenomeArrayHelper):
         bw.add_from_bigwig(bigwigfile, "+")
         self.assertLessEqual(abs(bw.sum() - 12000),self.tol)
 
+    def test_missing_strand_warns_and_returns_zeros(self):
+        bigwigfile = os.path.join(TestBigWigGenomeArray.test_folder,"wig","bw_center_12_fw.bw")
+        bw = BigWigGenomeArray(fill=0)
+        bw.add_from_bigwig(bigwigfile,"+")
+        roi = GenomicSegment("chrA",0,1000,"-")
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            summary = bw.summarize(roi,n_bins=10)
+            counts = bw[roi]
+
+        self.assertTrue((summary == 0).all())
+        self.assertEqual(len(summary),10)
+        self.assertTrue((counts == 0).all())
+        self.assertEqual(len([X for X in w if issubclass(X.category,plastid.util.services.exceptions.DataWarning)]),2)
+
     def test_multiple_same_strand_fetch(self):
         bigwigfw = os.path.join(TestBigWigGenomeArray.test_folder,"wig","bw_center_12_fw.bw")
         bigwigrc = os.path.join(TestBigWigGenomeArray.test_folder,"wig","bw_center_12_rc.bw")
@@ -1217,6 +1232,29 @@ class TestBigWigGenomeArray(AbstractGenomeArrayHelper):
                 msg = "Maximum difference for multiple_strand_fetch (%s) exceeds tolerance (%s)"% (maxdiff,self.tol)
                 self.assertLessEqual(maxdiff, self.tol, msg)
      
+    def test_multiple_same_strand_fetch_chain(self):
+        bigwigfw = os.path.join(TestBigWigGenomeArray.test_folder,"wig","bw_center_12_fw.bw")
+        bigwigrc = os.path.join(TestBigWigGenomeArray.test_folder,"wig","bw_center_12_rc.bw")
+        
+        bw = BigWigGenomeArray(fill=0)
+        single = BigWigGenomeArray(fill=0)
+        for ga in (bw,bw,single):
+            ga.add_from_bigwig(bigwigfw, "+")
+            ga.add_from_bigwig(bigwigrc, "-")
+
+        for chrom, length in bw.lengths().items():
+            for strand in bw.strands():
+                chain = SegmentChain(GenomicSegment(chrom,0,length//3,strand),
+                                     GenomicSegment(chrom,length//3 + 100,length//3 + 200,strand),
+                                     GenomicSegment(chrom,2*length//3,length,strand))
+                expected = 2*numpy.concatenate([single.get(X,roi_order=False) for X in chain])
+                if strand == "-":
+                    expected = expected[::-1]
+
+                maxdiff = abs(bw[chain] - expected).max()
+                msg = "Maximum difference for multiple_strand_fetch_chain (%s) exceeds tolerance (%s)"% (maxdiff,self.tol)
+                self.assertLessEqual(maxdiff, self.tol, msg)
+     
     def test_to_genome_array(self):
         for test, orig in self.gnds.items():
             fw = os.path.join(TestBigWigGenomeArray.test_folder,"wig","bw_%s_fw.wig" % test)
@@ -1335,6 +1373,23 @@ class TestBAMGenomeArray(AbstractExportableGenomeArrayHelper):
         z = BAMGenomeArray(f,f)
         self.assertEqual(z.sum(),2*self.bga.sum())
 
+    def test_read_cache_same_as_uncached(self):
+        f = os.path.join(self.test_folder,_TEST_FILES["bam"])
+        for cache_size in (1,100*1024**2):
+            z = BAMGenomeArray(f,cache_size=cache_size)
+            chr_length = z.lengths()["chrA"]
+            for start in range(0,chr_length,chr_length // 20):
+                for strand in ("+","-","."):
+                    iv = GenomicSegment("chrA",start,min(start + chr_length // 10,chr_length),strand)
+                    expected = sorted([(X.query_name,X.reference_start,X.is_reverse) for X in self.bga.get_reads(iv)])
+                    found    = sorted([(X.query_name,X.reference_start,X.is_reverse) for X in z.get_reads(iv)])
+                    self.assertEqual(expected,found)
+                    self.assertTrue((self.bga[iv] == z[iv]).all())
+
+            self.assertGreater(z.cache_info["hits"],0)
+            z.clear_cache()
+            self.assertEqual(z.cache_info,{ "hits" : 0, "misses" : 0, "blocks" : 0, "bytes" : 0 })
+
         
     def mutable_conversion_helper(self,new_class):
         """Helper function to test conversion of |BAMGenomeArray| to various |MutableAbstractGenomeArray| types
@@ -6,7 +6,7 @@ from random import shuffle
 from pkg_resources import resource_filename, cleanup_resources
 from nose.plugins.attrib import attr
 
-from plastid.genomics.roitools import Transcript
+from plastid.genomics.roitools import GenomicSegment, Transcript
 from plastid.readers.bed import BED_Reader
 from plastid.genomics.genome_hash import GenomeHash, BigBedGenomeHash, TabixGenomeHash
 from plastid.util.services.decorators import skip_if_abstract
@@ -549,3 +549,48 @@ class TestTabixGenomeHash(AbstractGenomeHashHelper):
             df = double_hash[tx]
             expected = self.tx_hash[tx] + self.cds_hash[tx]
             self.assertEqual(len(df),len(expected))
+
+    def test_sweep_matches_get_overlapping_features(self):
+        rois = sorted([X.spanning_segment for X in self.transcripts] + self.transcripts,
+                      key=lambda x: (x.chrom,x.start if isinstance(x,GenomicSegment) else x.spanning_segment.start))
+        double_hash = TabixGenomeHash(self.tx_file,self.cds_file,data_format="BED")
+        for stranded in (True,False):
+            found = list(double_hash.sweep(rois,stranded=stranded))
+            self.assertEqual(len(found),len(rois))
+            for roi, (found_roi, features) in zip(rois,found):
+                self.assertIs(roi,found_roi)
+                expected = double_hash.get_overlapping_features(roi,stranded=stranded)
+                self.assertEqual(sorted(expected,key=_name_sort),sorted(features,key=_name_sort))
+
+    def test_sweep_unsorted_raises_value_error(self):
+        roi = sorted([X.spanning_segment for X in self.transcripts],key=lambda x: (x.chrom,x.start))[-1]
+        rois = [roi,GenomicSegment(roi.chrom,0,1,roi.strand)]
+        self.assertRaises(ValueError,list,self.tx_hash.sweep(rois))
+
+    def test_spliced_query_returns_each_feature_once(self):
+        for tx in self.transcripts:
+            names = [X.get_name() for X in self.tx_hash[tx]]
+            self.assertEqual(len(names),len(set(names)))
+
+    def test_record_cache(self):
+        one_hash = TabixGenomeHash(self.tx_file,data_format="BED")
+        tx = self.transcripts[0]
+        first = one_hash[tx]
+        misses = one_hash.cache_info["misses"]
+        self.assertGreaterEqual(misses,len(first))
+        second = one_hash[tx]
+        self.assertEqual(one_hash.cache_info["hits"],misses)
+        self.assertEqual(one_hash.cache_info["misses"],misses)
+        for a, b in zip(first,second):
+            self.assertIs(a,b)
+
+        one_hash.clear_cache()
+        self.assertEqual(one_hash.cache_info,{ "hits" : 0, "misses" : 0, "records" : 0 })
+
+        no_cache = TabixGenomeHash(self.tx_file,data_format="BED",record_cache_size=0)
+        first  = no_cache[tx]
+        second = no_cache[tx]
+        self.assertEqual(first,second)
+        for a, b in zip(first,second):
+            self.assertIsNot(a,b)
+        self.assertEqual(no_cache.cache_info["records"],0)
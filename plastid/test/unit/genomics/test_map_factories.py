@@ -1,14 +1,20 @@
 #!/usr/bin/env python
+import array
+import pickle
 import numpy
 import pysam
 import warnings
 from pkg_resources import resource_filename
-from nose.tools import assert_true, assert_equal, assert_greater_equal
+from nose.plugins.attrib import attr
+from nose.tools import assert_true, assert_equal, assert_greater_equal, assert_raises
 from plastid.genomics.map_factories import FivePrimeMapFactory,\
                                        ThreePrimeMapFactory,\
                                        CenterMapFactory,\
                                        VariableFivePrimeMapFactory,\
-                                       StratifiedVariableFivePrimeMapFactory
+                                       StratifiedVariableFivePrimeMapFactory,\
+                                       SizeFilterFactory,\
+                                       ReadFilter,\
+                                       filter_reads
 from plastid.genomics.roitools import GenomicSegment, SegmentChain
 from plastid.genomics.genome_array import BAMGenomeArray
 from plastid.util.services.mini2to3 import cStringIO
@@ -204,3 +210,90 @@ class TestBAM_MappingRules(object):
     def test_variable_stratified_mapping_minus(self):
         pass
 
+
+
+@attr(test="unit")
+class TestReadFilter(object):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.reads = []
+        for n, cigar in enumerate(("25M","10M50N20M","3S26M2I4M","28M2D3M","40M")):
+            for mapq in (0,10,50):
+                for flag in (0,0x10,0x100,0x400,0x110):
+                    read = pysam.AlignedSegment()
+                    read.reference_id    = 0
+                    read.reference_start = 100
+                    read.cigarstring     = cigar
+                    read.query_sequence  = "N"*read.infer_query_length()
+                    read.mapping_quality = mapq
+                    read.flag            = flag
+                    # put array and string tags ahead of tested tags
+                    read.set_tag("ZB",array.array("h",range(n)))
+                    read.set_tag("XS","+-"[n % 2])
+                    if mapq > 0:
+                        read.set_tag("NH",1 + n % 3,value_type="C" if n % 2 else "i")
+
+                    cls.reads.append(read)
+
+    @staticmethod
+    def python_filter(rf,read):
+        length = len(read.positions)
+        if read.mapping_quality < rf.min_mapq:
+            return False
+        if read.flag & rf.require_flags != rf.require_flags or read.flag & rf.exclude_flags:
+            return False
+        if length < rf.min_length or (rf.max_length != -1 and length > rf.max_length):
+            return False
+        if rf.tag is not None:
+            if not read.has_tag(rf.tag):
+                return False
+            if rf.tag_values is not None:
+                return read.get_tag(rf.tag) in rf.tag_values
+
+        return True
+
+    def check_filter(self,rf):
+        for strand in ("+","-","."):
+            expected = [X for X in self.reads if self.python_filter(rf,X) and \
+                        (strand == "." or X.is_reverse == (strand == "-"))]
+            assert_equal(filter_reads(self.reads,strand,[rf]),expected)
+
+        assert_equal([rf(X) for X in self.reads],[self.python_filter(rf,X) for X in self.reads])
+
+    def test_filters_same_as_python(self):
+        filters = [ReadFilter(),
+                   ReadFilter(min_length=26,max_length=30),
+                   ReadFilter(min_length=31),
+                   ReadFilter(min_mapq=10,exclude_flags=0x500),
+                   ReadFilter(require_flags=0x110),
+                   ReadFilter(tag="NH"),
+                   ReadFilter(tag="NH",tag_values={1,2}),
+                   ReadFilter(tag="XS",tag_values=["-"]),
+                   SizeFilterFactory(min=26,max=33),
+                   ]
+        for rf in filters:
+            yield self.check_filter, rf
+
+    def test_size_filter_same_as_positions(self):
+        rf = SizeFilterFactory(min=29,max=31)
+        assert_equal([rf(X) for X in self.reads],[29 <= len(X.positions) <= 31 for X in self.reads])
+
+    def test_filter_reads_mixed_filters(self):
+        python_filter = lambda x: x.mapping_quality == 50
+        found = filter_reads(self.reads,"-",[python_filter,ReadFilter(min_length=30)])
+        expected = [X for X in self.reads if X.is_reverse and python_filter(X) and len(X.positions) >= 30]
+        assert_equal(found,expected)
+
+    def test_pickle(self):
+        for rf in (ReadFilter(1,30,5,0x1,0x100,"NH",[1]),SizeFilterFactory(min=25,max=35)):
+            found = pickle.loads(pickle.dumps(rf))
+            assert_equal(found.__class__,rf.__class__)
+            assert_equal(repr(found),repr(rf))
+
+    def test_bad_parameters_raise_value_error(self):
+        assert_raises(ValueError,ReadFilter,min_length=-1)
+        assert_raises(ValueError,ReadFilter,min_length=30,max_length=25)
+        assert_raises(ValueError,ReadFilter,tag="NHX")
+        assert_raises(ValueError,ReadFilter,tag_values=[1])
+        assert_raises(ValueError,SizeFilterFactory,min=0)
@@ -1073,6 +1073,49 @@ chrI    .    stop_codon    7235    7238    .    -    .    gene_id "YAL067C"; tra
                 self.assertEquals(i,ivc.get_segmentchain_coordinate(ivc.chrom,x,ivc.strand,stranded=True))
                 x = ivc.get_genomic_coordinate(i,stranded=False)[1]
                 self.assertEquals(i,ivc.get_segmentchain_coordinate(ivc.chrom,x,ivc.strand,stranded=False))
+
+    @skip_if_abstract
+    def test_get_genomic_coordinates(self):
+        ivca = self.test_class(GenomicSegment("chrA",2,3,"+"),
+                               GenomicSegment("chrA",15,19,"+"),
+                               GenomicSegment("chrA",20,24,"+"))
+        nvca = self.test_class(GenomicSegment("chrA",2,3,"-"),
+                               GenomicSegment("chrA",15,19,"-"),
+                               GenomicSegment("chrA",20,24,"-"))
+        for ivc in (ivca,nvca):
+            for stranded in (True,False):
+                positions = numpy.arange(ivc.length)
+                expected  = [ivc.get_genomic_coordinate(X,stranded=stranded)[1] for X in range(ivc.length)]
+                found     = ivc.get_genomic_coordinates(positions,stranded=stranded)
+                self.assertEqual(found.tolist(),expected)
+                self.assertEqual(ivc.get_genomic_coordinates(positions[::-1].reshape((3,3)),stranded=stranded).tolist(),
+                                 numpy.array(expected[::-1]).reshape((3,3)).tolist())
+
+            self.assertRaises(IndexError,ivc.get_genomic_coordinates,[0,ivc.length])
+            self.assertRaises(IndexError,ivc.get_genomic_coordinates,[-1])
+
+    @skip_if_abstract
+    def test_get_segmentchain_coordinates(self):
+        for strand in ("+","-"):
+            ivc = self.test_class(GenomicSegment("chrA",2,3,strand),
+                                  GenomicSegment("chrA",15,19,strand),
+                                  GenomicSegment("chrA",20,24,strand))
+            positions = numpy.arange(0,30)
+            for stranded in (True,False):
+                expected = []
+                for x in positions:
+                    try:
+                        expected.append(ivc.get_segmentchain_coordinate("chrA",x,strand,stranded=stranded))
+                    except KeyError:
+                        expected.append(-1)
+
+                found = ivc.get_segmentchain_coordinates("chrA",positions,strand,stranded=stranded)
+                self.assertEqual(found.tolist(),expected)
+
+            self.assertRaises(ValueError,ivc.get_segmentchain_coordinates,"chrB",positions,strand)
+
+        empty = self.test_class()
+        self.assertEqual(empty.get_segmentchain_coordinates(empty.chrom,[5],empty.strand).tolist(),[-1])
     
     @skip_if_abstract    
     def test_get_subchain(self):
@@ -1562,6 +1605,31 @@ chrI    .    stop_codon    7235    7238    .    -    .    gene_id "YAL067C"; tra
         self.assertListEqual(chain1.mask_segments,c1new.mask_segments)
         self.assertListEqual(chain2.mask_segments,c2new.mask_segments)
 
+    @skip_if_abstract
+    def test_pickle_empty(self):
+        chain = pickle.loads(pickle.dumps(self.test_class(ID="empty")))
+        self.assertEqual(len(chain),0)
+        self.assertEqual(chain.attr["ID"],"empty")
+
+    @skip_if_abstract
+    def test_unpickle_segment_string_state(self):
+        # state saved by earlier versions, with segments as strings
+        chain = self.test_class(GenomicSegment("chrA",50,100,"-"),
+                                GenomicSegment("chrA",120,130,"-"),
+                                ID="some_id",cds_genome_start=60,cds_genome_end=125)
+        chain.add_masks(GenomicSegment("chrA",55,65,"-"))
+        state = ([str(X) for X in chain.segments],[str(X) for X in chain.mask_segments],dict(chain.attr))
+        if isinstance(chain,Transcript):
+            state += (chain.cds_genome_start,chain.cds_genome_end)
+
+        found = self.test_class()
+        found.__setstate__(state)
+        self.assertEqual(found,chain)
+        self.assertDictEqual(found.attr,chain.attr)
+        self.assertListEqual(found.mask_segments,chain.mask_segments)
+        if isinstance(chain,Transcript):
+            self.assertEqual((found.cds_start,found.cds_end),(chain.cds_start,chain.cds_end))
+
     @skip_if_abstract
     def test_shallowcopy(self):
         segments = [GenomicSegment("chrA",10,100,"+"),
@@ -2307,6 +2375,48 @@ class TestTranscript(AbstractSegmentChainHelper):
     
         self.assertGreater(i,0,"test_get_utr3: No 3' UTRs tested?!")
 
+    def test_cache_derived(self):
+        tx = Transcript(GenomicSegment("chrA",0,100,"+"),
+                        GenomicSegment("chrA",150,300,"+"),
+                        ID="tx",cds_genome_start=50,cds_genome_end=200)
+        self.assertFalse(tx.cache_derived)
+        self.assertIsNot(tx.get_cds(),tx.get_cds())
+
+        tx.cache_derived = True
+        cds, utr5, utr3 = tx.get_cds(), tx.get_utr5(), tx.get_utr3()
+        self.assertIs(tx.get_cds(),cds)
+        self.assertIs(tx.get_utr5(),utr5)
+        self.assertIs(tx.get_utr3(),utr3)
+        self.assertIsNot(tx.get_cds(ID="other"),cds)
+
+        # changing coding region discards cached subchains
+        tx.cds_genome_end = 180
+        self.assertEqual(tx.get_cds().length,cds.length - 20)
+        self.assertEqual(tx.get_utr3().length,utr3.length + 20)
+
+        # as does changing segments
+        tx.add_segments(GenomicSegment("chrA",400,450,"+"))
+        self.assertEqual(tx.get_utr3().length,utr3.length + 70)
+
+        tx.cache_derived = False
+        self.assertIsNot(tx.get_utr5(),tx.get_utr5())
+
+    def test_cache_derived_discarded_when_masks_change(self):
+        tx = Transcript(GenomicSegment("chrA",0,100,"+"),
+                        GenomicSegment("chrA",150,300,"+"),
+                        ID="tx",cds_genome_start=50,cds_genome_end=200)
+        tx.cache_derived = True
+        cds = tx.get_cds()
+        self.assertIs(tx.get_cds(),cds)
+
+        tx.add_masks(GenomicSegment("chrA",60,70,"+"))
+        masked_cds = tx.get_cds()
+        self.assertIsNot(masked_cds,cds)
+        self.assertIs(tx.get_cds(),masked_cds)
+
+        tx.reset_masks()
+        self.assertIsNot(tx.get_cds(),masked_cds)
+
    # overridden to use Transcript.from_bed() to preserve CDS info
     def test_to_from_bed_identity(self):
         """Test import to and from BED12 format"""
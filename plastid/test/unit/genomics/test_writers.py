@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""Test suite for :py:mod:`plastid.genomics.writers`"""
+import unittest
+from nose.plugins.attrib import attr
+from plastid.util.services.mini2to3 import cStringIO
+from plastid.genomics.roitools import GenomicSegment, SegmentChain, Transcript
+from plastid.genomics.chain_table import ChainTable
+from plastid.genomics.writers import write_bed, write_gtf
+from plastid.test.unit.genomics.test_chain_table import _random_transcripts
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+def _varied_chains(num):
+    """Generate |Transcripts| and |SegmentChains| with a variety of attributes
+    that affect export
+    """
+    chains = []
+    for i, tx in enumerate(_random_transcripts(num)):
+        attr = tx.attr
+        kind = i % 8
+        if kind == 1:
+            attr["transcript_id"] = "t%s" % i
+            attr["gene_id"] = "g;%s" % (i // 3)
+        elif kind == 2:
+            attr.pop("ID")
+            attr["transcript_id"] = "t%s" % i
+            attr["gene_id"] = ["gB","gA"]
+        elif kind == 3:
+            attr.pop("ID")
+        elif kind == 4:
+            attr["color"] = "#FF0000"
+            attr["score"] = "12.6"
+            attr["note"] = 'a "quoted" = value, with; specials'
+        elif kind == 5:
+            attr["color"] = (10,20,30)
+            attr["phase"] = "0"
+            attr["source"] = "some_source"
+        elif kind == 6:
+            attr.pop("ID")
+            attr["Name"] = "name%s" % i
+            attr["some_list"] = ["x;1","y"]
+        elif kind == 7:
+            attr["thickstart"] = 5
+            attr["_bedx_column_order"] = ["gene_id","note"]
+
+        chains.append(tx)
+        chain = SegmentChain(*tx.segments,**attr)
+        chain.attr.setdefault("type","exon")
+        chains.append(chain)
+
+    chains.append(Transcript(ID="empty"))
+    chains.append(SegmentChain(GenomicSegment("chrA",5,9,"+"),type="CDS",ID="single",phase=2))
+    return chains
+
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+class TestWriters(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.chains = _varied_chains(400)
+
+    def test_write_bed_matches_as_bed(self):
+        for kwargs in ({},
+                       {"extra_columns" : ["gene_id","not_an_attribute"], "empty_value" : "na"},
+                       {"as_int" : False}):
+            fh = cStringIO.StringIO()
+            num = write_bed(self.chains,fh,blocksize=7,**kwargs)
+            self.assertEqual(fh.getvalue(),"".join([X.as_bed(**kwargs) for X in self.chains]))
+            self.assertEqual(num,len(self.chains) - 1)
+
+    def test_write_bed_chain_table_matches_as_bed(self):
+        for return_type in (SegmentChain,Transcript):
+            table = ChainTable.from_chains([X for X in self.chains if isinstance(X,return_type)],
+                                           return_type=return_type)
+            for kwargs in ({},{"extra_columns" : ["gene_id","note"], "empty_value" : "na"}):
+                fh = cStringIO.StringIO()
+                write_bed(table,fh,**kwargs)
+                self.assertEqual(fh.getvalue(),"".join([X.as_bed(**kwargs) for X in table]))
+
+    def test_write_gtf_matches_as_gtf(self):
+        for kwargs in ({},{"escape" : False},{"excludes" : ["note","gene_id"]}):
+            fh = cStringIO.StringIO()
+            write_gtf(self.chains,fh,blocksize=5,**kwargs)
+            self.assertEqual(fh.getvalue(),"".join([X.as_gtf(**kwargs) for X in self.chains]))
+
+    def test_write_gtf_uses_subclass_methods(self):
+        class MyChain(SegmentChain):
+            def as_gtf(self,escape=True,excludes=None):
+                return "custom\n"
+
+        fh = cStringIO.StringIO()
+        write_gtf([MyChain(GenomicSegment("chrA",5,9,"+"))],fh)
+        self.assertEqual(fh.getvalue(),"custom\n")
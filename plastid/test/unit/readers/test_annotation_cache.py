@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+"""Test suite for :py:mod:`plastid.readers.annotation_cache`"""
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+from nose.plugins.attrib import attr
+from plastid.util.services.mini2to3 import cStringIO
+from plastid.genomics.roitools import GenomicSegment, SegmentChain, Transcript
+from plastid.genomics.genome_hash import GenomeHash
+from plastid.readers.gff import GTF2_TranscriptAssembler, GFF3_TranscriptAssembler
+from plastid.readers.annotation_cache import AnnotationCache,\
+                                             AnnotationCacheWriter,\
+                                             cache_features,\
+                                             get_annotation_cache_key,\
+                                             get_annotation_cache_filename
+from plastid.readers.bed import BED_Reader
+from plastid.readers.bigbed import BigBedReader
+from plastid.readers.psl import PSL_Reader
+from plastid.test.unit.readers import test_gff as gff_data
+from pkg_resources import resource_filename
+
+#===============================================================================
+# INDEX: test data
+#===============================================================================
+
+_BED12_DATA = """chrA	100	1100	IVC1p	0.0	+	100	100	0,0,0	1	1000,	0,
+chrA	100	2700	IVC7p	500.0	+	2200	2400	0,122,223	3	1000,500,95,	0,2000,2505,
+chrA	100	2700	IVC7m	500.0	-	2200	2400	0,122,223	3	1000,500,95,	0,2000,2505,
+chrA	100	2700	IVC10p	500.0	+	1099	2101	0,122,223	3	1000,500,95,	0,2000,2505,
+"""
+
+_PSL_DATA = """250	0	0	0	0	0	1	100	+	read1	250	0	250	chrA	10000	100	450	2	100,150,	0,100,	100,300,
+200	0	0	0	0	0	0	0	-	read2	200	0	200	chrA	10000	1000	1200	1	200,	0,	1000,
+"""
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+def assemble(text,assembler=GTF2_TranscriptAssembler,return_type=Transcript):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return list(assembler(cStringIO.StringIO(text),return_type=return_type))
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+class TestAnnotationCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.transcripts = assemble(gff_data.GTF2_TO_TRANSCRIPTS_SORTED)
+        cls.gff3_transcripts = assemble(gff_data.GFF3_TO_TRANSCRIPTS_SORTED,assembler=GFF3_TranscriptAssembler)
+        cls.chains = assemble(gff_data.GTF2_TO_TRANSCRIPTS_SORTED,return_type=SegmentChain)
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def write_cache(self,features,key="",store_attr=True):
+        fn = os.path.join(self.tmpdir,"test.plcache")
+        writer = AnnotationCacheWriter(fn,key=key,store_attr=store_attr)
+        for feature in features:
+            writer.add(feature)
+        writer.close()
+        return fn
+
+    def check_equal(self,expected,found):
+        self.assertEqual(len(expected),len(found))
+        for tx1, tx2 in zip(expected,found):
+            self.assertEqual(tx1.__class__,tx2.__class__)
+            self.assertEqual(str(tx1),str(tx2))
+            self.assertEqual(tx1.cds_genome_start,tx2.cds_genome_start)
+            self.assertEqual(tx1.cds_genome_end,tx2.cds_genome_end)
+            self.assertDictEqual(tx1.attr,tx2.attr)
+
+    def test_round_trip_transcripts(self):
+        fn = self.write_cache(self.transcripts)
+        cache = AnnotationCache(fn,return_type=Transcript)
+        self.check_equal(self.transcripts,list(cache))
+
+    def test_round_trip_gff3_transcripts(self):
+        fn = self.write_cache(self.gff3_transcripts)
+        cache = AnnotationCache(fn,return_type=Transcript)
+        self.check_equal(self.gff3_transcripts,list(cache))
+
+    def test_round_trip_bed_transcripts(self):
+        # Transcripts from BED hold CDS outside of `attr`
+        transcripts = list(BED_Reader(cStringIO.StringIO(_BED12_DATA),return_type=Transcript))
+        self.assertTrue(any(X.cds_genome_start is not None for X in transcripts))
+        fn = self.write_cache(transcripts)
+        self.check_equal(transcripts,list(AnnotationCache(fn,return_type=Transcript)))
+
+    def test_round_trip_bigbed_transcripts(self):
+        bbfile = resource_filename("plastid","test/data/annotations/100transcripts_bed12.bb")
+        transcripts = list(BigBedReader(bbfile,return_type=Transcript))
+        fn = self.write_cache(transcripts)
+        self.check_equal(transcripts,list(AnnotationCache(fn,return_type=Transcript)))
+
+    def test_round_trip_psl_transcripts(self):
+        transcripts = list(PSL_Reader(cStringIO.StringIO(_PSL_DATA),return_type=Transcript))
+        fn = self.write_cache(transcripts)
+        self.check_equal(transcripts,list(AnnotationCache(fn,return_type=Transcript)))
+
+    def test_round_trip_segmentchains(self):
+        fn = self.write_cache(self.chains)
+        cache = AnnotationCache(fn,return_type=SegmentChain)
+        for tx1, tx2 in zip(self.chains,cache):
+            self.assertEqual(str(tx1),str(tx2))
+            self.assertDictEqual(tx1.attr,tx2.attr)
+
+    def test_without_attr(self):
+        fn = self.write_cache(self.transcripts,store_attr=False)
+        cache = AnnotationCache(fn,return_type=Transcript)
+        for tx1, tx2 in zip(self.transcripts,cache):
+            self.assertEqual(str(tx1),str(tx2))
+            self.assertEqual(tx1.get_name(),tx2.get_name())
+            self.assertEqual(tx1.cds_genome_start,tx2.cds_genome_start)
+            self.assertEqual(tx1.cds_genome_end,tx2.cds_genome_end)
+
+    def test_len(self):
+        fn = self.write_cache(self.transcripts)
+        self.assertEqual(len(AnnotationCache(fn)),len(self.transcripts))
+
+    def test_empty_cache(self):
+        fn = self.write_cache([])
+        cache = AnnotationCache(fn)
+        self.assertEqual(len(cache),0)
+        self.assertEqual(list(cache),[])
+        self.assertEqual(cache.get_features_by_name("nope"),[])
+        self.assertEqual(cache[GenomicSegment("chrI",0,1000,"+")],[])
+
+    def test_get_features_by_name(self):
+        fn = self.write_cache(self.transcripts)
+        cache = AnnotationCache(fn,return_type=Transcript)
+        for tx in self.transcripts:
+            found = cache.get_features_by_name(tx.get_name())
+            self.assertEqual(len(found),1)
+            self.check_equal([tx],found)
+
+        self.assertEqual(cache.get_features_by_name("not_a_transcript"),[])
+
+    def test_get_features_by_name_duplicates(self):
+        fn = self.write_cache(self.transcripts + self.transcripts)
+        cache = AnnotationCache(fn,return_type=Transcript)
+        tx = self.transcripts[0]
+        self.check_equal([tx,tx],cache.get_features_by_name(tx.get_name()))
+
+    def test_get_overlapping_features_matches_genome_hash(self):
+        fn = self.write_cache(self.transcripts)
+        cache = AnnotationCache(fn,return_type=Transcript)
+        ghash = GenomeHash(self.transcripts)
+        rois = [GenomicSegment("2R",3207059,3210000,"-"),
+                GenomicSegment("2R",3207059,3210000,"+"),
+                GenomicSegment("2R",0,100000000,"-"),
+                GenomicSegment("2R",3250000,3250100,"-"),
+                GenomicSegment("2R",10,20,"-"),
+                GenomicSegment("chrNone",0,100000000,"+"),
+                ]
+        rois.extend([X.spanning_segment for X in self.transcripts[::10]])
+        for roi in rois:
+            for stranded in (True,False):
+                expected = sorted([X.get_name() for X in ghash.get_overlapping_features(roi,stranded=stranded)])
+                found    = sorted([X.get_name() for X in cache.get_overlapping_features(roi,stranded=stranded)])
+                self.assertEqual(expected,found)
+
+            self.assertEqual(sorted([X.get_name() for X in ghash[roi]]),
+                             sorted([X.get_name() for X in cache[roi]]))
+
+    def test_key_mismatch_raises_value_error(self):
+        fn = self.write_cache(self.transcripts,key="abc")
+        self.assertEqual(AnnotationCache(fn,key="abc").key,"abc")
+        self.assertRaises(ValueError,AnnotationCache,fn,key="def")
+
+    def test_bad_file_raises_value_error(self):
+        fn = os.path.join(self.tmpdir,"bad.plcache")
+        with open(fn,"w") as fout:
+            fout.write("not a cache\n")
+        self.assertRaises(ValueError,AnnotationCache,fn)
+
+    def test_cache_features_writes_when_exhausted(self):
+        fn = os.path.join(self.tmpdir,"test.plcache")
+        gen = cache_features(iter(self.transcripts),fn)
+        first = next(gen)
+        self.assertFalse(os.path.exists(fn))
+        rest = list(gen)
+        self.check_equal(self.transcripts,[first] + rest)
+        self.check_equal(self.transcripts,list(AnnotationCache(fn,return_type=Transcript)))
+
+    def test_attr_not_json_raises_value_error(self):
+        fn = os.path.join(self.tmpdir,"test.plcache")
+        for val in [(1,2),set([1]),{ 1 : "a" },[object()]]:
+            writer = AnnotationCacheWriter(fn)
+            tx = Transcript(GenomicSegment("chrA",0,100,"+"),ID="a",some_key=val)
+            self.assertRaises(ValueError,writer.add,tx)
+            self.assertEqual(len(writer),0)
+
+        # fine if attr not stored
+        writer = AnnotationCacheWriter(fn,store_attr=False)
+        writer.add(tx)
+        self.assertEqual(len(writer),1)
+
+    def test_cache_features_not_written_if_attr_not_json(self):
+        fn = os.path.join(self.tmpdir,"test.plcache")
+        tx = Transcript(GenomicSegment("chrA",0,100,"+"),ID="a",some_key=(1,2))
+        features = self.transcripts + [tx]
+        with warnings.catch_warnings(record=True) as w:
+            warnings.simplefilter("always")
+            found = list(cache_features(iter(features),fn))
+
+        self.assertEqual(found,features)
+        self.assertFalse(os.path.exists(fn))
+        self.assertTrue(any("Not writing annotation cache" in str(X.message) for X in w))
+
+    def test_close_leaves_no_temporary_files(self):
+        fn = self.write_cache(self.transcripts)
+        fn = self.write_cache(self.transcripts)
+        self.assertEqual(os.listdir(self.tmpdir),["test.plcache"])
+        self.check_equal(self.transcripts,list(AnnotationCache(fn,return_type=Transcript)))
+
+    def test_cache_key_depends_on_content_and_options(self):
+        fn1 = os.path.join(self.tmpdir,"a.gtf")
+        fn2 = os.path.join(self.tmpdir,"b.gtf")
+        for fn, text in ((fn1,"some text\n"),(fn2,"other text\n")):
+            with open(fn,"w") as fout:
+                fout.write(text)
+
+        key1 = get_annotation_cache_key([fn1],annotation_format="GTF2",add_three=False)
+        self.assertEqual(key1,get_annotation_cache_key([fn1],annotation_format="GTF2",add_three=False))
+        self.assertNotEqual(key1,get_annotation_cache_key([fn2],annotation_format="GTF2",add_three=False))
+        self.assertNotEqual(key1,get_annotation_cache_key([fn1],annotation_format="GTF2",add_three=True))
+        self.assertNotEqual(key1,get_annotation_cache_key([fn1,fn1],annotation_format="GTF2",add_three=False))
+        self.assertEqual(get_annotation_cache_filename(self.tmpdir,key1),
+                         os.path.join(self.tmpdir,key1 + ".plcache"))
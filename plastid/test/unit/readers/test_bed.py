@@ -16,7 +16,7 @@ from nose.plugins.attrib import attr
 from plastid.util.services.mini2to3 import cStringIO
 from plastid.genomics.roitools import SegmentChain, GenomicSegment, Transcript
 from plastid.readers.bed import BED_Reader
-from nose.tools import assert_equal, assert_true, assert_dict_equal, assert_greater_equal
+from nose.tools import assert_equal, assert_true, assert_dict_equal, assert_greater_equal, assert_raises
 
 from plastid.test.ref_files import RPATH, REF_FILES
 
@@ -373,6 +373,90 @@ class TestBED():
             ltmp = list(reader)
             assert_greater_equal(len(warns),0)
 
+@attr(test="unit")
+class TestBEDReadAll():
+    """Test case for bulk reading via :meth:`BED_Reader.read_all`"""
+
+    @staticmethod
+    def read_both(text,**kwargs):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            iterated = list(BED_Reader(cStringIO.StringIO(text),**kwargs))
+            reader = BED_Reader(cStringIO.StringIO(text),**kwargs)
+            bulk = reader.read_all(blocksize=3)
+
+        return iterated, bulk, reader
+
+    def test_read_all_matches_iteration(self):
+        text = _BED_HEADER + _BED12_DATA + "\n\n# a comment\nnot a BED line\n" + _BED12_DATA
+        for return_type, add_three in ((SegmentChain,False),(Transcript,False),(Transcript,True)):
+            iterated, bulk, reader = self.read_both(text,return_type=return_type,add_three_for_stop=add_three)
+            assert_equal(len(bulk),2*len(_TEST_SEGMENTCHAINS))
+            assert_equal(len(iterated),len(bulk))
+            for chain1, chain2 in zip(iterated,bulk):
+                assert_equal(chain1,chain2)
+                assert_dict_equal(chain1.attr,chain2.attr)
+
+            assert_equal(reader.rejected,["not a BED line\n"])
+            assert_equal(reader.counter,len(text.split("\n")))
+
+    def test_read_all_parses_track_lines(self):
+        iterated, bulk, reader = self.read_both(_NARROW_PEAK_TEXT)
+        assert_equal(len(bulk),len(_NARROW_PEAK_CHAINS))
+        assert_equal(reader.metadata["type"],"narrowPeak")
+        for found, expected in zip(bulk,_NARROW_PEAK_CHAINS):
+            assert_equal(found,expected)
+            assert_equal(found.attr["peak"],expected.attr["peak"])
+
+    def test_read_all_empty(self):
+        iterated, bulk, reader = self.read_both(_BED_HEADER)
+        assert_equal(bulk,[])
+
+    def test_read_table_matches_read_all(self):
+        text = _BED_HEADER + _BED12_DATA + "\n\n# a comment\nnot a BED line\n" + _NARROW_PEAK_TEXT
+        for return_type, add_three in ((SegmentChain,False),(Transcript,False),(Transcript,True)):
+            iterated, bulk, _ = self.read_both(text,return_type=return_type,add_three_for_stop=add_three)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                reader = BED_Reader(cStringIO.StringIO(text),return_type=return_type,add_three_for_stop=add_three)
+                table = reader.read_table(blocksize=3)
+
+            assert_equal(len(table),len(bulk))
+            for chain1, chain2 in zip(bulk,table):
+                assert_equal(chain1,chain2)
+                assert_dict_equal(chain1.attr,chain2.attr)
+                if return_type == Transcript:
+                    assert_equal((chain1.cds_start,chain1.cds_end),(chain2.cds_start,chain2.cds_end))
+
+            assert_equal(reader.rejected,["not a BED line\n"])
+            assert_equal(reader.metadata["type"],"narrowPeak")
+
+    def test_from_bed_block_edge_cases(self):
+        # block columns with and without trailing commas, or padded with spaces,
+        # must give the same segments
+        expected = [GenomicSegment("chrA",100,1100,"+"),GenomicSegment("chrA",2100,2600,"+")]
+        for sizes, starts in (("1000,500,","0,2000,"),
+                              ("1000,500","0,2000"),
+                              ("1000, 500,"," 0,2000"),
+                              ("1000,500,95,","0,2000,2505,"), # extra blocks ignored
+                              ):
+            line = "\t".join(["chrA","100","2600","ID","0","+","100","100","0,0,0","2",sizes,starts])
+            assert_equal(SegmentChain.from_bed(line).segments,expected)
+
+    def test_from_bed_too_few_blocks_raises(self):
+        line = "\t".join(["chrA","100","2600","ID","0","+","100","100","0,0,0","3","1000,500,","0,2000,"])
+        assert_raises(IndexError,SegmentChain.from_bed,line)
+
+        line = "\t".join(["chrA","100","2600","ID","0","+","100","100","0,0,0","2","1000,,500,","0,2000,"])
+        assert_raises(ValueError,SegmentChain.from_bed,line)
+
+    def test_from_bed_bad_color_falls_back_to_black(self):
+        line = "\t".join(["chrA","100","2600","ID","0","+","100","100","notacolor"])
+        assert_equal(SegmentChain.from_bed(line).attr["color"],"#000000")
+        line = "\t".join(["chrA","100","2600","ID","0","+","100","100","255,0,0"])
+        assert_equal(SegmentChain.from_bed(line).attr["color"],"#FF0000")
+
+
 #===============================================================================
 # INDEX: test data
 #===============================================================================
@@ -284,6 +284,69 @@ class test_BigBedReader(unittest.TestCase):
                                 msg="%s failure:\n    Only in first set: %s\n    Only in second set: %s" % (txid,
                                                                                                    s1-s2,
                                                                                                    s2-s1))
+    def test_get_batch_same_as_get(self):
+        queries = list(self.cds_dict.values()) + list(self.as_cds_dict.values())
+        queries = [queries[X % len(queries)] for X in self.shuffled_indices]
+        queries.append(GenomicSegment("nonexistent_chrom",0,1000,"+"))
+        for col in (6,12):
+            bb = self.bbs[col]
+            for stranded in (True,False):
+                found = bb.get_batch(queries,stranded=stranded)
+                self.assertEqual(len(found),len(queries))
+                for query, batch_features in zip(queries,found):
+                    self.assertEqual([str(X) for X in bb.get(query,stranded=stranded)],
+                                     [str(X) for X in batch_features])
+
+    def test_get_many_same_as_get(self):
+        queries = list(self.cds_dict.values()) + list(self.as_cds_dict.values())
+        queries = [queries[X % len(queries)] for X in self.shuffled_indices]
+        for col in (6,12):
+            bb = BigBedReader(self.bbfiles[col],return_type=Transcript)
+            for stranded in (True,False):
+                for threads in (1,4):
+                    found = bb.get_many(queries,threads=threads,stranded=stranded)
+                    self.assertEqual(len(found),len(queries))
+                    for query, features in zip(queries,found):
+                        self.assertEqual([str(X) for X in self.bbs[col].get(query,stranded=stranded)],
+                                         [str(X) for X in features])
+
+    def test_get_same_with_and_without_caches(self):
+        cached   = BigBedReader(self.bbfiles[12],return_type=Transcript,record_cache_size=10000)
+        uncached = BigBedReader(self.bbfiles[12],return_type=Transcript,block_cache_size=0,record_cache_size=0)
+        queries  = list(self.cds_dict.values()) + list(self.as_cds_dict.values())
+        for _ in range(2):
+            for query in queries:
+                for stranded in (True,False):
+                    self.assertEqual([str(X) for X in cached.get(query,stranded=stranded)],
+                                     [str(X) for X in uncached.get(query,stranded=stranded)])
+
+        info = cached.cache_info
+        self.assertGreater(info["block_hits"],0)
+        self.assertGreater(info["record_hits"],0)
+        self.assertEqual(uncached.cache_info["blocks"],0)
+        self.assertEqual(uncached.cache_info["records"],0)
+
+        cached.clear_cache()
+        self.assertTrue(all([X == 0 for X in cached.cache_info.values()]))
+
+    def test_get_returns_new_objects_by_default(self):
+        bb = BigBedReader(self.bbfiles[12],return_type=Transcript)
+        query = [X for X in self.cds_dict.values() if len(X) > 0][0]
+        first = bb.get(query)
+        first[0].attr["modified"] = True
+        second = bb.get(query)
+        self.assertEqual([str(X) for X in first],[str(X) for X in second])
+        self.assertTrue(all([X is not Y for X,Y in zip(first,second)]))
+        self.assertNotIn("modified",second[0].attr)
+        self.assertEqual(bb.cache_info["records"],0)
+
+    def test_cache_bounded(self):
+        bb = BigBedReader(self.bbfiles[12],return_type=Transcript,block_cache_size=1,record_cache_size=3)
+        for query in self.cds_dict.values():
+            list(bb[query])
+            self.assertLessEqual(bb.cache_info["blocks"],1)
+            self.assertLessEqual(bb.cache_info["records"],3)
+
     def test_return_type(self):
         bb = self.bbs[12]
         i = iter(bb)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""Tests for compiled `GTF2`_/`GFF3`_ tokenizers in :py:mod:`plastid.readers.c_gff_tokens`.
+Token parsing tests from :py:mod:`plastid.test.unit.readers.test_gff_tokens` are
+re-run against the compiled parsers, which must give identical results.
+"""
+import unittest
+import warnings
+from nose.plugins.attrib import attr
+from plastid.readers.c_gff_tokens import parse_GFF_line, parse_GFF3_tokens, parse_GTF2_tokens
+from plastid.readers import gff_tokens
+from plastid.test.unit.readers import test_gff_tokens as base
+
+#===============================================================================
+# INDEX: test data
+#===============================================================================
+
+# strings the compiled GTF2 parser must defer to the pure-Python parser for,
+# or handle identically
+_GTF2_EDGE_CASES = [
+    'gene_id "mygene;"; transcript_id "myt;ranscript"',
+    'gene_id "g1"; transcript_id "t1"; exon_number 2; tag basic;',
+    'gene_id "g1"; transcript_id "t1"; exon_number 2',
+    'gene_id "g1"; note "it\'s here";',
+    'gene_id "g1"; transcript_id "t1"; note "it\'s here";',
+    'gene_id "g1"; note "escaped \\" quote";',
+    'gene_id "g1"; note "";',
+    'gene_id "g1"; note "a b c"\r',
+    'gene_id "g1"; transcript_id "t1"; note "%3Bsemicolon%25";',
+    '',
+]
+
+_GTF2_ATTR = 'gene_id "g1"; transcript_id "t1"; gene_name "ABC1"; tag "basic"; tag "CCDS"; level 2;'
+
+_GFF3_ATTR = 'ID=exon1;Parent=tx1,tx2;Name=some%3Bname;Note=a,b'
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+class TestCompiledGFF3_TokenParsing(base.TestGFF3_TokenParsing):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestCompiledGFF3_TokenParsing,cls).setUpClass()
+        cls.parser = staticmethod(parse_GFF3_tokens)
+
+    def test_attribute_subset(self):
+        found = self.parser(_GFF3_ATTR,attributes={"ID","Parent"})
+        self.assertDictEqual(found,{ "ID" : "exon1", "Parent" : ["tx1","tx2"] })
+
+    def test_values_unescaped(self):
+        self.assertDictEqual(self.parser(_GFF3_ATTR),gff_tokens.parse_GFF3_tokens(_GFF3_ATTR))
+
+    def test_malformed_raises_same_error(self):
+        self.assertRaises(ValueError,self.parser,"ID=a=b")
+        self.assertRaises(ValueError,self.parser,"ID")
+
+    def test_parent_interned(self):
+        a = self.parser("ID=a;Parent=%s" % "".join(["tx","1"]))
+        b = self.parser("ID=b;Parent=%s" % "".join(["t","x1"]))
+        self.assertIs(a["Parent"][0],b["Parent"][0])
+
+
+@attr(test="unit")
+class TestCompiledGTF2_TokenParsing(base.TestGTF2_TokenParsing):
+
+    @classmethod
+    def setUpClass(cls):
+        super(TestCompiledGTF2_TokenParsing,cls).setUpClass()
+        cls.parser = staticmethod(parse_GTF2_tokens)
+
+    def test_edge_cases_match_python_parser(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for inp in _GTF2_EDGE_CASES:
+                self.assertDictEqual(self.parser(inp),gff_tokens.parse_GTF2_tokens(inp),inp)
+
+    def test_malformed_raises_same_error(self):
+        for inp in ('gene_id "g1"; transcript_id',
+                    'gene_id "g1" transcript_id "t1";',
+                    'gene_id "g1";transcript_id "t1";',
+                    'gene_id "g1'):
+            self.assertRaises(Exception,gff_tokens.parse_GTF2_tokens,inp)
+            self.assertRaises(Exception,self.parser,inp)
+
+    def test_attribute_subset(self):
+        found = self.parser(_GTF2_ATTR,attributes={"transcript_id","level"})
+        self.assertDictEqual(found,{ "transcript_id" : "t1", "level" : "2" })
+
+    def test_attribute_subset_edge_cases(self):
+        # lines handed to the pure-Python parser must be filtered, too
+        attributes = {"gene_id","note"}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for inp in _GTF2_EDGE_CASES:
+                expected = { K : V for K,V in gff_tokens.parse_GTF2_tokens(inp).items() if K in attributes }
+                self.assertDictEqual(self.parser(inp,attributes=attributes),expected,inp)
+
+    def test_attribute_subset_duplicates(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            found = self.parser(_GTF2_ATTR,attributes={"tag"})
+        self.assertDictEqual(found,{ "tag" : "basic,CCDS" })
+
+    def test_ids_interned(self):
+        a = self.parser('gene_id "%s"; transcript_id "t1";' % "".join(["g","1"]))
+        b = self.parser('gene_id "%s"; transcript_id "t2";' % "".join(["g1",""]))
+        self.assertIs(a["gene_id"],b["gene_id"])
+
+
+@attr(test="unit")
+class TestParseGFFLine(unittest.TestCase):
+
+    def test_parse_line(self):
+        line = "chrI\tSGD\texon\t101\t200\t.\t+\t0\tgene_id \"g1\";\n"
+        expected = ("chrI","SGD","exon",100,200,".","+","0","gene_id \"g1\";")
+        self.assertEqual(parse_GFF_line(line),expected)
+
+    def test_parse_line_coordinates(self):
+        line = "chrI\tSGD\texon\t101\t200\t.\t+\t0\tID=a"
+        self.assertEqual(parse_GFF_line(line,False,True)[3:5],(101,201))
+        self.assertEqual(parse_GFF_line(line,True,False)[3:5],(100,199))
+        self.assertEqual(parse_GFF_line(line,False,False)[3:5],(101,200))
+
+    def test_parse_short_line_raises_index_error(self):
+        self.assertRaises(IndexError,parse_GFF_line,"chrI\tSGD\texon\t101\t200")
@@ -8,6 +8,8 @@ Notes
 """
 
 import unittest
+import os
+import tempfile
 from plastid.util.services.mini2to3 import cStringIO
 from nose.plugins.attrib import attr
 from random import shuffle
@@ -16,6 +18,10 @@ from plastid.readers.gff import GTF2_Reader,\
                              GFF3_Reader,\
                              GTF2_TranscriptAssembler,\
                              GFF3_TranscriptAssembler,\
+                             GTF2_IndexedTranscriptAssembler,\
+                             GFF3_IndexedTranscriptAssembler,\
+                             get_GFF_index_filename,\
+                             read_GFF_index,\
                              StopFeature
 from plastid.util.services.decorators import skip_if_abstract
 
@@ -9080,3 +9086,142 @@ chrD	.	CDS	701	800	.	+	.	ID=CDS_with_mRNA_and_shared_ID;Parent=parent_mRNA_of_CD
        
         found = list(GFF3_TranscriptAssembler(cStringIO.StringIO(text)))
         self.check_output_against_reference(found,reference=expected,stop_offset=0)
+
+
+class AbstractTestIndexedAssembler(AbstractTest_to_Transcripts):
+    """Tests indexed assemblers against the same references as the streaming assemblers"""
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix=".gff")
+        with os.fdopen(fd,"w") as fout:
+            fout.write(self.unsorted_input)
+        self.index_file = get_GFF_index_filename(self.filename)
+
+    def tearDown(self):
+        for fn in (self.filename,self.index_file):
+            if os.path.exists(fn):
+                os.remove(fn)
+
+    @skip_if_abstract
+    def test_output_is_sorted(self):
+        transcripts = list(self.test_class(self.filename))
+        self.assertEqual(len(transcripts),len(self.expected_ivcs),"Mismatch between number of assembled transcripts. Expected %s, got %s." % (len(self.expected_ivcs),len(transcripts)))
+        self.assertEqual(transcripts,sorted(transcripts))
+
+    @skip_if_abstract
+    def test_output_is_correct(self):
+        transcripts = self.test_class(self.filename,add_three_for_stop=False)
+        self.check_output_against_reference(transcripts,stop_offset=0)
+
+    @skip_if_abstract
+    def test_add_three(self):
+        transcripts = self.test_class(self.filename,add_three_for_stop=True)
+        self.check_output_against_reference(transcripts,stop_offset=3)
+
+    @skip_if_abstract
+    def test_not_end_inclusive(self):
+        expected = list(self.streaming_class(cStringIO.StringIO(self.unsorted_input),end_included=False))
+        found    = list(self.test_class(self.filename,end_included=False))
+        self.assertEqual(expected,found)
+
+    @skip_if_abstract
+    def test_rejected(self):
+        reader = self.test_class(self.filename)
+        for _ in reader: # populate rejected transcripts
+            pass
+        self.assertEqual(len(reader.rejected),len(self.rejected_ivc_names))
+        self.assertGreater(len(reader.rejected),0)
+
+    @skip_if_abstract
+    def test_index_created_and_reused(self):
+        self.assertFalse(os.path.exists(self.index_file))
+        buf = cStringIO.StringIO()
+        list(self.test_class(self.filename,printer=buf))
+        self.assertTrue(os.path.exists(self.index_file))
+        self.assertTrue("Indexing features" in buf.getvalue())
+
+        buf = cStringIO.StringIO()
+        list(self.test_class(self.filename,printer=buf))
+        self.assertFalse("Indexing features" in buf.getvalue())
+
+    @skip_if_abstract
+    def test_index_covers_all_features(self):
+        runs, _, _ = read_GFF_index(self.filename,file_format=self.test_class.file_format)
+        with open(self.filename,"rb") as fh:
+            data = fh.read()
+
+        found_lines = []
+        for chrom, ranges in runs.items():
+            for start, end in ranges:
+                for line in data[start:end].decode("utf-8").splitlines():
+                    self.assertEqual(line.split("\t")[0],chrom)
+                    found_lines.append(line)
+
+        expected_lines = [X for X in self.unsorted_input.splitlines() if X.strip() != "" and not X.startswith("#")]
+        self.assertEqual(sorted(expected_lines),sorted(found_lines))
+
+    @skip_if_abstract
+    def test_index_finds_multichromosome_transcripts(self):
+        _, multichrom, _ = read_GFF_index(self.filename,file_format=self.test_class.file_format)
+        self.assertTrue("TestBadTranscript2" in multichrom)
+
+    @skip_if_abstract
+    def test_metadata_read_from_header(self):
+        header = "\n".join(["##gff-version 3",
+                            "##sequence-region chrA 1 100000",
+                            "##genome-build plastid_test",
+                            "##genome-build second_value",
+                            "",
+                            ])
+        with open(self.filename,"w") as fout:
+            fout.write(header + self.unsorted_input)
+
+        reader = self.test_class(self.filename)
+        expected = list(self.streaming_class(cStringIO.StringIO(self.unsorted_input)))
+        self.assertEqual(list(reader),expected)
+        self.assertEqual(reader.metadata,{ "gff-version"  : "3",
+                                           "genome-build" : "plastid_test;second_value" })
+        self.assertEqual(reader.chromosomes,{ "chrA" : ("1","100000") })
+
+        # read again from existing index
+        reader = self.test_class(self.filename)
+        list(reader)
+        self.assertEqual(reader.metadata["genome-build"],"plastid_test;second_value")
+
+    @skip_if_abstract
+    def test_compressed_file_raises_value_error(self):
+        self.assertRaises(ValueError,list,self.test_class(self.filename + ".gz"))
+
+    @skip_if_abstract
+    def test_parallel_matches_serial(self):
+        serial   = list(self.test_class(self.filename,add_three_for_stop=True))
+        parallel = list(self.test_class(self.filename,add_three_for_stop=True,processes=2))
+        self.assertEqual(serial,parallel)
+        for tx1, tx2 in zip(serial,parallel):
+            self.assertEqual(tx1.get_name(),tx2.get_name())
+            self.assertEqual(tx1.cds_start,tx2.cds_start)
+            self.assertEqual(tx1.cds_end,tx2.cds_end)
+
+
+@attr(test="unit")
+class TestGTF2_IndexedAssembler(AbstractTestIndexedAssembler):
+    @classmethod
+    def setUpClass(cls):
+        cls.expected_ivcs      = EXPECTED_IVCS
+        cls.rejected_ivc_names = REJECTED_NAMES
+        cls.unsorted_input     = GTF2_TO_TRANSCRIPTS_UNSORTED
+        cls.test_class         = GTF2_IndexedTranscriptAssembler
+        cls.streaming_class    = GTF2_TranscriptAssembler
+        cls.default_stop_offset = -3
+
+
+@attr(test="unit")
+class TestGFF3_IndexedAssembler(AbstractTestIndexedAssembler):
+    @classmethod
+    def setUpClass(cls):
+        cls.expected_ivcs      = EXPECTED_IVCS
+        cls.rejected_ivc_names = REJECTED_NAMES
+        cls.unsorted_input     = GFF3_TO_TRANSCRIPTS_UNSORTED
+        cls.test_class         = GFF3_IndexedTranscriptAssembler
+        cls.streaming_class    = GFF3_TranscriptAssembler
+        cls.default_stop_offset = 0
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""Test suite for :py:mod:`plastid.test.benchmarks`"""
+import random
+import types
+import unittest
+from nose.plugins.attrib import attr
+from plastid.test.benchmarks import Benchmark, SkipBenchmark
+from plastid.test.benchmarks.data import random_transcripts, random_reads, P_OFFSETS
+from plastid.test.benchmarks.runner import discover, run_suite, compare_results
+
+
+#===============================================================================
+# INDEX: toy benchmarks
+#===============================================================================
+
+class _ToyDataset(object):
+    params = { "size" : "toy" }
+
+    def __init__(self,skip=False):
+        self.skip = skip
+
+
+class _TimeToy(Benchmark):
+    params = [1,2]
+
+    def time_sum(self,n):
+        sum(range(1000*n))
+
+
+class _TimeSkipAndFail(Benchmark):
+
+    def setup(self):
+        if self.dataset.skip:
+            raise SkipBenchmark("no dataset")
+
+    def time_fail(self):
+        raise ValueError("benchmark failed")
+
+
+_TOY_MODULE = types.ModuleType("toy_benchmarks")
+_TOY_MODULE._TimeToy = _TimeToy
+_TOY_MODULE._TimeSkipAndFail = _TimeSkipAndFail
+_TOY_MODULE.Benchmark = Benchmark
+
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+class TestBenchmarks(unittest.TestCase):
+
+    def test_discover(self):
+        found = [X[0] for X in discover(_TOY_MODULE)]
+        self.assertEqual(found,["_TimeSkipAndFail.time_fail","_TimeToy.time_sum(1)","_TimeToy.time_sum(2)"])
+
+    def test_run_suite(self):
+        results = run_suite(_ToyDataset(),repeat=2,module=_TOY_MODULE)
+        self.assertEqual(results["dataset"],{ "size" : "toy" })
+        toy = results["benchmarks"]["_TimeToy.time_sum(2)"]
+        self.assertEqual(toy["status"],"ok")
+        self.assertEqual(len(toy["times"]),2)
+        self.assertEqual(results["benchmarks"]["_TimeSkipAndFail.time_fail"]["status"],"failed")
+        self.assertIn("benchmark failed",results["benchmarks"]["_TimeSkipAndFail.time_fail"]["error"])
+
+        results = run_suite(_ToyDataset(skip=True),repeat=1,module=_TOY_MODULE,pattern="Skip")
+        self.assertEqual(list(results["benchmarks"]),["_TimeSkipAndFail.time_fail"])
+        self.assertEqual(results["benchmarks"]["_TimeSkipAndFail.time_fail"],
+                         { "status" : "skipped", "reason" : "no dataset" })
+
+    def test_compare_results(self):
+        old = { "benchmarks" : { "a" : { "status" : "ok", "median" : 1.0 },
+                                 "b" : { "status" : "ok", "median" : 1.0 },
+                                 "c" : { "status" : "ok", "median" : 1.0 },
+                                 "d" : { "status" : "skipped" },
+                                 "e" : { "status" : "ok", "median" : 1.0 } } }
+        new = { "benchmarks" : { "a" : { "status" : "ok", "median" : 1.5 },
+                                 "b" : { "status" : "ok", "median" : 0.5 },
+                                 "c" : { "status" : "ok", "median" : 1.05 },
+                                 "d" : { "status" : "ok", "median" : 1.0 } } }
+        self.assertEqual([(X[0],X[-1]) for X in compare_results(old,new,threshold=0.1)],
+                         [("a","slower"),("b","faster"),("c","")])
+
+    def test_synthetic_data(self):
+        rng = random.Random(3)
+        chrom_lengths = { "chrA" : 50000, "chrB" : 40000 }
+        transcripts = random_transcripts(rng,chrom_lengths,25)
+        self.assertEqual(len(transcripts),25)
+        for tx in transcripts:
+            self.assertEqual((tx.cds_end - tx.cds_start) % 3,0)
+            self.assertGreater(tx.cds_start,0)
+            self.assertLess(tx.cds_end,tx.length)
+
+        reads = random_reads(rng,transcripts,chrom_lengths,2000)
+        self.assertEqual(reads,sorted(reads,key=lambda x: (x[0],x[1])))
+        for chrom, start, length, _ in reads:
+            self.assertIn(length,P_OFFSETS)
+            self.assertTrue(0 <= start <= chrom_lengths[chrom] - length)
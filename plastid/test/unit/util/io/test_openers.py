@@ -1,6 +1,9 @@
 #!/usr/bin/env python
-from plastid.util.io.openers import (get_short_name, pretty_print_dict)
-from nose.tools import assert_equal
+import os
+from argparse import Namespace
+from plastid.util.io.openers import (get_short_name, pretty_print_dict, opener,
+                                     CompressedWriter, get_compression_kwargs, is_bgzf)
+from nose.tools import assert_equal, assert_true, assert_raises
 
 def test_get_short_name():
     tests = [("test","test",{}),
@@ -35,4 +38,131 @@ def test_pretty_print_dict():
 }
 """
     found = pretty_print_dict(dtmp)
-    assert_equal(expected,found,"Dictionary did not pretty-print!\nExpected:\n%s\n\nFound:\n%s\n\n" % (expected,found)) 
\ No newline at end of file
+    assert_equal(expected,found,"Dictionary did not pretty-print!\nExpected:\n%s\n\nFound:\n%s\n\n" % (expected,found)) 
+
+#===============================================================================
+# INDEX: CompressedWriter
+#===============================================================================
+
+def check_compressed_writer_round_trip(ext,threads):
+    import tempfile
+    import shutil
+    lines = ["chr%s\t%s\t%s\tname%s\n" % (i % 5,i,3*i,i) for i in range(20000)]
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fn = os.path.join(tmpdir,"test.txt.%s" % ext)
+        with opener(fn,"w",threads=threads,buffer_size=4096,compresslevel=4) as fout:
+            assert_true(isinstance(fout,CompressedWriter))
+            fout.writelines(lines[:10000])
+            fout.flush()
+            fout.write("".join(lines[10000:]))
+
+        with opener(fn,"a",threads=threads) as fout:
+            fout.write(b"appended\n")
+
+        assert_true(fout.closed)
+        assert_raises(ValueError,fout.write,"more")
+        with opener(fn,"rb") as fh:
+            found = fh.read().decode("utf-8")
+
+        assert_equal(found,"".join(lines) + "appended\n")
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_compressed_writer_round_trip():
+    for ext in ("gz","bz2"):
+        for threads in (1,3):
+            yield check_compressed_writer_round_trip, ext, threads
+
+def test_compressed_writer_bad_arguments_raise_value_error():
+    import tempfile
+    fn = os.path.join(tempfile.gettempdir(),"test.txt.gz")
+    for filename, kwargs in [("test.txt",{}),
+                             (fn,{"mode" : "r"}),
+                             (fn,{"compresslevel" : 0}),
+                             (fn,{"threads" : 0})]:
+        yield check_compressed_writer_raises_value_error, filename, kwargs
+
+def check_compressed_writer_raises_value_error(filename,kwargs):
+    assert_raises(ValueError,CompressedWriter,filename,**kwargs)
+
+def test_get_compression_kwargs():
+    ns = Namespace(compress_level=3,compress_threads=2,compress_buffer=64,other=5)
+    assert_equal(get_compression_kwargs(ns),{"compresslevel" : 3, "threads" : 2, "buffer_size" : 65536})
+    assert_equal(get_compression_kwargs(Namespace(other=5)),{})
+
+
+#===============================================================================
+# INDEX: CompressedReader
+#===============================================================================
+
+_READER_LINES = ["chr%s\t%s\t%s\tname%s\n" % (i % 5,i,3*i,i) for i in range(20000)]
+
+def _write_compressed_inputs(tmpdir):
+    """Write `_READER_LINES` to BGZF, gzip, multi-member gzip, and bzip2 files"""
+    import gzip
+    import bz2
+    import pysam
+    text = "".join(_READER_LINES).encode("utf-8")
+    plain_fn = os.path.join(tmpdir,"test.txt")
+    with open(plain_fn,"wb") as fh:
+        fh.write(text)
+
+    filenames = { "bgzf"  : os.path.join(tmpdir,"test_bgzf.txt.gz"),
+                  "gzip"  : os.path.join(tmpdir,"test_gzip.txt.gz"),
+                  "multi" : os.path.join(tmpdir,"test_multi.txt.gz"),
+                  "bzip2" : os.path.join(tmpdir,"test.txt.bz2") }
+    pysam.tabix_compress(plain_fn,filenames["bgzf"],force=True)
+    with gzip.GzipFile(filenames["gzip"],"wb") as fh:
+        fh.write(text)
+    with bz2.BZ2File(filenames["bzip2"],"wb") as fh:
+        fh.write(text)
+    with CompressedWriter(filenames["multi"],threads=2,buffer_size=10000) as fh:
+        fh.write(text)
+
+    return filenames
+
+def test_compressed_reader():
+    import tempfile
+    import shutil
+    tmpdir = tempfile.mkdtemp()
+    try:
+        filenames = _write_compressed_inputs(tmpdir)
+        assert_true(is_bgzf(filenames["bgzf"]))
+        for k in ("gzip","multi","bzip2"):
+            assert_true(not is_bgzf(filenames[k]))
+
+        for k, fn in sorted(filenames.items()):
+            for threads in (1,3):
+                with opener(fn,threads=threads,chunk_size=5000) as fh:
+                    assert_equal(fh.readline(),_READER_LINES[0])
+                    assert_equal(list(fh),_READER_LINES[1:])
+
+                with opener(fn,"rb",threads=threads,chunk_size=5000) as fh:
+                    assert_equal(fh.read(25),"".join(_READER_LINES).encode("utf-8")[:25])
+                    assert_equal(fh.read(),"".join(_READER_LINES).encode("utf-8")[25:])
+
+            # closing before the end stops background threads
+            fh = opener(fn,chunk_size=500)
+            fh.readline()
+            fh.close()
+            assert_true(fh.closed)
+    finally:
+        shutil.rmtree(tmpdir)
+
+def test_compressed_reader_truncated_bgzf_raises_io_error():
+    import tempfile
+    import shutil
+    tmpdir = tempfile.mkdtemp()
+    try:
+        fn = _write_compressed_inputs(tmpdir)["bgzf"]
+        with open(fn,"rb") as fh:
+            data = fh.read()
+        with open(fn,"wb") as fh:
+            fh.write(data[:-100])
+
+        fh = opener(fn)
+        assert_raises(IOError,fh.read)
+        fh.close()
+    finally:
+        shutil.rmtree(tmpdir)
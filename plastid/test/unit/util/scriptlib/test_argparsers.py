@@ -2,6 +2,9 @@
 """Test suite for :py:mod:`plastid.util.scriptlib.argparsers`"""
 import unittest
 import shlex
+import os
+import shutil
+import tempfile
 import argparse
 import copy
 import numpy
@@ -25,6 +28,7 @@ from plastid.genomics.genome_array import GenomeArray, BAMGenomeArray, \
 from plastid.genomics.genome_hash import GenomeHash, BigBedGenomeHash
 
 from plastid.util.scriptlib.argparsers import PrefixNamespaceWrapper,\
+                                           AnnotationParser,\
                                            get_alignment_file_parser,\
                                            get_genome_array_from_args,\
                                            get_annotation_file_parser,\
@@ -764,6 +768,72 @@ def test_annotation_not_sorted_not_raises_error_if_not_required():
             yield check_arg_not_raises_error, name, func, args, [], {"require_sort" : False}
 
 
+#=============================================================================
+# INDEX: tests for annotation caches
+#=============================================================================
+
+@attr(test="unit")
+def test_annotation_cache_built_and_reused():
+    from plastid.test.unit.readers import test_gff as gff_data
+    tmpdir = tempfile.mkdtemp()
+    try:
+        gtf_file  = os.path.join(tmpdir,"test.gtf")
+        cache_dir = os.path.join(tmpdir,"cache")
+        with open(gtf_file,"w") as fout:
+            fout.write(gff_data.GTF2_TO_TRANSCRIPTS_SORTED)
+
+        parser = AnnotationParser().get_parser()
+        argstr = "--annotation_format GTF2 --annotation_files %s --annotation_cache %s" % (gtf_file,cache_dir)
+        args = parser.parse_args(shlex.split(argstr))
+        ap = AnnotationParser()
+
+        expected = list(ap.get_transcripts_from_args(args))
+        assert_equal(len(os.listdir(cache_dir)),1)
+        found = list(ap.get_transcripts_from_args(args))
+        assert_list_equal([str(X) for X in expected],[str(X) for X in found])
+        assert_list_equal([X.attr for X in expected],[X.attr for X in found])
+
+        # cache file must not be rewritten, but a different option gets its own cache
+        args = parser.parse_args(shlex.split(argstr + " --add_three"))
+        list(ap.get_transcripts_from_args(args))
+        assert_equal(len(os.listdir(cache_dir)),2)
+    finally:
+        shutil.rmtree(tmpdir)
+
+@attr(test="unit")
+def test_annotation_cache_separate_for_return_types():
+    from plastid.test.unit.readers import test_gff as gff_data
+    tmpdir = tempfile.mkdtemp()
+    try:
+        gtf_file  = os.path.join(tmpdir,"test.gtf")
+        cache_dir = os.path.join(tmpdir,"cache")
+        with open(gtf_file,"w") as fout:
+            fout.write(gff_data.GTF2_TO_TRANSCRIPTS_SORTED)
+
+        parser = AnnotationParser().get_parser()
+        argstr = "--annotation_format GTF2 --annotation_files %s --annotation_cache %s" % (gtf_file,cache_dir)
+        args = parser.parse_args(shlex.split(argstr))
+        ap = AnnotationParser()
+
+        # build cache as SegmentChains, then read back as Transcripts, as when
+        # get_count_vectors is run before metagene on the same annotation
+        chains = list(ap.get_segmentchains_from_args(args))
+        assert_equal(len(os.listdir(cache_dir)),1)
+        found = list(ap.get_transcripts_from_args(args))
+        assert_equal(len(os.listdir(cache_dir)),2)
+        assert_list_equal([str(X) for X in chains],[str(X) for X in found])
+        assert_true(all(isinstance(X,Transcript) for X in found))
+        assert_true(any(X.cds_start is not None for X in found))
+
+        # reread from cache
+        cached = list(ap.get_transcripts_from_args(args))
+        assert_equal(len(os.listdir(cache_dir)),2)
+        assert_list_equal([(X.cds_start,X.cds_end) for X in found],
+                          [(X.cds_start,X.cds_end) for X in cached])
+    finally:
+        shutil.rmtree(tmpdir)
+
+
 #=============================================================================
 # INDEX: tests for genome hash parsing
 #=============================================================================
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""Test suite for :py:mod:`plastid.util.scriptlib.pipeline`"""
+import math
+import random
+import time
+import unittest
+from nose.plugins.attrib import attr
+from plastid.util.scriptlib.pipeline import Pipeline, Stage
+
+
+#===============================================================================
+# INDEX: helper functions
+#===============================================================================
+
+def _jitter(x):
+    """Return `x` after a short, random delay, so that workers finish out of order"""
+    time.sleep(random.random() / 1000.0)
+    return x
+
+
+def _raise_at_50(x):
+    if x == 50:
+        raise KeyError("raised at 50")
+    return x
+
+
+def _raise_in_source():
+    for i in range(100):
+        if i == 30:
+            raise ValueError("raised in source")
+        yield i
+
+
+#===============================================================================
+# INDEX: tests
+#===============================================================================
+
+@attr(test="unit")
+class TestPipeline(unittest.TestCase):
+
+    def test_results_in_order(self):
+        for workers in (1,4):
+            pipeline = Pipeline([Stage("jitter",_jitter,workers=workers),
+                                 Stage("double",lambda x: 2*x)],maxsize=3)
+            self.assertEqual(list(pipeline.imap(range(300))),[2*X for X in range(300)])
+
+    def test_process_stage(self):
+        pipeline = Pipeline([Stage("sqrt",math.sqrt,workers=2,kind="process")])
+        self.assertEqual(list(pipeline.imap(range(50))),[math.sqrt(X) for X in range(50)])
+
+    def test_run_and_report(self):
+        found = []
+        pipeline = Pipeline([Stage("jitter",_jitter),Stage("write",found.append)])
+        self.assertEqual(pipeline.run(range(100),name="parse"),100)
+        self.assertEqual(found,list(range(100)))
+        self.assertEqual([X.items for X in [pipeline.source] + pipeline.stages],[100,100,100])
+        self.assertGreater(pipeline.stages[0].busy_time,0)
+
+        lines = pipeline.report()
+        self.assertEqual(len(lines),4)
+        self.assertTrue(lines[1].strip().startswith("parse"))
+        self.assertIn("(slowest)",lines[2])
+
+        # counts reset between runs
+        pipeline.run(range(10))
+        self.assertEqual(pipeline.stages[0].items,10)
+
+    def test_stage_exception_propagates(self):
+        pipeline = Pipeline([Stage("raise",_raise_at_50),Stage("jitter",_jitter)],maxsize=2)
+        self.assertRaises(KeyError,pipeline.run,range(1000))
+
+    def test_source_exception_propagates(self):
+        pipeline = Pipeline([Stage("jitter",_jitter)],maxsize=2)
+        self.assertRaises(ValueError,pipeline.run,_raise_in_source())
+
+    def test_early_exit_stops_stages(self):
+        pipeline = Pipeline([Stage("jitter",_jitter)],maxsize=2)
+        results = pipeline.imap(range(10**6))
+        self.assertEqual(next(results),0)
+        results.close()
+        self.assertLess(pipeline.stages[0].items,100)
+
+    def test_bad_arguments_raise_value_error(self):
+        self.assertRaises(ValueError,Stage,"a",_jitter,workers=0)
+        self.assertRaises(ValueError,Stage,"a",_jitter,kind="coroutine")
+        self.assertRaises(ValueError,Pipeline,[])
+        self.assertRaises(ValueError,Pipeline,[Stage("a",_jitter)],maxsize=0)
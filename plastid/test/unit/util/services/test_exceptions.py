@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""Test suite for py:mod:`plastid.util.services.exceptions`"""
+import sys
+import unittest
+import warnings
+from nose.plugins.attrib import attr
+import plastid.util.services.exceptions as exceptions
+from plastid.util.services.mini2to3 import cStringIO
+from plastid.util.services.exceptions import DataWarning, FileFormatWarning, \
+                                             warn, warn_onceperfamily, \
+                                             filterwarnings, get_suppressed_counts, \
+                                             print_suppressed_summary
+
+@attr(test="unit")
+class TestWarnings(unittest.TestCase):
+
+    def setUp(self):
+        self.old_registry = exceptions.pl_once_registry
+        exceptions.pl_once_registry = {}
+
+    def tearDown(self):
+        exceptions.pl_once_registry = self.old_registry
+
+    def test_warn_reports_caller(self):
+        with warnings.catch_warnings(record=True) as warns:
+            warnings.simplefilter("always")
+            lineno = sys._getframe().f_lineno + 1
+            warn("test_warn_reports_caller",DataWarning)
+
+        self.assertEqual(len(warns),1)
+        self.assertEqual(warns[0].category,DataWarning)
+        self.assertEqual(warns[0].lineno,lineno)
+        self.assertEqual(warns[0].filename.replace(".pyc",".py"),__file__.replace(".pyc",".py"))
+
+    def test_warn_onceperfamily_counts_suppressed(self):
+        with warnings.catch_warnings(record=True) as warns:
+            warnings.simplefilter("always")
+            for _ in range(10):
+                warn_onceperfamily("test_warn_onceperfamily repeated",category=FileFormatWarning)
+            warn_onceperfamily("test_warn_onceperfamily other",category=FileFormatWarning)
+
+        self.assertEqual([str(X.message) for X in warns],
+                         ["test_warn_onceperfamily repeated","test_warn_onceperfamily other"])
+        self.assertEqual(get_suppressed_counts(),
+                         { ("test_warn_onceperfamily repeated",FileFormatWarning) : 9 })
+
+    def test_family_filter_matches_message_variants(self):
+        filterwarnings("onceperfamily","test_family_filter: chromosome",category=DataWarning)
+        num_filters = len(exceptions.pl_filters)
+        filterwarnings("onceperfamily","test_family_filter: chromosome",category=DataWarning)
+        self.assertEqual(len(exceptions.pl_filters),num_filters)
+
+        with warnings.catch_warnings(record=True) as warns:
+            warnings.simplefilter("always")
+            for chrom in ("chrA","chrB","chrC"):
+                warn("test_family_filter: chromosome %s not found" % chrom,DataWarning)
+
+        self.assertEqual(len(warns),1)
+        self.assertEqual(get_suppressed_counts(),
+                         { ("test_family_filter: chromosome",DataWarning) : 2 })
+
+    def test_print_suppressed_summary(self):
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            for _ in range(4):
+                warn_onceperfamily("test_print_suppressed_summary",category=DataWarning)
+
+            fh = cStringIO.StringIO()
+            print_suppressed_summary(fh)
+            self.assertIn("test_print_suppressed_summary",fh.getvalue())
+            self.assertIn("3 DataWarning",fh.getvalue())
+
+            # no summary for ignored warnings
+            warnings.simplefilter("ignore")
+            fh = cStringIO.StringIO()
+            print_suppressed_summary(fh)
+            self.assertEqual(fh.getvalue(),"")
@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 """Test suite for :py:mod:`plastid.util.services.sets`"""
 
-from plastid.util.services.sets import merge_sets
+import numpy
+from plastid.util.services.sets import merge_sets, label_integer_sets, get_random_sets
 from nose.plugins.attrib import attr
-from nose.tools import assert_set_equal
+from nose.tools import assert_set_equal, assert_equal, assert_true
 
 def check_merge_equal(expected, found):
     yield assert_set_equal, expected, found
@@ -68,3 +69,36 @@ def test_merge_sets(fn=merge_sets):
                      set(['d', 'o']),
                      set(['b', 'c', 'f', 'l', 'n']),
                      set(['a', 'g', 'j', 'm', 'p'])])  
+
+@attr(test="unit")
+def test_merge_sets_empty():
+    assert_equal(merge_sets([]),[])
+    assert_equal(merge_sets([set()]),[])
+
+@attr(test="unit")
+def test_merge_sets_chain():
+    # each set shares a member only with its neighbors
+    sets = [{ X, X + 1 } for X in range(1000)]
+    found = merge_sets(sets)
+    assert_equal(len(found),1)
+    assert_set_equal(found[0],set(range(1001)))
+
+@attr(test="unit")
+def test_label_integer_sets_matches_merge_sets():
+    numpy.random.seed(5)
+    for _ in range(20):
+        sets = get_random_sets(200,max_len=4,members=list(range(300)))
+        labels = label_integer_sets(sets)
+        expected = merge_sets(sets)
+        found = {}
+        for member in set().union(*sets):
+            found.setdefault(labels[member],set()).add(member)
+
+        assert_set_equal(set(frozenset(X) for X in expected),set(frozenset(X) for X in found.values()))
+        for label, group in found.items():
+            assert_equal(label,min(group))
+
+@attr(test="unit")
+def test_label_integer_sets_unused_members():
+    labels = label_integer_sets([{ 1, 3 }, { 3, 4 }],num_members=6)
+    assert_true((labels == numpy.array([0,1,2,1,1,5])).all())
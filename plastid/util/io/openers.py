@@ -17,11 +17,25 @@ Important methods
     Guesses whether a file is bzipped, gzipped, zipped, or uncompressed based upon 
     file extension, opens it appropriately, and returns a file-like object.
 
+:py:class:`CompressedWriter`
+    Buffered writer for gzipped or bzipped files, that hands compression
+    to one or more background threads, so that scripts can continue
+    computing while output is compressed.
+
+:py:class:`CompressedReader`
+    Reads gzipped or bzipped files, decompressing ahead of the caller in
+    background threads. Blocks of BGZF files are decompressed in parallel.
+
 :py:func:`NullWriter`
     Returns an open filehandle to the system's null location.
 """
 import sys
 import os
+import io
+import zlib
+import bz2
+import struct
+import threading
 import pandas as pd
 from plastid.util.io.filters import AbstractWriter
 from collections import Iterable
@@ -97,6 +111,521 @@ def multiopen(inp,fn=None,args=None,kwargs=None):
             yield obj
 
 
+#===============================================================================
+# INDEX: compressed output
+#===============================================================================
+
+try:
+    from queue import Queue, Full
+except ImportError: # Python 2
+    from Queue import Queue, Full
+
+
+class _StreamCompressor(object):
+    """Compress a series of blocks as a single gzip or bzip2 stream.
+    Blocks must be compressed in order, by one thread at a time.
+    """
+
+    def __init__(self,fmt,compresslevel):
+        if fmt == "gz":
+            self._compressor = zlib.compressobj(compresslevel,zlib.DEFLATED,31)
+        else:
+            self._compressor = bz2.BZ2Compressor(compresslevel)
+
+    def compress(self,data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+
+def _compress_member(data,fmt,compresslevel):
+    """Compress `data` as a complete, independent gzip member or bzip2 stream"""
+    if fmt == "gz":
+        compressor = zlib.compressobj(compresslevel,zlib.DEFLATED,31)
+        return compressor.compress(data) + compressor.flush()
+    else:
+        return bz2.compress(data,compresslevel)
+
+
+class CompressedWriter(object):
+    """Buffered, write-only file-like object for gzipped or bzipped files,
+    that hands compression to background threads.
+
+    Text written to the :class:`CompressedWriter` is collected in a buffer.
+    Each time the buffer fills, it is handed to a background compression
+    thread, and a separate background thread writes compressed blocks to
+    disk in order. The calling thread therefore only blocks if compression
+    falls more than a few blocks behind.
+
+    With one thread (the default), all blocks are compressed as a single
+    stream, producing the same output as :class:`gzip.GzipFile` or
+    :class:`bz2.BZ2File`. With more threads, each block is compressed
+    independently, in parallel, as a separate gzip member or bzip2 stream,
+    as in `pigz <https://zlib.net/pigz/>`_. Concatenated members are valid
+    gzip and bzip2 files, readable by :func:`opener`, `zcat`, `bzcat`, and
+    others.
+
+    Parameters
+    ----------
+    filename : str
+        Name of file to open. Must end in `'.gz'` or `'.bz2'`
+
+    mode : str, optional
+        Mode in which to open file: `'w'` or `'a'`, with or without `'b'`.
+        Text is encoded as UTF-8 before compression. (Default: `'w'`)
+
+    compresslevel : int, optional
+        Compression level, from 1 (fastest) to 9 (smallest; Default: 9)
+
+    buffer_size : int, optional
+        Number of bytes to collect before handing a block to a compression
+        thread (Default: 1048576)
+
+    threads : int, optional
+        Number of background compression threads (Default: 1)
+
+    Examples
+    --------
+    Write a gzipped BED file, compressing on four threads::
+
+        >>> with CompressedWriter("some_file.bed.gz",threads=4) as fout:
+        >>>     for chain in chains:
+        >>>         fout.write(chain.as_bed())
+    """
+
+    def __init__(self,filename,mode="w",compresslevel=9,buffer_size=1048576,threads=1):
+        from multiprocessing.pool import ThreadPool
+
+        if filename.endswith(".gz"):
+            self._format = "gz"
+        elif filename.endswith(".bz2"):
+            self._format = "bz2"
+        else:
+            raise ValueError("CompressedWriter: filename '%s' does not end in '.gz' or '.bz2'" % filename)
+
+        if "r" in mode or "+" in mode or ("w" not in mode and "a" not in mode):
+            raise ValueError("CompressedWriter: mode must be 'w' or 'a', with or without 'b'. Got '%s'." % mode)
+
+        if not 1 <= compresslevel <= 9:
+            raise ValueError("CompressedWriter: compresslevel must be between 1 and 9. Got %s." % compresslevel)
+
+        if buffer_size < 1 or threads < 1:
+            raise ValueError("CompressedWriter: buffer_size and threads must be positive integers.")
+
+        self.name          = filename
+        self.mode          = mode
+        self.compresslevel = compresslevel
+        self.buffer_size   = buffer_size
+        self.threads       = threads
+
+        self._buffer      = []
+        self._buffer_len  = 0
+        self._error       = None
+        self._closed      = False
+        self._stream      = _StreamCompressor(self._format,compresslevel) if threads == 1 else None
+        self._raw         = open(filename,mode.replace("b","").replace("t","") + "b")
+        self._pool        = ThreadPool(threads)
+        self._pending     = Queue(maxsize=2*threads + 1)
+        self._writer      = threading.Thread(target=self._write_blocks)
+        self._writer.daemon = True
+        self._writer.start()
+
+    def _write_blocks(self):
+        """Write compressed blocks to disk in the order they were submitted.
+        Runs in a background thread until it receives `None`
+        """
+        while True:
+            item = self._pending.get()
+            if item is None:
+                self._pending.task_done()
+                return
+            try:
+                if self._error is None:
+                    self._raw.write(item.get())
+            except Exception as e:
+                self._error = e
+            finally:
+                self._pending.task_done()
+
+    def _check_error(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _submit(self,final=False):
+        """Hand buffered data to the compression pool"""
+        data = b"".join(self._buffer)
+        self._buffer = []
+        self._buffer_len = 0
+        for start in range(0,len(data),self.buffer_size):
+            block = data[start:start + self.buffer_size]
+            if self._stream is not None:
+                self._pending.put(self._pool.apply_async(self._stream.compress,(block,)))
+            else:
+                self._pending.put(self._pool.apply_async(_compress_member,(block,self._format,self.compresslevel)))
+
+        if final and self._stream is not None:
+            self._pending.put(self._pool.apply_async(self._stream.flush))
+
+    @property
+    def closed(self):
+        return self._closed
+
+    def write(self,data):
+        """Write `data` to the file
+
+        Parameters
+        ----------
+        data : str or bytes
+            Data to write. Text is encoded as UTF-8
+        """
+        if self._closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._check_error()
+        if not isinstance(data,bytes):
+            data = data.encode("utf-8")
+
+        self._buffer.append(data)
+        self._buffer_len += len(data)
+        if self._buffer_len >= self.buffer_size:
+            self._submit()
+
+        return len(data)
+
+    def writelines(self,lines):
+        """Write each item in `lines` to the file"""
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        """Compress all buffered data, and write all compressed blocks to disk.
+        When compressing on a single thread, data held internally by the
+        compressor is written when the file is closed.
+        """
+        if self._closed:
+            raise ValueError("I/O operation on closed file.")
+
+        self._submit()
+        self._pending.join()
+        self._check_error()
+        self._raw.flush()
+
+    def close(self):
+        """Compress remaining data, wait for all blocks to be written, and close the file"""
+        if self._closed:
+            return
+
+        try:
+            self._submit(final=True)
+            self._pending.put(None)
+            self._writer.join()
+        finally:
+            self._closed = True
+            self._pool.terminate()
+            self._raw.close()
+
+        self._check_error()
+
+    def readable(self):
+        return False
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,type_,value,traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __repr__(self):
+        return "<%s name='%s' mode='%s' threads=%s>" % (self.__class__.__name__,self.name,self.mode,self.threads)
+
+
+def get_compression_kwargs(namespace):
+    """Collect arguments for :class:`CompressedWriter` from compression
+    options parsed by :class:`~plastid.util.scriptlib.argparsers.BaseParser`
+
+    Parameters
+    ----------
+    namespace : :py:class:`argparse.Namespace`
+        Namespace object from argparse.ArgumentParser
+
+    Returns
+    -------
+    dict
+        Keyword arguments for :func:`opener` or :class:`CompressedWriter`.
+        Empty if `namespace` has no compression options
+    """
+    dtmp = {}
+    for attr, key, factor in [("compress_level","compresslevel",1),
+                              ("compress_threads","threads",1),
+                              ("compress_buffer","buffer_size",1024)]:
+        val = getattr(namespace,attr,None)
+        if val is not None:
+            dtmp[key] = factor*val
+
+    return dtmp
+
+
+#===============================================================================
+# INDEX: compressed input
+#===============================================================================
+
+# first bytes of a BGZF block: gzip magic number, deflate, FEXTRA flag,
+# and the 'BC' subfield that holds the size of the block
+_BGZF_MAGIC  = b"\x1f\x8b\x08\x04"
+_BGZF_HEADER = struct.Struct("<4s6sH2sHH")
+
+
+def is_bgzf(filename):
+    """Determine whether a file is compressed in the blocked gzip (BGZF) format
+    used by `bgzip`, `tabix`, and BAM files
+
+    Parameters
+    ----------
+    filename : str
+        Name of file
+
+    Returns
+    -------
+    bool
+    """
+    with open(filename,"rb") as fh:
+        header = fh.read(_BGZF_HEADER.size)
+
+    if len(header) < _BGZF_HEADER.size:
+        return False
+
+    magic, _, _, subfield, sublength, _ = _BGZF_HEADER.unpack(header)
+    return magic == _BGZF_MAGIC and subfield == b"BC" and sublength == 2
+
+
+def _inflate_blocks(blocks):
+    """Decompress a list of complete BGZF blocks, checking their checksums"""
+    return b"".join([zlib.decompress(X,31) for X in blocks])
+
+
+class CompressedReader(io.RawIOBase):
+    """Read-only, unbuffered stream that decompresses gzipped or bzipped
+    files ahead of the caller, in background threads.
+
+    Files compressed in the blocked gzip (BGZF) format, by `bgzip` or
+    `tabix`, consist of independent blocks of at most 64 kb. These are
+    collected in batches of roughly `chunk_size` bytes, and decompressed
+    in parallel by a pool of `threads` threads. Other gzipped or bzipped
+    files are decompressed by a single read-ahead thread. In both cases,
+    at most a few chunks are held in memory, and decompression does not
+    begin until the first read.
+
+    Usually, :class:`CompressedReader` is used via :func:`opener`, which
+    wraps it in a buffered (and, for text, decoding) reader::
+
+        >>> with opener("some_file.gtf.gz") as fh:
+        >>>     for transcript in GTF2_TranscriptAssembler(fh):
+        >>>         pass
+
+    Parameters
+    ----------
+    filename : str
+        Name of file to open. Must end in `'.gz'` or `'.bz2'`
+
+    threads : int or None, optional
+        Number of threads to use for decompression of BGZF files. If `None`,
+        the number of CPUs, up to 4 (Default: `None`)
+
+    chunk_size : int, optional
+        Number of compressed bytes to hand to each decompression thread, or
+        number of decompressed bytes for each read by the read-ahead thread
+        (Default: 1048576)
+    """
+
+    def __init__(self,filename,threads=None,chunk_size=1048576):
+        from multiprocessing.pool import ThreadPool
+        from multiprocessing import cpu_count
+
+        if not filename.endswith((".gz",".bz2")):
+            raise ValueError("CompressedReader: filename '%s' does not end in '.gz' or '.bz2'" % filename)
+
+        if threads is None:
+            threads = min(4,cpu_count())
+
+        if threads < 1 or chunk_size < 1:
+            raise ValueError("CompressedReader: threads and chunk_size must be positive integers.")
+
+        io.RawIOBase.__init__(self)
+        self.name       = filename
+        self.mode       = "rb"
+        self.threads    = threads
+        self.chunk_size = chunk_size
+        self.bgzf       = filename.endswith(".gz") and is_bgzf(filename)
+
+        self._raw      = open(filename,"rb")
+        self._pool     = ThreadPool(threads) if self.bgzf else None
+        self._pending  = Queue(maxsize=2*threads + 2)
+        self._stop     = threading.Event()
+        self._reader   = None
+        self._current  = b""
+        self._offset   = 0
+        self._finished = False
+
+    def _put(self,item):
+        """Put `item` in the queue of decompressed chunks, unless the stream is closed
+
+        Returns
+        -------
+        bool
+            `True` if `item` was queued
+        """
+        while not self._stop.is_set():
+            try:
+                self._pending.put(item,timeout=0.1)
+                return True
+            except Full:
+                pass
+
+        return False
+
+    def _read_ahead(self):
+        """Decompress the file into the queue. Runs in a background thread"""
+        try:
+            if self.bgzf:
+                self._read_ahead_bgzf()
+            else:
+                self._read_ahead_stream()
+        except Exception as e:
+            self._put(e)
+
+        self._put(None)
+
+    def _read_ahead_stream(self):
+        """Decompress a gzip or bzip2 stream in `chunk_size` pieces"""
+        if self.name.endswith(".gz"):
+            import gzip
+            fh = gzip.GzipFile(fileobj=self._raw,mode="rb")
+        else:
+            fh = bz2.BZ2File(self._raw,"rb")
+
+        while not self._stop.is_set():
+            data = fh.read(self.chunk_size)
+            if len(data) == 0 or not self._put(data):
+                break
+
+    def _read_ahead_bgzf(self):
+        """Split a BGZF file into batches of blocks, and queue their decompression"""
+        leftover = b""
+        while not self._stop.is_set():
+            data = self._raw.read(self.chunk_size)
+            buf  = leftover + data
+            pos  = 0
+            blocks = []
+            while pos + _BGZF_HEADER.size <= len(buf):
+                magic, _, _, subfield, _, block_size = _BGZF_HEADER.unpack_from(buf,pos)
+                if magic != _BGZF_MAGIC or subfield != b"BC":
+                    raise IOError("Malformed BGZF block at byte %s of '%s'." % (self._raw.tell() - len(buf) + pos,self.name))
+
+                block_size += 1
+                if pos + block_size > len(buf):
+                    break
+
+                blocks.append(buf[pos:pos + block_size])
+                pos += block_size
+
+            leftover = buf[pos:]
+            if len(blocks) > 0 and not self._put(self._pool.apply_async(_inflate_blocks,(blocks,))):
+                break
+
+            if len(data) == 0:
+                if len(leftover) > 0:
+                    raise IOError("File '%s' ends in a truncated BGZF block." % self.name)
+                break
+
+    def _next_chunk(self):
+        """Fetch the next decompressed chunk from the queue
+
+        Returns
+        -------
+        bool
+            `False` if the end of the file has been reached
+        """
+        if self._finished:
+            return False
+
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read_ahead)
+            self._reader.daemon = True
+            self._reader.start()
+
+        item = self._pending.get()
+        if item is None:
+            self._finished = True
+            return False
+        elif isinstance(item,Exception):
+            self._finished = True
+            raise item
+        elif not isinstance(item,bytes):
+            item = item.get()
+
+        self._current = item
+        self._offset  = 0
+        return True
+
+    def readinto(self,b):
+        """Read up to `len(b)` decompressed bytes into `b`
+
+        Returns
+        -------
+        int
+            Number of bytes read. 0 at the end of the file
+        """
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+
+        while self._offset >= len(self._current):
+            if not self._next_chunk():
+                return 0
+
+        n = min(len(b),len(self._current) - self._offset)
+        b[:n] = self._current[self._offset:self._offset + n]
+        self._offset += n
+        return n
+
+    def readable(self):
+        return True
+
+    def fileno(self):
+        """Return the descriptor of the underlying compressed file"""
+        return self._raw.fileno()
+
+    def close(self):
+        """Stop decompression and close the file"""
+        if self.closed or not hasattr(self,"_raw"):
+            return
+
+        self._stop.set()
+        if self._reader is not None:
+            self._reader.join()
+        if self._pool is not None:
+            self._pool.terminate()
+
+        self._raw.close()
+        io.RawIOBase.close(self)
+
+    def __repr__(self):
+        return "<%s name='%s' bgzf=%s threads=%s>" % (self.__class__.__name__,self.name,self.bgzf,self.threads)
+
+
 def opener(filename,mode="r",**kwargs):
     """Open a file, detecting whether it is compressed or not, based upon
     its file extension. Extensions are tested in the following order:
@@ -124,9 +653,24 @@ def opener(filename,mode="r",**kwargs):
         choices (e.g. "r", "a, "w" with or without "b")
     
     **kwargs
-        Other parameters to pass to appropriate file opener 
+        Other parameters to pass to appropriate file opener. Gzipped
+        and bzipped files opened for writing or appending are opened
+        as a :class:`CompressedWriter`, which accepts `compresslevel`,
+        `buffer_size`, and `threads`. Gzipped and bzipped files opened
+        for reading are read through a :class:`CompressedReader`, which
+        accepts `threads` and `chunk_size`. In Python 3, these are
+        decoded as UTF-8 text unless `mode` contains `'b'`.
     """
-    if filename.endswith(".gz"):
+    if filename.endswith((".gz",".bz2")) and "+" not in mode:
+        if "w" in mode or "a" in mode:
+            return CompressedWriter(filename,mode,**kwargs)
+
+        fh = io.BufferedReader(CompressedReader(filename,**kwargs),buffer_size=65536)
+        if "b" in mode or sys.version_info[0] == 2:
+            return fh
+        else:
+            return io.TextIOWrapper(fh,encoding="utf-8")
+    elif filename.endswith(".gz"):
         import gzip
         if "b" not in mode:
             mode += "b"
@@ -275,7 +819,9 @@ def argsopener(filename,namespace,mode="w",**kwargs):
         Mode of writing (`'w'` or `'wb'`)
     
     **kwargs
-        Other keyword arguments to pass to file opener
+        Other keyword arguments to pass to file opener. For gzipped
+        or bzipped files, these default to the compression options
+        in `namespace` (see :func:`get_compression_kwargs`)
     
     Returns
     -------
@@ -283,6 +829,10 @@ def argsopener(filename,namespace,mode="w",**kwargs):
     """
     if "w" not in mode:
         mode += "w"
+    if filename.endswith((".gz",".bz2")):
+        dtmp = get_compression_kwargs(namespace)
+        dtmp.update(kwargs)
+        kwargs = dtmp
     fout = opener(filename,mode,**kwargs)
     fout.write(args_to_comment(namespace))
     return fout
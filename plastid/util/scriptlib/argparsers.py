@@ -359,6 +359,15 @@ class AlignmentParser(Parser):
                                             " (BAM & bowtie files only. Default: %(default)s)")),
             ]
 
+        read_cache = [
+            ("read_cache"       , dict(type=float,
+                                       default=0,
+                                       metavar="MB",
+                                       help="Memory in MB to devote to caching reads from recently-queried parts of BAM files, "+
+                                            "so that overlapping or nearby regions (e.g. transcript isoforms) are read only once. "+
+                                            "For BAM files only. (Default: 0, no caching)")),
+            ]
+
         big_genome = [
             ("big_genome"       , dict(action="store_true",
                                        default=False,
@@ -373,7 +382,7 @@ class AlignmentParser(Parser):
         
         # filetype-specific options
         self.filetype_options = {
-             "BAM"    : length_ops,
+             "BAM"    : length_ops + read_cache,
              "bowtie" : length_ops + big_genome,
              "wiggle" : big_genome,
              "bigwig" : maxmem,
@@ -570,8 +579,9 @@ class AlignmentParser(Parser):
             
             if args.countfile_format in ("BAM","CRAM"):
                 count_files = [pysam.Samfile(X,"rb") for X in args.count_files]
+                cache_size  = 0 if "read_cache" in disabled else int(args.read_cache*1024**2)
                 try:
-                    ga = BAMGenomeArray(count_files)
+                    ga = BAMGenomeArray(count_files,cache_size=cache_size)
                 except ValueError:
                     printer.write("Input BAM file(s) not indexed. Please index via:")
                     printer.write("")
@@ -742,6 +752,21 @@ class AnnotationParser(Parser):
                 ("sorted"              , dict(default=False,
                                               action="store_true",
                                               help="%sannotation_files are sorted by chromosomal position (Default: False)" % prefix)),
+                ("index"               , dict(default=False,
+                                              action="store_true",
+                                              help="Assemble transcripts from GTF2/GFF3 %sannotation_files one chromosome at a time, "  % prefix +
+                                                   "using an on-disk index of feature positions that is built on first use. "+
+                                                   "Requires little memory even if files are unsorted. Ignored for other formats. (Default: False)")),
+                ("processes"           , dict(type=int,
+                                              default=1,
+                                              metavar="N",
+                                              help="Number of processes to use when assembling transcripts with '--%sindex' (Default: 1)" % prefix)),
+                ("annotation_cache"    , dict(type=str,
+                                              default=None,
+                                              metavar="dir",
+                                              help="Directory in which to store binary caches of features assembled from %sannotation_files. " % prefix +
+                                                   "Caches are built on first use, and reused by later runs on the same files with the same options. "+
+                                                   "Ignored for BigBed files. (Default: no caching)")),
             ]
         
         # options for specific filetypes
@@ -881,11 +906,24 @@ class AnnotationParser(Parser):
     
         args = PrefixNamespaceWrapper(args,self.prefix)
         disabled = self.disabled
+
+        cache_file = None
+        if "annotation_cache" not in disabled and args.annotation_cache is not None \
+           and args.annotation_format.lower() != "bigbed":
+            from plastid.readers.annotation_cache import AnnotationCache, cache_features,\
+                                                         get_annotation_cache_key,\
+                                                         get_annotation_cache_filename
+            cache_key  = get_annotation_cache_key(args.annotation_files,**self._get_cache_options(args,return_type))
+            cache_file = get_annotation_cache_filename(args.annotation_cache,cache_key)
+            if os.path.exists(cache_file):
+                printer.write("Loading features from annotation cache %s ..." % cache_file)
+                return iter(AnnotationCache(cache_file,return_type=return_type,key=cache_key))
     
         if require_sort == True and 'sorted' not in disabled:
             if args.annotation_format in ("BED","GTF2","GFF3") and \
                 args.sorted == False and 'tabix' not in disabled and\
-                args.tabix == False:
+                args.tabix == False and not (args.annotation_format in ("GTF2","GFF3") and \
+                                             'index' not in disabled and args.index == True):
                 printer.write("Using unsorted/unindexed annotation files requires impractical amounts of memory.")
                 if args.annotation_format == "BED":
                     printer.write("""Convert BED to BigBed using Jim Kent's bedToBigBed utility as follows:
@@ -945,9 +983,25 @@ class AnnotationParser(Parser):
         else:
             streams = (opener(X) for X in args.annotation_files)
     
+        if "index" not in disabled:
+            use_index = args.index
+        else:
+            use_index = False
+
+        if "processes" not in disabled:
+            processes = args.processes
+        else:
+            processes = 1
+
         if args.annotation_format in ("GFF3","GTF2"):
-            from plastid.readers.gff import GFF3_TranscriptAssembler, GTF2_TranscriptAssembler
-            if 'sorted' not in disabled and args.sorted == False and \
+            from plastid.readers.gff import GFF3_TranscriptAssembler, GTF2_TranscriptAssembler,\
+                                            GFF3_IndexedTranscriptAssembler, GTF2_IndexedTranscriptAssembler
+            if use_index == True and tabix == True:
+                warnings.warn("Tabix compression is incompatible with '--%sindex'. Ignoring '--%sindex'." % (self.prefix,self.prefix),ArgumentWarning)
+                use_index = False
+
+            if use_index == False and \
+               'sorted' not in disabled and args.sorted == False and \
                'tabix' not in disabled and args.tabix == False and \
                any((os.stat(X).st_size >= _GFF_SORT_SIZE for X in args.annotation_files)):
                 msg = """Transcript assembly on large FORMAT files can require a lot of memory.
@@ -957,7 +1011,22 @@ class AnnotationParser(Parser):
                 msg = msg.replace("FORMAT",args.annotation_format)
                 warnings.warn(msg,ArgumentWarning)
         
-        if args.annotation_format.lower() == "gff3":
+        if args.annotation_format.lower() == "gff3" and use_index == True:
+            transcripts = GFF3_IndexedTranscriptAssembler(*args.annotation_files,
+                                                          transcript_types=args.gff_transcript_types,
+                                                          exon_types=args.gff_exon_types,
+                                                          cds_types=args.gff_cds_types,
+                                                          printer=printer,
+                                                          add_three_for_stop=add_three,
+                                                          return_type=return_type,
+                                                          processes=processes)
+        elif args.annotation_format.lower() == "gtf2" and use_index == True:
+            transcripts = GTF2_IndexedTranscriptAssembler(*args.annotation_files,
+                                                          printer=printer,
+                                                          add_three_for_stop=add_three,
+                                                          return_type=return_type,
+                                                          processes=processes)
+        elif args.annotation_format.lower() == "gff3":
             transcripts = GFF3_TranscriptAssembler(*streams,
                                                    transcript_types=args.gff_transcript_types,
                                                    exon_types=args.gff_exon_types,
@@ -988,8 +1057,45 @@ class AnnotationParser(Parser):
             transcripts = PSL_Reader(*streams,
                                      tabix=tabix,
                                      return_type=return_type,printer=printer)
+
+        if cache_file is not None:
+            if not os.path.isdir(args.annotation_cache):
+                os.makedirs(args.annotation_cache)
+            printer.write("Caching features to %s ..." % cache_file)
+            transcripts = cache_features(transcripts,cache_file,key=cache_key)
             
         return transcripts
+
+    def _get_cache_options(self,args,return_type):
+        """Collect options that change which features are assembled from
+        annotation files, for use as part of an annotation cache key
+
+        Parameters
+        ----------
+        args : :class:`PrefixNamespaceWrapper`
+            Parsed arguments
+
+        return_type : |SegmentChain| or subclass
+            Type of feature assembled. Readers store different `attr` for
+            different types (e.g. CDS boundaries only for |Transcripts|),
+            so each type gets its own cache.
+
+        Returns
+        -------
+        dict
+        """
+        options = { "annotation_format" : args.annotation_format,
+                    "return_type"       : "%s.%s" % (return_type.__module__,return_type.__name__),
+                  }
+        names = ["add_three","tabix","sorted","index","bed_extra_columns"]
+        if args.annotation_format == "GFF3":
+            names.extend(["gff_transcript_types","gff_exon_types","gff_cds_types"])
+
+        for name in names:
+            if name not in self.disabled:
+                options[name] = getattr(args,name)
+
+        return options
         
     def get_genome_hash_from_args(self,args,printer=None):
         """Return a |GenomeHash| of regions from command-line arguments
@@ -1039,7 +1145,7 @@ class AnnotationParser(Parser):
                         sys.exit(2)
                     return BigBedGenomeHash(args.annotation_files[0])
                 elif "tabix" not in self.disabled and args.tabix == True:
-                    return TabixGenomeHash(args.annotation_files,args.annotation_format,printer=printer)
+                    return TabixGenomeHash(args.annotation_files,data_format=args.annotation_format,printer=printer)
                 else:
                     streams = (opener(X) for X in args.annotation_files)
                     if args.annotation_format == "BED":
@@ -1113,6 +1219,9 @@ class MaskParser(AnnotationParser):
         allow_mapping : bool, optional
             Enable/disable user configuration of mapping rules (default: True)
         """
+        # masks are read as raw features, so transcript assembly options don't apply
+        disabled = [] if disabled is None else list(disabled)
+        disabled.extend(["index","processes"])
         AnnotationParser.__init__(self,
                                   prefix=prefix,
                                   disabled=disabled,
@@ -1567,6 +1676,17 @@ class BaseParser(Parser):
 #                        help="Raise exceptions instead of warnings")
         p.set_defaults(warnlevel=0)
 
+        c = p.add_argument_group(title="output compression options",
+                                 description="Options for output files whose names end in '.gz' or '.bz2'")
+        c.add_argument("--compress_level",type=int,default=9,choices=range(1,10),metavar="N",
+                       help="Compression level, from 1 (fastest) to 9 (smallest). (Default: 9)")
+        c.add_argument("--compress_threads",type=int,default=1,metavar="N",
+                       help="Number of background threads to use for compression. "+
+                            "With more than one, output is compressed in independent blocks, "+
+                            "as by pigz. (Default: 1)")
+        c.add_argument("--compress_buffer",type=int,default=1024,metavar="KB",
+                       help="Size of blocks, in kilobytes, handed to compression threads. (Default: 1024)")
+
         return p
 
     def get_base_ops_from_args(self,args):
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+"""Run the steps of a command-line script as a pipeline of concurrent stages.
+
+Many scripts read a stream of features, and then, for each feature, look up
+masks, fetch counts, and format output, one step after another. A
+:class:`Pipeline` runs each of these steps as a separate :class:`Stage`,
+connected to the next by a bounded queue, so that, for example, parsing
+of the next feature can proceed while counts are fetched for the current one.
+
+Each stage is served by a pool of one or more worker threads or processes.
+Results are passed on in the order in which items entered the pipeline,
+regardless of the number of workers. The amount of work in flight is
+limited by the size of the queues, so memory use is bounded even if one
+stage is much slower than the others.
+
+Each stage records the number of items it processed and the time spent
+processing them, which :meth:`Pipeline.report` summarizes, so that
+bottlenecks can be found.
+
+Examples
+--------
+Count reads in regions, parsing, masking, counting, and writing in
+separate threads::
+
+    >>> def add_masks(roi):
+    >>>     roi.add_masks(*itertools.chain.from_iterable(mask_hash.get_overlapping_features(roi)))
+    >>>     return roi
+    >>>
+    >>> def count(roi):
+    >>>     return "%s\\t%s\\n" % (roi.get_name(),roi.get_masked_counts(ga).sum())
+    >>>
+    >>> pipeline = Pipeline([Stage("mask",add_masks),
+    >>>                      Stage("count",count),
+    >>>                      Stage("write",fout.write)])
+    >>> pipeline.run(transcripts,name="parse")
+    >>> pipeline.report(printer)
+
+
+Notes
+-----
+Stages that share objects that are not thread-safe, such as
+|BAMGenomeArrays|, should each use a single worker. Stages that run in
+processes must use functions and items that can be pickled.
+"""
+import time
+import threading
+
+try:
+    from queue import Queue, Empty, Full
+except ImportError: # Python 2
+    from Queue import Queue, Empty, Full
+
+
+#===============================================================================
+# INDEX: helpers
+#===============================================================================
+
+# marks the end of the stream of items in a queue
+_END = "__pipeline_end__"
+
+class _Ready(object):
+    """Wrapper for a value that is already available, with the same
+    interface as :class:`multiprocessing.pool.AsyncResult`
+    """
+    __slots__ = ("value",)
+
+    def __init__(self,value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class _Raise(object):
+    """Wrapper that re-raises an exception from an earlier stage when its
+    value is requested
+    """
+    __slots__ = ("error",)
+
+    def __init__(self,error):
+        self.error = error
+
+    def get(self):
+        raise self.error
+
+
+def _timed_call(func,value):
+    """Apply `func` to `value`, and measure how long it takes
+
+    Returns
+    -------
+    object
+        Result of `func(value)`
+
+    float
+        Elapsed time, in seconds
+    """
+    start = time.time()
+    result = func(value)
+    return result, time.time() - start
+
+
+#===============================================================================
+# INDEX: stages and pipelines
+#===============================================================================
+
+class Stage(object):
+    """A step in a :class:`Pipeline`, that transforms each item it receives
+
+    Parameters
+    ----------
+    name : str
+        Name of stage, used in reports
+
+    func : callable
+        Function that accepts a single item and returns a single result,
+        which is passed to the next stage
+
+    workers : int, optional
+        Number of threads or processes that apply `func` (Default: 1)
+
+    kind : str, optional
+        `'thread'` or `'process'` (Default: `'thread'`)
+
+    Attributes
+    ----------
+    items : int
+        Number of items processed in the most recent run
+
+    busy_time : float
+        Total time, in seconds, spent processing items in the most recent run
+    """
+
+    def __init__(self,name,func,workers=1,kind="thread"):
+        if kind not in ("thread","process"):
+            raise ValueError("Stage '%s': kind must be 'thread' or 'process'. Got '%s'." % (name,kind))
+        if workers < 1:
+            raise ValueError("Stage '%s': workers must be a positive integer. Got %s." % (name,workers))
+
+        self.name      = name
+        self.func      = func
+        self.workers   = workers
+        self.kind      = kind
+        self.items     = 0
+        self.busy_time = 0.0
+
+    @property
+    def throughput(self):
+        """Number of items processed per second of work, per worker"""
+        return self.items / self.busy_time if self.busy_time > 0 else float("nan")
+
+    def _record(self,elapsed):
+        self.items     += 1
+        self.busy_time += elapsed
+
+    def _get_pool(self):
+        if self.kind == "thread":
+            from multiprocessing.pool import ThreadPool
+            return ThreadPool(self.workers)
+        else:
+            from multiprocessing import Pool
+            return Pool(self.workers)
+
+    def __repr__(self):
+        return "<%s name='%s' workers=%s kind='%s'>" % (self.__class__.__name__,self.name,self.workers,self.kind)
+
+
+class Pipeline(object):
+    """Apply a series of :class:`Stages <Stage>` to a stream of items,
+    running all stages concurrently
+
+    Parameters
+    ----------
+    stages : list
+        List of :class:`Stage` objects, in the order they should be applied
+
+    maxsize : int, optional
+        Maximum number of items waiting between any two stages (Default: 64)
+
+    Attributes
+    ----------
+    source : Stage
+        Stage representing the iteration over the input, named when
+        :meth:`imap` or :meth:`run` is called
+
+    elapsed : float
+        Time, in seconds, taken by the most recent run
+    """
+
+    def __init__(self,stages,maxsize=64):
+        if len(stages) == 0:
+            raise ValueError("Pipeline: at least one stage is required.")
+        if maxsize < 1:
+            raise ValueError("Pipeline: maxsize must be a positive integer. Got %s." % maxsize)
+
+        self.stages  = list(stages)
+        self.maxsize = maxsize
+        self.source  = None
+        self.elapsed = 0.0
+        self._stop   = None
+
+    def _get(self,queue):
+        """Get the next item from `queue`, or `None` if the pipeline is stopped"""
+        while True:
+            try:
+                return queue.get(timeout=0.05)
+            except Empty:
+                if self._stop.is_set():
+                    return None
+
+    def _put(self,queue,item):
+        """Put `item` in `queue`, unless the pipeline is stopped
+
+        Returns
+        -------
+        bool
+            `True` if `item` was queued
+        """
+        while True:
+            try:
+                queue.put(item,timeout=0.05)
+                return True
+            except Full:
+                if self._stop.is_set():
+                    return False
+
+    def _feed(self,source,outq):
+        """Iterate over `source`, timing each step. Runs in a background thread"""
+        try:
+            iterator = iter(source)
+            while not self._stop.is_set():
+                start = time.time()
+                try:
+                    value = next(iterator)
+                except StopIteration:
+                    break
+                if not self._put(outq,_Ready((value,time.time() - start))):
+                    return
+        except Exception as e:
+            self._put(outq,_Raise(e))
+
+        self._put(outq,_END)
+
+    def _dispatch(self,stage,pool,upstream,inq,outq):
+        """Hand results of `upstream` to the workers of `stage`, in order.
+        Runs in a background thread.
+        """
+        failed = False
+        while True:
+            item = self._get(inq)
+            if item is None:
+                return
+            elif item is _END:
+                self._put(outq,_END)
+                return
+            elif failed:
+                # drain input so that earlier stages do not block
+                continue
+
+            try:
+                value, elapsed = item.get()
+            except Exception as e:
+                failed = True
+                self._put(outq,_Raise(e))
+                continue
+
+            upstream._record(elapsed)
+            if not self._put(outq,pool.apply_async(_timed_call,(stage.func,value))):
+                return
+
+    def imap(self,source,name="source"):
+        """Pass each item in `source` through all stages
+
+        Parameters
+        ----------
+        source : iterable
+            Items to process. Iteration occurs in a background thread
+
+        name : str, optional
+            Name of source stage, used in reports (Default: `'source'`)
+
+        Yields
+        ------
+        object
+            Results of the final stage, in the same order as `source`
+
+        Raises
+        ------
+        Exception
+            Any exception raised by `source` or a stage
+        """
+        self.source = Stage(name,None)
+        for stage in self.stages:
+            stage.items = 0
+            stage.busy_time = 0.0
+
+        self._stop = threading.Event()
+        queues = [Queue(maxsize=self.maxsize) for _ in range(len(self.stages) + 1)]
+        pools  = []
+        threads = [threading.Thread(target=self._feed,args=(source,queues[0]))]
+        upstream = self.source
+        for i, stage in enumerate(self.stages):
+            pool = stage._get_pool()
+            pools.append(pool)
+            threads.append(threading.Thread(target=self._dispatch,
+                                            args=(stage,pool,upstream,queues[i],queues[i+1])))
+            upstream = stage
+
+        start = time.time()
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        try:
+            while True:
+                item = self._get(queues[-1])
+                if item is None or item is _END:
+                    break
+
+                value, elapsed = item.get()
+                upstream._record(elapsed)
+                yield value
+        finally:
+            self.elapsed = time.time() - start
+            self._stop.set()
+            for thread in threads:
+                thread.join()
+            for pool in pools:
+                pool.terminate()
+
+    def run(self,source,name="source"):
+        """Pass each item in `source` through all stages, discarding the
+        results of the final stage
+
+        Parameters
+        ----------
+        source : iterable
+            Items to process. Iteration occurs in a background thread
+
+        name : str, optional
+            Name of source stage, used in reports (Default: `'source'`)
+
+        Returns
+        -------
+        int
+            Number of items processed
+        """
+        n = 0
+        for _ in self.imap(source,name=name):
+            n += 1
+
+        return n
+
+    def report(self,printer=None):
+        """Summarize the number of items processed by each stage, the time
+        each spent working, and their throughputs
+
+        Parameters
+        ----------
+        printer : file-like, optional
+            If given, each line of the report is written to `printer`
+
+        Returns
+        -------
+        list
+            Lines of report
+        """
+        if self.source is None:
+            return []
+
+        stages = [self.source] + self.stages
+        busiest = max(stages,key=lambda x: x.busy_time / x.workers)
+        lines = ["Pipeline finished in %.2f s:" % self.elapsed]
+        for stage in stages:
+            lines.append("    %-12s %10d items  %9.2f s busy  %10.1f items/s%s" % (stage.name,
+                                                                                   stage.items,
+                                                                                   stage.busy_time,
+                                                                                   stage.throughput * stage.workers,
+                                                                                   "  (slowest)" if stage is busiest else ""))
+
+        if printer is not None:
+            for line in lines:
+                printer.write(line)
+
+        return lines
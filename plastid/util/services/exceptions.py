@@ -31,6 +31,12 @@ a `onceperfamily` filter for it if one doesn't already exist:
   - :func:`warn_onceperfamily`
   - :func:`warn_explicit_onceperfamily`
 
+These functions are cheap enough to call from inner loops. Repeats of a family
+that has already been shown are counted and discarded without matching any
+regular expressions, and :func:`warn` finds its caller without inspecting the
+whole stack. When the interpreter exits, the number of warnings suppressed in
+each family is summarized on :obj:`sys.stderr` (see :func:`get_suppressed_counts`).
+
 
 Exception types
 ---------------
@@ -66,8 +72,9 @@ See also
     Warnings module
 """
 import re
+import sys
+import atexit
 import warnings
-import inspect
 import linecache
 import textwrap
 from plastid.util.io.filters import colored
@@ -138,11 +145,22 @@ class DataWarning(Warning):
 #===============================================================================
 
 pl_once_registry = {}
-"""Registry of `onceperfamily` warnings that have been seen in the current execution context"""
+"""Registry of `onceperfamily` warnings that have been seen in the current execution context,
+mapping each family to the number of warnings issued in it"""
 
 pl_filters       = []
 """Plastid's own warnings filters, which allow additional actions compared to Python's"""
 
+_pl_filter_keys  = {}
+"""Index of precompiled filters in `pl_filters`, keyed by their uncompiled parameters"""
+
+def _get_caller_module():
+    """Return the name of the module that called the function calling this one"""
+    try:
+        return sys._getframe(2).f_globals.get("__name__",__name__)
+    except ValueError:
+        return __name__
+
 def filterwarnings(action,message="",category=Warning,module="",lineno=0,append=0):
     """Insert an entry into the warnings filter. Behaviors are as in :func:`warnings.filterwarnings`,
     except the additional action `'onceperfamily'` can be used to allow one warning per `family`
@@ -185,11 +203,13 @@ def filterwarnings(action,message="",category=Warning,module="",lineno=0,append=
     warnings.filterwarnings
         Python's warnings filter
     """
-    tup = (action,re.compile(message,re.I),category,re.compile(module),lineno)
     if action == "onceperfamily":
-        if tup in pl_filters:
+        key = (message,category,module,lineno)
+        if key in _pl_filter_keys:
             return
         else:
+            tup = (action,re.compile(message,re.I),category,re.compile(module),lineno)
+            _pl_filter_keys[key] = tup
             if append == 1:
                 pl_filters.append(tup)
             else:
@@ -226,11 +246,20 @@ def warn_onceperfamily(message,pattern=None,category=None,stacklevel=1):
     warnings.warn
         Python's warning system, which this wraps
     """
+    if category is None:
+        category = UserWarning
+
     if pattern is None:
+        # fast path: this family has already been shown
+        family = (message,category,"",0)
+        if family in pl_once_registry:
+            pl_once_registry[family] += 1
+            return
+
         pattern = message
         filterwarnings("onceperfamily",message=pattern,category=category)
         
-    warn(message,category=category,stacklevel=stacklevel)
+    warn(message,category=category,stacklevel=stacklevel+1)
 
 def warn_explicit_onceperfamily(message,category,filename,lineno,pattern=None,
                                 module=None,registry=None,module_globals=None):
@@ -275,15 +304,8 @@ def warn_explicit_onceperfamily(message,category,filename,lineno,pattern=None,
         pattern = message
         filterwarnings("onceperfamily",message=pattern,category=category)
 
-    if module is None:# or module_globals is None:
-        frame = inspect.currentframe()
-        if frame is None:
-            module = __name__
-        else:
-            try:
-                module = inspect.getmodule(frame.f_back.f_code).__name__
-            finally:
-                del frame
+    if module is None:
+        module = _get_caller_module()
         
     warn_explicit(pattern,category,filename,lineno,module=module,registry=registry,module_globals=module_globals)
 
@@ -311,8 +333,17 @@ def warn(message,category=None,stacklevel=1):
     """
     if category is None:
         category = UserWarning
-        
-    _, filename, lineno, _, _, _ = inspect.stack()[stacklevel]
+
+    try:
+        frame = sys._getframe(stacklevel)
+    except ValueError:
+        filename = "sys"
+        lineno   = 1
+    else:
+        filename = frame.f_code.co_filename
+        lineno   = frame.f_lineno
+        del frame
+
     warn_explicit(message,category,filename,lineno,module=filename)
 
 def warn_explicit(message,category,filename,lineno,module=None,registry=None,module_globals=None):
@@ -351,23 +382,17 @@ def warn_explicit(message,category,filename,lineno,module=None,registry=None,mod
         Python's warning system, which this wraps
     """
     global pl_once_registry
-    if module is None: # or module_globals is None:
-        frame = inspect.currentframe()
-        if frame is None:
-            module = __name__
-        else:
-            try:
-                module = inspect.getmodule(frame.f_back.f_code).__name__
-            finally:
-                del frame
+    if module is None:
+        module = _get_caller_module()
 
     for _, pat, filter_category, mod, filter_line in pl_filters:
         if pat.match(message) and issubclass(category,filter_category) and\
            (module is None or mod.match(module)) and\
            (filter_line == 0 or filter_line == lineno):
             
-            tup =(pat.pattern,filter_category,mod,filter_line) 
+            tup = (pat.pattern,filter_category,mod.pattern,filter_line)
             if tup in pl_once_registry:
+                pl_once_registry[tup] += 1
                 return
             else:
                 pl_once_registry[tup] = 1
@@ -434,6 +459,61 @@ def formatwarning(message,category,filename,lineno,file=None,line=None):
 
     return "\n".join(ltmp)
 
+
+def get_suppressed_counts():
+    """Return the number of warnings suppressed in each `onceperfamily` family
     
+    Returns
+    -------
+    dict
+        Dictionary mapping tuples of (message pattern, category) to the number
+        of warnings suppressed after the first in that family. Only families
+        with suppressed warnings are included.
+    """
+    dtmp = {}
+    for (pattern,category,_,_), count in pl_once_registry.items():
+        if count > 1:
+            key = (pattern,category)
+            dtmp[key] = dtmp.get(key,0) + count - 1
+
+    return dtmp
+
+def _is_ignored(message,category):
+    """Return `True` if Python's warnings filters ignore `message`"""
+    for action, msg, filter_category, _, filter_line in warnings.filters:
+        if (msg is None or msg.match(message)) and issubclass(category,filter_category) \
+           and filter_line == 0:
+            return action == "ignore"
+
+    return False
+
+def print_suppressed_summary(stream=None):
+    """Write the number of warnings suppressed in each `onceperfamily` family
+    to `stream`. Called automatically when the interpreter exits.
+    
+    Parameters
+    ----------
+    stream : file-like, optional
+        Stream to write to (Default: :obj:`sys.stderr`)
+    """
+    if stream is None:
+        stream = sys.stderr
+
+    counts = { K : V for K, V in get_suppressed_counts().items() if not _is_ignored(*K) }
+    if len(counts) == 0:
+        return
+
+    ltmp = [colored("Suppressed repeats of %s warning(s):" % len(counts),color="cyan",attrs=["bold"])]
+    for (pattern,category), count in sorted(counts.items(),key=lambda x: -x[1]):
+        ltmp.append("    %8d %s: %s" % (count,category.__name__,pattern))
+
+    try:
+        stream.write("\n".join(ltmp) + "\n")
+    except (IOError,ValueError):
+        # stream may already be closed at exit
+        pass
+
+
 warnings.formatwarning = formatwarning
+atexit.register(print_suppressed_summary)
 
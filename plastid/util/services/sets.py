@@ -4,33 +4,27 @@
 Exported functions
 ------------------
 :py:func:`merge_sets`
-    Recursively merge of sets based upon common members, until all groups
-    sharing common members are merged.
+    Merge sets based upon common members, until all groups sharing
+    common members are merged.
+
+:py:func:`label_integer_sets`
+    Label integer members of sets by the merged group to which they belong,
+    as :py:func:`merge_sets` would, using :py:mod:`numpy` arrays
 
 :py:func:`get_random_sets`
     Generate random sets of members
 """
-import copy
+import numpy
+
 
 def merge_sets(list_of_sets,printer=None):
     """Merges sets in a list if they have one or more common member,
     until all groups sharing common members are merged.
     
-    Merging takes places as follows:
-    
-        1.  All members in all sets are counted
-    
-        2.  All sets containing more than one member are merged via
-            a call to :func:`_merge_sets`
-            
-        3.  A set of unmerged single-member sets is generated by finding all
-            members that appear in multi-member sets after step (2), and subtracting
-            this set from the set generated in step (1)
-            
-        4.  The list of single- and multi-member sets are concatenated to create
-            a final list
-    
-    Repeat steps 1-4 until the number of sets is unchanged  
+    Merging uses a disjoint-set forest (union-find) with path compression.
+    The members of each set are joined to the set's first member, so that
+    the total cost is nearly linear in the total number of members in all
+    sets.
     
     Parameters
     ----------
@@ -44,77 +38,100 @@ def merge_sets(list_of_sets,printer=None):
     Returns
     -------
     list
-        list of merged sets
+        list of merged sets, in order of the first appearance of any of their
+        members in `list_of_sets`
     """
-    # first, simplify sets to remove redundancy
-    list_of_sets = frozenset([frozenset(X) for X in list_of_sets])
-    
-    # count up all members
-    all_members = []
+    parents = {}
+
+    def find(member):
+        root = member
+        while parents[root] != root:
+            root = parents[root]
+
+        # compress path
+        while parents[member] != root:
+            parents[member], member = root, parents[member]
+
+        return root
+
+    num_sets = 0
     for my_set in list_of_sets:
-        all_members.extend(my_set)
-
-    all_members = set(all_members)
-        
-    # ignore singletons in merge process
-    multis = [X for X in list_of_sets if len(X) > 1]
-    if  printer is not None:
-        stmp = "Starting with %s sets, %s distinct members, and %s groups with multiple items ..." % (len(list_of_sets), len(all_members),len(multis))
-        printer.write(stmp)
-        
-    # find remaining singletons post-merge
-    merged_multis = _merge_sets(multis,printer=printer)
-    merged_members = []
-    for my_set in merged_multis:
-        merged_members.extend(my_set)
-
-    merged_members = frozenset(merged_members)
-    unmerged_members = all_members - merged_members
-    unmerged_sets = [set([X]) for X in unmerged_members]
-
-    return sorted([set(X) for X in merged_multis] + unmerged_sets)
-    
-def _merge_sets(list_of_sets,printer=None):
-    """Inner loop function for :func:`merge_sets`.
+        num_sets += 1
+        first_root = None
+        for member in my_set:
+            if member not in parents:
+                parents[member] = member
+                root = member
+            else:
+                root = find(member)
+
+            if first_root is None:
+                first_root = root
+            elif root != first_root:
+                parents[root] = first_root
+
+    if printer is not None:
+        printer.write("Starting with %s sets and %s distinct members ..." % (num_sets,len(parents)))
 
+    groups = {}
+    for member in parents:
+        try:
+            groups[find(member)].add(member)
+        except KeyError:
+            groups[find(member)] = { member }
+
+    if printer is not None:
+        printer.write("Merged %s starting sets to %s final sets ..." % (num_sets,len(groups)))
+
+    return list(groups.values())
+
+def label_integer_sets(list_of_sets,num_members=None):
+    """Label integer members of sets by the merged group to which they belong.
+    
+    Groups are the same as those found by :func:`merge_sets`, but are
+    found as the connected components of a sparse graph, in compiled code.
+    This is much faster than :func:`merge_sets` for large numbers of sets.
+    
     Parameters
     ----------
     list_of_sets : list
-        List of multimember sets of hashable items to merge
+        List of sets (or other iterables) of non-negative integers
 
-    printer : file-like or `None`, optional
-        Writer to which status is sent, as string, if not `None`
-        (Default: :`None`)
+    num_members : int or None, optional
+        Number of possible members. If `None`, one more than the largest
+        member in `list_of_sets` (Default: `None`)
 
     Returns
     -------
-    list
-        merged list of sets
+    :class:`numpy.ndarray`
+        Array of length `num_members`. Element `i` is the smallest member
+        of the merged group containing member `i`. Integers that are not
+        members of any set are labeled as groups of their own.
     """
-    if printer is not None:
-        stmp = "Starting with %s sets..." % len(list_of_sets)
-        printer.write(stmp)
-
-    new_sets = []
-    for set_a in list_of_sets:
-        new_set = set(copy.deepcopy(set_a))
-        for set_b in list_of_sets:
-            if len(new_set & set_b) > 0:
-                new_set |= set_b
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
 
-        new_sets.append(frozenset(new_set))
-
-    ltmp = list(set(new_sets))
-    if printer is not None:
-        stmp = "Merged %s starting sets to %s final sets ..." % (len(list_of_sets), len(ltmp))
-        printer.write(stmp)
-
-    # terminate if no new mergers
-    if len(ltmp) == len(list_of_sets):
-        return [set(X) for X in ltmp]
-    # otherwise, recurse
-    else:
-        return _merge_sets(ltmp,printer=printer)
+    members = []
+    firsts  = []
+    for my_set in list_of_sets:
+        ltmp = list(my_set)
+        if len(ltmp) > 0:
+            members.extend(ltmp)
+            firsts.extend([ltmp[0]] * len(ltmp))
+
+    members = numpy.array(members,dtype=int)
+    firsts  = numpy.array(firsts,dtype=int)
+    if num_members is None:
+        num_members = members.max() + 1 if len(members) > 0 else 0
+
+    graph = coo_matrix((numpy.ones(len(members),dtype=numpy.int8),(members,firsts)),
+                       shape=(num_members,num_members))
+    _, components = connected_components(graph,directed=False)
+
+    # relabel each component by its smallest member
+    smallest = numpy.full(components.max() + 1 if num_members > 0 else 0,num_members,dtype=int)
+    numpy.minimum.at(smallest,components,numpy.arange(num_members))
+    return smallest[components]
 
 def get_random_sets(num_sets,max_len=3,members=list("abcdefghijklmnop")):
     """Generates random sets of members
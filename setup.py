@@ -360,6 +360,16 @@ ext_modules = [Extension(x.replace(base_path+os.sep,"").replace(".pyx","").repla
                          cython_compile_time_env = CYTHON_COMPILE_TIME_ENV,
                         ) for x in noinclude_pyx]
 
+c_gff_tokens = Extension(
+    "plastid.readers.c_gff_tokens",
+    ["plastid/readers/c_gff_tokens.pyx"],
+    include_dirs=INCLUDE_PATH,
+    libraries=LIBRARIES,
+    library_dirs=LIBRARY_DIRS,
+    runtime_library_dirs=RUNTIME_LIBRARY_DIRS,
+    cython_directives=CYTHON_ARGS,
+)
+
 bbifile = Extension(
     "plastid.readers.bbifile",
     ["plastid/readers/bbifile.pyx"] + kent_deps,
@@ -393,6 +403,7 @@ bigbed = Extension(
     cython_directives=CYTHON_ARGS,
 )
 
+ext_modules.append(c_gff_tokens)
 ext_modules.append(bbifile)
 ext_modules.append(bigwig)
 ext_modules.append(bigbed)